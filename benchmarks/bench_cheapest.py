@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: `cheapest` pelo índice de preço unitário vs varrimento da cache.
+
+Gera uma cache sintética (default 50k entradas em 20 categorias, preços em
+€/kg, €/L e €/un) num diretório temporário e mede o top-10 de uma categoria:
+  - varrimento: load de toda a cache + entry_unit_price por entrada + ordenação
+  - backend json: índice price_cache.units.json (+ 1000 registos no log)
+  - backend sqlite: índice (category, base_unit, unit_price)
+
+Usage:
+  python3 benchmarks/bench_cheapest.py [--entries 50000]
+"""
+
+import argparse
+import heapq
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import cache_store  # noqa: E402
+from config import MARKETS, CACHE_TTL_HOURS  # noqa: E402
+
+CATEGORIES = [f"categoria {i}" for i in range(20)]
+UNITS = ["kg", "g", "L", "ml", "un"]
+
+
+def make_cache(n: int, seed: int = 11) -> dict:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    cache = {m: {} for m in MARKETS}
+    for i in range(n):
+        unit = rng.choice(UNITS)
+        price = round(rng.uniform(0.3, 15), 2)
+        cache[MARKETS[i % len(MARKETS)]][f"produto {i}"] = {
+            "name": f"Produto {i}", "price": price, "unit": unit,
+            "price_per_unit": price / (1000 if unit in ("g", "ml") else rng.uniform(0.2, 2)),
+            "category": rng.choice(CATEGORIES), "cached_at": now.isoformat(),
+            "expires_at": now.timestamp() + CACHE_TTL_HOURS * 3600,
+        }
+    return cache
+
+
+def scan(store: cache_store.CacheStore, category: str, unit: str, now: float, limit: int) -> list:
+    rows = []
+    for market, key, entry in cache_store.iter_entries(store.load_all()):
+        unit_price = cache_store.entry_unit_price(entry)
+        if (
+            unit_price and unit_price[1] == unit and cache_store.entry_category(entry) == category
+            and cache_store.entry_expiry(entry) > now
+        ):
+            rows.append((unit_price[0], market, key))
+    return heapq.nsmallest(limit, rows)
+
+
+def timed(fn, repeat: int = 3) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--entries", type=int, default=50_000)
+    args = parser.parse_args()
+
+    cache = make_cache(args.entries)
+    category, unit, now = CATEGORIES[0], "kg", time.time()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "price_cache.json"
+        json_store = cache_store.JsonCacheStore(path, MARKETS)
+        json_store.save_all(cache)
+
+        t_scan, expected = timed(lambda: scan(json_store, category, unit, now, 10))
+        t_json, got = timed(lambda: json_store.cheapest(category, unit, MARKETS, now, 10))
+        assert got == expected
+
+        rng = random.Random(2)
+        json_store.put_many([
+            (m, f"produto {rng.randrange(args.entries)}", cache[m][f"produto {i}"])
+            for m in MARKETS for i in range(MARKETS.index(m), 1000, len(MARKETS))
+        ])
+        t_json_log, _ = timed(lambda: json_store.cheapest(category, unit, MARKETS, now, 10))
+
+        with cache_store.SqliteCacheStore(path.with_suffix(".db"), MARKETS) as sql_store:
+            sql_store.save_all(cache)
+            t_sql, got = timed(lambda: sql_store.cheapest(category, unit, MARKETS, now, 10))
+            assert got == expected
+
+    print(f"{args.entries} entradas, {len(CATEGORIES)} categorias — top 10 €/kg de uma categoria")
+    print(f"varrimento (load + preço unitário por entrada): {t_scan * 1000:8.1f} ms")
+    print(f"json    índice de preço unitário:               {t_json * 1000:8.1f} ms")
+    print(f"json    idem, 1000 registos no log:             {t_json_log * 1000:8.1f} ms")
+    print(f"sqlite  índice (category, base_unit, price):    {t_sql * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
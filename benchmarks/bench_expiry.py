@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark: `expired`/`stats` com expires_at + índice de expiração vs validação por entrada.
+
+Gera uma cache sintética (default 50k entradas, ~30% expiradas) num diretório
+temporário e mede:
+  - is_cache_valid por entrada: parsing de cached_at vs comparação com expires_at
+  - stats/expired como eram (load de todo o JSON + datetime por entrada)
+  - stats/expired nos backends json (índice de expiração + log) e sqlite (índice)
+  - stats pelos contadores mantidos (histograma por balde de expiração) vs
+    `stats --recount` (varrimento completo)
+
+Usage:
+  python3 benchmarks/bench_expiry.py [--entries 50000]
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import cache_store  # noqa: E402
+import price_cache  # noqa: E402
+from config import MARKETS, CACHE_TTL_HOURS  # noqa: E402
+
+
+def make_cache(n: int, seed: int = 5, with_expires_at: bool = True) -> dict:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    cache = {m: {} for m in MARKETS}
+    for i in range(n):
+        market = MARKETS[i % len(MARKETS)]
+        cached = now - timedelta(hours=rng.uniform(0, CACHE_TTL_HOURS / 0.7))
+        entry = {"name": f"produto {i}", "price": round(rng.uniform(0.3, 15), 2),
+                 "unit": "un", "cached_at": cached.isoformat()}
+        if with_expires_at:
+            entry["expires_at"] = cached.timestamp() + CACHE_TTL_HOURS * 3600
+        cache[market][f"produto {i}"] = entry
+    return cache
+
+
+def legacy_is_valid(entry: dict) -> bool:
+    cached_at = entry.get("cached_at")
+    if not cached_at:
+        return False
+    age = (datetime.now(timezone.utc) - datetime.fromisoformat(cached_at)).total_seconds() / 3600
+    return age < CACHE_TTL_HOURS
+
+
+def legacy_stats(path: Path) -> dict:
+    with open(path) as f:
+        cache = json.load(f)
+    return {m: sum(1 for e in cache.get(m, {}).values() if legacy_is_valid(e)) for m in MARKETS}
+
+
+def timed(fn, repeat: int = 3) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--entries", type=int, default=50_000)
+    args = parser.parse_args()
+
+    cache = make_cache(args.entries)
+    entries = [e for m in MARKETS for e in cache[m].values()]
+
+    t_parse, _ = timed(lambda: [legacy_is_valid(e) for e in entries])
+    t_epoch, _ = timed(lambda: [price_cache.is_cache_valid(e) for e in entries])
+    print(f"{args.entries} entradas")
+    print(f"is_cache_valid  cached_at (datetime): {t_parse * 1000:8.1f} ms")
+    print(f"is_cache_valid  expires_at:           {t_epoch * 1000:8.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "price_cache.json"
+        json_store = cache_store.JsonCacheStore(path, MARKETS)
+        json_store.save_all(cache)
+        now = time.time()
+
+        t_legacy, legacy = timed(lambda: legacy_stats(path))
+        t_counts, counts = timed(lambda: json_store.counts(MARKETS, now))
+        t_expired, _ = timed(lambda: json_store.expired(MARKETS, now))
+        assert {m: v for m, (_, v) in counts.items()} == legacy
+
+        rng = random.Random(1)
+        json_store.put_many([
+            (m, f"produto {rng.randrange(args.entries)}", e)
+            for m, e in ((rng.choice(MARKETS), {"name": "x", "cached_at": datetime.now(timezone.utc).isoformat()})
+                         for _ in range(1000))
+        ])
+        t_counts_log, _ = timed(lambda: json_store.counts(MARKETS, now))
+        t_recount, _ = timed(lambda: json_store.recount(MARKETS, now))
+
+        with cache_store.SqliteCacheStore(path.with_suffix(".db"), MARKETS) as sql_store:
+            sql_store.save_all(cache)
+            t_sql_counts, sql_counts = timed(lambda: sql_store.counts(MARKETS, now))
+            t_sql_expired, _ = timed(lambda: sql_store.expired(MARKETS, now))
+            assert {m: v for m, (_, v) in sql_counts.items()} == legacy
+            t_sql_recount, _ = timed(lambda: sql_store.recount(MARKETS, now))
+
+    print(f"stats   anterior (load JSON + datetime):   {t_legacy * 1000:8.1f} ms")
+    print(f"stats   json (contadores do índice):       {t_counts * 1000:8.1f} ms")
+    print(f"stats   json (contadores + 1000 no log):   {t_counts_log * 1000:8.1f} ms")
+    print(f"stats   sqlite (tabela histogram):         {t_sql_counts * 1000:8.1f} ms")
+    print(f"stats --recount json (varrimento):         {t_recount * 1000:8.1f} ms")
+    print(f"stats --recount sqlite (varrimento):       {t_sql_recount * 1000:8.1f} ms")
+    print(f"expired json (prefixo do índice):          {t_expired * 1000:8.1f} ms")
+    print(f"expired sqlite (prefixo do índice):        {t_sql_expired * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark: parse_prices_pt (bloco) vs parse_price_pt / parse_price_unit_pt por string.
+
+Gera strings de preço PT sintéticas ("2,49 €", "1.299,00 €", "0,99/kg", "1,20 €/L",
+"€ 3,10", "0,35 €/un") e mede o débito em strings/s num só core:
+  - parse_price_pt em ciclo (o que cada `parse-price` fazia por processo)
+  - parse_price_unit_pt em ciclo (regex pré-compilada, com unidade)
+  - parse_prices_pt — blocos limpos e com 1% de ruído
+
+Usage:
+  python3 benchmarks/bench_parse_price.py [--strings 1000000]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import price_cache  # noqa: E402
+
+def make_strings(n: int, seed: int = 8, noise: float = 0.0) -> list[str]:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        if noise and rng.random() < noise:
+            out.append(rng.choice(["esgotado", "0,99 €/100g", "Preço: 2,49 €"]))
+            continue
+        euros, cents = rng.randint(0, 3000), rng.randint(0, 99)
+        base = f"{euros:,}".replace(",", ".") + f",{cents:02d}"
+        out.append(rng.choice([f"{base} €", f"{base}/kg", f"{base} €/L", f"€ {base}", f"{base} €/un"]))
+    return out
+
+
+def timed(fn, repeat: int = 3) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--strings", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    clean = make_strings(args.strings)
+    noisy = make_strings(args.strings, noise=0.01)
+
+    t_legacy, _ = timed(lambda: [price_cache.parse_price_pt(s) for s in clean])
+    t_single, expected = timed(lambda: [price_cache.parse_price_unit_pt(s) for s in clean])
+    t_batch, got = timed(lambda: price_cache.parse_prices_pt(clean))
+    t_noisy, _ = timed(lambda: price_cache.parse_prices_pt(noisy))
+    assert got == expected
+
+    def rate(t: float) -> str:
+        return f"{args.strings / t / 1e6:6.2f} M/s  ({t * 1000:7.1f} ms)"
+
+    print(f"{args.strings} strings")
+    print(f"parse_price_pt        por string:      {rate(t_legacy)}")
+    print(f"parse_price_unit_pt   por string:      {rate(t_single)}")
+    print(f"parse_prices_pt       blocos limpos:   {rate(t_batch)}")
+    print(f"parse_prices_pt       1% de ruído:     {rate(t_noisy)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark: PriceIndex.resolve vs get_cached_price por item × mercado.
+
+Gera uma cache sintética (default 10k entradas por mercado, ~30% expiradas e
+metade sem `expires_at`, como as entradas antigas) e listas de compras com
+nomes exatos, parciais, repetidos e inexistentes. Para cada lista mede:
+  - get_cached_price em ciclo, sem índice (caminho das listas curtas)
+  - build_market_indexes + get_cached_price com TrigramIndex (listas longas)
+  - PriceIndex(prefilter=True).resolve — filtra as válidas uma vez
+  - PriceIndex(prefilter=False).resolve — só memoiza nomes repetidos
+sobre um dict carregado e sobre a vista mmap do backend JSON (load_cache_view),
+e confirma que os resultados são idênticos.
+
+Usage:
+  python3 benchmarks/bench_price_index.py [--entries 10000] [--items 1000 20]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import cache_store  # noqa: E402
+import price_compare  # noqa: E402
+from config import MARKETS, CACHE_TTL_HOURS  # noqa: E402
+
+PRODUCTS = ["leite", "iogurte", "queijo", "manteiga", "arroz", "massa", "feijão", "grão",
+            "atum", "azeite", "óleo", "café", "chá", "bolachas", "cereais", "pão", "ovos",
+            "fiambre", "frango", "peru", "pescada", "bacalhau", "detergente", "lixívia"]
+QUALIFIERS = ["meio-gordo", "magro", "uht", "agulha", "carolino", "esparguete", "integral",
+              "natural", "grego", "ralado", "fatiado", "em lata", "extra virgem", "moído"]
+BRANDS = ["mimosa", "gresso", "continente", "pingo doce", "nacional", "milaneza", "delta",
+          "compal", "tenório", "bom petisco", "gallo", "nestlé", "skip", "neoblanc"]
+
+
+def make_cache(n: int, seed: int = 15) -> dict:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    cache = {}
+    for market in MARKETS:
+        entries = {}
+        while len(entries) < n:
+            key = f"{rng.choice(PRODUCTS)} {rng.choice(QUALIFIERS)} {rng.choice(BRANDS)} {rng.randint(1, 999)}"
+            cached = now - timedelta(hours=rng.uniform(0, CACHE_TTL_HOURS / 0.7))
+            entry = {"name": key, "price": round(rng.uniform(0.3, 15), 2), "cached_at": cached.isoformat()}
+            if rng.random() < 0.5:
+                entry["expires_at"] = cached.timestamp() + CACHE_TTL_HOURS * 3600
+            entries[key] = entry
+        cache[market] = entries
+    return cache
+
+
+def make_items(cache: dict, n: int, seed: int = 2) -> list[dict]:
+    rng = random.Random(seed)
+    keys = list(cache[MARKETS[0]])
+    items = []
+    for _ in range(n):
+        kind = rng.random()
+        if kind < 0.3:
+            name = rng.choice(keys)
+        elif kind < 0.7:
+            name = f"{rng.choice(PRODUCTS)} {rng.choice(QUALIFIERS)}"
+        elif kind < 0.9:
+            name = rng.choice(PRODUCTS).capitalize()
+        else:
+            name = f"produto inexistente {rng.randint(1, 50)}"
+        items.append({"name": name})
+    return items
+
+
+def timed(fn, repeat: int = 3) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def per_item(cache: dict, items: list[dict], indexed: bool) -> list[dict]:
+    indexes = price_compare.build_market_indexes(cache) if indexed else {m: None for m in MARKETS}
+    out = []
+    for item in items:
+        prices = {}
+        for market in MARKETS:
+            entry = price_compare.get_cached_price(cache, market, item["name"], indexes[market])
+            if entry:
+                prices[market] = entry
+        out.append(prices)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--entries", type=int, default=10_000, help="Entradas por mercado")
+    parser.add_argument("--items", type=int, nargs="+", default=[1000, 20])
+    args = parser.parse_args()
+
+    cache = make_cache(args.entries)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = cache_store.JsonCacheStore(Path(tmp) / "price_cache.json", MARKETS)
+        store.save_all(cache)
+        print(f"cache: {args.entries} entradas × {len(MARKETS)} mercados")
+        for n in args.items:
+            items = make_items(cache, n)
+            print(f"\n[{n} itens]")
+            for label, source in (("dict", lambda: cache), ("vista mmap", store.load_view)):
+                t_linear, expected = timed(lambda: per_item(source(), items, indexed=False), repeat=1)
+                t_trigram, r_trigram = timed(lambda: per_item(source(), items, indexed=True))
+                t_pre, r_pre = timed(lambda: price_compare.PriceIndex(source()).resolve(items))
+                t_lazy, r_lazy = timed(lambda: price_compare.PriceIndex(source(), prefilter=False).resolve(items))
+                assert expected == r_trigram == r_pre == r_lazy, "resultados diferentes"
+                print(f"  {label:<10} get_cached_price {t_linear * 1000:8.1f} ms | + trigramas {t_trigram * 1000:7.1f} ms"
+                      f" | PriceIndex {t_pre * 1000:7.1f} ms | sem pré-filtro {t_lazy * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
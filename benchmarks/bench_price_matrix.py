@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark: PriceMatrix vs ciclos sobre os dicts de preços no optimize_split.
+
+Gera listas sintéticas (itens × mercados, ~10% de células indisponíveis, ~20%
+com promoção e alguns preferred_store) e mede, para cada tamanho:
+  - greedy (mercado mais barato por item, com preferred_store) + subtotais das
+    alternativas single-store, percorrendo `prices.get(market)` em Python
+  - o mesmo com PriceMatrix (inclui a construção da matriz)
+  - optimize_split completo (só com os mercados de config.MARKETS)
+e confirma que os resultados são idênticos.
+
+Usage:
+  python3 benchmarks/bench_price_matrix.py [--items 100 1000 5000] [--markets 2 8]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import price_compare  # noqa: E402
+from config import MARKETS, ONLINE_MARKET_IDS  # noqa: E402
+from price_matrix import PriceMatrix, effective_price  # noqa: E402
+
+
+def make_items(n: int, markets: list[str], seed: int = 17) -> list[dict]:
+    rng = random.Random(seed)
+    items = []
+    for i in range(n):
+        prices = {}
+        for market in markets:
+            if rng.random() < 0.1:
+                continue
+            price = round(rng.uniform(0.3, 15), 2)
+            info = {"price": price, "promo_effective_price": None, "available": rng.random() > 0.02}
+            if rng.random() < 0.2:
+                info["promo_effective_price"] = round(price * 0.7, 2)
+            prices[market] = info
+        preferred = rng.choice(markets) if rng.random() < 0.05 else None
+        items.append({
+            "item": {"name": f"produto {i}", "category": rng.choice(["mercearia", "lacticínios", "limpeza"]),
+                     "preferred_store": preferred},
+            "prices": prices,
+        })
+    return items
+
+
+def timed(fn, repeat: int = 5) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def dict_walk(items: list[dict], markets: list[str]) -> tuple[list[int], list[tuple[float, bool]]]:
+    """Greedy e alternativas como eram calculados antes da PriceMatrix."""
+    choice = []
+    for item_data in items:
+        prices = item_data["prices"]
+        preferred = item_data["item"].get("preferred_store")
+        if preferred in markets and preferred in ONLINE_MARKET_IDS and effective_price(prices.get(preferred)) is not None:
+            choice.append(markets.index(preferred))
+            continue
+        best_j, best_price = -1, float("inf")
+        for j, market in enumerate(markets):
+            effective = effective_price(prices.get(market))
+            if effective is not None and effective < best_price:
+                best_j, best_price = j, effective
+        choice.append(best_j)
+    totals = []
+    for market in markets:
+        subtotal, all_available = 0.0, True
+        for item_data in items:
+            p = effective_price(item_data["prices"].get(market))
+            if p is not None:
+                subtotal += p
+            else:
+                all_available = False
+        totals.append((subtotal, all_available))
+    return choice, totals
+
+
+def matrix_walk(items: list[dict], markets: list[str]) -> tuple[list[int], list[tuple[float, bool]]]:
+    matrix = PriceMatrix(items, markets)
+    choice, _ = matrix.cheapest()
+    return choice, [matrix.column_total(j) for j in range(len(markets))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--items", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--markets", type=int, nargs="+", default=[2, 8])
+    args = parser.parse_args()
+
+    for n_markets in args.markets:
+        markets = list(MARKETS) + [f"mercado{k}" for k in range(len(MARKETS), n_markets)]
+        markets = markets[:n_markets]
+        print(f"\n[{n_markets} mercados]")
+        for n in args.items:
+            items = make_items(n, markets)
+            t_dict, expected = timed(lambda: dict_walk(items, markets))
+            t_matrix, got = timed(lambda: matrix_walk(items, markets))
+            assert expected[0] == got[0], "greedy diferente"
+            assert all(abs(a[0] - b[0]) < 1e-6 and a[1] == b[1] for a, b in zip(expected[1], got[1])), \
+                "alternativas diferentes"
+            line = (f"  {n:>6} itens  dicts {t_dict * 1000:8.2f} ms | PriceMatrix {t_matrix * 1000:8.2f} ms"
+                    f" ({t_dict / t_matrix:4.1f}×)")
+            if n_markets == len(MARKETS):
+                t_split, _ = timed(lambda: price_compare.optimize_split(items), repeat=3)
+                line += f" | optimize_split {t_split * 1000:8.2f} ms"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark: `price_cache.py refresh-plan` num catálogo grande.
+
+Gera um consumption_model, um shopping_history e uma cache sintéticos e mede:
+  - refresh_candidates (modelo + histórico → candidatos por chave normalizada)
+  - plan_refresh com paragem antecipada (o que o comando usa)
+  - ordenação completa de todos os pares, para referência
+
+Usage:
+  python3 benchmarks/bench_refresh_plan.py [--products 20000] [--limit 50]
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import price_cache  # noqa: E402
+import price_compare  # noqa: E402
+from config import MARKETS  # noqa: E402
+
+
+def make_data(n: int, seed: int = 9) -> tuple[dict, dict, dict]:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    model = {
+        f"p{i}": {
+            "name": f"produto {i}",
+            "avg_purchase_interval_days": rng.randint(3, 60),
+            "estimated_stock_remaining_days": rng.randint(0, 30),
+        }
+        for i in range(n)
+    }
+    history = {"purchases": [
+        {"date": (now - timedelta(days=rng.randint(0, 120))).isoformat(),
+         "items": [{"name": f"produto {rng.randrange(n)}"} for _ in range(30)]}
+        for _ in range(500)
+    ]}
+    cache = {}
+    for m in MARKETS:
+        cache[m] = {}
+        for i in range(2 * n):
+            cached = now - timedelta(hours=rng.uniform(0, 48))
+            cache[m][f"produto {i}"] = {"price": 1.0, "cached_at": cached.isoformat(),
+                                        "expires_at": cached.timestamp() + 24 * 3600}
+    return model, history, cache
+
+
+def timed(fn, repeat: int = 3) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    model, history, cache = make_data(args.products)
+    now = datetime.now(timezone.utc)
+    lookup = price_compare.get_cached_price
+
+    t_cands, cands = timed(lambda: price_cache.refresh_candidates(model, history, [], now))
+    t_plan, plan = timed(lambda: price_cache.plan_refresh(cache, cands, MARKETS, args.limit, lookup))
+    t_full, full = timed(lambda: price_cache.plan_refresh(cache, cands, MARKETS, len(cands) * len(MARKETS), lookup), 1)
+    assert [r["score"] for r in plan] == [r["score"] for r in full[:args.limit]]
+
+    print(f"{len(cands)} produtos × {len(MARKETS)} mercados, cache com {2 * args.products} entradas/mercado")
+    print(f"refresh_candidates:                     {t_cands * 1000:8.1f} ms")
+    print(f"plan_refresh top-k (paragem antecipada): {t_plan * 1000:8.1f} ms")
+    print(f"plan_refresh ordenação completa:        {t_full * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark: price_compare --scenarios vs uma comparação (e uma leitura de ficheiros) por cenário.
+
+Gera uma cache sintética (gerador do bench_price_index) num diretório temporário
+com o backend JSON, uma lista base e variantes "e se" (cada uma sem ~10% dos
+itens). Mede o tempo total para todos os cenários:
+  - run_comparison por cenário, com a lista escrita em inventory.json (o que
+    cada processo fazia — sem contar o arranque do interpretador)
+  - run_scenarios em série (--jobs 1): uma leitura da cache, um PriceIndex
+  - run_scenarios com ProcessPoolExecutor (--jobs N, default nº de CPUs)
+e confirma que os totais são iguais. Com pareto (default) a fronteira é calculada
+nos três casos.
+
+Usage:
+  python3 benchmarks/bench_scenarios.py [--entries 10000] [--items 150] [--scenarios 8] [--jobs N]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import price_cache  # noqa: E402
+import price_compare  # noqa: E402
+import scenarios  # noqa: E402
+from bench_price_index import make_cache, make_items  # noqa: E402
+
+
+def timed(fn) -> tuple[float, object]:
+    t0 = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t0, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--items", type=int, default=150)
+    parser.add_argument("--scenarios", type=int, default=8)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        os.environ["GROCERY_CACHE_BACKEND"] = "json"
+        price_compare.DATA_DIR = data_dir
+        price_cache.DATA_DIR = data_dir
+        price_cache.CACHE_FILE = data_dir / "price_cache.json"
+        (data_dir / "family_preferences.json").write_text("{}")
+
+        cache = make_cache(args.entries)
+        rows = [price_cache.build_entry(m, key, {"price": e["price"]})
+                for m, entries in cache.items() for key, e in entries.items()]
+        price_cache.write_entries(rows)
+
+        rng = random.Random(4)
+        base = make_items(cache, args.items)
+        variants = [[item for item in base if rng.random() > 0.1] for _ in range(args.scenarios)]
+        print(f"{args.entries} entradas/mercado, {args.scenarios} cenários de ~{args.items} itens, "
+              f"{args.jobs} processo(s)")
+
+        def per_scenario():
+            totals = []
+            for items in variants:
+                (data_dir / "inventory.json").write_text(json.dumps({"shopping_list": items}))
+                totals.append(price_compare.run_comparison(use_result_cache=False)["total"])
+            return totals
+
+        def batch(jobs):
+            out = []
+            lines = [json.dumps({"id": k, "items": items}) for k, items in enumerate(variants)]
+            scenarios.run_scenarios(lines, out.append, jobs=jobs)
+            return [r["total"] for r in sorted(map(json.loads, out), key=lambda r: r["id"])]
+
+        t_each, expected = timed(per_scenario)
+        t_serial, serial = timed(lambda: batch(1))
+        t_pool, pooled = timed(lambda: batch(args.jobs))
+        assert serial == expected and pooled == expected, "resultados diferentes"
+
+        print(f"  run_comparison por cenário      {t_each * 1000:9.1f} ms")
+        print(f"  --scenarios --jobs 1            {t_serial * 1000:9.1f} ms  ({t_each / t_serial:4.1f}×)")
+        print(f"  --scenarios --jobs {args.jobs:<2d}           {t_pool * 1000:9.1f} ms  ({t_each / t_pool:4.1f}×)")
+
+
+if __name__ == "__main__":
+    main()
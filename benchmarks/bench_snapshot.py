@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark: snapshot binário (price_cache.bin, mmap) vs parsing de price_cache.json.
+
+Gera uma cache sintética (default 50k entradas) num diretório temporário e mede
+o custo de um processo de vida curta que só precisa de algumas chaves:
+  - get: load de todo o JSON + lookup (como era) vs JsonCacheStore.get (mmap +
+    pesquisa binária), com o log vazio e com 1000 registos no log
+  - price_compare: load_cache + get_cached_price vs load_cache_view + get_cached_price
+
+Usage:
+  python3 benchmarks/bench_snapshot.py [--entries 50000] [--lookups 20]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import cache_store  # noqa: E402
+import price_cache  # noqa: E402
+import price_compare  # noqa: E402
+from config import MARKETS, CACHE_TTL_HOURS  # noqa: E402
+
+
+def make_cache(n: int, seed: int = 10) -> dict:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    cache = {m: {} for m in MARKETS}
+    for i in range(n):
+        market = MARKETS[i % len(MARKETS)]
+        cached = now - timedelta(hours=rng.uniform(0, CACHE_TTL_HOURS / 2))
+        cache[market][f"produto {i}"] = {
+            "name": f"Produto {i}", "price": round(rng.uniform(0.3, 15), 2), "unit": "un",
+            "cached_at": cached.isoformat(), "expires_at": cached.timestamp() + CACHE_TTL_HOURS * 3600,
+        }
+    return cache
+
+
+def timed(fn, repeat: int = 3) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--entries", type=int, default=50_000)
+    parser.add_argument("--lookups", type=int, default=20)
+    args = parser.parse_args()
+
+    cache = make_cache(args.entries)
+    rng = random.Random(3)
+    wanted = [(MARKETS[i % len(MARKETS)], f"produto {i}")
+              for i in (rng.randrange(args.entries) for _ in range(args.lookups))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "price_cache.json"
+        cache_store.JsonCacheStore(path, MARKETS).save_all(cache)
+        print(f"{args.entries} entradas: JSON {path.stat().st_size / 1e6:.1f} MB, "
+              f"binário {path.with_suffix('.bin').stat().st_size / 1e6:.1f} MB")
+
+        def fresh() -> cache_store.JsonCacheStore:
+            return cache_store.JsonCacheStore(path, MARKETS)
+
+        t_json, expected = timed(lambda: fresh().load_all()[wanted[0][0]][wanted[0][1]])
+        t_bin, got = timed(lambda: fresh().get(*wanted[0]), repeat=50)
+        assert got == expected
+
+        price_cache.CACHE_FILE = path
+        price_cache.DATA_DIR = path.parent
+
+        def compare(loader):
+            loaded = loader()
+            return [price_compare.get_cached_price(loaded, m, k) for m, k in wanted]
+
+        t_cmp_json, expected = timed(lambda: compare(price_cache.load_cache))
+        t_cmp_view, got = timed(lambda: compare(price_cache.load_cache_view))
+        assert got == expected
+
+        fresh().put_many([(m, f"produto {rng.randrange(args.entries)}", {"name": "x", "price": 1.0})
+                          for m in MARKETS for _ in range(1000 // len(MARKETS))])
+        t_bin_log, _ = timed(lambda: fresh().get(*wanted[0]), repeat=50)
+
+    print(f"get            load JSON + lookup:        {t_json * 1000:9.2f} ms")
+    print(f"get            mmap + pesquisa binária:   {t_bin * 1e6:9.1f} µs")
+    print(f"get            idem, 1000 no log:         {t_bin_log * 1e6:9.1f} µs")
+    print(f"price_compare  load_cache ({args.lookups} lookups):   {t_cmp_json * 1000:9.2f} ms")
+    print(f"price_compare  load_cache_view:           {t_cmp_view * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark: SplitSession (deltas) vs optimize_split completo a cada alteração.
+
+Parte de uma lista sintética (mesmo gerador do bench_price_matrix, só com os
+mercados de config.MARKETS) e aplica uma sequência de alterações — itens novos,
+itens removidos e preços alterados. Para cada tamanho mede o tempo médio por
+alteração:
+  - optimize_split sobre a lista inteira (o que o price_compare fazia)
+  - SplitSession: o delta e o result()
+e confirma no fim que os resultados são idênticos. Mostra também quantas
+alterações precisaram da solução completa.
+
+Usage:
+  python3 benchmarks/bench_split_session.py [--items 50 200 1000] [--deltas 200]
+"""
+
+import argparse
+import copy
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import price_compare  # noqa: E402
+from bench_price_matrix import make_items  # noqa: E402
+from config import MARKETS  # noqa: E402
+from split_session import SplitSession  # noqa: E402
+
+
+def make_deltas(items: list[dict], n: int, seed: int = 5) -> list[tuple]:
+    rng = random.Random(seed)
+    names = [d["item"]["name"] for d in items]
+    extra = iter(make_items(n, MARKETS, seed=seed + 1))
+    deltas = []
+    for k in range(n):
+        op = rng.random()
+        if op < 0.35:
+            item_data = next(extra)
+            item_data["item"]["name"] = f"novo {k}"
+            names.append(item_data["item"]["name"])
+            deltas.append(("add", item_data))
+        elif op < 0.6 and len(names) > 1:
+            deltas.append(("remove", names.pop(rng.randrange(len(names)))))
+        else:
+            price = round(rng.uniform(0.3, 15), 2)
+            deltas.append(("set_price", rng.choice(names), rng.choice(MARKETS), {"price": price}))
+    return deltas
+
+
+def apply_to_list(items: list[dict], delta: tuple) -> None:
+    if delta[0] == "add":
+        items.append(delta[1])
+    elif delta[0] == "remove":
+        items[:] = [d for d in items if d["item"]["name"] != delta[1]]
+    else:
+        _, name, market, info = delta
+        for d in items:
+            if d["item"]["name"] == name:
+                d["prices"] = dict(d["prices"], **{market: info})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--items", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--deltas", type=int, default=200)
+    args = parser.parse_args()
+
+    for n in args.items:
+        items = make_items(n, MARKETS)
+        deltas = make_deltas(items, args.deltas)
+
+        plain = copy.deepcopy(items)
+        t0 = time.perf_counter()
+        for delta in deltas:
+            apply_to_list(plain, delta)
+            expected = price_compare.optimize_split(plain)
+        t_full = (time.perf_counter() - t0) / len(deltas)
+
+        session = SplitSession(copy.deepcopy(items))
+        t0 = time.perf_counter()
+        for delta in deltas:
+            getattr(session, delta[0])(*delta[1:])
+            result = session.result()
+        t_session = (time.perf_counter() - t0) / len(deltas)
+
+        assert result == expected, "resultados diferentes"
+        print(f"  {n:>6} itens  optimize_split {t_full * 1000:7.2f} ms/alteração"
+              f" | SplitSession {t_session * 1000:7.2f} ms/alteração ({t_full / t_session:4.1f}×)"
+              f" | soluções completas {session.stats['full'] - 1}/{len(deltas)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Benchmark: substitute_brands pelo índice (categoria, unidade, marca, preço unitário) vs varrimento.
+
+Gera uma cache sintética (default 20k entradas por mercado, 14 marcas, preços em
+€/kg, €/L e €/un) num diretório temporário e uma lista de 100 itens, cada um com
+marca preferida e duas aceitáveis. Mede a etapa de substituição inteira
+(candidatos + escolha por mercado):
+  - varrimento: todas as entradas válidas de cada mercado, por item
+  - backend json: blocos por (categoria, unidade, marca) em price_cache.units.json
+  - backend sqlite: índice de cobertura (category, base_unit, brand, unit_price, market, expires_at)
+e confirma que as substituições são as mesmas. Objetivo: < 100 ms para 100 itens.
+
+Usage:
+  python3 benchmarks/bench_substitutions.py [--entries 20000] [--items 100]
+"""
+
+import argparse
+import copy
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import cache_store  # noqa: E402
+import substitutions  # noqa: E402
+from config import MARKETS, CACHE_TTL_HOURS  # noqa: E402
+
+PRODUCTS = {"leite": ("lacticínios", "L"), "iogurte": ("lacticínios", "kg"), "queijo": ("lacticínios", "kg"),
+            "arroz": ("mercearia", "kg"), "massa": ("mercearia", "kg"), "azeite": ("mercearia", "L"),
+            "café": ("bebidas", "kg"), "sumo": ("bebidas", "L"), "ovos": ("frescos", "un"),
+            "detergente": ("limpeza", "L")}
+QUALIFIERS = ["meio-gordo", "magro", "uht", "agulha", "carolino", "esparguete", "integral",
+              "natural", "grego", "ralado", "fatiado", "extra virgem", "moído", "laranja"]
+BRANDS = ["Mimosa", "Gresso", "Continente", "Pingo Doce", "Nacional", "Milaneza", "Delta",
+          "Compal", "Agros", "Bom Petisco", "Gallo", "Nestlé", "Skip", "Neoblanc"]
+
+
+def make_cache(n: int, seed: int = 24) -> dict:
+    rng = random.Random(seed)
+    now = time.time()
+    cache = {}
+    for market in MARKETS:
+        entries = {}
+        while len(entries) < n:
+            product = rng.choice(list(PRODUCTS))
+            category, unit = PRODUCTS[product]
+            brand = rng.choice(BRANDS)
+            name = f"{product} {rng.choice(QUALIFIERS)} {brand} {rng.randint(1, 999)}"
+            price = round(rng.uniform(0.3, 15), 2)
+            entries[name.lower()] = {
+                "name": name, "price": price, "price_per_unit": round(price / rng.uniform(0.25, 2), 2),
+                "unit": unit, "brand": brand, "category": category, "cached_at": "2026-01-01T00:00:00+00:00",
+                "expires_at": now + (CACHE_TTL_HOURS * 3600 if rng.random() > 0.2 else -1),
+            }
+        cache[market] = entries
+    return cache
+
+
+def make_items(cache: dict, n: int, seed: int = 3) -> list[dict]:
+    """Itens "produto qualificador" com marcas, e a entrada pelo nome de cada mercado (se houver)."""
+    rng = random.Random(seed)
+    items = []
+    for _ in range(n):
+        product = rng.choice(list(PRODUCTS))
+        name = f"{product} {rng.choice(QUALIFIERS)}"
+        preferred, *acceptable = rng.sample(BRANDS, 3)
+        item = {"name": name, "category": PRODUCTS[product][0],
+                "preferred_brand": preferred, "acceptable_brands": acceptable}
+        prices = {}
+        for market in MARKETS:
+            match = next((e for k, e in cache[market].items() if k.startswith(name.lower())), None)
+            if match is not None:
+                prices[market] = match
+        items.append({"item": item, "prices": prices})
+    return items
+
+
+class ScanStore:
+    """brand_candidates por varrimento de todas as entradas (a alternativa sem índice)."""
+
+    def __init__(self, cache: dict):
+        self.cache = cache
+
+    def brand_candidates(self, queries, markets, now, limit):
+        results = []
+        for category, base_unit, brands, terms in queries:
+            found = {}
+            for market in markets:
+                rows = []
+                for key, entry in self.cache[market].items():
+                    unit_price = cache_store.entry_unit_price(entry)
+                    if (
+                        unit_price and unit_price[1] == base_unit and cache_store.entry_category(entry) == category
+                        and cache_store.entry_brand(entry) in brands and cache_store.entry_expiry(entry) > now
+                        and all(term in key for term in terms)
+                    ):
+                        rows.append((unit_price[0], key))
+                if rows:
+                    found[market] = sorted(rows)[:limit]
+            results.append(found)
+        return results
+
+
+def timed(fn, repeat: int = 3) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--entries", type=int, default=20_000)
+    parser.add_argument("--items", type=int, default=100)
+    args = parser.parse_args()
+
+    cache = make_cache(args.entries)
+    items = make_items(cache, args.items)
+    now = time.time()
+
+    def run(store, view):
+        subs, _ = substitutions.substitute_brands(copy.deepcopy(items), store, view, {}, now=now)
+        return subs
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "price_cache.json"
+        json_store = cache_store.JsonCacheStore(path, MARKETS)
+        json_store.save_all(cache)
+        view = json_store.load_view()
+
+        t_scan, expected = timed(lambda: run(ScanStore(cache), view), repeat=1)
+        t_json, got = timed(lambda: run(json_store, view))
+        assert got == expected, "json: substituições diferentes"
+
+        with cache_store.SqliteCacheStore(path.with_suffix(".db"), MARKETS) as sql_store:
+            sql_store.save_all(cache)
+            t_sql, got = timed(lambda: run(sql_store, view))
+            assert got == expected, "sqlite: substituições diferentes"
+
+    print(f"{args.entries} entradas/mercado, {args.items} itens — {len(expected)} substituições")
+    print(f"varrimento (todas as entradas por item):         {t_scan * 1000:8.1f} ms")
+    print(f"json    índice de preço unitário com marca:      {t_json * 1000:8.1f} ms")
+    print(f"sqlite  índice de cobertura por marca:           {t_sql * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
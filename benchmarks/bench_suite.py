@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Suite de benchmarks: latência p50/p95 e memória de pico dos pontos de entrada, comparadas com uma baseline.
+
+Cargas sintéticas do benchmarks/workload.py (seed fixa), num diretório temporário:
+  - optimize_split[itens=N]     listas de 20–500 itens já resolvidas (PriceIndex)
+                                numa cache de 10⁴ produtos por mercado
+  - fuzzy_search[cache=N]       20 pesquisas (nomes, marcas, misses) num mercado
+                                com 10²–10⁵ produtos
+  - check_stock[modelo=N]       consumption_model.json com 10²–10⁴ produtos
+  - generate_triage[modelo=N]   o mesmo modelo, 30 itens manuais na shopping_list
+
+Cada cenário corre uma vez para aquecer e depois até --repeat vezes (pelo menos
+5, parando após --max-seconds); p50/p95 são os percentis por ordem dos tempos
+(com poucas execuções o p95 é o máximo). A memória de pico é medida numa execução
+à parte com tracemalloc, para não pesar nos tempos; a preparação da carga não conta.
+
+Com --baseline (default benchmarks/baseline.json, se existir) cada cenário é
+comparado com o da baseline: regressão se o p50 ou o pico de memória crescerem
+mais do que --tolerance (e mais do que um mínimo absoluto, para não acusar ruído
+em tempos de microssegundos). Uma regressão só fica se a melhor de até
+CONFIRM_RUNS medições completas repetidas também o for; com --fail-on-regression
+o processo termina então com código 1. A baseline depende da máquina — gravar
+uma nova com --save-baseline antes de comparar noutra.
+
+Usage:
+  python3 benchmarks/bench_suite.py [--quick] [--only NOME] [--repeat 30] [--max-seconds 3]
+                                    [--baseline FICHEIRO] [--save-baseline] [--tolerance 0.25]
+                                    [--output resultados.json] [--fail-on-regression]
+"""
+
+import argparse
+import json
+from contextlib import contextmanager
+import math
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import consumption_tracker  # noqa: E402
+import list_optimizer  # noqa: E402
+import price_cache  # noqa: E402
+import price_compare  # noqa: E402
+import workload  # noqa: E402
+
+BASELINE_FILE = Path(__file__).parent / "baseline.json"
+SPLIT_SIZES = [20, 100, 500]
+SPLIT_CACHE_SIZE = 10_000
+SEARCH_SIZES = [100, 1_000, 10_000, 100_000]
+MODEL_SIZES = [100, 1_000, 10_000]
+QUICK_MAX_SIZE = 1_000
+MANUAL_ITEMS = 30
+MIN_RUNS = 5
+CONFIRM_RUNS = 3  # medições completas repetidas antes de dar uma regressão como certa
+# Abaixo disto a diferença é ruído, mesmo que passe a tolerância relativa
+MIN_DELTA_MS = 0.5
+MIN_DELTA_KIB = 64
+QUERIES = ["leite", "arroz agulha", "café moído delta", "azeite extra virgem", "iogurte grego",
+           "mimosa", "pingo doce", "papel higiénico", "atum", "água 1.5l", "sem lactose", "massa esparguete",
+           "detergente skip", "queijo fatiado", "ovos", "frango do campo", "cerveja", "biológico",
+           "trufas", "salmão fumado"]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Percentil por ordem (nearest-rank) de `values`."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def measure(fn, repeat: int, max_seconds: float) -> dict:
+    """{runs, p50_ms, p95_ms, peak_kib} de `fn()`."""
+    fn()
+    times = []
+    start = time.perf_counter()
+    while len(times) < repeat and (len(times) < MIN_RUNS or time.perf_counter() - start < max_seconds):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"runs": len(times), "p50_ms": round(percentile(times, 50) * 1000, 3),
+            "p95_ms": round(percentile(times, 95) * 1000, 3), "peak_kib": round(peak / 1024, 1)}
+
+
+# ---------------------------------------------------------------------------
+# Cenários: cada um prepara a carga e devolve a função a medir
+# ---------------------------------------------------------------------------
+
+def split_scenario(size: int, cache: dict):
+    items = workload.make_shopping_list(size)
+    index = price_compare.PriceIndex(cache)
+    items_with_prices = [{"item": item, "prices": prices}
+                         for item, prices in zip(items, index.resolve(items)) if prices]
+    return lambda: price_compare.optimize_split(items_with_prices)
+
+
+def search_scenario(size: int):
+    cache = workload.make_price_cache(size, markets=["continente"])
+    return lambda: [price_cache.fuzzy_search(cache, "continente", query) for query in QUERIES]
+
+
+def model_dir(root: Path, size: int) -> Path:
+    path = root / f"modelo-{size}"
+    if not path.exists():
+        workload.write_data_dir(path, workload.make_consumption_model(size),
+                                workload.make_shopping_list(MANUAL_ITEMS))
+    return path
+
+
+@contextmanager
+def patched(module, **values):
+    """Aponta globais de `module` (DATA_DIR, ...) para a carga e repõe-nos à saída."""
+    saved = {name: getattr(module, name) for name in values}
+    for name, value in values.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+
+def stock_scenario(size: int, root: Path):
+    path = model_dir(root, size)
+
+    def run():
+        with patched(consumption_tracker, DATA_DIR=path, MODEL_FILE=path / "consumption_model.json",
+                     HISTORY_FILE=path / "shopping_history.json"):
+            return consumption_tracker.check_stock()
+    return run
+
+
+def triage_scenario(size: int, root: Path):
+    path = model_dir(root, size)
+
+    def run():
+        with patched(list_optimizer, DATA_DIR=path):
+            return list_optimizer.generate_triage()
+    return run
+
+
+def scenarios(root: Path, quick: bool):
+    """(nome, preparação) de cada cenário; a preparação só corre se o cenário for medido."""
+    def sizes(values):
+        return [v for v in values if not quick or v <= QUICK_MAX_SIZE]
+
+    split_cache = {}
+
+    def cache_for_split():
+        if not split_cache:
+            split_cache.update(workload.make_price_cache(SPLIT_CACHE_SIZE))
+        return split_cache
+
+    for size in SPLIT_SIZES:
+        yield f"optimize_split[itens={size}]", lambda size=size: split_scenario(size, cache_for_split())
+    for size in sizes(SEARCH_SIZES):
+        yield f"fuzzy_search[cache={size}]", lambda size=size: search_scenario(size)
+    for size in sizes(MODEL_SIZES):
+        yield f"check_stock[modelo={size}]", lambda size=size: stock_scenario(size, root)
+    for size in sizes(MODEL_SIZES):
+        yield f"generate_triage[modelo={size}]", lambda size=size: triage_scenario(size, root)
+
+
+# ---------------------------------------------------------------------------
+# Baseline
+# ---------------------------------------------------------------------------
+
+def compare(result: dict, base: dict | None, tolerance: float) -> str:
+    """ok | regressão | melhoria | novo — p50 e memória de pico face à baseline."""
+    if base is None:
+        return "novo"
+    limit = 1 + tolerance
+    slower = (result["p50_ms"] > base["p50_ms"] * limit
+              and result["p50_ms"] - base["p50_ms"] > MIN_DELTA_MS)
+    bigger = (result["peak_kib"] > base["peak_kib"] * limit
+              and result["peak_kib"] - base["peak_kib"] > MIN_DELTA_KIB)
+    if slower or bigger:
+        return "regressão"
+    if result["p50_ms"] * limit < base["p50_ms"] and base["p50_ms"] - result["p50_ms"] > MIN_DELTA_MS:
+        return "melhoria"
+    return "ok"
+
+
+def machine() -> dict:
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--quick", action="store_true",
+                        help=f"só caches e modelos até {QUICK_MAX_SIZE} produtos (listas de todos os tamanhos)")
+    parser.add_argument("--only", help="só os cenários cujo nome contém este texto")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--max-seconds", type=float, default=3.0, help="tempo máximo de medição por cenário")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="grava os resultados em --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--output", type=Path, help="grava os resultados em JSON")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="termina com código 1 se houver regressões confirmadas")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline.get("machine") != machine():
+            print(f"aviso: baseline gravada noutra máquina ({baseline.get('machine', {}).get('platform')})")
+
+    results, regressions = {}, []
+    print(f"{'cenário':34s} {'exec':>5s} {'p50 ms':>10s} {'p95 ms':>10s} {'pico KiB':>10s}  baseline")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, prepare in scenarios(Path(tmp), args.quick):
+            if args.only and args.only not in name:
+                continue
+            fn = prepare()
+            result = measure(fn, args.repeat, args.max_seconds)
+            base = baseline.get("scenarios", {}).get(name)
+            # confirmação: um pico de carga na máquina não conta como regressão
+            for _ in range(CONFIRM_RUNS):
+                if compare(result, base, args.tolerance) != "regressão":
+                    break
+                again = measure(fn, args.repeat, args.max_seconds)
+                result = min(result, again, key=lambda r: (r["p50_ms"], r["peak_kib"]))
+            results[name] = result
+            line = (f"{name:34s} {result['runs']:5d} {result['p50_ms']:10.2f} {result['p95_ms']:10.2f} "
+                    f"{result['peak_kib']:10.1f}")
+            if baseline:
+                status = compare(result, base, args.tolerance)
+                if status == "regressão":
+                    regressions.append(name)
+                if base is not None:
+                    status += f" (p50 {base['p50_ms']:.2f} ms, pico {base['peak_kib']:.1f} KiB)"
+                line += f"  {status}"
+            print(line, flush=True)
+
+    report = {"generated_at": datetime.now(timezone.utc).isoformat(), "machine": machine(),
+              "quick": args.quick, "scenarios": results}
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n")
+    if args.save_baseline:
+        if args.baseline.exists():
+            report["scenarios"] = {**json.loads(args.baseline.read_text()).get("scenarios", {}), **results}
+        args.baseline.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n")
+        print(f"baseline gravada em {args.baseline}")
+    if regressions:
+        print(f"{len(regressions)} regressão(ões) acima de {args.tolerance:.0%}: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
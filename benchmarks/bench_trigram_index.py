@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark: índice de trigramas vs varrimento linear.
+
+Compara price_compare.get_cached_price (lista de N itens × mercados) e
+price_cache.fuzzy_search com e sem TrigramIndex, sobre uma cache sintética,
+e confirma que os resultados são idênticos.
+
+Usage:
+  python3 benchmarks/bench_trigram_index.py [--entries 10000] [--items 60]
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import price_cache  # noqa: E402
+import price_compare  # noqa: E402
+from config import MARKETS  # noqa: E402
+
+PRODUCTS = ["leite", "iogurte", "queijo", "manteiga", "arroz", "massa", "feijão", "grão",
+            "atum", "azeite", "óleo", "café", "chá", "bolachas", "cereais", "pão", "ovos",
+            "fiambre", "frango", "peru", "pescada", "bacalhau", "detergente", "lixívia"]
+QUALIFIERS = ["meio-gordo", "magro", "uht", "agulha", "carolino", "esparguete", "integral",
+              "natural", "grego", "ralado", "fatiado", "em lata", "extra virgem", "moído"]
+BRANDS = ["mimosa", "gresso", "continente", "pingo doce", "nacional", "milaneza", "delta",
+          "compal", "tenório", "bom petisco", "gallo", "nestlé", "skip", "neoblanc"]
+SIZES = ["1kg", "500g", "1l", "1,5l", "6x1l", "12un", "250g", "4x125g", "750ml"]
+
+
+def make_cache(n: int, seed: int = 42) -> dict:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).isoformat()
+    cache = {}
+    for market in MARKETS:
+        entries = {}
+        while len(entries) < n:
+            key = " ".join([rng.choice(PRODUCTS), rng.choice(QUALIFIERS), rng.choice(BRANDS),
+                            rng.choice(SIZES), str(rng.randint(1, 999))])
+            entries[key] = {"name": key, "price": round(rng.uniform(0.3, 15), 2), "cached_at": now}
+        cache[market] = entries
+    return cache
+
+
+def make_items(n: int, seed: int = 1) -> list[str]:
+    rng = random.Random(seed)
+    names = []
+    for _ in range(n):
+        kind = rng.random()
+        if kind < 0.6:
+            names.append(f"{rng.choice(PRODUCTS)} {rng.choice(QUALIFIERS)}")
+        elif kind < 0.9:
+            names.append(rng.choice(PRODUCTS))
+        else:
+            names.append(f"produto inexistente {rng.randint(1, 99)}")
+    return names
+
+
+def timed(fn, repeat: int = 3) -> tuple[float, object]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--entries", type=int, default=10_000, help="Entradas por mercado")
+    parser.add_argument("--items", type=int, default=60, help="Itens na lista de compras")
+    args = parser.parse_args()
+
+    cache = make_cache(args.entries)
+    t_build, indexes = timed(lambda: price_compare.build_market_indexes(cache), repeat=1)
+    print(f"cache: {args.entries} entradas × {len(MARKETS)} mercados | lista: {args.items} itens")
+    print(f"construção dos índices: {t_build * 1000:.1f} ms")
+
+    workloads = {
+        "lista típica": make_items(args.items),
+        "só misses": [f"produto inexistente {i}" for i in range(args.items)],
+    }
+    for label, items in workloads.items():
+        queries = len(items) * len(MARKETS)
+
+        def resolve(idx):
+            return [
+                price_compare.get_cached_price(cache, m, name, idx[m] if idx else None)
+                for name in items for m in MARKETS
+            ]
+
+        def search(idx):
+            return [
+                price_cache.fuzzy_search(cache, m, name, index=idx[m] if idx else None)
+                for name in items for m in MARKETS
+            ]
+
+        print(f"\n[{label}] {queries} consultas")
+        for fn_label, fn in (("get_cached_price", resolve), ("fuzzy_search", search)):
+            t_lin, r_lin = timed(lambda: fn(None))
+            t_idx, r_idx = timed(lambda: fn(indexes))
+            assert r_lin == r_idx, f"{fn_label}: resultados diferentes com índice"
+            saved = (t_lin - t_idx) / queries
+            breakeven = f"{t_build / saved:,.0f} consultas" if saved > 0 else "—"
+            print(f"  {fn_label:<17} linear {t_lin * 1000:7.1f} ms | trigramas {t_idx * 1000:7.1f} ms "
+                  f"| compensa a construção a partir de {breakeven}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Gerador de cargas sintéticas para os benchmarks (determinístico por seed).
+
+Produz dados com a forma dos ficheiros reais em data/:
+  - make_price_cache: {market: {chave: entrada}} como o price_cache grava (nome
+    "produto qualificador marca tamanho ref", preço, price_per_unit em €/kg, €/L
+    ou €/un, pack_size, marca, categoria), com promoções variadas ("Leve 3 pague 2",
+    "50% na 2ª unidade", "2 por X€", "Poupa N%") e idades mistas — frescas,
+    expiradas e muito antigas, metade com `expires_at` e metade só com `cached_at`;
+  - make_consumption_model: consumption_model.json com histórico de compras,
+    consumo semanal, confiança, granel e lojas presenciais;
+  - make_history: shopping_history.json com as compras do modelo agrupadas por dia e mercado;
+  - make_shopping_list: itens "produto qualificador" com quantidade e marcas;
+  - write_data_dir: os ficheiros de dados num diretório (inventory.json,
+    consumption_model.json, shopping_history.json, family_preferences.json).
+"""
+
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from config import CACHE_TTL_HOURS, MARKETS
+
+# categoria → [(produto, unidade base, preço unitário típico (min, max), tamanhos na unidade base)]
+CATALOGUE = {
+    "lacticínios": [("leite", "L", (0.6, 1.3), [1, 6]), ("iogurte", "kg", (1.5, 5.0), [0.12, 0.5, 1]),
+                    ("queijo", "kg", (6.0, 18.0), [0.15, 0.25, 0.5]), ("manteiga", "kg", (7.0, 12.0), [0.25]),
+                    ("natas", "L", (2.5, 5.0), [0.2, 1])],
+    "mercearia": [("arroz", "kg", (0.9, 2.5), [1, 5]), ("massa", "kg", (1.0, 3.5), [0.5, 1]),
+                  ("feijão", "kg", (1.5, 3.0), [0.5, 1]), ("grão", "kg", (1.5, 3.0), [0.5, 1]),
+                  ("azeite", "L", (6.0, 11.0), [0.75, 1, 3]), ("açúcar", "kg", (0.9, 1.6), [1]),
+                  ("farinha", "kg", (0.7, 1.5), [1])],
+    "bebidas": [("café", "kg", (12.0, 35.0), [0.25, 0.5, 1]), ("sumo", "L", (0.9, 2.5), [0.33, 1, 1.5]),
+                ("água", "L", (0.15, 0.6), [1.5, 6, 9]), ("cerveja", "L", (1.5, 4.0), [0.33, 1.98]),
+                ("vinho", "L", (2.5, 12.0), [0.75])],
+    "frescos": [("ovos", "un", (0.15, 0.4), [6, 12]), ("frango", "kg", (3.0, 7.0), [0.5, 1]),
+                ("pescada", "kg", (6.0, 12.0), [0.4, 1]), ("fiambre", "kg", (8.0, 16.0), [0.12, 0.2]),
+                ("pão", "kg", (2.0, 5.0), [0.4, 0.6]), ("maçã", "kg", (1.2, 2.5), [1, 1.5])],
+    "limpeza": [("detergente", "L", (1.5, 5.0), [1, 2.5]), ("lixívia", "L", (0.6, 1.5), [2, 4]),
+                ("papel higiénico", "un", (0.2, 0.5), [12, 24]), ("esponjas", "un", (0.2, 0.6), [3, 6])],
+    "conservas": [("atum", "kg", (8.0, 20.0), [0.12, 0.36]), ("salsichas", "kg", (3.0, 7.0), [0.2, 0.4]),
+                  ("tomate pelado", "kg", (1.2, 2.5), [0.4, 0.8])],
+}
+QUALIFIERS = ["meio-gordo", "magro", "uht", "agulha", "carolino", "esparguete", "integral", "natural",
+              "grego", "ralado", "fatiado", "extra virgem", "moído", "laranja", "biológico", "familiar",
+              "sem lactose", "em lata", "do campo", "clássico"]
+BRANDS = ["Mimosa", "Gresso", "Continente", "Pingo Doce", "Nacional", "Milaneza", "Delta", "Compal",
+          "Agros", "Bom Petisco", "Gallo", "Nestlé", "Skip", "Neoblanc", "Luso", "Renova"]
+PHYSICAL_STORES = ["lidl", "makro"]
+
+PRODUCTS = [(category, *product) for category, products in CATALOGUE.items() for product in products]
+_UNIT_LABEL = {"kg": ("g", 1000), "L": ("ml", 1000), "un": ("un", 1)}
+
+
+def _size_label(size: float, unit: str) -> str:
+    small, factor = _UNIT_LABEL[unit]
+    if unit != "un" and size < 1:
+        return f"{round(size * factor)}{small}"
+    return f"{size:g}{'un' if unit == 'un' else unit}"
+
+
+def _promo(rng: random.Random, price: float) -> tuple[str | None, float | None]:
+    """(promo, promo_effective_price) — ~25% das entradas têm promoção."""
+    roll = rng.random()
+    if roll < 0.07:
+        return "Leve 3 pague 2", None
+    if roll < 0.13:
+        return "50% na 2ª unidade", None
+    if roll < 0.18:
+        return f"2 por {price * 1.7:.2f}€".replace(".", ","), None
+    if roll < 0.25:
+        pct = rng.choice([10, 15, 20, 25, 30])
+        return f"Poupa {pct}%", round(price * (1 - pct / 100), 2)
+    return None, None
+
+
+def _age_hours(rng: random.Random) -> float:
+    """Idade da entrada: 60% frescas, 25% expiradas há pouco, 15% muito antigas."""
+    roll = rng.random()
+    if roll < 0.60:
+        return rng.uniform(0, CACHE_TTL_HOURS)
+    if roll < 0.85:
+        return rng.uniform(CACHE_TTL_HOURS, 72)
+    return rng.uniform(72, 40 * 24)
+
+
+def make_price_cache(n: int, seed: int = 25, markets: list[str] | None = None,
+                     now: float | None = None) -> dict:
+    """{market: {chave: entrada}} com `n` produtos por mercado."""
+    rng = random.Random(seed)
+    now = time.time() if now is None else now
+    cache = {}
+    for market in markets or MARKETS:
+        entries = {}
+        while len(entries) < n:
+            category, product, unit, (low, high), sizes = rng.choice(PRODUCTS)
+            brand = rng.choice(BRANDS)
+            size = rng.choice(sizes)
+            name = (f"{product.capitalize()} {rng.choice(QUALIFIERS)} {brand} "
+                    f"{_size_label(size, unit)} {rng.randint(1, 999)}")
+            per_unit = round(rng.uniform(low, high), 2)
+            price = round(max(0.09, per_unit * size), 2)
+            promo, effective = _promo(rng, price)
+            cached_at = now - _age_hours(rng) * 3600
+            entry = {
+                "name": name, "price": price, "price_per_unit": per_unit, "unit": unit, "pack_size": size,
+                "brand": brand, "promo": promo, "promo_effective_price": effective,
+                "available": rng.random() > 0.03, "category": category,
+                "cached_at": datetime.fromtimestamp(cached_at, timezone.utc).isoformat(),
+            }
+            if rng.random() < 0.5:
+                entry["expires_at"] = cached_at + CACHE_TTL_HOURS * 3600
+            entries[name.lower()] = entry
+        cache[market] = entries
+    return cache
+
+
+def _product_name(rng: random.Random) -> tuple[str, str, str, tuple[float, float]]:
+    category, product, unit, price_range, _ = rng.choice(PRODUCTS)
+    return f"{product.capitalize()} {rng.choice(QUALIFIERS)}", category, unit, price_range
+
+
+def make_consumption_model(n: int, seed: int = 25, now: datetime | None = None) -> dict:
+    """consumption_model.json com `n` produtos e até 12 compras cada."""
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+    model = {}
+    while len(model) < n:
+        name, category, unit, (low, high) = _product_name(rng)
+        if name.lower().replace(" ", "_") in model:
+            name = f"{name} {len(model)}"
+        weekly = round(rng.uniform(0.2, 4.0), 2)
+        interval = rng.choice([3, 7, 7, 10, 14, 21, 30])
+        quantity = round(weekly * interval / 7, 1) or 1
+        market = rng.choice(MARKETS)
+        first = now - timedelta(days=interval * 12 + rng.randint(0, interval))
+        history = []
+        for k in range(rng.randint(1, 12)):
+            date = first + timedelta(days=interval * k + rng.randint(-1, 1))
+            if date > now:
+                break
+            history.append({"date": date.isoformat(), "quantity": quantity, "unit": unit, "market": market,
+                            "price": round(rng.uniform(low, high) * quantity, 2)})
+        last = history[-1]
+        # a última compra é recente para parte dos produtos, para haver alertas e previsões
+        recent = now - timedelta(days=rng.uniform(0, interval * 1.5))
+        if rng.random() < 0.5 and (len(history) < 2 or recent > datetime.fromisoformat(history[-2]["date"])):
+            last["date"] = recent.isoformat()
+        preferred, *acceptable = rng.sample(BRANDS, rng.randint(1, 3))
+        bulk = category in ("mercearia", "limpeza", "conservas") and rng.random() < 0.4
+        store_roll = rng.random()
+        model[name.lower().replace(" ", "_")] = {
+            "name": name,
+            "category": category,
+            "avg_weekly_consumption": {"value": weekly, "unit": unit},
+            "avg_purchase_interval_days": float(interval),
+            "preferred_brand": preferred,
+            "acceptable_brands": acceptable,
+            "purchase_history": history,
+            "last_purchased": last["date"],
+            "last_quantity": quantity,
+            "estimated_stock_remaining_days": round(rng.uniform(0, interval * 1.5), 1),
+            "bulk_eligible": bulk,
+            "bulk_quantity": {"value": round(weekly * 4, 1), "unit": unit} if bulk else None,
+            "preferred_store": (rng.choice(PHYSICAL_STORES) if store_roll < 0.1
+                                else rng.choice(MARKETS) if store_roll < 0.2 else None),
+            "confidence": round(min(1.0, len(history) / 8), 2),
+            "active": rng.random() > 0.05,
+        }
+    return model
+
+
+def make_history(model: dict) -> dict:
+    """shopping_history.json: as compras de `model` agrupadas por dia e mercado."""
+    purchases = {}
+    for entry in model.values():
+        for purchase in entry["purchase_history"]:
+            key = (purchase["date"][:10], purchase["market"])
+            purchases.setdefault(key, []).append({
+                "name": entry["name"], "quantity": purchase["quantity"], "unit": purchase["unit"],
+                "price": purchase["price"], "brand": entry["preferred_brand"], "category": entry["category"],
+            })
+    return {"version": 1, "purchases": [
+        {"date": date, "market": market, "items": items,
+         "total": round(sum(i["price"] for i in items), 2)}
+        for (date, market), items in sorted(purchases.items())
+    ]}
+
+
+def make_shopping_list(n: int, seed: int = 25) -> list[dict]:
+    """`n` itens "produto qualificador" (nomes distintos) com quantidade e, em parte, marcas."""
+    rng = random.Random(seed)
+    items = {}
+    while len(items) < n:
+        name, category, unit, _ = _product_name(rng)
+        if name.lower() in items:
+            if len(items) >= len(PRODUCTS) * len(QUALIFIERS):
+                break
+            continue
+        item = {"name": name, "category": category,
+                "quantity": {"value": rng.choice([1, 1, 2, 3, 6]) if unit == "un" else
+                             round(rng.uniform(0.5, 4), 1), "unit": unit}}
+        if rng.random() < 0.3:
+            preferred, *acceptable = rng.sample(BRANDS, 3)
+            item.update(preferred_brand=preferred, acceptable_brands=acceptable)
+        items[name.lower()] = item
+    return list(items.values())
+
+
+def write_data_dir(path: Path, model: dict, shopping_list: list[dict]) -> None:
+    """Grava em `path` os ficheiros de dados lidos por consumption_tracker e list_optimizer."""
+    path.mkdir(parents=True, exist_ok=True)
+    files = {
+        "consumption_model.json": model,
+        "shopping_history.json": make_history(model),
+        "inventory.json": {"version": 1, "last_updated": datetime.now(timezone.utc).isoformat(),
+                           "items": {}, "shopping_list": shopping_list},
+        "family_preferences.json": {
+            "household_size": 4,
+            "budget": {"weekly_limit_eur": 150, "monthly_limit_eur": 500, "bulk_monthly_budget_eur": 120},
+            "physical_stores": {"lidl": {"name": "Lidl", "visit_frequency": "semanal"},
+                                "makro": {"name": "Makro / Recheio", "visit_frequency": "mensal"}},
+        },
+    }
+    for name, data in files.items():
+        (path / name).write_text(json.dumps(data, ensure_ascii=False))
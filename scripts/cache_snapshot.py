@@ -0,0 +1,254 @@
+"""
+Snapshot binário da cache de preços (price_cache.bin), lido por mmap.
+
+O JSON continua a ser o formato de intercâmbio e de recurso; este ficheiro é uma
+cópia derivada de price_cache.json, regravada a cada snapshot, que permite a um
+processo de vida curta responder a `get` sem desserializar a cache inteira.
+
+Formato (little-endian):
+  cabeçalho  HEADER → magic b"GPCB", versão, (mtime_ns, tamanho) do JSON de
+             origem, nº de registos e offsets/tamanhos das secções seguintes
+  registos   por mercado, pela ordem do JSON: RECORD (tamanho da chave, tamanho
+             da entrada) + b"market\\0key" UTF-8 + entrada em JSON compacto
+  tabela     uint64 por registo (offset relativo à secção de registos),
+             ordenada pela chave composta — pesquisa binária sobre o mmap
+  diretório  JSON [[market, início, fim, nº de registos], ...] pela ordem do JSON
+
+O ficheiro só é usado se o (mtime_ns, tamanho) do cabeçalho coincidir com o
+price_cache.json actual; caso contrário o leitor volta ao JSON.
+"""
+
+import json
+import mmap
+import os
+import struct
+from collections.abc import ItemsView, Mapping
+from pathlib import Path
+
+from trigram_index import MarketTrigrams, TrigramFile
+
+MAGIC = b"GPCB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHqqQQQQQ")
+RECORD = struct.Struct("<II")
+_SLOT = struct.Struct("<Q")
+_SEP = b"\x00"
+
+
+def write_snapshot(path: Path, cache: dict, source: tuple[int, int]) -> int:
+    """
+    Grava `cache` em `path` (tmp + os.replace). `source` é o (mtime_ns, tamanho)
+    do JSON de que o snapshot deriva. Devolve o nº de registos.
+    """
+    records = bytearray()
+    slots: list[tuple[bytes, int]] = []
+    directory = []
+    for market, entries in cache.items():
+        if not isinstance(entries, dict):
+            continue
+        start = len(records)
+        count = 0
+        prefix = market.encode("utf-8") + _SEP
+        for key, entry in entries.items():
+            if not isinstance(entry, dict):
+                continue
+            composite = prefix + key.encode("utf-8")
+            raw = json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            slots.append((composite, len(records)))
+            records += RECORD.pack(len(composite), len(raw)) + composite + raw
+            count += 1
+        directory.append([market, start, len(records), count])
+
+    slots.sort()
+    table = b"".join(_SLOT.pack(off) for _, off in slots)
+    raw_dir = json.dumps(directory, ensure_ascii=False).encode("utf-8")
+    records_off = HEADER.size
+    table_off = records_off + len(records)
+    dir_off = table_off + len(table)
+    header = HEADER.pack(
+        MAGIC, VERSION, 0, source[0], source[1], len(slots),
+        records_off, table_off, dir_off, len(raw_dir),
+    )
+
+    path = Path(path)
+    # sufixo por processo: dois leitores podem reconstruir o ficheiro em simultâneo
+    tmp = path.with_suffix(f".bin.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(records)
+        f.write(table)
+        f.write(raw_dir)
+    os.replace(tmp, path)
+    return len(slots)
+
+
+class BinarySnapshot:
+    """Leitor de price_cache.bin: pesquisa binária na tabela, sem materializar a cache."""
+
+    def __init__(self, mm: mmap.mmap):
+        self._mm = mm
+        (_, _, _, _, _, self._n, self._records_off, self._table_off,
+         dir_off, dir_len) = HEADER.unpack_from(mm, 0)
+        directory = json.loads(mm[dir_off:dir_off + dir_len])
+        self._markets = {market: (start, end, count) for market, start, end, count in directory}
+        self._keys: dict[str, list[str]] = {}
+
+    @classmethod
+    def open(cls, path: Path, source: Path) -> "BinarySnapshot | None":
+        """Abre `path` se existir e corresponder ao estado actual de `source`; senão None."""
+        try:
+            st = os.stat(source)
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):  # ValueError: ficheiro vazio
+            return None
+        if len(mm) < HEADER.size:
+            mm.close()
+            return None
+        magic, version, _, mtime_ns, size, *_ = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION or (mtime_ns, size) != (st.st_mtime_ns, st.st_size):
+            mm.close()
+            return None
+        return cls(mm)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def markets(self) -> list[str]:
+        return list(self._markets)
+
+    def _find(self, market: str, key: str) -> int | None:
+        """Offset absoluto do registo de (market, key), ou None."""
+        mm, base, table = self._mm, self._records_off, self._table_off
+        target = market.encode("utf-8") + _SEP + key.encode("utf-8")
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            off = base + _SLOT.unpack_from(mm, table + mid * 8)[0]
+            klen = RECORD.unpack_from(mm, off)[0]
+            start = off + RECORD.size
+            if mm[start:start + klen] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self._n:
+            return None
+        off = base + _SLOT.unpack_from(mm, table + lo * 8)[0]
+        klen = RECORD.unpack_from(mm, off)[0]
+        start = off + RECORD.size
+        return off if mm[start:start + klen] == target else None
+
+    def _entry_at(self, off: int) -> dict:
+        klen, elen = RECORD.unpack_from(self._mm, off)
+        start = off + RECORD.size + klen
+        return json.loads(self._mm[start:start + elen])
+
+    def get(self, market: str, key: str) -> dict | None:
+        off = self._find(market, key)
+        return None if off is None else self._entry_at(off)
+
+    def __contains__(self, item: tuple[str, str]) -> bool:
+        return self._find(*item) is not None
+
+    def keys(self, market: str) -> list[str]:
+        """Chaves de `market` pela ordem original do JSON (descodificadas uma vez)."""
+        keys = self._keys.get(market)
+        if keys is None:
+            keys = []
+            if market in self._markets:
+                mm = self._mm
+                start, end, _ = self._markets[market]
+                skip = len(market.encode("utf-8")) + 1
+                off = self._records_off + start
+                stop = self._records_off + end
+                while off < stop:
+                    klen, elen = RECORD.unpack_from(mm, off)
+                    key_start = off + RECORD.size
+                    keys.append(mm[key_start + skip:key_start + klen].decode("utf-8"))
+                    off = key_start + klen + elen
+            self._keys[market] = keys
+        return keys
+
+
+    def entries(self, market: str):
+        """(key, entrada) de `market` pela ordem original, numa só passagem sequencial."""
+        if market not in self._markets:
+            return
+        mm = self._mm
+        start, end, _ = self._markets[market]
+        skip = len(market.encode("utf-8")) + 1
+        off = self._records_off + start
+        stop = self._records_off + end
+        while off < stop:
+            klen, elen = RECORD.unpack_from(mm, off)
+            key_start = off + RECORD.size
+            entry_start = key_start + klen
+            yield mm[key_start + skip:entry_start].decode("utf-8"), json.loads(mm[entry_start:entry_start + elen])
+            off = entry_start + elen
+
+
+class _MarketItems(ItemsView):
+    """items() de MarketView: percorre os registos em sequência em vez de pesquisar chave a chave."""
+
+    def __iter__(self):
+        view = self._mapping
+        overrides = view._overrides
+        for key, entry in view._snapshot.entries(view._market):
+            yield key, overrides.get(key, entry)
+        for key in view._added():
+            yield key, overrides[key]
+
+
+class MarketView(Mapping):
+    """
+    Entradas de um mercado como Mapping só de leitura: snapshot binário com os
+    registos do log por cima. A ordem de iteração é a de um dict reconstruído
+    pelo replay do log — chaves atualizadas mantêm a posição, novas vão para o fim.
+    Cada acesso devolve uma entrada nova (mutá-la não altera a cache).
+    """
+
+    def __init__(self, snapshot: BinarySnapshot, market: str, overrides: dict | None = None,
+                 trigram_file: TrigramFile | None = None):
+        self._snapshot = snapshot
+        self._market = market
+        self._overrides = overrides or {}
+        self._trigram_file = trigram_file
+        self._trigrams: MarketTrigrams | None = None
+
+    @property
+    def trigrams(self) -> MarketTrigrams | None:
+        """Índice de trigramas persistente das chaves desta view (ou None), para fuzzy_search/get_cached_price."""
+        if self._trigrams is None and self._trigram_file is not None:
+            self._trigrams = self._trigram_file.market(self._market, self)
+        return self._trigrams
+
+    def get(self, key, default=None):
+        if key in self._overrides:
+            return self._overrides[key]
+        entry = self._snapshot.get(self._market, key)
+        return default if entry is None else entry
+
+    def __getitem__(self, key):
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __contains__(self, key) -> bool:
+        return key in self._overrides or (self._market, key) in self._snapshot
+
+    def _added(self) -> list[str]:
+        if not self._overrides:
+            return []
+        base = set(self._snapshot.keys(self._market))
+        return [k for k in self._overrides if k not in base]
+
+    def __iter__(self):
+        yield from self._snapshot.keys(self._market)
+        yield from self._added()
+
+    def items(self):
+        return _MarketItems(self)
+
+    def __len__(self) -> int:
+        return len(self._snapshot.keys(self._market)) + len(self._added())
@@ -0,0 +1,1131 @@
+"""
+Backends de armazenamento da cache de preços.
+
+price_cache.py acede à cache exclusivamente através de um CacheStore, o que
+permite trocar o formato em disco sem mexer nos comandos:
+
+  - JsonCacheStore   → data/price_cache.json (default, formato de intercâmbio)
+                       + data/price_cache.log (escritas append-only)
+  - SqliteCacheStore → data/price_cache.db, indexado por (market, key) e por
+                       cached_at, para que get/update/expired/stats leiam
+                       apenas as linhas de que precisam
+
+O backend é escolhido em config.CACHE_BACKEND (ou pela variável de ambiente
+GROCERY_CACHE_BACKEND). A conversão entre os dois formatos é feita pelos
+subcomandos `price_cache.py migrate` e `price_cache.py export`.
+"""
+
+import fcntl
+import heapq
+import json
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from datetime import datetime
+
+from cache_snapshot import BinarySnapshot, MarketView, write_snapshot
+from config import CACHE_TTL_HOURS
+from trigram_index import TrigramFile, trigrams, write_trigram_file
+
+BACKENDS: tuple[str, ...] = ("json", "sqlite")
+
+# Tamanho do log do backend JSON a partir do qual uma escrita dispara a compactação.
+WAL_COMPACT_BYTES: int = 512 * 1024
+
+# Largura dos baldes dos histogramas de expiração e de cached_at mantidos pelos backends.
+HISTOGRAM_BUCKET_SECONDS: int = 3600
+
+
+def entry_timestamp(entry: dict) -> float | None:
+    """Devolve cached_at de uma entrada como epoch (segundos), ou None se ausente/inválido."""
+    cached_at = entry.get("cached_at")
+    if not cached_at:
+        return None
+    try:
+        return datetime.fromisoformat(cached_at).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def entry_expiry(entry: dict, ttl_hours: float = CACHE_TTL_HOURS) -> float:
+    """Epoch de expiração: `expires_at` se gravado, senão cached_at + TTL (0.0 = já expirada)."""
+    expires_at = entry.get("expires_at")
+    if isinstance(expires_at, (int, float)):
+        return float(expires_at)
+    ts = entry_timestamp(entry)
+    return ts + ttl_hours * 3600 if ts is not None else 0.0
+
+
+# Unidades de price_per_unit → (unidade base, fator para a base)
+UNIT_BASES: dict[str, tuple[str, float]] = {
+    "kg": ("kg", 1.0), "g": ("kg", 1000.0),
+    "l": ("L", 1.0), "lt": ("L", 1.0), "cl": ("L", 100.0), "ml": ("L", 1000.0),
+    "un": ("un", 1.0), "uni": ("un", 1.0), "und": ("un", 1.0), "unid": ("un", 1.0),
+}
+
+# Formato das linhas do índice de preço unitário do backend JSON (2: com a marca)
+UNIT_INDEX_VERSION = 2
+
+
+def entry_category(entry: dict) -> str | None:
+    """Categoria normalizada (minúsculas) da entrada, ou None."""
+    category = entry.get("category")
+    if not isinstance(category, str):
+        return None
+    return category.lower().strip() or None
+
+
+def entry_brand(entry: dict) -> str | None:
+    """Marca normalizada (casefold, sem espaços nas pontas) da entrada, ou None."""
+    brand = entry.get("brand")
+    if not isinstance(brand, str):
+        return None
+    return brand.strip().casefold() or None
+
+
+def unit_price_rows(cache: dict, ttl_hours: float = CACHE_TTL_HOURS) -> dict[str, list]:
+    """
+    {categoria: [[preço unitário, unidade base, market, key, expires_at, marca], ...]}
+    ordenado por preço (marca normalizada por entry_brand, ou None).
+    """
+    index: dict[str, list] = {}
+    for market, key, entry in iter_entries(cache):
+        category = entry_category(entry)
+        unit_price = entry_unit_price(entry) if category else None
+        if unit_price is not None:
+            index.setdefault(category, []).append(
+                [unit_price[0], unit_price[1], market, key, entry_expiry(entry, ttl_hours), entry_brand(entry)]
+            )
+    for rows in index.values():
+        rows.sort()
+    return index
+
+
+def entry_unit_price(entry: dict) -> tuple[float, str] | None:
+    """Preço efetivo por €/kg, €/L ou €/un → (valor, unidade base); None sem dados."""
+    if entry.get("available") is False:
+        return None
+    unit = str(entry.get("unit") or "un").lower().replace("€", "").strip(" /")
+    if unit not in UNIT_BASES:
+        return None
+    base, factor = UNIT_BASES[unit]
+    price = entry.get("price")
+    effective = entry.get("promo_effective_price") or price
+    per_unit = entry.get("price_per_unit")
+    if not isinstance(per_unit, (int, float)) or isinstance(per_unit, bool):
+        if base != "un" or not isinstance(effective, (int, float)):
+            return None
+        per_unit, factor = effective, 1.0
+    elif isinstance(price, (int, float)) and isinstance(effective, (int, float)) and price > 0:
+        per_unit = per_unit * effective / price
+    if per_unit <= 0:
+        return None
+    return round(per_unit * factor, 4), base
+
+
+def time_bucket(ts: float | None) -> int:
+    """Balde do histograma de um epoch (-1 sem data). Igual a CAST(ts / 3600 AS INTEGER) no SQLite."""
+    return int(ts / HISTOGRAM_BUCKET_SECONDS) if ts is not None else -1
+
+
+def empty_histogram() -> dict:
+    return {"total": 0, "expired": 0, "expires": {}, "cached": {}}
+
+
+def tally(hist: dict, entry: dict, now: float, ttl_hours: float = CACHE_TTL_HOURS, sign: int = 1) -> None:
+    """Soma (sign=1) ou retira (sign=-1) `entry` do histograma de um mercado."""
+    expires_at = entry_expiry(entry, ttl_hours)
+    hist["total"] += sign
+    if expires_at <= now:
+        hist["expired"] += sign
+    for field, bucket in (("expires", time_bucket(expires_at)), ("cached", time_bucket(entry_timestamp(entry)))):
+        n = hist[field].get(bucket, 0) + sign
+        if n:
+            hist[field][bucket] = n
+        else:
+            hist[field].pop(bucket, None)
+
+
+def scan_histogram(cache: dict, markets: list[str], now: float, ttl_hours: float = CACHE_TTL_HOURS) -> dict:
+    """Histograma por varrimento completo — a referência para os contadores mantidos."""
+    result = {m: empty_histogram() for m in markets}
+    for market, _, entry in iter_entries(cache):
+        if market in result:
+            tally(result[market], entry, now, ttl_hours)
+    return result
+
+
+def _per_market(rows: list) -> dict[str, int]:
+    """{market: nº de linhas} de linhas [expires_at, market, key, cached_at]."""
+    counts: dict[str, int] = {}
+    for _, market, _, _ in rows:
+        counts[market] = counts.get(market, 0) + 1
+    return counts
+
+
+def iter_entries(cache: dict):
+    """Itera (market, key, entry) de um dict de cache, ignorando chaves que não são mercados."""
+    for market, entries in cache.items():
+        if not isinstance(entries, dict):
+            continue
+        for key, entry in entries.items():
+            if isinstance(entry, dict):
+                yield market, key, entry
+
+
+@contextmanager
+def store_lock(path: Path, exclusive: bool):
+    """flock no .lock ao lado de `path`: partilhado para leituras e appends, exclusivo para reescritas."""
+    lock_path = Path(path).with_suffix(".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class CacheStore(ABC):
+    """Interface comum aos backends; `now` é um epoch em segundos (válida se entry_expiry > now)."""
+
+    def __init__(self, markets: list[str], ttl_hours: float = CACHE_TTL_HOURS):
+        self.markets = list(markets)
+        self.ttl_hours = ttl_hours
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        pass
+
+    @abstractmethod
+    def load_all(self) -> dict:
+        """Cache completa ({market: {key: entry}})."""
+
+    def load_view(self) -> dict:
+        """Cache só de leitura ({market: Mapping}); por omissão, o próprio load_all."""
+        return self.load_all()
+
+    @abstractmethod
+    def save_all(self, cache: dict) -> None:
+        """Substitui a cache inteira."""
+
+    @abstractmethod
+    def get(self, market: str, key: str) -> dict | None:
+        """Entrada (market, key), ou None."""
+
+    @abstractmethod
+    def put(self, market: str, key: str, entry: dict) -> None:
+        """Grava uma entrada."""
+
+    def put_many(self, rows: list[tuple[str, str, dict]]) -> None:
+        """Grava vários (market, key, entry) numa única escrita/transação."""
+        for market, key, entry in rows:
+            self.put(market, key, entry)
+
+    @abstractmethod
+    def delete_many(self, rows: list[tuple[str, str]]) -> int:
+        """Remove os (market, key) indicados; devolve quantas entradas existiam."""
+
+    def compact(self, min_bytes: int = 0) -> dict:
+        """Consolida o armazenamento (no-op por omissão)."""
+        return {"compacted": False}
+
+    @abstractmethod
+    def market_entries(self, market: str) -> dict:
+        """Entradas de um mercado ({key: entry})."""
+
+    def search_entries(self, market: str, query: str) -> dict:
+        """Entradas cuja chave pode conter `query` (superconjunto; o filtro final é do chamador)."""
+        return self.market_entries(market)
+
+    @abstractmethod
+    def expired(self, markets: list[str], now: float) -> list[tuple[str, str, str | None]]:
+        """(market, key, cached_at) das entradas expiradas, das mais antigas para as mais recentes."""
+
+    @abstractmethod
+    def histogram(self, markets: list[str], now: float) -> dict[str, dict]:
+        """{market: {"total", "expired", "expires", "cached"}} pelos contadores, sem varrer entradas."""
+
+    def recount(self, markets: list[str], now: float) -> dict[str, dict]:
+        """O mesmo que `histogram`, por varrimento completo da cache."""
+        return scan_histogram(self.load_all(), markets, now, self.ttl_hours)
+
+    @abstractmethod
+    def rebuild_counters(self) -> None:
+        """Reconstrói os contadores mantidos a partir das entradas."""
+
+    def counts(self, markets: list[str], now: float) -> dict[str, tuple[int, int]]:
+        """Devolve {market: (total, válidas)}."""
+        return {m: (h["total"], h["total"] - h["expired"]) for m, h in self.histogram(markets, now).items()}
+
+    @abstractmethod
+    def cheapest(
+        self, category: str, base_unit: str, markets: list[str], now: float, limit: int
+    ) -> list[tuple[float, str, str]]:
+        """(preço unitário, market, key) das `limit` entradas válidas mais baratas da categoria."""
+
+    @abstractmethod
+    def brand_candidates(
+        self, queries: list[tuple[str, str, tuple[str, ...], tuple[str, ...]]],
+        markets: list[str], now: float, limit: int,
+    ) -> list[dict[str, list[tuple[float, str]]]]:
+        """Por consulta (categoria, unidade, marcas, termos): {market: [(preço unitário, key)]}."""
+
+
+# ---------------------------------------------------------------------------
+# JSON
+# ---------------------------------------------------------------------------
+
+class JsonCacheStore(CacheStore):
+    """Backend JSON: snapshot + log append-only, com índices gravados a cada compactação."""
+
+    def __init__(self, path: Path, markets: list[str], ttl_hours: float = CACHE_TTL_HOURS):
+        super().__init__(markets, ttl_hours)
+        self.path = Path(path)
+        self.log_path = self.path.with_suffix(".log")
+        self.expiry_path = self.path.with_suffix(".expiry.json")
+        self.binary_path = self.path.with_suffix(".bin")
+        self.units_path = self.path.with_suffix(".units.json")
+        self.trigrams_path = self.path.with_suffix(".trigrams")
+
+    def _lock(self, exclusive: bool):
+        return store_lock(self.path, exclusive)
+
+    def _read_snapshot(self) -> dict:
+        if self.path.exists():
+            with open(self.path) as f:
+                return json.load(f)
+        return {m: {} for m in self.markets}
+
+    def _iter_log(self):
+        """Registos do log. Linhas incompletas (escrita interrompida) são ignoradas."""
+        if not self.log_path.exists():
+            return
+        with open(self.log_path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def _replay(self, cache: dict) -> int:
+        """Aplica o log a `cache`; devolve o nº de registos aplicados."""
+        applied = 0
+        for record in self._iter_log():
+            if record.get("op") == "put":
+                cache.setdefault(record["market"], {})[record["key"]] = record["entry"]
+                applied += 1
+        return applied
+
+    def _append(self, records: list[dict]) -> int:
+        """Acrescenta registos ao log numa única write(); devolve o tamanho do log."""
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode()
+        with self._lock(exclusive=False):
+            fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+                return os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+
+    def _write_snapshot(self, cache: dict) -> None:
+        """Grava o snapshot de forma atómica e descarta o log. Chamar com o lock exclusivo."""
+        tmp = self.path.with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(cache, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        if self.log_path.exists():
+            os.truncate(self.log_path, 0)
+        self._write_expiry_index(cache)
+        self._write_unit_index(cache)
+        self._write_binary(cache)
+        self._write_trigrams({
+            market: [k for k, e in entries.items() if isinstance(e, dict)]
+            for market, entries in cache.items() if isinstance(entries, dict)
+        })
+
+    def _write_binary(self, cache: dict) -> None:
+        st = self.path.stat()
+        write_snapshot(self.binary_path, cache, (st.st_mtime_ns, st.st_size))
+
+    def _write_trigrams(self, market_keys: dict) -> None:
+        st = self.path.stat()
+        write_trigram_file(self.trigrams_path, market_keys, (st.st_mtime_ns, st.st_size))
+
+    def _open_trigrams(self, snapshot: BinarySnapshot) -> TrigramFile | None:
+        """Índice de trigramas do snapshot actual; reconstrói-o (das chaves de `snapshot`) se faltar."""
+        st = self.path.stat()
+        trigram_file = TrigramFile.open(self.trigrams_path, (st.st_mtime_ns, st.st_size))
+        if trigram_file is None:
+            self._write_trigrams({m: snapshot.keys(m) for m in snapshot.markets()})
+            trigram_file = TrigramFile.open(self.trigrams_path, (st.st_mtime_ns, st.st_size))
+        return trigram_file
+
+    def _open_binary(self) -> BinarySnapshot | None:
+        """Snapshot binário do JSON actual; reconstrói-o se faltar. None sem snapshot JSON."""
+        snapshot = BinarySnapshot.open(self.binary_path, self.path)
+        if snapshot is None and self.path.exists():
+            self._write_binary(self._read_snapshot())
+            snapshot = BinarySnapshot.open(self.binary_path, self.path)
+        return snapshot
+
+    def _log_overrides(self, needle: str | None = None) -> dict[str, dict]:
+        """
+        {market: {key: entry}} dos puts do log. Com `needle` (chave serializada
+        como no log), o log só é desserializado se o texto a contiver.
+        """
+        try:
+            raw = self.log_path.read_text()
+        except FileNotFoundError:
+            return {}
+        if not raw or (needle is not None and needle not in raw):
+            return {}
+        overrides: dict[str, dict] = {}
+        for line in raw.splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("op") == "put":
+                overrides.setdefault(record["market"], {})[record["key"]] = record["entry"]
+        return overrides
+
+    def _expiry_groups(self, cache: dict) -> tuple[dict[int, list], dict[str, dict[int, int]]]:
+        """
+        Linhas [expires_at, market, key, cached_at] agrupadas por balde de expiração
+        (ordenadas em cada balde) e {market: {balde de cached_at: n}}.
+        """
+        groups: dict[int, list] = {}
+        cached: dict[str, dict[int, int]] = {}
+        for market, key, entry in iter_entries(cache):
+            expires_at = entry_expiry(entry, self.ttl_hours)
+            groups.setdefault(time_bucket(expires_at), []).append(
+                [expires_at, market, key, entry.get("cached_at")]
+            )
+            buckets = cached.setdefault(market, {})
+            bucket = time_bucket(entry_timestamp(entry))
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+        for rows in groups.values():
+            rows.sort()
+        return groups, cached
+
+    def _write_expiry_index(self, cache: dict) -> None:
+        """Cabeçalho com o histograma por balde, seguido de uma linha JSON por balde de expiração."""
+        groups, cached = self._expiry_groups(cache)
+        buckets, blocks, offset = {}, [], 0
+        for bucket in sorted(groups):
+            block = json.dumps(groups[bucket], ensure_ascii=False).encode() + b"\n"
+            buckets[bucket] = [offset, len(block), _per_market(groups[bucket])]
+            blocks.append(block)
+            offset += len(block)
+        st = self.path.stat()
+        header = json.dumps(
+            {"snapshot": [st.st_mtime_ns, st.st_size], "buckets": buckets, "cached": cached},
+            ensure_ascii=False,
+        ).encode() + b"\n"
+        tmp = self.expiry_path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(header)
+            f.writelines(blocks)
+        os.replace(tmp, self.expiry_path)
+
+    def _write_unit_index(self, cache: dict) -> None:
+        """Cabeçalho com offsets, uma linha por categoria e um bloco ordenado por (categoria, unidade, marca)."""
+        rows_by_category = unit_price_rows(cache, self.ttl_hours)
+        blocks = [
+            json.dumps(rows, ensure_ascii=False).encode() + b"\n" for rows in rows_by_category.values()
+        ]
+        offsets, offset = {}, 0
+        for category, block in zip(rows_by_category, blocks):
+            offsets[category] = [offset, len(block)]
+            offset += len(block)
+        brand_offsets: dict[str, dict[str, dict[str, list]]] = {}
+        for category, rows in rows_by_category.items():
+            groups: dict[tuple[str, str], list[str]] = {}
+            for price, unit, market, key, expires_at, brand in rows:
+                if brand is not None and "\n" not in key:
+                    groups.setdefault((unit, brand), []).append(f"{price!r}\t{market}\t{expires_at!r}\t{key}\n")
+            for (unit, brand), lines in groups.items():
+                block = "".join(lines).encode()
+                brand_offsets.setdefault(category, {}).setdefault(unit, {})[brand] = [offset, len(block)]
+                blocks.append(block)
+                offset += len(block)
+        st = self.path.stat()
+        header = json.dumps(
+            {"snapshot": [st.st_mtime_ns, st.st_size], "version": UNIT_INDEX_VERSION, "categories": offsets,
+             "brands": brand_offsets},
+            ensure_ascii=False,
+        ).encode() + b"\n"
+        tmp = self.units_path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(header)
+            f.writelines(blocks)
+        os.replace(tmp, self.units_path)
+
+    def _read_unit_rows(self, category: str) -> list | None:
+        """Linhas de `category` no índice de preço unitário, ou None se ausente/desatualizado."""
+        if not self.units_path.exists() or not self.path.exists():
+            return None
+        with open(self.units_path, "rb") as f:
+            try:
+                header = json.loads(f.readline())
+            except json.JSONDecodeError:
+                return None
+            st = self.path.stat()
+            if header.get("snapshot") != [st.st_mtime_ns, st.st_size]:
+                return None
+            if header.get("version") != UNIT_INDEX_VERSION:  # sem blocos por marca (antes da v2)
+                return None
+            if category not in header["categories"]:
+                return []
+            offset, size = header["categories"][category]
+            f.seek(f.tell() + offset)
+            return json.loads(f.read(size))
+
+    def _read_brand_blocks(self, groups: set[tuple[str, str, str]]) -> dict[tuple, list[str]] | None:
+        """
+        {(categoria, unidade, marca): linhas do bloco} do índice de preço unitário (blocos
+        em falta ficam vazios), ou None se o índice estiver ausente/desatualizado.
+        """
+        if not self.units_path.exists() or not self.path.exists():
+            return None
+        with open(self.units_path, "rb") as f:
+            try:
+                header = json.loads(f.readline())
+            except json.JSONDecodeError:
+                return None
+            st = self.path.stat()
+            if header.get("snapshot") != [st.st_mtime_ns, st.st_size]:
+                return None
+            if header.get("version") != UNIT_INDEX_VERSION:
+                return None
+            start, blocks = f.tell(), {}
+            for group in groups:
+                category, unit, brand = group
+                location = header["brands"].get(category, {}).get(unit, {}).get(brand)
+                if location is None:
+                    blocks[group] = []
+                    continue
+                f.seek(start + location[0])
+                blocks[group] = f.read(location[1]).decode().split("\n")[:-1]
+            return blocks
+
+    def _read_expiry_index(self, first: int, last: int) -> tuple[dict, dict, list] | None:
+        """
+        (contagens {balde: {market: n}}, baldes de cached_at, linhas dos baldes de expiração
+        entre `first` e `last`) do índice, ou None se ausente/desatualizado.
+        """
+        if not self.expiry_path.exists() or not self.path.exists():
+            return None
+        with open(self.expiry_path, "rb") as f:
+            try:
+                header = json.loads(f.readline())
+            except json.JSONDecodeError:
+                return None
+            st = self.path.stat()
+            if not isinstance(header, dict) or "buckets" not in header:
+                return None  # formato anterior (uma só linha com todas as entradas)
+            if header.get("snapshot") != [st.st_mtime_ns, st.st_size]:
+                return None
+            buckets = {int(b): v for b, v in header["buckets"].items()}
+            spans = [(off, off + size) for b, (off, size, _) in buckets.items() if first <= b <= last]
+            rows = []
+            if spans:
+                start = min(a for a, _ in spans)
+                f.seek(f.tell() + start)
+                for line in f.read(max(b for _, b in spans) - start).splitlines():
+                    rows.extend(json.loads(line))
+        counts = {b: per_market for b, (_, _, per_market) in buckets.items()}
+        cached = {m: {int(b): n for b, n in c.items()} for m, c in header["cached"].items()}
+        return counts, cached, rows
+
+    def _expiry_index(self, first: int, last: int) -> tuple[dict, dict, list]:
+        """Como _read_expiry_index, recalculado a partir do snapshot se o índice não servir."""
+        index = self._read_expiry_index(first, last)
+        if index is not None:
+            return index
+        groups, cached = self._expiry_groups(self._read_snapshot() if self.path.exists() else {})
+        counts = {b: _per_market(rows) for b, rows in groups.items()}
+        rows = [row for b in sorted(groups) if first <= b <= last for row in groups[b]]
+        return counts, cached, rows
+
+    def load_all(self) -> dict:
+        if not self.path.parent.exists():
+            return {m: {} for m in self.markets}
+        with self._lock(exclusive=False):
+            cache = self._read_snapshot()
+            self._replay(cache)
+        return cache
+
+    def save_all(self, cache: dict) -> None:
+        with self._lock(exclusive=True):
+            self._write_snapshot(cache)
+
+    def compact(self, min_bytes: int = 0) -> dict:
+        """Funde o log no snapshot (se o log tiver pelo menos `min_bytes`)."""
+        with self._lock(exclusive=True):
+            size = self.log_path.stat().st_size if self.log_path.exists() else 0
+            if size == 0 or size < min_bytes:
+                return {"compacted": False, "log_bytes": size}
+            cache = self._read_snapshot()
+            folded = self._replay(cache)
+            self._write_snapshot(cache)
+        return {"compacted": True, "log_bytes": size, "folded": folded}
+
+    def load_view(self) -> dict:
+        """{market: MarketView} sobre o snapshot binário, sem desserializar a cache."""
+        if not self.path.parent.exists():
+            return {m: {} for m in self.markets}
+        with self._lock(exclusive=False):
+            snapshot = self._open_binary()
+            if snapshot is None:
+                cache = self._read_snapshot()
+                self._replay(cache)
+                return cache
+            overrides = self._log_overrides()
+            trigram_file = self._open_trigrams(snapshot)
+        markets = dict.fromkeys([*snapshot.markets(), *self.markets, *overrides])
+        return {m: MarketView(snapshot, m, overrides.get(m), trigram_file) for m in markets}
+
+    def get(self, market: str, key: str) -> dict | None:
+        if not self.path.parent.exists():
+            return None
+        with self._lock(exclusive=False):
+            snapshot = self._open_binary()
+            if snapshot is None:
+                cache = self._read_snapshot()
+                self._replay(cache)
+                return cache.get(market, {}).get(key)
+            overrides = self._log_overrides(json.dumps(key, ensure_ascii=False))
+        if key in overrides.get(market, {}):
+            return overrides[market][key]
+        return snapshot.get(market, key)
+
+    def put(self, market: str, key: str, entry: dict) -> None:
+        self.put_many([(market, key, entry)])
+
+    def put_many(self, rows: list[tuple[str, str, dict]]) -> None:
+        size = self._append([
+            {"op": "put", "market": market, "key": key, "entry": entry}
+            for market, key, entry in rows
+        ])
+        if size >= WAL_COMPACT_BYTES:
+            self.compact(min_bytes=WAL_COMPACT_BYTES)
+
+    def delete_many(self, rows: list[tuple[str, str]]) -> int:
+        """Remove entradas reescrevendo o snapshot (com o log já fundido)."""
+        with self._lock(exclusive=True):
+            cache = self._read_snapshot()
+            self._replay(cache)
+            removed = sum(cache.get(market, {}).pop(key, None) is not None for market, key in rows)
+            if removed:
+                self._write_snapshot(cache)
+        return removed
+
+    def market_entries(self, market: str) -> dict:
+        return self.load_view().get(market, {})
+
+    def expired(self, markets: list[str], now: float) -> list[tuple[str, str, str | None]]:
+        wanted = set(markets)
+        with self._lock(exclusive=False):
+            _, _, rows = self._expiry_index(0, time_bucket(now))
+            overrides = self._log_overrides()
+        expired = [
+            (exp, market, key, cached_at) for exp, market, key, cached_at in rows
+            if exp <= now and market in wanted and key not in overrides.get(market, {})
+        ]
+        for market, entries in overrides.items():
+            if market not in wanted:
+                continue
+            for key, entry in entries.items():
+                exp = entry_expiry(entry, self.ttl_hours)
+                if exp <= now:
+                    expired.append((exp, market, key, entry.get("cached_at")))
+        expired.sort(key=lambda row: row[0])
+        return [(market, key, cached_at) for _, market, key, cached_at in expired]
+
+    def histogram(self, markets: list[str], now: float) -> dict[str, dict]:
+        """Cabeçalho do índice de expiração e balde actual, com o log sobreposto."""
+        now_bucket = time_bucket(now)
+        with self._lock(exclusive=False):
+            counts, cached, boundary = self._expiry_index(now_bucket, now_bucket)
+            overrides = self._log_overrides()
+            snapshot = self._open_binary() if overrides else None
+
+        result = {m: empty_histogram() for m in markets}
+        for bucket, per_market in counts.items():
+            for market, n in per_market.items():
+                if market in result:
+                    result[market]["total"] += n
+                    result[market]["expires"][bucket] = n
+                    if bucket < now_bucket:
+                        result[market]["expired"] += n
+        for exp, market, _, _ in boundary:
+            if exp <= now and market in result:
+                result[market]["expired"] += 1
+        for market, buckets in cached.items():
+            if market in result:
+                result[market]["cached"] = dict(buckets)
+        for market, entries in overrides.items():
+            if market not in result:
+                continue
+            for key, entry in entries.items():
+                old = snapshot.get(market, key) if snapshot is not None else None
+                if old is not None:
+                    tally(result[market], old, now, self.ttl_hours, sign=-1)
+                tally(result[market], entry, now, self.ttl_hours)
+        return result
+
+    def rebuild_counters(self) -> None:
+        with self._lock(exclusive=True):
+            if self.path.exists():
+                self._write_expiry_index(self._read_snapshot())
+
+    def cheapest(
+        self, category: str, base_unit: str, markets: list[str], now: float, limit: int
+    ) -> list[tuple[float, str, str]]:
+        wanted = set(markets)
+        with self._lock(exclusive=False):
+            snapshot_rows = self._read_unit_rows(category)
+            if snapshot_rows is None:
+                cache = self._read_snapshot() if self.path.exists() else {}
+                snapshot_rows = unit_price_rows(cache, self.ttl_hours).get(category, [])
+            overrides = self._log_overrides()
+
+        # linhas do snapshot já ordenadas: bastam as primeiras `limit` que passam o filtro
+        rows = (
+            (price, market, key)
+            for price, unit, market, key, expires_at, _ in snapshot_rows
+            if unit == base_unit and market in wanted and expires_at > now
+            and key not in overrides.get(market, {})
+        )
+        found = list(islice(rows, limit))
+        for market, entries in overrides.items():
+            if market not in wanted:
+                continue
+            for key, entry in entries.items():
+                unit_price = entry_unit_price(entry)
+                if (
+                    unit_price is not None and unit_price[1] == base_unit
+                    and entry_category(entry) == category
+                    and entry_expiry(entry, self.ttl_hours) > now
+                ):
+                    found.append((unit_price[0], market, key))
+        return heapq.nsmallest(limit, found)
+
+    def brand_candidates(
+        self, queries: list[tuple[str, str, tuple[str, ...], tuple[str, ...]]],
+        markets: list[str], now: float, limit: int,
+    ) -> list[dict[str, list[tuple[float, str]]]]:
+        wanted = set(markets)
+        groups = {(category, unit, brand) for category, unit, brands, _ in queries for brand in brands}
+        with self._lock(exclusive=False):
+            blocks = self._read_brand_blocks(groups)
+            if blocks is None:
+                cache = self._read_snapshot() if self.path.exists() else {}
+                blocks = {group: [] for group in groups}
+                for category, rows in unit_price_rows(cache, self.ttl_hours).items():
+                    for price, unit, market, key, expires_at, brand in rows:
+                        if (category, unit, brand) in blocks:
+                            blocks[(category, unit, brand)].append(f"{price!r}\t{market}\t{expires_at!r}\t{key}")
+            overrides = self._log_overrides()
+
+        # entradas do log (novas ou alteradas) por (categoria, unidade, marca)
+        logged: dict[tuple[str, str, str], list] = {}
+        for market, entries in overrides.items():
+            if market not in wanted:
+                continue
+            for key, entry in entries.items():
+                category, brand = entry_category(entry), entry_brand(entry)
+                unit_price = entry_unit_price(entry) if category and brand else None
+                if unit_price is not None and entry_expiry(entry, self.ttl_hours) > now:
+                    logged.setdefault((category, unit_price[1], brand), []).append((unit_price[0], market, key))
+
+        results = []
+        for category, base_unit, brands, terms in queries:
+            found: dict[str, list] = {}
+            for brand in brands:
+                lines = blocks[(category, base_unit, brand)]
+                for term in terms:  # pré-filtro sem desempacotar: o termo em qualquer ponto da linha
+                    lines = [line for line in lines if term in line]
+                taken = dict.fromkeys(wanted, 0)
+                for line in lines:  # por ordem de preço
+                    price, market, expires_at, key = line.split("\t", 3)
+                    if (
+                        market not in wanted or taken[market] >= limit or float(expires_at) <= now
+                        or key in overrides.get(market, {}) or not all(term in key for term in terms)
+                    ):
+                        continue
+                    found.setdefault(market, []).append((float(price), key))
+                    taken[market] += 1
+                    if all(n >= limit for n in taken.values()):
+                        break
+                for price, market, key in logged.get((category, base_unit, brand), ()):
+                    if all(term in key for term in terms):
+                        found.setdefault(market, []).append((price, key))
+            results.append({m: heapq.nsmallest(limit, rows) for m, rows in found.items()})
+        return results
+
+
+# ---------------------------------------------------------------------------
+# SQLite
+# ---------------------------------------------------------------------------
+
+SQLITE_SCHEMA_VERSION = 6
+
+# Cada passo leva a base de dados da versão i para i+1 (PRAGMA user_version).
+_SQLITE_MIGRATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS entries (
+        market    TEXT NOT NULL,
+        key       TEXT NOT NULL,
+        cached_at REAL,
+        entry     TEXT NOT NULL,
+        PRIMARY KEY (market, key)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_entries_market_cached_at ON entries (market, cached_at);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS trigrams (
+        market TEXT NOT NULL,
+        gram   TEXT NOT NULL,
+        key    TEXT NOT NULL,
+        PRIMARY KEY (market, gram, key)
+    ) WITHOUT ROWID;
+    """,
+    """
+    ALTER TABLE entries ADD COLUMN expires_at REAL NOT NULL DEFAULT 0;
+    CREATE INDEX IF NOT EXISTS idx_entries_market_expires_at ON entries (market, expires_at);
+    """,
+    """
+    ALTER TABLE entries ADD COLUMN category TEXT;
+    ALTER TABLE entries ADD COLUMN base_unit TEXT;
+    ALTER TABLE entries ADD COLUMN unit_price REAL;
+    CREATE INDEX IF NOT EXISTS idx_entries_unit_price ON entries (category, base_unit, unit_price);
+    """,
+    # histogram: contagens por (market, expires|cached, balde), mantidas pelos triggers.
+    # Um REPLACE apaga a linha antiga — só dispara o trigger de DELETE com recursive_triggers.
+    f"""
+    CREATE TABLE IF NOT EXISTS histogram (
+        market TEXT NOT NULL,
+        kind   TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        n      INTEGER NOT NULL,
+        PRIMARY KEY (market, kind, bucket)
+    ) WITHOUT ROWID;
+    CREATE TRIGGER IF NOT EXISTS entries_histogram_insert AFTER INSERT ON entries BEGIN
+        INSERT INTO histogram VALUES
+            (NEW.market, 'expires', CAST(NEW.expires_at / {HISTOGRAM_BUCKET_SECONDS} AS INTEGER), 1)
+            ON CONFLICT (market, kind, bucket) DO UPDATE SET n = n + 1;
+        INSERT INTO histogram VALUES
+            (NEW.market, 'cached', COALESCE(CAST(NEW.cached_at / {HISTOGRAM_BUCKET_SECONDS} AS INTEGER), -1), 1)
+            ON CONFLICT (market, kind, bucket) DO UPDATE SET n = n + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS entries_histogram_delete AFTER DELETE ON entries BEGIN
+        UPDATE histogram SET n = n - 1 WHERE market = OLD.market AND (
+            (kind = 'expires' AND bucket = CAST(OLD.expires_at / {HISTOGRAM_BUCKET_SECONDS} AS INTEGER))
+            OR (kind = 'cached'
+                AND bucket = COALESCE(CAST(OLD.cached_at / {HISTOGRAM_BUCKET_SECONDS} AS INTEGER), -1))
+        );
+        DELETE FROM histogram WHERE market = OLD.market AND n = 0;
+    END;
+    CREATE TRIGGER IF NOT EXISTS entries_histogram_update
+    AFTER UPDATE OF market, cached_at, expires_at ON entries BEGIN
+        UPDATE histogram SET n = n - 1 WHERE market = OLD.market AND (
+            (kind = 'expires' AND bucket = CAST(OLD.expires_at / {HISTOGRAM_BUCKET_SECONDS} AS INTEGER))
+            OR (kind = 'cached'
+                AND bucket = COALESCE(CAST(OLD.cached_at / {HISTOGRAM_BUCKET_SECONDS} AS INTEGER), -1))
+        );
+        DELETE FROM histogram WHERE market = OLD.market AND n = 0;
+        INSERT INTO histogram VALUES
+            (NEW.market, 'expires', CAST(NEW.expires_at / {HISTOGRAM_BUCKET_SECONDS} AS INTEGER), 1)
+            ON CONFLICT (market, kind, bucket) DO UPDATE SET n = n + 1;
+        INSERT INTO histogram VALUES
+            (NEW.market, 'cached', COALESCE(CAST(NEW.cached_at / {HISTOGRAM_BUCKET_SECONDS} AS INTEGER), -1), 1)
+            ON CONFLICT (market, kind, bucket) DO UPDATE SET n = n + 1;
+    END;
+    """,
+    """
+    ALTER TABLE entries ADD COLUMN brand TEXT;
+    CREATE INDEX IF NOT EXISTS idx_entries_brand
+        ON entries (category, base_unit, brand, unit_price, market, expires_at);
+    """,
+]
+
+# Recalcula a tabela histogram a partir de entries (migração para v5 e `stats --recount`).
+_SQLITE_REBUILD_HISTOGRAM = f"""
+    DELETE FROM histogram;
+    INSERT INTO histogram
+        SELECT market, 'expires', CAST(expires_at / {HISTOGRAM_BUCKET_SECONDS} AS INTEGER) AS b, COUNT(*)
+        FROM entries GROUP BY market, b;
+    INSERT INTO histogram
+        SELECT market, 'cached', COALESCE(CAST(cached_at / {HISTOGRAM_BUCKET_SECONDS} AS INTEGER), -1) AS b,
+               COUNT(*)
+        FROM entries GROUP BY market, b;
+"""
+
+
+class SqliteCacheStore(CacheStore):
+    """Backend SQLite: uma linha por (market, key), com índices e histograma mantidos por triggers."""
+
+    def __init__(self, path: Path, markets: list[str], ttl_hours: float = CACHE_TTL_HOURS):
+        super().__init__(markets, ttl_hours)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA recursive_triggers=ON")
+        self._ensure_schema()
+
+    def _ensure_schema(self) -> None:
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        for step in range(version, SQLITE_SCHEMA_VERSION):
+            self._conn.executescript(_SQLITE_MIGRATIONS[step])
+            with self._conn:
+                if step == 1:
+                    self._index_trigrams(
+                        self._conn.execute("SELECT market, key FROM entries").fetchall()
+                    )
+                elif step == 2:
+                    self._conn.execute(
+                        "UPDATE entries SET expires_at = COALESCE("
+                        "  json_extract(entry, '$.expires_at'), cached_at + ?, 0)",
+                        (self.ttl_hours * 3600,),
+                    )
+                elif step == 3:
+                    self._conn.executemany(
+                        "UPDATE entries SET category = ?, base_unit = ?, unit_price = ? "
+                        "WHERE market = ? AND key = ?",
+                        (
+                            (*self._row(market, key, json.loads(raw))[5:8], market, key)
+                            for market, key, raw in self._conn.execute(
+                                "SELECT market, key, entry FROM entries"
+                            ).fetchall()
+                        ),
+                    )
+                elif step == 4:
+                    self._rebuild_histogram()
+                elif step == 5:
+                    self._conn.executemany(
+                        "UPDATE entries SET brand = ? WHERE market = ? AND key = ?",
+                        (
+                            (self._row(market, key, json.loads(raw))[8], market, key)
+                            for market, key, raw in self._conn.execute(
+                                "SELECT market, key, entry FROM entries WHERE unit_price IS NOT NULL"
+                            ).fetchall()
+                        ),
+                    )
+                self._conn.execute(f"PRAGMA user_version = {step + 1}")
+
+    def _rebuild_histogram(self) -> None:
+        for statement in _SQLITE_REBUILD_HISTOGRAM.split(";"):
+            if statement.strip():
+                self._conn.execute(statement)
+
+    def _index_trigrams(self, rows) -> None:
+        """Indexa (market, key) na tabela trigrams. Idempotente — a chave não muda num replace."""
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO trigrams (market, gram, key) VALUES (?, ?, ?)",
+            ((market, g, key) for market, key in rows for g in trigrams(key)),
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def compact(self, min_bytes: int = 0) -> dict:
+        """Checkpoint do WAL do SQLite para o ficheiro principal."""
+        busy, log_frames, _ = self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        return {"compacted": not busy, "log_frames": log_frames}
+
+    _INSERT = (
+        "INSERT OR REPLACE INTO entries "
+        "(market, key, cached_at, expires_at, entry, category, base_unit, unit_price, brand) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+
+    def _row(self, market: str, key: str, entry: dict) -> tuple:
+        category = entry_category(entry)
+        unit_price = entry_unit_price(entry) if category else None
+        price, base_unit = unit_price if unit_price else (None, None)
+        return (
+            market, key, entry_timestamp(entry), entry_expiry(entry, self.ttl_hours),
+            json.dumps(entry, ensure_ascii=False),
+            category if unit_price else None, base_unit, price,
+            entry_brand(entry) if unit_price else None,
+        )
+
+    def load_all(self) -> dict:
+        cache = {m: {} for m in self.markets}
+        for market, key, raw in self._conn.execute("SELECT market, key, entry FROM entries"):
+            cache.setdefault(market, {})[key] = json.loads(raw)
+        return cache
+
+    def save_all(self, cache: dict) -> None:
+        rows = [self._row(m, k, e) for m, k, e in iter_entries(cache)]
+        with self._conn:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM trigrams")
+            self._conn.executemany(self._INSERT, rows)
+            self._index_trigrams((r[0], r[1]) for r in rows)
+
+    def get(self, market: str, key: str) -> dict | None:
+        row = self._conn.execute(
+            "SELECT entry FROM entries WHERE market = ? AND key = ?", (market, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, market: str, key: str, entry: dict) -> None:
+        with self._conn:
+            self._conn.execute(self._INSERT, self._row(market, key, entry))
+            self._index_trigrams([(market, key)])
+
+    def put_many(self, rows: list[tuple[str, str, dict]]) -> None:
+        with self._conn:
+            self._conn.executemany(self._INSERT, (self._row(m, k, e) for m, k, e in rows))
+            self._index_trigrams((m, k) for m, k, _ in rows)
+
+    def delete_many(self, rows: list[tuple[str, str]]) -> int:
+        removed = 0
+        with self._conn:
+            for market, key in rows:
+                removed += self._conn.execute(
+                    "DELETE FROM entries WHERE market = ? AND key = ?", (market, key)
+                ).rowcount
+                self._conn.executemany(
+                    "DELETE FROM trigrams WHERE market = ? AND gram = ? AND key = ?",
+                    ((market, g, key) for g in trigrams(key)),
+                )
+        return removed
+
+    def market_entries(self, market: str) -> dict:
+        return {
+            key: json.loads(raw)
+            for key, raw in self._conn.execute(
+                "SELECT key, entry FROM entries WHERE market = ?", (market,)
+            )
+        }
+
+    def search_entries(self, market: str, query: str) -> dict:
+        grams = sorted(trigrams(query))
+        if not grams:
+            return self.market_entries(market)
+        placeholders = ", ".join("?" * len(grams))
+        rows = self._conn.execute(
+            "SELECT e.key, e.entry FROM entries e JOIN ("
+            f"  SELECT key FROM trigrams WHERE market = ? AND gram IN ({placeholders})"
+            "   GROUP BY key HAVING COUNT(*) = ?"
+            ") t ON t.key = e.key WHERE e.market = ?",
+            (market, *grams, len(grams), market),
+        )
+        return {key: json.loads(raw) for key, raw in rows}
+
+    def expired(self, markets: list[str], now: float) -> list[tuple[str, str, str | None]]:
+        result = []
+        for market in markets:
+            rows = self._conn.execute(
+                "SELECT key, json_extract(entry, '$.cached_at') FROM entries "
+                "WHERE market = ? AND expires_at <= ? ORDER BY expires_at",
+                (market, now),
+            )
+            result.extend((market, key, cached_at) for key, cached_at in rows)
+        return result
+
+    def histogram(self, markets: list[str], now: float) -> dict[str, dict]:
+        """Baldes da tabela histogram; no balde actual, `expired` conta pelo índice de expires_at."""
+        now_bucket = time_bucket(now)
+        result = {}
+        for market in markets:
+            hist = empty_histogram()
+            for kind, bucket, n in self._conn.execute(
+                "SELECT kind, bucket, n FROM histogram WHERE market = ?", (market,)
+            ):
+                hist[kind][bucket] = n
+            hist["total"] = sum(hist["expires"].values())
+            hist["expired"] = sum(n for b, n in hist["expires"].items() if b < now_bucket)
+            if now_bucket in hist["expires"]:
+                hist["expired"] += self._conn.execute(
+                    "SELECT COUNT(*) FROM entries WHERE market = ? AND expires_at BETWEEN ? AND ? "
+                    f"AND CAST(expires_at / {HISTOGRAM_BUCKET_SECONDS} AS INTEGER) = ?",
+                    (market, (now_bucket - 1) * HISTOGRAM_BUCKET_SECONDS, now, now_bucket),
+                ).fetchone()[0]
+            result[market] = hist
+        return result
+
+    def rebuild_counters(self) -> None:
+        with self._conn:
+            self._rebuild_histogram()
+
+    def cheapest(
+        self, category: str, base_unit: str, markets: list[str], now: float, limit: int
+    ) -> list[tuple[float, str, str]]:
+        if not markets:
+            return []
+        placeholders = ", ".join("?" * len(markets))
+        rows = self._conn.execute(
+            "SELECT unit_price, market, key FROM entries "
+            "WHERE category = ? AND base_unit = ? AND unit_price IS NOT NULL "
+            f"AND market IN ({placeholders}) AND expires_at > ? "
+            "ORDER BY unit_price, market, key LIMIT ?",
+            (category, base_unit, *markets, now, limit),
+        )
+        return [tuple(row) for row in rows]
+
+    def brand_candidates(
+        self, queries: list[tuple[str, str, tuple[str, ...], tuple[str, ...]]],
+        markets: list[str], now: float, limit: int,
+    ) -> list[dict[str, list[tuple[float, str]]]]:
+        if not markets:
+            return [{} for _ in queries]
+        placeholders = ", ".join("?" * len(markets))
+        results = []
+        for category, base_unit, brands, terms in queries:
+            found: dict[str, list] = {}
+            for brand in brands:
+                # uma marca de cada vez: igualdade nas três primeiras colunas do índice,
+                # linhas já por ordem de preço — o cursor pára quando cada mercado tem `limit`
+                cursor = self._conn.execute(
+                    "SELECT unit_price, market, key FROM entries INDEXED BY idx_entries_brand "
+                    "WHERE category = ? AND base_unit = ? AND brand = ? "
+                    f"AND market IN ({placeholders}) AND expires_at > ? "
+                    + "".join("AND instr(key, ?) > 0 " for _ in terms)
+                    + "ORDER BY unit_price, key",
+                    (category, base_unit, brand, *markets, now, *terms),
+                )
+                taken = dict.fromkeys(markets, 0)
+                for price, market, key in cursor:
+                    if taken[market] < limit:
+                        found.setdefault(market, []).append((price, key))
+                        taken[market] += 1
+                    if all(n >= limit for n in taken.values()):
+                        break
+            results.append({m: heapq.nsmallest(limit, rows) for m, rows in found.items()})
+        return results
+
+
+def open_store(
+    backend: str, json_path: Path, markets: list[str], ttl_hours: float = CACHE_TTL_HOURS
+) -> CacheStore:
+    """Abre o backend pedido. O ficheiro SQLite vive ao lado do JSON (mesmo nome, extensão .db)."""
+    if backend == "sqlite":
+        return SqliteCacheStore(Path(json_path).with_suffix(".db"), markets, ttl_hours)
+    if backend == "json":
+        return JsonCacheStore(json_path, markets, ttl_hours)
+    raise ValueError(f"Backend de cache desconhecido: {backend}. Use: {list(BACKENDS)}")
+
+
+def store_files(backend: str, json_path: Path) -> list[Path]:
+    """Ficheiros cujo conteúdo define o estado da cache (para invalidação por mtime)."""
+    json_path = Path(json_path)
+    if backend == "sqlite":
+        db = json_path.with_suffix(".db")
+        return [db, db.with_name(db.name + "-wal")]
+    return [json_path, json_path.with_suffix(".log")]
@@ -44,6 +44,22 @@ MARKETS: list[str] = [m.value for m in OnlineMarket]
 # TTL da cache de preços (horas). Partilhado por price_cache.py e price_compare.py.
 CACHE_TTL_HOURS: int = 24
 
+# Backend de armazenamento da cache de preços: "json" (data/price_cache.json) ou
+# "sqlite" (data/price_cache.db). Pode ser sobreposto pela variável de ambiente
+# GROCERY_CACHE_BACKEND. Ver scripts/cache_store.py.
+CACHE_BACKEND: str = "json"
+
+# Retenção da cache de preços (aplicada por `price_cache.py gc`):
+#   - CACHE_MAX_ENTRIES_PER_MARKET: acima disto, saem as entradas com menor score
+#     de utilização (hits recentes e frequentes em price_compare / search)
+#   - CACHE_MAX_STALE_HOURS: entradas expiradas há mais do que isto são removidas
+#   - CACHE_GC_ON_WRITE: correr o gc após `update`/`update-batch` quando um mercado
+#     passa o limite de entradas
+# Produtos ativos em consumption_model.json nunca são removidos.
+CACHE_MAX_ENTRIES_PER_MARKET: int = 5000
+CACHE_MAX_STALE_HOURS: int = 30 * 24
+CACHE_GC_ON_WRITE: bool = False
+
 # Configuração de entrega por mercado.
 # Chaves são strings (valores do enum) para compatibilidade com código legado.
 # Verificar os valores actuais nos sites antes de cada campanha.
@@ -59,3 +75,23 @@ DELIVERY_CONFIG: dict[str, dict[str, float]] = {
         "min_order": 0.0,
     },
 }
+
+# Recolha automática de preços (price_fetcher.py), por mercado:
+#   - search_url: página de pesquisa ({query} já codificado para URL)
+#   - concurrency: pedidos em simultâneo
+#   - rate_per_second / burst: token bucket partilhado por todos os pedidos ao mercado
+# Valores conservadores — equivalem aos 2–3 s entre pesquisas da recolha manual.
+FETCH_CONFIG: dict[str, dict] = {
+    OnlineMarket.CONTINENTE.value: {
+        "search_url": "https://www.continente.pt/pesquisa/?q={query}",
+        "concurrency": 2,
+        "rate_per_second": 0.5,
+        "burst": 2,
+    },
+    OnlineMarket.PINGODOCE.value: {
+        "search_url": "https://www.pingodoce.pt/pesquisa/?q={query}",
+        "concurrency": 2,
+        "rate_per_second": 0.5,
+        "burst": 2,
+    },
+}
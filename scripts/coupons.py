@@ -0,0 +1,143 @@
+"""
+Seleção ótima de cupões por mercado.
+
+Cada cupão da config de um mercado ({market: {coupons: [...]}}) tem:
+  description, discount_eur, min_spend, categories ([] = todos)
+e, opcionalmente:
+  exclusive_group  cupões do mesmo grupo não acumulam entre si (ex: "cartao")
+  stackable        false → o cupão não acumula com nenhum outro
+
+CouponBook indexa os cupões de um mercado por categoria (e os gerais à parte),
+pelo que ver quais se aplicam a um carrinho só percorre as categorias do
+carrinho. A escolha é uma mochila pequena em cêntimos: maximizar o desconto
+(limitado ao subtotal) respeitando grupos exclusivos e cupões não acumuláveis;
+em empate, o conjunto que desperdiça menos valor facial e, depois, o que usa
+menos cupões — os restantes ficam para a próxima compra.
+
+O resultado é memoizado por cupões aplicáveis (e pelo subtotal, quando este
+limita o desconto): o optimizer avalia o mesmo mercado muitas vezes com
+carrinhos diferentes mas equivalentes.
+"""
+
+
+class Coupon:
+    __slots__ = ("index", "description", "discount_cents", "min_spend", "categories", "group", "stackable")
+
+    def __init__(self, index: int, raw: dict):
+        self.index = index
+        self.description = raw.get("description", "")
+        self.discount_cents = max(0, round(raw.get("discount_eur", 0.0) * 100))
+        self.min_spend = raw.get("min_spend", 0.0)
+        self.categories = frozenset(raw.get("categories") or ())
+        self.group = raw.get("exclusive_group")
+        self.stackable = raw.get("stackable", True)
+
+
+def _solve(coupons: list[Coupon], cap_cents: int) -> tuple[int, tuple[int, ...]]:
+    """(desconto em cêntimos, índices escolhidos) ótimo para `coupons` aplicáveis."""
+    if cap_cents <= 0 or not coupons:
+        return 0, ()
+
+    def better(a, b) -> bool:
+        """a = (soma, nº cupões, índices): mais desconto, depois menos desperdício, depois menos cupões."""
+        return (-min(a[0], cap_cents), a[0], a[1]) < (-min(b[0], cap_cents), b[0], b[1])
+
+    # Grupos: cada cupão acumulável sem grupo é um grupo próprio; escolhe-se ≤ 1 por grupo
+    groups: dict[object, list[Coupon]] = {}
+    for coupon in coupons:
+        if coupon.stackable:
+            groups.setdefault(coupon.group if coupon.group is not None else ("_", coupon.index), []).append(coupon)
+
+    # DP por soma: por cada soma alcançável guarda-se a escolha com menos cupões.
+    # Somas acima do limite só valem a menor (as outras desperdiçam mais).
+    states: dict[int, tuple[int, tuple[int, ...]]] = {0: (0, ())}
+    for members in groups.values():
+        new_states = dict(states)
+        for total, (count, chosen) in states.items():
+            if total >= cap_cents:
+                continue
+            for coupon in members:
+                s = total + coupon.discount_cents
+                candidate = (count + 1, chosen + (coupon.index,))
+                if s not in new_states or candidate[0] < new_states[s][0]:
+                    new_states[s] = candidate
+        over = [s for s in new_states if s > cap_cents]
+        if len(over) > 1:
+            keep = min(over)
+            for s in over:
+                if s != keep:
+                    del new_states[s]
+        states = new_states
+
+    best = max(((s, c, chosen) for s, (c, chosen) in states.items()),
+               key=lambda a: (min(a[0], cap_cents), -a[0], -a[1]))
+    for coupon in coupons:
+        if not coupon.stackable:
+            single = (coupon.discount_cents, 1, (coupon.index,))
+            if better(single, best):
+                best = single
+    return min(best[0], cap_cents), best[2]
+
+
+class CouponBook:
+    """Cupões de um mercado, indexados por categoria, com escolha ótima memoizada."""
+
+    def __init__(self, coupons: list[dict] | None):
+        self.coupons = [Coupon(i, raw) for i, raw in enumerate(coupons or [])]
+        self._general: list[Coupon] = []
+        self._by_category: dict[str, list[Coupon]] = {}
+        for coupon in self.coupons:
+            if coupon.discount_cents <= 0:
+                continue
+            if not coupon.categories:
+                self._general.append(coupon)
+            for category in coupon.categories:
+                self._by_category.setdefault(category, []).append(coupon)
+        self._memo: dict[tuple, tuple[int, tuple[int, ...]]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._general or self._by_category)
+
+    def applicable(self, subtotal: float, categories) -> list[Coupon]:
+        """Cupões com min_spend ≤ subtotal e (sem restrição ou) alguma categoria no carrinho."""
+        found = {c.index: c for c in self._general if c.min_spend <= subtotal}
+        for category in categories:
+            for coupon in self._by_category.get(category, ()):
+                if coupon.min_spend <= subtotal:
+                    found[coupon.index] = coupon
+        return [found[i] for i in sorted(found)]
+
+    def _best(self, subtotal: float, categories) -> tuple[int, tuple[int, ...]]:
+        if not self:
+            return 0, ()
+        applicable = self.applicable(subtotal, categories)
+        indices = tuple(c.index for c in applicable)
+        # Sem limite, a escolha depende só dos cupões aplicáveis; só subtotais abaixo
+        # desse desconto precisam de resolver (e memoizar) a mochila com limite
+        unbounded = self._memo.get(indices)
+        if unbounded is None:
+            unbounded = self._memo[indices] = _solve(applicable, sum(c.discount_cents for c in applicable) + 1)
+        cap = round(subtotal * 100)
+        if cap >= unbounded[0]:
+            return unbounded
+        key = (cap, indices)
+        if key not in self._memo:
+            self._memo[key] = _solve(applicable, cap)
+        return self._memo[key]
+
+    def max_discount(self, subtotal: float, categories) -> float:
+        """Desconto máximo (€) para um carrinho com este subtotal e categorias."""
+        return self._best(subtotal, categories)[0] / 100
+
+    def best(self, subtotal: float, categories) -> tuple[float, list[dict]]:
+        """(desconto_total, cupões aplicados) — mesmo formato que price_compare.apply_coupons."""
+        cents, chosen = self._best(subtotal, categories)
+        # Distribui o desconto pelos cupões escolhidos, do maior para o menor
+        remaining = cents
+        applied = []
+        for coupon in sorted((self.coupons[i] for i in chosen), key=lambda c: -c.discount_cents):
+            used = min(coupon.discount_cents, remaining)
+            if used > 0:
+                remaining -= used
+                applied.append({"description": coupon.description, "discount_eur": used / 100})
+        return cents / 100, applied
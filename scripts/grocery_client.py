@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Cliente do grocery_daemon (JSON-RPC sobre Unix socket).
+
+Se o daemon estiver a correr, o pedido é servido por ele (estruturas já em
+memória). Caso contrário, o método é executado no próprio processo através do
+mesmo registo de métodos — o resultado é idêntico, só mais lento.
+
+Usage:
+  python3 grocery_client.py list_optimizer.generate_weekly_list
+  python3 grocery_client.py price_cache.get '{"market": "continente", "product": "leite"}'
+  python3 grocery_client.py consumption_tracker.check_stock --no-fallback
+
+Este módulo só importa a stdlib: o custo de arranque no caminho rápido é o do
+interpretador, sem reimportar os scripts nem reler os ficheiros de dados.
+"""
+
+import json
+import os
+import socket
+import sys
+import argparse
+from pathlib import Path
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+CALL_TIMEOUT_SECONDS = 120.0
+
+
+class RpcError(Exception):
+    """Erro devolvido por um método JSON-RPC (código + mensagem)."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def socket_path() -> Path:
+    env = os.environ.get("GROCERY_DAEMON_SOCKET")
+    return Path(env) if env else DATA_DIR / "grocery.sock"
+
+
+def _call_socket(path: Path, method: str, params: dict) -> object:
+    request = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(CALL_TIMEOUT_SECONDS)
+        sock.connect(str(path))
+        sock.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionResetError("daemon fechou a ligação sem resposta")
+    response = json.loads(line)
+    if "error" in response:
+        raise RpcError(response["error"]["code"], response["error"]["message"])
+    return response["result"]
+
+
+def call(method: str, params: dict | None = None, fallback: bool = True, path: Path | None = None) -> object:
+    """
+    Chama `method` no daemon; sem daemon (socket inexistente ou recusado),
+    executa-o em processo se `fallback` for True.
+    """
+    params = params or {}
+    try:
+        return _call_socket(path or socket_path(), method, params)
+    except (FileNotFoundError, ConnectionRefusedError):
+        if not fallback:
+            raise
+    from grocery_daemon import dispatch  # import tardio: só no caminho lento
+    return dispatch(method, params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cliente do grocery_daemon")
+    parser.add_argument("method", help="Ex.: price_cache.get, list_optimizer.generate_triage")
+    parser.add_argument("params", nargs="?", default="{}", help="Parâmetros (objeto JSON)")
+    parser.add_argument("--no-fallback", action="store_true", help="Falhar se o daemon não estiver a correr")
+    args = parser.parse_args()
+
+    try:
+        params = json.loads(args.params)
+    except json.JSONDecodeError as e:
+        print(json.dumps({"error": f"Parâmetros JSON inválidos: {e}"}, ensure_ascii=False))
+        sys.exit(1)
+
+    try:
+        result = call(args.method, params, fallback=not args.no_fallback)
+    except RpcError as e:
+        print(json.dumps({"error": e.message, "code": e.code}, ensure_ascii=False))
+        sys.exit(1)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(json.dumps({"error": f"Daemon não está a correr ({socket_path()})"}, ensure_ascii=False))
+        sys.exit(1)
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Serviço residente opcional: expõe os entry points dos scripts como JSON-RPC 2.0
+sobre um Unix socket local.
+
+Cada cron job e cada interação WhatsApp corre um script do zero — arranque do
+interpretador, imports e parsing de price_cache.json, consumption_model.json e
+family_preferences.json. O daemon mantém módulos e ficheiros já carregados em
+memória e invalida cada ficheiro quando o seu mtime/tamanho/inode muda.
+
+Usage:
+  python3 grocery_daemon.py serve [--socket data/grocery.sock]
+  python3 grocery_daemon.py status
+  python3 grocery_daemon.py stop
+  python3 grocery_daemon.py methods
+
+Protocolo: uma linha JSON por pedido/resposta
+  → {"jsonrpc": "2.0", "id": 1, "method": "price_cache.get", "params": {"market": "continente", "product": "leite"}}
+  ← {"jsonrpc": "2.0", "id": 1, "result": {...}}
+
+Métodos:
+  price_cache.<cmd>          → cmd_<cmd>(args); params = flags do CLI (update_batch exige "file")
+  consumption_tracker.*      → update_model_after_purchase, check_stock, apply_feedback
+  list_optimizer.*           → generate_weekly_list, generate_bulk_list, generate_physical_list, generate_triage
+  price_compare.*            → optimize_split, run_comparison
+  price_compare.run_comparison_incremental
+                             → run_comparison com uma SplitSession mantida entre pedidos:
+                               só os itens e preços que mudaram são reavaliados
+  daemon.ping | daemon.stats | daemon.shutdown
+
+O cliente (grocery_client.py) usa o mesmo registo em processo quando o daemon
+não está a correr.
+"""
+
+import copy
+import inspect
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+import argparse
+from pathlib import Path
+from types import SimpleNamespace
+
+import consumption_tracker
+import list_optimizer
+import price_cache
+import price_compare
+from split_session import SplitSession
+from cache_store import store_files
+from grocery_client import RpcError, call, socket_path
+
+# Códigos de erro JSON-RPC 2.0
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+# Um ficheiro escrito há menos do que isto pode voltar a ser escrito no mesmo
+# "tick" de mtime (a granularidade real do filesystem é de vários ms) sem que a
+# assinatura mude — nesse caso a memo não é usada e o ficheiro é relido.
+_MTIME_SLACK_NS = 50_000_000
+
+
+# ---------------------------------------------------------------------------
+# Memo invalidada por mtime
+# ---------------------------------------------------------------------------
+
+def _signature(path: Path) -> tuple | None:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class MtimeMemo:
+    """Valores derivados de ficheiros, reutilizados enquanto os ficheiros não mudam."""
+
+    def __init__(self):
+        self._entries: dict = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, paths: list[Path], loader):
+        sig = tuple(_signature(p) for p in paths)
+        cached = self._entries.get(key)
+        if cached is not None and cached[0] == sig:
+            self.hits += 1
+            return cached[1]
+        # stat antes de carregar: uma escrita concorrente só pode tornar a
+        # assinatura guardada mais antiga do que o conteúdo, nunca o contrário
+        value = loader()
+        self.misses += 1
+        settled = time.time_ns() - _MTIME_SLACK_NS
+        if all(s is None or s[0] < settled for s in sig):
+            self._entries[key] = (sig, value)
+        else:
+            self._entries.pop(key, None)
+        return value
+
+    def invalidate(self, key=None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def install_memo(memo: MtimeMemo):
+    """
+    Substitui os loaders dos scripts por versões memoizadas. Devolve uma função
+    que repõe os originais.
+
+    Os JSON e o dict completo da cache saem como cópias (copy.deepcopy): um handler
+    que altere o que carregou não contamina os pedidos seguintes. As vistas da cache
+    são só de leitura e são partilhadas. save_json invalida a entrada correspondente.
+    """
+    patched = []
+
+    def patch(module, name, replacement):
+        patched.append((module, name, getattr(module, name)))
+        setattr(module, name, replacement)
+
+    def memo_load_json(original):
+        def load_json(path, default=None):
+            path = Path(path)
+            if not path.exists():
+                return original(path, default)
+            return copy.deepcopy(memo.get(("json", str(path)), [path], lambda: original(path, default)))
+        return load_json
+
+    def memo_save_json(original):
+        def save_json(path, data):
+            original(path, data)
+            memo.invalidate(("json", str(Path(path))))
+        return save_json
+
+    def memo_cache(name, original, share: bool):
+        def load() -> dict:
+            backend = price_cache.get_backend()
+            paths = store_files(backend, price_cache.CACHE_FILE)
+            value = memo.get((name, backend, str(price_cache.CACHE_FILE)), paths, original)
+            return value if share else copy.deepcopy(value)
+        return load
+
+    load_cache = memo_cache("price_cache", price_cache.load_cache, share=False)
+    load_cache_view = memo_cache("price_cache_view", price_cache.load_cache_view, share=True)
+
+    for module in (consumption_tracker, list_optimizer, price_compare):
+        patch(module, "load_json", memo_load_json(module.load_json))
+    patch(consumption_tracker, "save_json", memo_save_json(consumption_tracker.save_json))
+    patch(price_cache, "load_cache", load_cache)
+    patch(price_cache, "load_cache_view", load_cache_view)
+    patch(price_compare, "load_cache_view", load_cache_view)
+
+    def restore():
+        for module, name, original in reversed(patched):
+            setattr(module, name, original)
+        memo.invalidate()
+
+    return restore
+
+
+# ---------------------------------------------------------------------------
+# Registo de métodos
+# ---------------------------------------------------------------------------
+
+class _CmdArgs(SimpleNamespace):
+    """Namespace à argparse: flags omitidas valem None (o default de todos os subcomandos)."""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return None
+
+
+def _cmd(fn):
+    return lambda params: fn(_CmdArgs(**params))
+
+
+def _kwargs(fn):
+    signature = inspect.signature(fn)
+
+    def method(params):
+        try:
+            signature.bind(**params)
+        except TypeError as e:
+            raise RpcError(INVALID_PARAMS, str(e)) from e
+        return fn(**params)
+    return method
+
+
+_EXPORTS = {
+    consumption_tracker: ["update_model_after_purchase", "check_stock", "apply_feedback"],
+    list_optimizer: ["generate_weekly_list", "generate_bulk_list", "generate_physical_list", "generate_triage"],
+    price_compare: ["optimize_split", "run_comparison"],
+}
+
+_STARTED_AT = time.time()
+_MEMO: MtimeMemo | None = None
+_SESSION: SplitSession | None = None
+
+
+def _run_comparison_incremental(params: dict) -> dict:
+    global _SESSION
+    if params:
+        raise RpcError(INVALID_PARAMS, "run_comparison_incremental não aceita parâmetros")
+    if _SESSION is None:
+        _SESSION = SplitSession()
+    return price_compare.run_comparison(optimizer=_SESSION.solve)
+
+
+def _daemon_stats() -> dict:
+    return {
+        "pid": os.getpid(),
+        "uptime_seconds": round(time.time() - _STARTED_AT, 1),
+        "memo": _MEMO.stats() if _MEMO else None,
+        "split_session": dict(_SESSION.stats, items=len(_SESSION.items)) if _SESSION else None,
+    }
+
+
+def build_methods() -> dict:
+    methods = {
+        f"price_cache.{name[4:]}": _cmd(getattr(price_cache, name))
+        for name in dir(price_cache) if name.startswith("cmd_")
+    }
+    for module, names in _EXPORTS.items():
+        for name in names:
+            methods[f"{module.__name__}.{name}"] = _kwargs(getattr(module, name))
+    methods["price_compare.run_comparison_incremental"] = _run_comparison_incremental
+    methods["daemon.ping"] = lambda params: "pong"
+    methods["daemon.stats"] = lambda params: _daemon_stats()
+    return methods
+
+
+METHODS = build_methods()
+
+
+def dispatch(method: str, params: dict | None = None) -> object:
+    """Executa `method` neste processo. Levanta RpcError para método/parâmetros inválidos."""
+    if method not in METHODS:
+        raise RpcError(METHOD_NOT_FOUND, f"Método desconhecido: {method}")
+    if params is None:
+        params = {}
+    if not isinstance(params, dict):
+        raise RpcError(INVALID_PARAMS, "params deve ser um objeto JSON")
+    return METHODS[method](params)
+
+
+# ---------------------------------------------------------------------------
+# Servidor
+# ---------------------------------------------------------------------------
+
+def handle_request(line: bytes, server=None) -> dict:
+    """Uma linha JSON-RPC → objeto de resposta."""
+    try:
+        request = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        return {"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": str(e)}}
+    if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+        return {"jsonrpc": "2.0", "id": None, "error": {"code": INVALID_REQUEST, "message": "Pedido inválido"}}
+
+    req_id = request.get("id")
+    method = request["method"]
+    try:
+        if method == "daemon.shutdown" and server is not None:
+            server.stopping = True
+            result = {"stopping": True}
+        else:
+            result = dispatch(method, request.get("params"))
+    except RpcError as e:
+        return {"jsonrpc": "2.0", "id": req_id, "error": {"code": e.code, "message": e.message}}
+    except Exception as e:  # o daemon não pode cair por causa de um pedido
+        if _MEMO is not None:
+            _MEMO.invalidate()  # o método pode ter mutado dados memoizados antes de falhar
+        return {"jsonrpc": "2.0", "id": req_id, "error": {"code": INTERNAL_ERROR, "message": f"{type(e).__name__}: {e}"}}
+    return {"jsonrpc": "2.0", "id": req_id, "result": result}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = handle_request(line, self.server)
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class GroceryServer(socketserver.UnixStreamServer):
+    """Servidor de um só thread: os pedidos são servidos em série, sem locks."""
+
+    timeout = 1.0
+
+    def __init__(self, path: Path):
+        self.stopping = False
+        super().__init__(str(path), _Handler)
+        os.chmod(path, 0o600)
+
+    def serve_until_stopped(self) -> None:
+        while not self.stopping:
+            self.handle_request()
+
+
+def _clear_stale_socket(path: Path) -> bool:
+    """Remove um socket órfão. Retorna False se houver um daemon vivo a escutar."""
+    if not path.exists():
+        return True
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(path))
+            return False
+        except (ConnectionRefusedError, FileNotFoundError):
+            pass
+    path.unlink(missing_ok=True)
+    return True
+
+
+def serve(path: Path) -> dict:
+    global _MEMO, _STARTED_AT
+    path = Path(path)
+    if not _clear_stale_socket(path):
+        return {"error": f"Daemon já está a correr em {path}"}
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    _MEMO = MtimeMemo()
+    _STARTED_AT = time.time()
+    restore = install_memo(_MEMO)
+    stdin, sys.stdin = sys.stdin, open(os.devnull)  # update_batch sem "file" não pode bloquear
+    server = GroceryServer(path)
+
+    def stop(signum, frame):
+        server.stopping = True
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+    try:
+        server.serve_until_stopped()
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
+        sys.stdin.close()
+        sys.stdin = stdin
+        restore()
+        _MEMO = None
+    return {"stopped": str(path)}
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Grocery daemon (JSON-RPC sobre Unix socket)")
+    parser.add_argument("--socket", default=None, help="Caminho do socket (default: data/grocery.sock ou GROCERY_DAEMON_SOCKET)")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("serve", help="Arranca o daemon em primeiro plano")
+    sub.add_parser("status", help="Estado do daemon (pid, uptime, memo)")
+    sub.add_parser("stop", help="Pede ao daemon para terminar")
+    sub.add_parser("methods", help="Lista os métodos expostos")
+    args = parser.parse_args()
+
+    path = Path(args.socket) if args.socket else socket_path()
+
+    if args.command == "serve":
+        result = serve(path)
+    elif args.command in ("status", "stop"):
+        method = "daemon.stats" if args.command == "status" else "daemon.shutdown"
+        try:
+            result = call(method, fallback=False, path=path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            result = {"running": False, "socket": str(path)}
+    elif args.command == "methods":
+        result = sorted(METHODS)
+    else:
+        parser.print_help()
+        sys.exit(1)
+        return
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -83,8 +83,7 @@ def generate_weekly_list():
 
     combined = []
     for item in manual_items:
-        item["source"] = "manual"
-        combined.append(item)
+        combined.append({**item, "source": "manual"})
 
     for item in predicted_items:
         if item["name"].lower() not in manual_names:
@@ -0,0 +1,352 @@
+"""
+Fronteira de Pareto do price_compare: custo total × nº de encomendas × substituições de marca.
+
+O optimize_split devolve um split e as alternativas single-store; a pergunta do
+admin costuma ser outra — "quanto custa com uma só encomenda? e sem trocar de
+marca?". pareto_frontier devolve todas as distribuições não dominadas:
+  - total (Σ subtotal + entrega − cupões − saldo, como no modo exato);
+  - encomendas: mercados usados (uma entrega por mercado);
+  - substituições: itens comprados noutra marca que não a `preferred_brand`
+    (nem uma das `acceptable_brands`) — entradas sem `brand` não contam.
+Uma distribuição é dominada se outra não é pior em nenhum dos três e é melhor
+nalgum; de cada vetor (total, encomendas, substituições) fica um representante.
+
+Branch-and-bound multiobjetivo sobre a atribuição item → mercado, com os mesmos
+itens fixos e a mesma ordem de ramificação do optimize_exact. Um nó parcial é
+descartado quando todas as suas continuações são dominadas por pontos já
+encontrados. As continuações dividem-se em duas classes — ficar nos mercados já
+usados (encomendas = k) ou abrir outro (≥ k+1) — e cada classe tem o seu limite
+inferior de custo: preço mínimo restante só nos mercados da classe + ajuste de
+entrega/cupões/saldo por mercado, como no optimize_exact. Dentro de cada classe,
+as substituições entram no limite: quem escolher só q das substituições
+evitáveis (itens cuja opção mais barata é de outra marca) paga pelo menos a
+diferença para a marca certa em todas as outras — menos as q maiores. O nó
+continua se, para alguma classe e algum q, o vetor (limite, encomendas,
+substituições) não for dominado. Incumbentes iniciais: o greedy com
+rebalanceamento e o greedy restrito a cada subconjunto de mercados (com e sem
+substituições).
+
+Se `time_budget` se esgotar, os pontos encontrados continuam a não se dominar
+entre si, mas a fronteira pode estar incompleta (`complete: false`).
+"""
+
+import math
+import time
+from itertools import combinations
+
+from price_compare import (
+    MARKETS, CouponBook, LinePricer, PriceMatrix, coupon_books, default_market_config,
+    greedy_assignments, market_cost, market_params, rebalance_coupons, rebalance_delivery,
+)
+
+INF = math.inf
+PARETO_TIME_BUDGET_SECONDS = 1.0
+# Incumbentes por subconjunto de mercados só até aqui (2^M subconjuntos)
+PARETO_MAX_SEED_MARKETS = 6
+
+
+def brand_substitution(item: dict, price_info: dict | None) -> bool:
+    """Se a entrada de cache é de uma marca que não a preferida (nem aceite) do item."""
+    preferred = item.get("preferred_brand")
+    brand = (price_info or {}).get("brand")
+    if not preferred or not brand:
+        return False
+    accepted = {b.strip().casefold() for b in [preferred, *(item.get("acceptable_brands") or [])] if b}
+    return brand.strip().casefold() not in accepted
+
+
+def _label(total: float, orders: int, substitutions: int) -> str:
+    text = f"€{total:.2f} com {orders} encomenda{'s' if orders != 1 else ''}"
+    if substitutions:
+        text += f" e {substitutions} substitui{'ções' if substitutions != 1 else 'ção'} de marca"
+    return text
+
+
+def pareto_frontier(items_with_prices: list, market_config: dict | None = None,
+                    time_budget: float | None = PARETO_TIME_BUDGET_SECONDS, pricer: LinePricer | None = None,
+                    matrix: PriceMatrix | None = None, books: dict[str, CouponBook] | None = None) -> dict:
+    """
+    Distribuições não dominadas em (total, encomendas, substituições de marca).
+
+    Output: {points: [{total, orders, substitutions, markets: {market: {items, total}},
+             substituted, label}], complete, nodes, elapsed_s}
+            com os pontos por encomendas e depois por total.
+    """
+    if market_config is None:
+        market_config = default_market_config()
+    started = time.monotonic()
+    deadline = started + time_budget if time_budget is not None else None
+
+    if matrix is None:
+        matrix = PriceMatrix(items_with_prices, MARKETS, pricer)
+    if books is None:
+        books = coupon_books(market_config)
+    markets = matrix.markets
+    n_markets = len(markets)
+    all_mask = (1 << n_markets) - 1
+    categories = [d["item"].get("category", "outros") for d in items_with_prices]
+    swapped = [
+        [brand_substitution(d["item"], d["prices"].get(m)) for m in markets] for d in items_with_prices
+    ]
+    base_choice = [-1] * matrix.n  # itens fixos; -1 nos livres e nos indisponíveis
+    free = []  # (linha, categoria, [(preço, índice do mercado)] por preço)
+    for i, category in enumerate(categories):
+        j = matrix.preferred[i]
+        options = [(matrix.price(i, j), j)] if j >= 0 else matrix.options(i)
+        if len(options) == 1:
+            base_choice[i] = options[0][1]
+        elif options:
+            free.append((i, category, options))
+    free.sort(key=lambda f: (f[2][1][0] - f[2][0][0], f[2][0][0]), reverse=True)
+    n = len(free)
+
+    def market_state(choice: list[int]) -> tuple[list[float], list[int], list[frozenset], int]:
+        subs = [0.0] * n_markets
+        counts = [0] * n_markets
+        cats = [set() for _ in markets]
+        n_subs = 0
+        for i, j in enumerate(choice):
+            if j >= 0:
+                subs[j] += matrix.price(i, j)
+                counts[j] += 1
+                cats[j].add(categories[i])
+                n_subs += swapped[i][j]
+        return subs, counts, [frozenset(c) for c in cats], n_subs
+
+    base_sub, base_count, base_cats, base_subs = market_state(base_choice)
+
+    # Sufixos independentes da classe: subtotal/categorias ainda possíveis por mercado
+    # e mercados que os itens por atribuir ainda podem usar
+    rest_at = [[0.0] * (n + 1) for _ in markets]
+    rest_cats = [[frozenset()] * (n + 1) for _ in markets]
+    rest_mask = [0] * (n + 1)
+    for d in range(n - 1, -1, -1):
+        _, category, options = free[d]
+        rest_mask[d] = rest_mask[d + 1]
+        for mi in range(n_markets):
+            rest_at[mi][d] = rest_at[mi][d + 1]
+            rest_cats[mi][d] = rest_cats[mi][d + 1]
+        for price, mi in options:
+            rest_at[mi][d] += price
+            rest_cats[mi][d] = rest_cats[mi][d] | {category}
+            rest_mask[d] |= 1 << mi
+
+    suffixes: dict[int, tuple[list[float], list[int], list[float]]] = {}
+
+    def suffix(mask: int) -> tuple[list[float], list[int], list[float]]:
+        """
+        Só com as opções em `mask`, por profundidade: preço mínimo restante, substituições
+        forçadas restantes (item sem opção da marca certa) e, por item, quanto custa a mais
+        evitar a substituição quando a opção mais barata é uma (0 nos restantes).
+        """
+        if mask not in suffixes:
+            rest_min = [0.0] * (n + 1)
+            forced = [0] * (n + 1)
+            penalty = [0.0] * n
+            for d in range(n - 1, -1, -1):
+                i, _, options = free[d]
+                inside = [(price, swapped[i][mi]) for price, mi in options if mask >> mi & 1]
+                kept = [price for price, swap in inside if not swap]
+                rest_min[d] = rest_min[d + 1] + (inside[0][0] if inside else INF)
+                forced[d] = forced[d + 1] + (not kept and bool(inside))
+                if kept:
+                    penalty[d] = kept[0] - inside[0][0]
+            suffixes[mask] = (rest_min, forced, penalty)
+        return suffixes[mask]
+
+    tops: dict[tuple[int, int], list[float]] = {}
+
+    def savings(mask: int, d: int) -> list[float]:
+        """[q] = soma das q maiores penalizações dos itens por atribuir (prefixos por ordem decrescente)."""
+        key = (mask, d)
+        if key not in tops:
+            ordered = sorted((p for p in suffix(mask)[2][d:] if p > 0), reverse=True)
+            top = [0.0]
+            for p in ordered:
+                top.append(top[-1] + p)
+            tops[key] = top
+        return tops[key]
+
+    params = market_params(markets, market_config, books)
+
+    def lower_bound(d, subs, counts, cats, mask, rest_min) -> float:
+        """Limite do optimize_exact, com os itens por atribuir só nos mercados de `mask`."""
+        bound = rest_min[d]
+        if bound == INF:
+            return INF
+        for mi in range(n_markets):
+            if not counts[mi] and not mask >> mi & 1:
+                continue
+            cost, threshold, min_order, book, balance = params[mi]
+            subtotal = subs[mi]
+            reachable = subtotal + (rest_at[mi][d] if mask >> mi & 1 else 0.0)
+            if reachable < min_order:
+                if counts[mi]:
+                    return INF
+                continue
+            if not counts[mi] and reachable == 0:
+                continue
+            possible_cats = cats[mi] | rest_cats[mi][d]
+            max_coupons = book.max_discount(reachable, possible_cats) if book else 0.0
+            adjustment = -min(reachable, max_coupons + balance)
+            if threshold is None or reachable < threshold:
+                adjustment += cost
+            bound += subtotal + (adjustment if counts[mi] else min(0.0, adjustment))
+        return bound
+
+    def leaf_total(subs, counts, cats) -> float:
+        total = 0.0
+        for mi, market in enumerate(markets):
+            if not counts[mi]:
+                continue
+            if subs[mi] < params[mi][2]:
+                return INF
+            total += market_cost(market, subs[mi], cats[mi], market_config, books)["total"]
+        return total
+
+    # Fronteira: [(total, encomendas, substituições, escolha dos livres)]
+    eps = 1e-9
+    frontier: list[tuple[float, int, int, tuple[int, ...]]] = []
+
+    def dominated(total: float, orders: int, n_subs: int) -> bool:
+        return any(p[0] <= total + eps and p[1] <= orders and p[2] <= n_subs for p in frontier)
+
+    def offer(total: float, orders: int, n_subs: int, choice: tuple[int, ...]) -> None:
+        if total == INF or dominated(total, orders, n_subs):
+            return
+        frontier[:] = [p for p in frontier if not (total <= p[0] and orders <= p[1] and n_subs <= p[2])]
+        frontier.append((total, orders, n_subs, choice))
+
+    def full_choice(choice) -> list[int]:
+        full = list(base_choice)
+        for (i, _, _), mi in zip(free, choice):
+            full[i] = mi
+        return full
+
+    def evaluate(choice: tuple[int, ...]) -> None:
+        subs, counts, cats, n_subs = market_state(full_choice(choice))
+        offer(leaf_total(subs, counts, cats), sum(1 for c in counts if c), n_subs, choice)
+
+    def prunable(d, subs, counts, cats, n_subs) -> bool:
+        """Se todas as continuações do nó são dominadas (ver as classes no topo)."""
+        used = sum(1 << mi for mi in range(n_markets) if counts[mi])
+        orders = bin(used).count("1")
+        if d == n:
+            return dominated(leaf_total(subs, counts, cats), orders, n_subs)
+        classes = []
+        if used:
+            classes.append((used, orders))
+        if rest_mask[d] & ~used:
+            classes.append((all_mask, orders + 1))
+        for mask, min_orders in classes:
+            rest_min, forced, _ = suffix(mask)
+            bound = lower_bound(d, subs, counts, cats, mask, rest_min)
+            if bound == INF:
+                continue
+            # Com q substituições evitáveis: substituições ≥ base + q e custo ≥ bound + as
+            # penalizações dos restantes itens (todas menos as q maiores). Os pontos com
+            # encomendas ≤ min_orders, por substituições, dão o custo a bater para cada q;
+            # entre dois pontos basta o maior q (o de menor limite)
+            base = n_subs + forced[d]
+            top = savings(mask, d)
+            last = len(top) - 1
+            best = INF
+            q = 0
+            for total, p_orders, p_subs, _ in sorted(frontier, key=lambda p: p[2]):
+                if p_orders > min_orders:
+                    continue
+                if p_subs - base > q:
+                    worst = min(p_subs - base, last + 1) - 1
+                    if bound + top[last] - top[worst] < best - eps:
+                        return False
+                    q = p_subs - base
+                    if q > last:
+                        break
+                best = min(best, total)
+            else:
+                if bound < best - eps:
+                    return False
+        return True
+
+    # Incumbentes: greedy com rebalanceamento e, por subconjunto de mercados, o mais
+    # barato lá (com e sem substituições evitáveis); onde faltar, o mais barato de todos
+    greedy, _ = greedy_assignments(items_with_prices, matrix)
+    rebalance_delivery(greedy, market_config, matrix, books)
+    rebalance_coupons(greedy, market_config, matrix, books)
+    greedy_market = {a["row"]: markets.index(m) for m, assigned in greedy.items() for a in assigned}
+    evaluate(tuple(greedy_market[i] for i, _, _ in free))
+    if n_markets <= PARETO_MAX_SEED_MARKETS:
+        subsets = [s for r in range(1, n_markets + 1) for s in combinations(range(n_markets), r)]
+    else:
+        subsets = [(mi,) for mi in range(n_markets)] + [tuple(range(n_markets))]
+    for subset in subsets:
+        for keep_brand in (False, True):
+            choice = []
+            for i, _, options in free:
+                inside = [mi for _, mi in options if mi in subset] or [options[0][1]]
+                if keep_brand:
+                    inside = [mi for mi in inside if not swapped[i][mi]] or inside
+                choice.append(inside[0])
+            evaluate(tuple(choice))
+
+    # DFS com pilha explícita; o caminho é uma lista ligada (mercado, pai)
+    stack = [(0, tuple(base_sub), tuple(base_count), tuple(base_cats), base_subs, None)]
+    nodes = 0
+    timed_out = False
+    while stack:
+        if deadline is not None and nodes % 256 == 0 and time.monotonic() > deadline:
+            timed_out = True
+            break
+        d, subs, counts, cats, n_subs, path = stack.pop()
+        nodes += 1
+        if prunable(d, subs, counts, cats, n_subs):
+            continue
+        if d == n:
+            choice = []
+            while path is not None:
+                choice.append(path[0])
+                path = path[1]
+            choice.reverse()
+            offer(leaf_total(subs, counts, cats), sum(1 for c in counts if c), n_subs, tuple(choice))
+            continue
+        i, category, options = free[d]
+        children = []
+        for price, mi in options:
+            c_subs = subs[:mi] + (subs[mi] + price,) + subs[mi + 1:]
+            c_counts = counts[:mi] + (counts[mi] + 1,) + counts[mi + 1:]
+            c_cats = cats if category in cats[mi] else cats[:mi] + (cats[mi] | {category},) + cats[mi + 1:]
+            c_n_subs = n_subs + swapped[i][mi]
+            if not prunable(d + 1, c_subs, c_counts, c_cats, c_n_subs):
+                children.append((d + 1, c_subs, c_counts, c_cats, c_n_subs, (mi, path)))
+        # o filho mais barato fica no topo da pilha
+        stack.extend(reversed(children))
+
+    points = []
+    for total, orders, n_subs, choice in sorted(frontier, key=lambda p: (p[1], p[0], p[2])):
+        full = full_choice(choice)
+        split = {}
+        for mi, market in enumerate(markets):
+            rows = [i for i, j in enumerate(full) if j == mi]
+            if not rows:
+                continue
+            subtotal = sum(matrix.price(i, mi) for i in rows)
+            cats = {categories[i] for i in rows}
+            split[market] = {
+                "items": [items_with_prices[i]["item"]["name"] for i in rows],
+                "total": round(market_cost(market, subtotal, cats, market_config, books)["total"], 2),
+            }
+        points.append({
+            "total": round(total, 2),
+            "orders": orders,
+            "substitutions": n_subs,
+            "markets": split,
+            "substituted": [items_with_prices[i]["item"]["name"] for i, j in enumerate(full)
+                            if j >= 0 and swapped[i][j]],
+            "label": _label(total, orders, n_subs),
+        })
+    return {
+        "points": points,
+        "complete": not timed_out,
+        "nodes": nodes,
+        "elapsed_s": round(time.monotonic() - started, 3),
+    }
@@ -7,21 +7,45 @@ e depois chama este script para persistir/consultar os dados em cache.
 
 Usage:
   python3 price_cache.py update --market continente --product "leite mimosa" --data '{"price": 1.29, ...}'
+  python3 price_cache.py update-batch [--file updates.ndjson]   (NDJSON em stdin por omissão)
   python3 price_cache.py search --product "leite" [--market continente]
   python3 price_cache.py get --market continente --product "leite mimosa"
   python3 price_cache.py parse-price "2,49 €"
+  python3 price_cache.py parse-price --batch < prices.ndjson
   python3 price_cache.py expired [--market continente]
-  python3 price_cache.py stats
+  python3 price_cache.py stats [--recount]
+  python3 price_cache.py refresh-plan [--limit 50] [--market continente]
+  python3 price_cache.py cheapest --category lacticínios [--unit L] [--limit 10] [--market continente]
+  python3 price_cache.py gc [--dry-run] [--max-entries 5000] [--max-stale-hours 720] [--market continente]
+  python3 price_cache.py history --market continente --product "leite mimosa" [--window 30]
+  python3 price_cache.py compact
+  python3 price_cache.py migrate [--source data/price_cache.json]
+  python3 price_cache.py export [--output data/price_cache.json]
+
+O backend de armazenamento (json | sqlite) é definido em config.CACHE_BACKEND
+ou pela variável de ambiente GROCERY_CACHE_BACKEND.
 """
 
+import heapq
 import json
+import os
 import sys
 import re
+import time
 import argparse
 from pathlib import Path
 from datetime import datetime, timezone
 
-from config import MARKETS, CACHE_TTL_HOURS
+from config import (
+    MARKETS, ONLINE_MARKET_IDS, CACHE_TTL_HOURS, CACHE_BACKEND,
+    CACHE_MAX_ENTRIES_PER_MARKET, CACHE_MAX_STALE_HOURS, CACHE_GC_ON_WRITE,
+)
+from cache_store import (
+    CacheStore, JsonCacheStore, SqliteCacheStore, open_store, iter_entries, entry_timestamp, entry_expiry,
+    time_bucket, store_files, store_lock,
+)
+from trigram_index import TrigramIndex
+import price_history
 
 DATA_DIR = Path(__file__).parent.parent / "data"
 CACHE_FILE = DATA_DIR / "price_cache.json"
@@ -31,17 +55,182 @@ CACHE_FILE = DATA_DIR / "price_cache.json"
 # I/O helpers
 # ---------------------------------------------------------------------------
 
+def get_backend() -> str:
+    return os.environ.get("GROCERY_CACHE_BACKEND") or CACHE_BACKEND
+
+
+def get_store(backend: str | None = None) -> CacheStore:
+    """Abre o backend de cache configurado (usar como context manager)."""
+    return open_store(backend or get_backend(), CACHE_FILE, MARKETS, CACHE_TTL_HOURS)
+
+
+def cache_files() -> list[Path]:
+    """Ficheiros que definem o estado da cache no backend configurado."""
+    return store_files(get_backend(), CACHE_FILE)
+
+
+def _load_data_json(name: str) -> dict:
+    path = DATA_DIR / name
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def history_dir() -> Path:
+    return DATA_DIR / "price_history"
+
+
+def record_history(rows: list[tuple[str, str, dict]]) -> int:
+    """Acrescenta os preços gravados ao histórico; devolve quantas séries mudaram."""
+    now = time.time()
+    return sum(price_history.append_price(history_dir(), m, k, now, e) for m, k, e in rows)
+
+
+def hits_file() -> Path:
+    return DATA_DIR / "price_cache.hits"
+
+
+def lookups_file() -> Path:
+    return DATA_DIR / "price_cache.lookups"
+
+
+def _append_lines(path: Path, rows: list) -> None:
+    """Acrescenta uma linha JSON por elemento de `rows`, numa única write()."""
+    data = "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode()
+    with store_lock(CACHE_FILE, exclusive=False):
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+
+def _iter_lines(path: Path):
+    """Linhas JSON de um ficheiro de hits/consultas, saltando as corrompidas."""
+    if not path.exists():
+        return
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except (json.JSONDecodeError, ValueError):
+                continue
+
+
+def _rewrite_lines(path: Path, rows) -> None:
+    """Substitui o ficheiro por `rows`, uma linha JSON cada (tmp + os.replace)."""
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+
+def record_hits(pairs: list[tuple[str, str]]) -> None:
+    """
+    Regista consultas bem-sucedidas (market, key) para a política de retenção.
+    Uma linha JSON [timestamp, contagem, market, key] por hit, numa única write().
+    """
+    if not pairs:
+        return
+    now = round(time.time(), 3)
+    _append_lines(hits_file(), [[now, 1, m, k] for m, k in pairs])
+
+
+def record_lookups(counts: dict[str, tuple[int, int]]) -> None:
+    """
+    Regista {market: (consultas, encontradas)} para a taxa de acerto de `stats`.
+    Uma linha [timestamp, market, consultas, encontradas] por mercado e execução.
+    """
+    rows = [[round(time.time(), 3), m, n, found] for m, (n, found) in counts.items() if n]
+    if rows:
+        _append_lines(lookups_file(), rows)
+
+
+def load_lookups(since: float = 0.0) -> dict[str, tuple[int, int]]:
+    """{market: (consultas, encontradas)} registadas desde `since` (epoch)."""
+    totals: dict[str, tuple[int, int]] = {}
+    for row in _iter_lines(lookups_file()):
+        try:
+            ts, market, n, found = row
+        except (TypeError, ValueError):
+            continue
+        if ts >= since:
+            prev_n, prev_found = totals.get(market, (0, 0))
+            totals[market] = (prev_n + n, prev_found + found)
+    return totals
+
+
+def compact_lookups(now: float) -> int:
+    """
+    Reescreve price_cache.lookups com uma linha por mercado e hora (a mais recente
+    do balde dá o timestamp), descartando o que já saiu da janela do `stats`.
+    Sob o lock exclusivo, para não perder appends concorrentes. Devolve nº de linhas.
+    """
+    path = lookups_file()
+    if not path.exists():
+        return 0
+    since = now - STATS_WINDOW_DAYS * 86400
+    buckets: dict[tuple[str, int], list] = {}
+    with store_lock(CACHE_FILE, exclusive=True):
+        for row in _iter_lines(path):
+            try:
+                ts, market, n, found = row
+            except (TypeError, ValueError):
+                continue
+            if ts < since:
+                continue
+            slot = buckets.setdefault((market, int(ts // LOOKUPS_BUCKET_SECONDS)), [ts, market, 0, 0])
+            slot[0] = max(slot[0], ts)
+            slot[2] += n
+            slot[3] += found
+        _rewrite_lines(path, sorted(buckets.values(), key=lambda r: (r[0], r[1])))
+    return len(buckets)
+
+
+def load_hits() -> dict[tuple[str, str], tuple[float, int]]:
+    """{(market, key): (último hit, nº de hits)}, agregando as linhas do ficheiro de hits."""
+    hits: dict[tuple[str, str], tuple[float, int]] = {}
+    for row in _iter_lines(hits_file()):
+        try:
+            ts, count, market, key = row
+        except (TypeError, ValueError):
+            continue
+        last, total = hits.get((market, key), (0.0, 0))
+        hits[(market, key)] = (max(last, ts), total + count)
+    return hits
+
+
+def compact_hits(gone: set[tuple[str, str]] = frozenset()) -> int:
+    """
+    Reescreve o ficheiro de hits com uma linha por chave, sem as de `gone` (entradas
+    removidas). Lê e reescreve sob o lock exclusivo, para não perder hits
+    acrescentados entretanto. Devolve nº de linhas.
+    """
+    path = hits_file()
+    if not path.exists():
+        return 0
+    with store_lock(CACHE_FILE, exclusive=True):
+        hits = {k: v for k, v in load_hits().items() if k not in gone}
+        _rewrite_lines(path, ([ts, count, market, key] for (market, key), (ts, count) in hits.items()))
+    return len(hits)
+
+
 def load_cache() -> dict:
-    if CACHE_FILE.exists():
-        with open(CACHE_FILE) as f:
-            return json.load(f)
-    return {m: {} for m in MARKETS}
+    with get_store() as store:
+        return store.load_all()
+
+
+def load_cache_view() -> dict:
+    """Cache só de leitura ({market: Mapping}), sem desserializar o snapshot inteiro."""
+    with get_store() as store:
+        return store.load_view()
 
 
 def save_cache(cache: dict) -> None:
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    with open(CACHE_FILE, "w") as f:
-        json.dump(cache, f, indent=2, ensure_ascii=False)
+    with get_store() as store:
+        store.save_all(cache)
 
 
 # ---------------------------------------------------------------------------
@@ -53,6 +242,9 @@ def normalize_key(name: str) -> str:
     return name.lower().strip()
 
 
+_NON_PRICE_CHARS = re.compile(r"[^\d.]")
+
+
 def parse_price_pt(price_str: str) -> float | None:
     """
     Converte preço em formato PT para float.
@@ -68,15 +260,68 @@ def parse_price_pt(price_str: str) -> float | None:
     elif "," in cleaned:
         cleaned = cleaned.replace(",", ".")
     # Remover qualquer caractere não numérico restante exceto ponto
-    cleaned = re.sub(r"[^\d.]", "", cleaned)
+    cleaned = _NON_PRICE_CHARS.sub("", cleaned)
     try:
         return float(cleaned)
     except ValueError:
         return None
 
 
+# Sufixos de unidade reconhecidos ("0,99/kg", "1,20 €/L", "0,35 €/un")
+PRICE_UNITS = {
+    "kg": "€/kg", "g": "€/g",
+    "l": "€/L", "lt": "€/L", "ml": "€/ml",
+    "un": "€/un", "uni": "€/un", "und": "€/un", "unid": "€/un",
+}
+# Número que pode começar por separador (",99" e ".5", como no parse_price_pt); os
+# pontos depois da vírgula e a vírgula final de "9,€/kg" ficam no número
+_PRICE_RE = re.compile(r"((?=[.,]*\d)[\d.]*(?:,[\d.]*)?)(?:/([A-Za-z]+))?")
+
+
+def _strip_price(text: str) -> str:
+    return text.replace("€", "").replace(" ", "").replace("\xa0", "").replace("\t", "")
+
+
+def parse_price_unit_pt(price_str: str) -> tuple[float | None, str | None]:
+    """
+    Como parse_price_pt, mas devolve também a unidade do sufixo.
+    "0,99/kg" → (0.99, "€/kg") | "2,49 €" → (2.49, None) | "grátis" → (None, None)
+    """
+    m = _PRICE_RE.search(_strip_price(price_str)) if price_str else None
+    if m is None:
+        return None, None
+    num, unit = m.groups()
+    if "," in num:
+        num = num.replace(".", "").replace(",", ".")
+    try:
+        value = float(num)
+    except ValueError:
+        return None, None
+    return value, PRICE_UNITS.get(unit.lower()) if unit else None
+
+
+def iter_parse_prices_pt(strings):
+    """Versão em stream de parse_prices_pt."""
+    return map(parse_price_unit_pt, strings)
+
+
+def parse_prices_pt(strings) -> list[tuple[float | None, str | None]]:
+    """
+    Converte muitas strings de preço PT de uma vez: [(valor, unidade), ...] pela
+    mesma ordem, com parse_price_unit_pt.
+    """
+    return list(map(parse_price_unit_pt, strings))
+
+
 def is_cache_valid(entry: dict) -> bool:
-    """Verifica se uma entrada de cache ainda é válida (<24h)."""
+    """Verifica se uma entrada de cache ainda é válida (<24h).
+
+    Entradas gravadas por `update` trazem `expires_at` (epoch) e são verificadas
+    com uma única comparação; as antigas recorrem ao parsing de cached_at.
+    """
+    expires_at = entry.get("expires_at")
+    if isinstance(expires_at, (int, float)):
+        return time.time() < expires_at
     cached_at = entry.get("cached_at")
     if not cached_at:
         return False
@@ -86,17 +331,27 @@ def is_cache_valid(entry: dict) -> bool:
     return age_hours < CACHE_TTL_HOURS
 
 
-def fuzzy_search(cache: dict, market: str, query: str, limit: int = 5) -> list[dict]:
+def fuzzy_search(
+    cache: dict, market: str, query: str, limit: int = 5, index: TrigramIndex | None = None
+) -> list[dict]:
     """
     Pesquisa produtos no cache por nome (substring match).
     Retorna lista ordenada por relevância.
+
+    Com `index` (TrigramIndex das chaves do mercado, ou por omissão o índice
+    persistente de uma MarketView do backend JSON), só as chaves candidatas são
+    testadas; o resultado é o mesmo do varrimento completo.
     """
     query_lower = query.lower()
     market_cache = cache.get(market, {})
     results = []
+    if index is None:
+        index = getattr(market_cache, "trigrams", None)
 
-    for key, entry in market_cache.items():
+    keys = index.containing(query_lower) if index is not None else market_cache
+    for key in keys:
         if query_lower in key:
+            entry = market_cache[key]
             score = 1.0 if key == query_lower else 0.5 + (len(query_lower) / len(key)) * 0.5
             results.append({**entry, "_key": key, "_score": score, "_market": market})
 
@@ -104,54 +359,419 @@ def fuzzy_search(cache: dict, market: str, query: str, limit: int = 5) -> list[d
     return results[:limit]
 
 
+# ---------------------------------------------------------------------------
+# Retenção (gc)
+# ---------------------------------------------------------------------------
+
+GC_HIT_HALF_LIFE_DAYS = 14  # um hit vale metade ao fim disto
+
+
+def active_product_keys(model: dict) -> list[str]:
+    """Chaves normalizadas dos produtos ativos em consumption_model.json."""
+    return [
+        normalize_key(p["name"]) for p in model.values()
+        if isinstance(p, dict) and p.get("name") and p.get("active", True)
+    ]
+
+
+def protected_keys(market_keys, product_keys: list[str]) -> set[str]:
+    """
+    Chaves do mercado que price_compare.get_cached_price pode devolver para um
+    produto ativo: a chave exata e as que a contêm ou estão nela contidas.
+    """
+    index = TrigramIndex(market_keys)
+    protected = set()
+    for key in product_keys:
+        if key in index:
+            protected.add(key)
+        protected.update(index.containing(key))
+        protected.update(index.contained_in(key))
+    return protected
+
+
+def retention_score(entry: dict, hit: tuple[float, int] | None, now: float) -> float:
+    """
+    LFU com decaimento: (hits + 1) × 0.5^(idade / meia-vida), em que a idade conta
+    desde o último hit ou, se mais recente, desde a gravação da entrada.
+    """
+    last_hit, count = hit or (0.0, 0)
+    last_seen = max(last_hit, entry_timestamp(entry) or 0.0)
+    age_days = max(0.0, now - last_seen) / 86400
+    return (count + 1) * 0.5 ** (age_days / GC_HIT_HALF_LIFE_DAYS)
+
+
+def plan_gc(
+    cache: dict,
+    hits: dict,
+    product_keys: list[str],
+    markets: list[str],
+    now: float,
+    max_entries: int = CACHE_MAX_ENTRIES_PER_MARKET,
+    max_stale_hours: float = CACHE_MAX_STALE_HOURS,
+) -> tuple[list[dict], int]:
+    """
+    Entradas a remover: expiradas há mais de `max_stale_hours` e, se o mercado
+    continuar acima de `max_entries`, as de menor retention_score.
+    Devolve ([{market, key, reason}], nº de entradas protegidas).
+    """
+    evict = []
+    n_protected = 0
+    for market in markets:
+        entries = cache.get(market, {})
+        protected = protected_keys(entries, product_keys)
+        n_protected += len(protected)
+        stale_before = now - max_stale_hours * 3600
+        candidates = []
+        n_stale = 0
+        for key, entry in entries.items():
+            if key in protected:
+                continue
+            if entry_expiry(entry) < stale_before:
+                evict.append({"market": market, "key": key, "reason": "age"})
+                n_stale += 1
+            else:
+                candidates.append((retention_score(entry, hits.get((market, key)), now), key))
+        excess = len(entries) - n_stale - max_entries
+        if excess > 0:
+            for _, key in heapq.nsmallest(excess, candidates):
+                evict.append({"market": market, "key": key, "reason": "size"})
+    return evict, n_protected
+
+
+def run_gc(
+    markets: list[str],
+    max_entries: int = CACHE_MAX_ENTRIES_PER_MARKET,
+    max_stale_hours: float = CACHE_MAX_STALE_HOURS,
+    dry_run: bool = False,
+) -> dict:
+    model = _load_data_json("consumption_model.json")
+    hits = load_hits()
+    now = time.time()
+    with get_store() as store:
+        evict, n_protected = plan_gc(
+            store.load_view(), hits, active_product_keys(model), markets, now, max_entries, max_stale_hours
+        )
+        removed = 0
+        if evict and not dry_run:
+            removed = store.delete_many([(e["market"], e["key"]) for e in evict])
+        counts = store.counts(markets, now)
+
+    if not dry_run:
+        compact_hits({(e["market"], e["key"]) for e in evict} if removed else frozenset())
+        compact_lookups(now)
+    by_reason = {"age": 0, "size": 0}
+    for e in evict:
+        by_reason[e["reason"]] += 1
+    return {
+        "dry_run": dry_run,
+        "evicted": len(evict) if dry_run else removed,
+        "by_reason": by_reason,
+        "protected": n_protected,
+        "remaining": {m: counts[m][0] for m in markets},
+        "entries": evict,
+    }
+
+
+def gc_on_write(store: CacheStore, markets: set[str]) -> dict | None:
+    """Com CACHE_GC_ON_WRITE, corre o gc nos mercados gravados que passaram o limite."""
+    if not CACHE_GC_ON_WRITE:
+        return None
+    counts = store.counts(sorted(markets), time.time())
+    over = [m for m, (total, _) in counts.items() if total > CACHE_MAX_ENTRIES_PER_MARKET]
+    if not over:
+        return None
+    return run_gc(over, CACHE_MAX_ENTRIES_PER_MARKET, CACHE_MAX_STALE_HOURS)
+
+
+# ---------------------------------------------------------------------------
+# Refresh planner
+# ---------------------------------------------------------------------------
+
+REFRESH_PLAN_LIMIT = 50
+REFRESH_HISTORY_DAYS = 90        # janela do shopping_history usada para a frequência
+REFRESH_URGENCY_HORIZON_DAYS = 7  # stock a acabar dentro disto pesa ≥ 50% da urgência
+REFRESH_FREQUENCY_WEIGHT = 0.5    # peso da frequência vs urgência (1 - peso)
+
+
+def _history_frequencies(history: dict, model: dict, now: datetime, days: int) -> dict[str, float]:
+    """Compras por semana de cada produto (chave normalizada) no shopping_history."""
+    cutoff = now.timestamp() - days * 86400
+    counts: dict[str, int] = {}
+    for purchase in history.get("purchases", []):
+        try:
+            ts = datetime.fromisoformat(purchase.get("date", "")).timestamp()
+        except (TypeError, ValueError):
+            continue
+        if ts < cutoff:
+            continue
+        seen = set()
+        for item in purchase.get("items", []):
+            model_entry = model.get(item.get("id"))
+            name = model_entry["name"] if isinstance(model_entry, dict) else item.get("name")
+            if name:
+                seen.add(normalize_key(name))
+        for key in seen:
+            counts[key] = counts.get(key, 0) + 1
+    return {key: n / (days / 7) for key, n in counts.items()}
+
+
+def refresh_candidates(model: dict, history: dict, shopping_list: list, now: datetime) -> dict[str, dict]:
+    """
+    Produtos que entram no próximo price_compare, por chave normalizada:
+    {key: {"name", "per_week", "days_left"}}. Fontes: consumption_model (ativos e
+    não presenciais), shopping_history e a shopping_list atual (days_left = 0).
+    """
+    candidates: dict[str, dict] = {}
+
+    def merge(name: str, per_week: float, days_left: float | None) -> None:
+        key = normalize_key(name)
+        current = candidates.setdefault(key, {"name": name, "per_week": 0.0, "days_left": None})
+        current["per_week"] = max(current["per_week"], per_week)
+        if days_left is not None and (current["days_left"] is None or days_left < current["days_left"]):
+            current["days_left"] = days_left
+
+    physical = set()
+    for entry in model.values():
+        if not isinstance(entry, dict) or not entry.get("name"):
+            continue  # ex: "_comment"
+        store = entry.get("preferred_store")
+        if not entry.get("active", True) or (store and store not in ONLINE_MARKET_IDS):
+            physical.add(normalize_key(entry["name"]))
+            continue
+        interval = entry.get("avg_purchase_interval_days") or 0
+        merge(entry["name"], 7 / interval if interval > 0 else 0.0, entry.get("estimated_stock_remaining_days"))
+
+    for key, per_week in _history_frequencies(history, model, now, REFRESH_HISTORY_DAYS).items():
+        if key not in physical:
+            merge(candidates[key]["name"] if key in candidates else key, per_week, None)
+
+    for item in shopping_list:
+        if item.get("name"):
+            merge(item["name"], 0.0, 0)
+    return candidates
+
+
+def plan_refresh(
+    cache: dict,
+    candidates: dict[str, dict],
+    markets: list[str],
+    limit: int = REFRESH_PLAN_LIMIT,
+    lookup=None,
+) -> list[dict]:
+    """
+    Ordena os pares (mercado, produto) por
+        score = staleness × procura,  procura = w · frequência + (1 - w) · urgência
+    e devolve os `limit` primeiros, por score decrescente.
+
+    - staleness: 1 se o price_compare não encontraria preço válido (em falta ou
+      expirado), senão idade / TTL da entrada que encontraria
+    - frequência: compras/semana, normalizada pelo máximo dos candidatos
+    - urgência: H / (H + dias até acabar), 0 se desconhecido
+
+    `lookup(cache, market, key)` é o lookup do price_compare (exato e depois
+    substring), para que a staleness reflita o que a comparação vai usar. Como
+    staleness ≤ 1, o score nunca excede a procura: os candidatos são percorridos
+    por procura decrescente (heap) e o ciclo pára assim que a procura já não
+    chega ao pior score do top-k — só esses pares chegam a ser procurados na cache.
+    """
+    now = time.time()
+    max_per_week = max((c["per_week"] for c in candidates.values()), default=0.0) or 1.0
+    horizon = REFRESH_URGENCY_HORIZON_DAYS
+    w = REFRESH_FREQUENCY_WEIGHT
+
+    by_demand = []
+    for order, (key, c) in enumerate(candidates.items()):
+        days_left = c["days_left"]
+        urgency = horizon / (horizon + max(0.0, days_left)) if days_left is not None else 0.0
+        demand = w * (c["per_week"] / max_per_week) + (1 - w) * urgency
+        if demand > 0:
+            by_demand.append((-demand, order, key))
+    heapq.heapify(by_demand)
+
+    top: list[tuple] = []  # min-heap (score, -seq, row) com os melhores `limit`
+    seq = 0
+    while by_demand and limit > 0:
+        neg_demand, _, key = heapq.heappop(by_demand)
+        demand = -neg_demand
+        if len(top) == limit and demand <= top[0][0]:
+            break
+        c = candidates[key]
+        for market in markets:
+            entry = lookup(cache, market, key) if lookup else None
+            if entry is None:
+                stale = cache.get(market, {}).get(key)
+                status, staleness = ("expired" if stale else "missing"), 1.0
+                cached_at = stale.get("cached_at") if stale else None
+            else:
+                ts = entry_timestamp(entry)
+                age_hours = (now - ts) / 3600 if ts is not None else CACHE_TTL_HOURS
+                status, staleness = "valid", min(1.0, max(0.0, age_hours / CACHE_TTL_HOURS))
+                cached_at = entry.get("cached_at")
+            score = staleness * demand
+            if score <= 0:
+                continue
+            row = {
+                "market": market,
+                "product": c["name"],
+                "key": key,
+                "score": round(score, 4),
+                "status": status,
+                "staleness": round(staleness, 3),
+                "per_week": round(c["per_week"], 2),
+                "days_left": c["days_left"],
+                "cached_at": cached_at,
+            }
+            item = (score, -seq, row)  # -seq: em empate fica o primeiro visto
+            seq += 1
+            if len(top) < limit:
+                heapq.heappush(top, item)
+            elif item > top[0]:
+                heapq.heapreplace(top, item)
+
+    return [row for _, _, row in sorted(top, reverse=True)]
+
+
 # ---------------------------------------------------------------------------
 # Commands
 # ---------------------------------------------------------------------------
 
-def cmd_update(args) -> dict:
-    """Adiciona ou atualiza entrada de preço no cache."""
-    cache = load_cache()
-    market = args.market.lower()
+def build_entry(market: str, product: str, data, field: str = "--data") -> tuple[str, str, dict]:
+    """
+    Valida um update e constrói a entrada de cache.
+    `data` pode ser um dict ou uma string JSON. Levanta ValueError com a mensagem de erro.
+    Retorna (market, key, entry).
+    """
+    market = (market or "").lower()
     if market not in MARKETS:
-        return {"error": f"Mercado desconhecido: {market}. Use: {MARKETS}"}
+        raise ValueError(f"Mercado desconhecido: {market}. Use: {MARKETS}")
+    if not product or not isinstance(product, str):
+        raise ValueError("Nome de produto em falta")
 
-    try:
-        data = json.loads(args.data)
-    except json.JSONDecodeError as e:
-        return {"error": f"JSON inválido em --data: {e}"}
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON inválido em {field}: {e}") from e
 
     if not isinstance(data, dict):
-        return {"error": f"--data deve ser um objeto JSON, recebido: {type(data).__name__}"}
-
-    key = normalize_key(args.product)
-    now = datetime.now(timezone.utc).isoformat()
+        raise ValueError(f"{field} deve ser um objeto JSON, recebido: {type(data).__name__}")
 
+    now = datetime.now(timezone.utc)
     entry = {
-        "name": args.product,
+        "name": product,
         "price": data.get("price"),
         "price_per_unit": data.get("price_per_unit"),
         "unit": data.get("unit", "un"),
+        "pack_size": data.get("pack_size"),
         "brand": data.get("brand"),
         "promo": data.get("promo"),
         "promo_effective_price": data.get("promo_effective_price"),
         "available": data.get("available", True),
         "product_url": data.get("product_url"),
-        "cached_at": now,
+        "category": data.get("category"),
+        "cached_at": now.isoformat(),
+        "expires_at": now.timestamp() + CACHE_TTL_HOURS * 3600,
     }
+    return market, normalize_key(product), entry
 
-    if market not in cache:
-        cache[market] = {}
-    cache[market][key] = entry
-    save_cache(cache)
-    return {"updated": key, "market": market, "price": entry["price"]}
+
+def fill_categories(rows: list[tuple[str, str, dict]]) -> None:
+    """Completa `category` das entradas sem categoria com a do produto em consumption_model.json."""
+    missing = [entry for _, _, entry in rows if not entry.get("category")]
+    if not missing:
+        return
+    categories = {
+        normalize_key(p["name"]): p["category"]
+        for p in _load_data_json("consumption_model.json").values()
+        if isinstance(p, dict) and p.get("name") and p.get("category")
+    }
+    for _, key, entry in rows:
+        if not entry.get("category") and key in categories:
+            entry["category"] = categories[key]
+
+
+def write_entries(rows: list[tuple[str, str, dict]]) -> dict | None:
+    """
+    Grava entradas já validadas por build_entry numa única escrita: completa a
+    categoria, corre o gc (se ativo) e acrescenta o histórico. Devolve o resultado do gc.
+    """
+    fill_categories(rows)
+    with get_store() as store:
+        store.put_many(rows)
+        gc = gc_on_write(store, {m for m, _, _ in rows})
+    record_history(rows)
+    return gc
+
+
+def cmd_update(args) -> dict:
+    """Adiciona ou atualiza entrada de preço no cache."""
+    try:
+        market, key, entry = build_entry(args.market, args.product, args.data)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    gc = write_entries([(market, key, entry)])
+    result = {"updated": key, "market": market, "price": entry["price"]}
+    if gc:
+        result["gc_evicted"] = gc["evicted"]
+    return result
+
+
+def cmd_update_batch(args) -> dict:
+    """
+    Aplica vários updates numa única escrita.
+
+    Lê NDJSON (um objeto por linha: {"market", "product", "data"}) de --file ou stdin.
+    Cada registo é validado com as mesmas regras de `update`; registos inválidos
+    são reportados e ignorados, os restantes são gravados de uma só vez.
+    """
+    if args.file and args.file != "-":
+        path = Path(args.file)
+        if not path.exists():
+            return {"error": f"Ficheiro não encontrado: {path}"}
+        lines = path.read_text().splitlines()
+    else:
+        lines = sys.stdin.read().splitlines()
+
+    results = []
+    rows = []
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError(f"Registo deve ser um objeto JSON, recebido: {type(record).__name__}")
+            market, key, entry = build_entry(
+                record.get("market"), record.get("product"), record.get("data"), field="data"
+            )
+        except json.JSONDecodeError as e:
+            results.append({"line": line_no, "error": f"JSON inválido: {e}"})
+            continue
+        except ValueError as e:
+            results.append({"line": line_no, "error": str(e)})
+            continue
+        rows.append((market, key, entry))
+        results.append({"line": line_no, "updated": key, "market": market, "price": entry["price"]})
+
+    gc = write_entries(rows) if rows else None
+
+    result = {
+        "applied": len(rows),
+        "errors": sum(1 for r in results if "error" in r),
+        "results": results,
+    }
+    if gc:
+        result["gc_evicted"] = gc["evicted"]
+    return result
 
 
 def cmd_get(args) -> dict:
     """Obtém entrada de cache para um produto/mercado específico."""
-    cache = load_cache()
     market = args.market.lower()
     key = normalize_key(args.product)
-    entry = cache.get(market, {}).get(key)
+    with get_store() as store:
+        entry = store.get(market, key)
     if not entry:
         return {"found": False, "key": key, "market": market}
     return {
@@ -164,51 +784,265 @@ def cmd_get(args) -> dict:
 
 def cmd_search(args) -> list:
     """Pesquisa produtos no cache."""
-    cache = load_cache()
     markets_to_search = [args.market.lower()] if args.market else MARKETS
     results = []
-    for market in markets_to_search:
-        if market not in MARKETS:
-            continue
-        results.extend(fuzzy_search(cache, market, args.product))
+    with get_store() as store:
+        for market in markets_to_search:
+            if market not in MARKETS:
+                continue
+            cache = {market: store.search_entries(market, args.product.lower())}
+            results.extend(fuzzy_search(cache, market, args.product))
+    record_hits([(r["_market"], r["_key"]) for r in results])
+    found = {r["_market"] for r in results}
+    record_lookups({m: (1, int(m in found)) for m in markets_to_search if m in MARKETS})
     return results
 
 
 def cmd_parse_price(args) -> dict:
-    """Converte string de preço PT para float."""
-    value = parse_price_pt(args.price_str)
-    return {"input": args.price_str, "value": value}
+    """Converte string de preço PT para float (ou várias, com --batch)."""
+    if args.batch:
+        return cmd_parse_price_batch(args)
+    if args.price_str is None:
+        return {"error": "Indicar o preço a converter ou usar --batch"}
+    value, unit = parse_price_unit_pt(args.price_str)
+    return {"input": args.price_str, "value": value, "unit": unit}
+
+
+def cmd_parse_price_batch(args) -> dict:
+    """
+    Lê NDJSON de stdin — uma string JSON por linha, ou {"price_str": "..."} — e
+    converte tudo com parse_prices_pt.
+    """
+    inputs, lines, results = [], [], []
+    for line_no, line in enumerate(sys.stdin, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            results.append({"line": line_no, "error": f"JSON inválido: {e}"})
+            continue
+        if isinstance(record, dict):
+            record = record.get("price_str")
+        if not isinstance(record, str):
+            results.append({"line": line_no, "error": "Esperada uma string ou {\"price_str\": ...}"})
+            continue
+        inputs.append(record)
+        lines.append(line_no)
+
+    for line_no, price_str, (value, unit) in zip(lines, inputs, parse_prices_pt(inputs)):
+        results.append({"line": line_no, "input": price_str, "value": value, "unit": unit})
+    results.sort(key=lambda r: r["line"])
+    parsed = sum(1 for r in results if r.get("value") is not None)
+    return {"count": len(results), "parsed": parsed, "failed": len(results) - parsed, "results": results}
 
 
 def cmd_expired(args) -> dict:
     """Lista produtos com cache expirado."""
-    cache = load_cache()
     markets_to_check = [args.market.lower()] if args.market else MARKETS
-    expired = []
-    for market in markets_to_check:
-        for key, entry in cache.get(market, {}).items():
-            if not is_cache_valid(entry):
-                expired.append({"market": market, "product": key, "cached_at": entry.get("cached_at")})
+    with get_store() as store:
+        rows = store.expired(markets_to_check, time.time())
+    expired = [{"market": m, "product": k, "cached_at": cached_at} for m, k, cached_at in rows]
     return {"expired_count": len(expired), "expired": expired}
 
 
+STATS_WINDOW_DAYS = 7  # janela da taxa de acerto
+LOOKUPS_BUCKET_SECONDS = 3600  # o gc compacta price_cache.lookups numa linha por mercado e hora
+STATS_AGE_BUCKETS = [(1, "<1h"), (6, "1-6h"), (24, "6-24h"), (168, "1-7d")]
+
+
+def age_distribution(cached: dict[int, int], now: float) -> dict[str, int]:
+    """Entradas por idade (horas completas desde cached_at) a partir do histograma de cached_at."""
+    now_bucket = time_bucket(now)
+    dist = dict.fromkeys([label for _, label in STATS_AGE_BUCKETS] + [">7d", "sem data"], 0)
+    for bucket, n in cached.items():
+        if bucket < 0:
+            dist["sem data"] += n
+            continue
+        age = now_bucket - bucket
+        dist[next((label for limit, label in STATS_AGE_BUCKETS if age < limit), ">7d")] += n
+    return dist
+
+
+def _rate(part: int, whole: int) -> float | None:
+    return round(part / whole, 3) if whole else None
+
+
 def cmd_stats(args) -> dict:
-    """Estatísticas do cache."""
-    cache = load_cache()
+    """
+    Estatísticas do cache a partir dos contadores que o backend mantém em cada escrita
+    (sem varrer entradas). Com --recount, confirma-os por varrimento completo e
+    reconstrói-os se divergirem.
+
+    `write_rate_per_hour` conta as entradas gravadas nas últimas 24h (uma chave
+    regravada conta uma vez); `hit_rate` vem das consultas do price_compare e do
+    search nos últimos STATS_WINDOW_DAYS dias (price_cache.lookups, que o gc compacta).
+    """
+    now = time.time()
+    recount = None
+    with get_store() as store:
+        hist = store.histogram(MARKETS, now)
+        if getattr(args, "recount", False):
+            scanned = store.recount(MARKETS, now)
+            mismatched = [m for m in MARKETS if scanned[m] != hist[m]]
+            if mismatched:
+                store.rebuild_counters()
+                hist = scanned
+            recount = {"ok": not mismatched, "mismatched": mismatched}
+    lookups = load_lookups(now - STATS_WINDOW_DAYS * 86400)
+
     stats = {}
-    total_valid = 0
-    total_expired = 0
+    totals = {"valid": 0, "expired": 0, "updated": 0, "lookups": 0, "found": 0}
     for market in MARKETS:
-        entries = cache.get(market, {})
-        valid = sum(1 for e in entries.values() if is_cache_valid(e))
-        expired = len(entries) - valid
-        total_valid += valid
-        total_expired += expired
-        stats[market] = {"total": len(entries), "valid": valid, "expired": expired}
-    stats["total"] = {"valid": total_valid, "expired": total_expired}
+        h = hist[market]
+        age = age_distribution(h["cached"], now)
+        updated = age["<1h"] + age["1-6h"] + age["6-24h"]
+        n_lookups, found = lookups.get(market, (0, 0))
+        stats[market] = {
+            "total": h["total"],
+            "valid": h["total"] - h["expired"],
+            "expired": h["expired"],
+            "age": age,
+            "write_rate_per_hour": round(updated / 24, 2),
+            "hit_rate": _rate(found, n_lookups),
+            "lookups": n_lookups,
+        }
+        for key, value in (("valid", stats[market]["valid"]), ("expired", h["expired"]), ("updated", updated),
+                           ("lookups", n_lookups), ("found", found)):
+            totals[key] += value
+    stats["total"] = {
+        "valid": totals["valid"],
+        "expired": totals["expired"],
+        "write_rate_per_hour": round(totals["updated"] / 24, 2),
+        "hit_rate": _rate(totals["found"], totals["lookups"]),
+        "lookups": totals["lookups"],
+    }
+    if recount is not None:
+        stats["recount"] = recount
     return stats
 
 
+def cmd_refresh_plan(args) -> dict:
+    """Fila limitada e sem duplicados de (mercado, produto) a atualizar no próximo refresh."""
+    # import tardio: price_compare importa este módulo
+    from price_compare import get_cached_price
+
+    now = datetime.now(timezone.utc)
+    model = _load_data_json("consumption_model.json")
+    history = _load_data_json("shopping_history.json")
+    inventory = _load_data_json("inventory.json")
+    candidates = refresh_candidates(model, history, inventory.get("shopping_list", []), now)
+
+    markets = [args.market.lower()] if args.market else MARKETS
+    limit = args.limit if args.limit is not None else REFRESH_PLAN_LIMIT
+    queue = plan_refresh(load_cache_view(), candidates, markets, limit, get_cached_price)
+    compact_hits()
+    return {
+        "generated_at": now.isoformat(),
+        "candidates": len(candidates) * len(markets),
+        "limit": limit,
+        "queue": queue,
+    }
+
+
+CHEAPEST_LIMIT = 10
+UNIT_LABELS = {"kg": "€/kg", "L": "€/L", "un": "€/un"}
+
+
+def cmd_cheapest(args) -> dict:
+    """Produtos com menor preço efetivo por kg/L/un de uma categoria, em todos os mercados."""
+    category = (args.category or "").lower().strip()
+    if not category:
+        return {"error": "Indicar a categoria (--category)"}
+    limit = args.limit if args.limit is not None else CHEAPEST_LIMIT
+    markets = [args.market.lower()] if args.market else MARKETS
+    units = [args.unit] if args.unit else list(UNIT_LABELS)
+
+    now = time.time()
+    results = {}
+    with get_store() as store:
+        for unit in units:
+            rows = []
+            for unit_price, market, key in store.cheapest(category, unit, markets, now, limit):
+                entry = store.get(market, key) or {}
+                rows.append({
+                    "market": market,
+                    "product": key,
+                    "unit_price": unit_price,
+                    "name": entry.get("name"),
+                    "brand": entry.get("brand"),
+                    "price": entry.get("price"),
+                    "promo_effective_price": entry.get("promo_effective_price"),
+                })
+            if rows:
+                results[UNIT_LABELS[unit]] = rows
+    return {"category": category, "limit": limit, "results": results}
+
+
+def cmd_gc(args) -> dict:
+    """Aplica a política de retenção (idade + limite por mercado), protegendo produtos ativos."""
+    markets = [args.market.lower()] if args.market else MARKETS
+    max_entries = args.max_entries if args.max_entries is not None else CACHE_MAX_ENTRIES_PER_MARKET
+    max_stale = args.max_stale_hours if args.max_stale_hours is not None else CACHE_MAX_STALE_HOURS
+    if max_entries < 0 or max_stale < 0:
+        return {"error": "--max-entries e --max-stale-hours não podem ser negativos"}
+    return run_gc(markets, max_entries, max_stale, dry_run=bool(args.dry_run))
+
+
+def cmd_history(args) -> dict:
+    """Mínimo, máximo e média (ponderada no tempo) dos preços observados de um produto."""
+    if args.window is not None and args.window < 0:
+        return {"error": "--window não pode ser negativo"}
+    market = args.market.lower()
+    key = normalize_key(args.product)
+    series = price_history.load_series(history_dir(), market, key)
+    if series is None:
+        return {"found": False, "key": key, "market": market}
+    return {
+        "found": True,
+        "key": key,
+        "market": market,
+        "window_days": args.window,
+        **series.stats(args.window),
+    }
+
+
+def cmd_compact(args) -> dict:
+    """Funde o log de escritas no snapshot (backend json) ou faz checkpoint (sqlite)."""
+    with get_store() as store:
+        result = store.compact()
+    return {"backend": get_backend(), **result}
+
+
+def cmd_migrate(args) -> dict:
+    """Importa o ficheiro JSON para o backend SQLite (substitui o conteúdo da base de dados)."""
+    source = Path(args.source) if args.source else CACHE_FILE
+    if not source.exists():
+        return {"error": f"Ficheiro não encontrado: {source}"}
+    cache = JsonCacheStore(source, MARKETS, CACHE_TTL_HOURS).load_all()
+    with SqliteCacheStore(CACHE_FILE.with_suffix(".db"), MARKETS, CACHE_TTL_HOURS) as store:
+        store.save_all(cache)
+        counts = store.counts(MARKETS, time.time())
+    return {
+        "migrated": sum(1 for _ in iter_entries(cache)),
+        "source": str(source),
+        "db": str(CACHE_FILE.with_suffix(".db")),
+        "markets": {m: total for m, (total, _) in counts.items()},
+    }
+
+
+def cmd_export(args) -> dict:
+    """Exporta o backend SQLite para JSON (formato de intercâmbio)."""
+    db = CACHE_FILE.with_suffix(".db")
+    if not db.exists():
+        return {"error": f"Base de dados não encontrada: {db}. Correr 'migrate' primeiro."}
+    output = Path(args.output) if args.output else CACHE_FILE
+    with SqliteCacheStore(db, MARKETS, CACHE_TTL_HOURS) as store:
+        cache = store.load_all()
+    JsonCacheStore(output, MARKETS, CACHE_TTL_HOURS).save_all(cache)
+    return {"exported": sum(1 for _ in iter_entries(cache)), "output": str(output)}
+
+
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
@@ -221,7 +1055,11 @@ def main():
     p_update = sub.add_parser("update", help="Adicionar/atualizar preço no cache")
     p_update.add_argument("--market", required=True, choices=MARKETS)
     p_update.add_argument("--product", required=True)
-    p_update.add_argument("--data", required=True, help='JSON com campos: price, unit, brand, promo, available, ...')
+    p_update.add_argument("--data", required=True, help='JSON com campos: price, unit, pack_size, brand, promo, available, ...')
+
+    # update-batch
+    p_batch = sub.add_parser("update-batch", help="Aplicar vários updates (NDJSON) numa única escrita")
+    p_batch.add_argument("--file", default=None, help='NDJSON com {"market", "product", "data"} por linha (default: stdin)')
 
     # get
     p_get = sub.add_parser("get", help="Obter preço de um produto")
@@ -235,19 +1073,60 @@ def main():
 
     # parse-price
     p_parse = sub.add_parser("parse-price", help="Converter preço PT para float")
-    p_parse.add_argument("price_str")
+    p_parse.add_argument("price_str", nargs="?", default=None)
+    p_parse.add_argument("--batch", action="store_true", help="Ler NDJSON de stdin (uma string por linha)")
 
     # expired
     p_expired = sub.add_parser("expired", help="Listar entradas expiradas")
     p_expired.add_argument("--market", choices=MARKETS, default=None)
 
     # stats
-    sub.add_parser("stats", help="Estatísticas do cache")
+    p_stats = sub.add_parser("stats", help="Estatísticas do cache")
+    p_stats.add_argument("--recount", action="store_true",
+                         help="Confirmar os contadores por varrimento completo (e reconstruí-los se divergirem)")
+
+    # refresh-plan
+    p_plan = sub.add_parser("refresh-plan", help="Fila de produtos a atualizar no próximo refresh")
+    p_plan.add_argument("--limit", type=int, default=None, help=f"Máximo de pares (default: {REFRESH_PLAN_LIMIT})")
+    p_plan.add_argument("--market", choices=MARKETS, default=None)
+
+    # cheapest
+    p_cheapest = sub.add_parser("cheapest", help="Produtos mais baratos por kg/L/un numa categoria")
+    p_cheapest.add_argument("--category", required=True)
+    p_cheapest.add_argument("--unit", choices=list(UNIT_LABELS), default=None, help="Só esta unidade base (default: todas)")
+    p_cheapest.add_argument("--limit", type=int, default=None, help=f"Produtos por unidade (default: {CHEAPEST_LIMIT})")
+    p_cheapest.add_argument("--market", choices=MARKETS, default=None)
+
+    # gc
+    p_gc = sub.add_parser("gc", help="Remover entradas antigas/pouco usadas (retenção)")
+    p_gc.add_argument("--dry-run", action="store_true", help="Só listar o que seria removido")
+    p_gc.add_argument("--max-entries", type=int, default=None, help=f"Máximo por mercado (default: {CACHE_MAX_ENTRIES_PER_MARKET})")
+    p_gc.add_argument("--max-stale-hours", type=float, default=None, help=f"Horas após expirar (default: {CACHE_MAX_STALE_HOURS})")
+    p_gc.add_argument("--market", choices=MARKETS, default=None)
+
+    # history
+    p_history = sub.add_parser("history", help="Histórico de preços de um produto (min/max/média)")
+    p_history.add_argument("--market", required=True, choices=MARKETS)
+    p_history.add_argument("--product", required=True)
+    p_history.add_argument("--window", type=float, default=None, help="Janela em dias (default: histórico completo)")
+
+    # compact
+    sub.add_parser("compact", help="Fundir o log de escritas num novo snapshot")
+
+    # migrate
+    p_migrate = sub.add_parser("migrate", help="Importar price_cache.json para SQLite")
+    p_migrate.add_argument("--source", default=None, help="Ficheiro JSON de origem (default: data/price_cache.json)")
+
+    # export
+    p_export = sub.add_parser("export", help="Exportar cache SQLite para JSON")
+    p_export.add_argument("--output", default=None, help="Ficheiro JSON de destino (default: data/price_cache.json)")
 
     args = parser.parse_args()
 
     if args.command == "update":
         result = cmd_update(args)
+    elif args.command == "update-batch":
+        result = cmd_update_batch(args)
     elif args.command == "get":
         result = cmd_get(args)
     elif args.command == "search":
@@ -258,6 +1137,20 @@ def main():
         result = cmd_expired(args)
     elif args.command == "stats":
         result = cmd_stats(args)
+    elif args.command == "refresh-plan":
+        result = cmd_refresh_plan(args)
+    elif args.command == "cheapest":
+        result = cmd_cheapest(args)
+    elif args.command == "gc":
+        result = cmd_gc(args)
+    elif args.command == "history":
+        result = cmd_history(args)
+    elif args.command == "compact":
+        result = cmd_compact(args)
+    elif args.command == "migrate":
+        result = cmd_migrate(args)
+    elif args.command == "export":
+        result = cmd_export(args)
     else:
         parser.print_help()
         sys.exit(1)
@@ -5,25 +5,46 @@ Recebe lista de compras, consulta preços em cache, e retorna
 a distribuição ótima que minimiza custo total (incluindo entrega, cupões e saldo).
 
 Usage:
-  python3 price_compare.py [--output comparison.json]
+  python3 price_compare.py [--output comparison.json] [--exact [--time-budget 2]] [--no-pareto]
+                           [--brand-penalty 10 | --no-substitution]
+  python3 price_compare.py --scenarios scenarios.ndjson [--jobs 4] [--output results.ndjson]
 
-Lê: data/inventory.json (shopping_list), data/price_cache.json, data/family_preferences.json
+Lê: data/inventory.json (shopping_list), data/price_cache.json, data/family_preferences.json,
+    data/consumption_model.json (marcas aceitáveis)
 Escreve: resultado da comparação (stdout JSON ou ficheiro)
 """
 
 import json
 import sys
 import argparse
+import time
+from bisect import bisect_right
+from collections.abc import Callable
+from functools import partial
+from itertools import compress, repeat
+from operator import eq
 from pathlib import Path
 from datetime import datetime, timezone
 
-from config import MARKETS, ONLINE_MARKET_IDS, DELIVERY_CONFIG, CACHE_TTL_HOURS
+from config import MARKETS, DELIVERY_CONFIG
+from price_cache import load_cache_view, is_cache_valid, record_hits, record_lookups, cache_files, get_store
+from cache_store import entry_expiry
+from price_matrix import PriceMatrix, effective_price  # noqa: F401 — effective_price reexportado
+from promotions import LinePricer
+from coupons import CouponBook
+from result_cache import ResultCache, fingerprint, source_signature
+from substitutions import BRAND_PENALTY_PCT, brand_sources, substitute_brands
+from trigram_index import TrigramIndex
 
 DATA_DIR = Path(__file__).parent.parent / "data"
 
 # Parâmetros de algoritmo (não dependem do mercado — permanecem aqui)
 SIMPLICITY_THRESHOLD = 5.0   # Se diff < €5, preferir 1 mercado
 DELIVERY_GAP_THRESHOLD = 5.0  # Tentar rebalancear se faltam <€5 para entrega grátis
+# Pré-filtrar a cache no PriceIndex custa o mesmo que ~200 itens resolvidos um a
+# um sobre o snapshot mmap (ver benchmarks/bench_price_index.py); abaixo disto não compensa.
+PRICE_INDEX_MIN_ITEMS = 200
+EXACT_TIME_BUDGET_SECONDS = 2.0  # Orçamento de tempo do modo --exact (branch-and-bound)
 
 
 # ---------------------------------------------------------------------------
@@ -44,42 +65,168 @@ def load_shopping_list() -> list:
 
 
 def load_price_cache() -> dict:
-    cache = load_json(DATA_DIR / "price_cache.json", {m: {} for m in MARKETS})
-    return cache
+    """Lê a cache através do backend configurado em price_cache (json ou sqlite).
+
+    No backend JSON as entradas vêm do snapshot binário por mmap: só as chaves
+    efetivamente consultadas são desserializadas.
+    """
+    return load_cache_view()
 
 
 def load_preferences() -> dict:
     return load_json(DATA_DIR / "family_preferences.json", {})
 
 
+def load_brand_sources(prefs: dict) -> dict:
+    """Marcas preferidas/aceitáveis por produto (consumption_model.json + brand_preferences)."""
+    return brand_sources(load_json(DATA_DIR / "consumption_model.json", {}), prefs)
+
+
 # ---------------------------------------------------------------------------
 # Cache lookup
 # ---------------------------------------------------------------------------
 
-def is_cache_valid(entry: dict) -> bool:
-    cached_at = entry.get("cached_at")
-    if not cached_at:
-        return False
-    age_hours = (
-        datetime.now(timezone.utc) - datetime.fromisoformat(cached_at)
-    ).total_seconds() / 3600
-    return age_hours < CACHE_TTL_HOURS
+def get_cached_price(
+    cache: dict, market: str, product_name: str, index: TrigramIndex | None = None, hits: list | None = None
+) -> dict | None:
+    """Retorna entrada de cache válida ou None.
 
-
-def get_cached_price(cache: dict, market: str, product_name: str) -> dict | None:
-    """Retorna entrada de cache válida ou None."""
+    `index` (TrigramIndex das chaves do mercado; por omissão o índice persistente de
+    uma MarketView do backend JSON) restringe o fallback por substring às chaves
+    candidatas, percorridas pela mesma ordem do dict — o match devolvido é o mesmo
+    do varrimento completo. Com `hits`, acrescenta-lhe o (market, key) encontrado
+    (para a política de retenção da cache).
+    """
     key = product_name.lower().strip()
-    entry = cache.get(market, {}).get(key)
+    market_cache = cache.get(market, {})
+    if index is None:
+        index = getattr(market_cache, "trigrams", None)
+    entry = market_cache.get(key)
     if entry and is_cache_valid(entry):
+        if hits is not None:
+            hits.append((market, key))
         return entry
     # Tentativa de match parcial (substring)
-    for k, v in cache.get(market, {}).items():
+    if index is None:
+        candidates = market_cache
+    else:
+        candidates = sorted(
+            set(index.containing(key)) | set(index.contained_in(key)),
+            key=index.position,
+        )
+    for k in candidates:
         if key in k or k in key:
+            v = market_cache[k]
             if is_cache_valid(v):
+                if hits is not None:
+                    hits.append((market, k))
                 return v
     return None
 
 
+def build_market_indexes(cache: dict) -> dict[str, TrigramIndex]:
+    """Um TrigramIndex por mercado, construído uma vez por execução."""
+    return {market: TrigramIndex(cache.get(market, {})) for market in MARKETS}
+
+
+class PriceIndex:
+    """Tabela de preços de uma execução: resolve a lista de compras inteira de uma vez.
+
+    Com `prefilter`, as entradas válidas de cada mercado são filtradas uma só vez
+    (is_cache_valid por entrada, não por consulta) e as suas chaves, pela ordem da
+    cache, são concatenadas num único texto separado por "\\0". O fallback por
+    substring passa a ser:
+      - "nome in chave": um str.find no texto — a primeira ocorrência está na
+        primeira chave (pela ordem da cache) que contém o nome;
+      - "chave in nome": as substrings do nome procuradas no dict das válidas;
+    e o match é o de menor posição entre os dois. Sem `prefilter` — listas curtas,
+    em que filtrar a cache inteira custa mais do que as consultas — cada consulta
+    segue get_cached_price e lê só as entradas de que precisa.
+
+    O resultado é sempre o de get_cached_price: chave exata válida, senão a primeira
+    chave válida (pela ordem da cache) que contém o nome ou está contida nele. Nomes
+    repetidos na lista são resolvidos uma vez.
+    """
+
+    _SEP = "\0"
+
+    def __init__(self, cache: dict, markets: list[str] | None = None, prefilter: bool = True):
+        self.cache = cache
+        self.markets = list(markets or MARKETS)
+        self.prefilter = prefilter
+        self.hits: list[tuple[str, str]] = []
+        self._valid: dict[str, dict[str, tuple[int, dict]]] = {}
+        self._keys: dict[str, list[str]] = {}
+        self._text: dict[str, str] = {}
+        self._starts: dict[str, list[int]] = {}
+        self._resolved: dict[tuple[str, str], tuple[str, dict] | None] = {}
+        if prefilter:
+            for market in self.markets:
+                self._prepare(market)
+
+    def _prepare(self, market: str) -> None:
+        keys, valid, starts, offset = [], {}, [], 0
+        for key, entry in self.cache.get(market, {}).items():
+            if self._SEP in key or not is_cache_valid(entry):
+                continue
+            valid[key] = (len(keys), entry)
+            keys.append(key)
+            starts.append(offset)
+            offset += len(key) + 1
+        self._valid[market] = valid
+        self._keys[market] = keys
+        self._starts[market] = starts
+        self._text[market] = self._SEP.join(keys)
+
+    def _match(self, market: str, key: str) -> tuple[str, dict] | None:
+        valid = self._valid[market]
+        if key in valid:
+            return key, valid[key][1]
+        keys = self._keys[market]
+        if not keys:
+            return None
+        best = len(keys)
+        pos = self._text[market].find(key) if self._SEP not in key else -1
+        if pos >= 0:
+            best = bisect_right(self._starts[market], pos) - 1
+        n = len(key)
+        for i in range(n):
+            for j in range(i + 1, n + 1):
+                hit = valid.get(key[i:j])
+                if hit is not None and hit[0] < best:
+                    best = hit[0]
+        if best == len(keys):
+            return None
+        k = keys[best]
+        return k, valid[k][1]
+
+    def lookup(self, market: str, product_name: str) -> tuple[str, dict] | None:
+        """(chave, entrada) válida para `product_name` em `market`, ou None."""
+        key = product_name.lower().strip()
+        if (market, key) not in self._resolved:
+            if self.prefilter:
+                found = self._match(market, key)
+            else:
+                hits = []
+                entry = get_cached_price(self.cache, market, key, hits=hits)
+                found = (hits[0][1], entry) if entry else None
+            self._resolved[(market, key)] = found
+        return self._resolved[(market, key)]
+
+    def resolve(self, items: list[dict]) -> list[dict[str, dict]]:
+        """{market: entrada} de cada item, pela ordem de `items`; acumula os hits em `self.hits`."""
+        results = []
+        for item in items:
+            prices = {}
+            for market in self.markets:
+                found = self.lookup(market, item["name"])
+                if found:
+                    prices[market] = found[1]
+                    self.hits.append((market, found[0]))
+            results.append(prices)
+        return results
+
+
 # ---------------------------------------------------------------------------
 # Delivery
 # ---------------------------------------------------------------------------
@@ -111,245 +258,282 @@ def apply_coupons(subtotal: float, coupons: list[dict], categories_in_cart: set[
     Aplica cupões disponíveis a um subtotal.
 
     Cada cupão tem: description, discount_eur, min_spend, categories ([] = todos)
-    Retorna: (desconto_total, lista_cupoes_aplicados)
-    Greedy: aplica cupões por ordem de valor decrescente.
+    e, opcionalmente, exclusive_group e stackable (ver coupons.py).
+    Retorna: (desconto_total, lista_cupoes_aplicados), do maior para o menor.
+    Escolhe o conjunto de cupões com maior desconto (ver CouponBook), não o greedy.
     """
-    applicable = []
-    for coupon in coupons:
-        min_spend = coupon.get("min_spend", 0.0)
-        allowed_cats = coupon.get("categories", [])
-        if subtotal < min_spend:
-            continue
-        if allowed_cats and not categories_in_cart.intersection(allowed_cats):
-            continue
-        applicable.append(coupon)
-
-    # Ordenar por desconto decrescente
-    applicable.sort(key=lambda c: c.get("discount_eur", 0.0), reverse=True)
+    return CouponBook(coupons).best(subtotal, categories_in_cart)
 
-    total_discount = 0.0
-    applied = []
-    for coupon in applicable:
-        discount = min(coupon.get("discount_eur", 0.0), subtotal - total_discount)
-        if discount > 0:
-            total_discount += discount
-            applied.append({
-                "description": coupon.get("description", ""),
-                "discount_eur": round(discount, 2),
-            })
 
-    return round(total_discount, 2), applied
+def coupon_books(market_config: dict) -> dict[str, CouponBook]:
+    """Um CouponBook por mercado, para reutilizar entre as avaliações de uma otimização."""
+    return {m: CouponBook(market_config.get(m, {}).get("coupons", [])) for m in MARKETS}
 
 
 # ---------------------------------------------------------------------------
 # Core optimization
 # ---------------------------------------------------------------------------
 
-def optimize_split(items_with_prices: list, market_config: dict | None = None) -> dict:
-    """
-    Algoritmo greedy com rebalanceamento para encontrar split ótimo.
+def market_params(markets: list[str], market_config: dict,
+                  books: dict[str, CouponBook]) -> list[tuple]:
+    """(custo de entrega, limiar grátis, min_order, CouponBook, saldo) de cada mercado, para os limites inferiores."""
+    params = []
+    for market in markets:
+        delivery = DELIVERY_CONFIG.get(market, {})
+        config = market_config.get(market, {})
+        params.append((delivery.get("cost", 0.0), delivery.get("free_threshold"),
+                       delivery.get("min_order") or 0.0, books[market], config.get("balance", 0.0)))
+    return params
+
+
+def market_cost(market: str, subtotal: float, categories: set[str], market_config: dict,
+                books: dict[str, CouponBook] | None = None) -> dict:
+    """Cupões, saldo e entrega sobre o subtotal de um mercado (sem arredondar)."""
+    if books is not None:
+        coupon_discount, applied_coupons = books[market].best(subtotal, categories)
+    else:
+        coupons = market_config.get(market, {}).get("coupons", [])
+        coupon_discount, applied_coupons = apply_coupons(subtotal, coupons, categories)
 
-    Input:
-        items_with_prices: lista de {item, prices: {market: price_info}}
-        market_config: config de cupões/saldo por mercado (opcional)
-            {market: {coupons: [...], balance: float}}
+    # Saldo de cartão/pontos
+    balance = market_config.get(market, {}).get("balance", 0.0)
+    balance_used = min(balance, max(0.0, subtotal - coupon_discount))
+
+    after_discounts = subtotal - coupon_discount - balance_used
+    delivery = calculate_delivery(market, after_discounts)
+    return {
+        "coupon_discount": coupon_discount,
+        "coupons_applied": applied_coupons,
+        "balance_used": balance_used,
+        "after_discounts": after_discounts,
+        "delivery": delivery,
+        "total": after_discounts + delivery,
+    }
+
+
+def build_market_result(market: str, items: list, market_config: dict,
+                        books: dict[str, CouponBook] | None = None) -> dict | None:
+    """Itens atribuídos a um mercado → subtotal, cupões, saldo, entrega e total."""
+    if not items:
+        return None
+
+    subtotal = sum(i["price"] for i in items)
+    categories = {i["item"].get("category", "outros") for i in items}
+    cost = market_cost(market, subtotal, categories, market_config, books)
+
+    return {
+        "items": [
+            {
+                "name": i["item"]["name"],
+                "qty": i["item"].get("quantity", {}).get("value", 1),
+                "unit": i["item"].get("quantity", {}).get("unit", "un"),
+                "price": round(i["price"], 2),
+                "units": i["line"]["units"] if i.get("line") else 1,
+                "unit_price": i["line"]["unit_price"] if i.get("line") else i["price"],
+                "brand": i["price_info"].get("brand"),
+                "promo": i["price_info"].get("promo"),
+                "promo_applied": i["line"]["promo"] if i.get("line") else None,
+            }
+            for i in items
+        ],
+        "subtotal": round(subtotal, 2),
+        "coupon_discount": round(cost["coupon_discount"], 2),
+        "coupons_applied": cost["coupons_applied"],
+        "balance_used": round(cost["balance_used"], 2),
+        "after_discounts": round(cost["after_discounts"], 2),
+        "delivery": round(cost["delivery"], 2),
+        "total": round(cost["total"], 2),
+    }
+
+
+def _assignment(matrix: PriceMatrix, i: int, j: int, **extra) -> dict:
+    """Item `i` no mercado `j`: custo da linha, entrada de cache e detalhe das unidades/promoção."""
+    item_data = matrix.items[i]
+    return {"item": item_data["item"], "price": matrix.price(i, j), "row": i,
+            "price_info": item_data["prices"].get(matrix.markets[j], {}), "line": matrix.line(i, j), **extra}
+
+
+UNAVAILABLE_REASON = "Não encontrado em nenhum mercado no cache"
 
-    Output: {markets, total, savings_vs_best_single, alternatives, unavailable, recommendation_note}
-    """
-    if market_config is None:
-        market_config = {m: {"coupons": [], "balance": 0.0} for m in MARKETS}
 
-    # Passo 1: Atribuição greedy — cada item vai para o mercado com menor preço efetivo.
-    # Se o item tiver preferred_store que seja um mercado online, tenta-se aí primeiro;
-    # apenas se não estiver disponível é que se cai para o mercado mais barato.
-    assignments = {m: [] for m in MARKETS}
+def _assignments_from_choice(items_with_prices: list, matrix: PriceMatrix,
+                             choice: list[int]) -> tuple[dict[str, list], list]:
+    """Índice de mercado por item (-1 = indisponível) → (atribuições por mercado, itens indisponíveis)."""
+    assignments = {m: [] for m in matrix.markets}
     unavailable_items = []
+    for i, (item_data, j) in enumerate(zip(items_with_prices, choice)):
+        if j < 0:
+            unavailable_items.append({"name": item_data["item"].get("name"), "reason": UNAVAILABLE_REASON})
+            continue
+        extra = {"preferred_store_honored": True} if matrix.preferred[i] == j else {}
+        assignments[matrix.markets[j]].append(_assignment(matrix, i, j, **extra))
+    return assignments, unavailable_items
 
-    for item_data in items_with_prices:
-        item = item_data["item"]
-        prices = item_data["prices"]
-
-        # Preferência de mercado online (ex: "continente" para produto específico da marca)
-        item_preferred = item.get("preferred_store") if item.get("preferred_store") in ONLINE_MARKET_IDS else None
-
-        # Tentar mercado preferido primeiro
-        assigned = False
-        if item_preferred:
-            pref_info = prices.get(item_preferred)
-            if pref_info and pref_info.get("available", True):
-                pref_effective = pref_info.get("promo_effective_price") or pref_info.get("price")
-                if pref_effective is not None:
-                    assignments[item_preferred].append({
-                        "item": item,
-                        "price": pref_effective,
-                        "price_info": pref_info,
-                        "preferred_store_honored": True,
-                    })
-                    assigned = True
-
-        if not assigned:
-            # Greedy normal: mercado mais barato disponível
-            best_market = None
-            best_price = float("inf")
-
-            for market in MARKETS:
-                price_info = prices.get(market)
-                if not price_info or not price_info.get("available", True):
-                    continue
-                effective = price_info.get("promo_effective_price") or price_info.get("price")
-                if effective is None:
-                    continue
-                if effective < best_price:
-                    best_price = effective
-                    best_market = market
-
-            if best_market:
-                assignments[best_market].append({
-                    "item": item,
-                    "price": best_price,
-                    "price_info": prices.get(best_market, {}),
-                })
-            else:
-                unavailable_items.append({
-                    "name": item.get("name"),
-                    "reason": "Não encontrado em nenhum mercado no cache",
-                })
-
-    # Passo 2: Calcular subtotais e categorias por mercado
-    def build_market_result(market: str, items: list) -> dict | None:
-        if not items:
-            return None
 
-        subtotal = sum(i["price"] for i in items)
-        categories = {i["item"].get("category", "outros") for i in items}
+def greedy_assignments(items_with_prices: list, matrix: PriceMatrix | None = None) -> tuple[dict[str, list], list]:
+    """
+    Passo 1: cada item vai para o mercado com menor preço efetivo.
+    Se o item tiver preferred_store que seja um mercado online, tenta-se aí primeiro;
+    apenas se não estiver disponível é que se cai para o mercado mais barato.
+    Devolve (atribuições por mercado, itens indisponíveis).
+    """
+    if matrix is None:
+        matrix = PriceMatrix(items_with_prices, MARKETS)
+    choice, _ = matrix.cheapest()
+    return _assignments_from_choice(items_with_prices, matrix, choice)
 
-        # Cupões
-        coupons = market_config.get(market, {}).get("coupons", [])
-        coupon_discount, applied_coupons = apply_coupons(subtotal, coupons, categories)
 
-        # Saldo de cartão/pontos
-        balance = market_config.get(market, {}).get("balance", 0.0)
-        balance_used = min(balance, max(0.0, subtotal - coupon_discount))
-
-        after_discounts = subtotal - coupon_discount - balance_used
-        delivery = calculate_delivery(market, after_discounts)
-        total = after_discounts + delivery
-
-        return {
-            "items": [
-                {
-                    "name": i["item"]["name"],
-                    "qty": i["item"].get("quantity", {}).get("value", 1),
-                    "unit": i["item"].get("quantity", {}).get("unit", "un"),
-                    "price": round(i["price"], 2),
-                    "brand": i["price_info"].get("brand"),
-                    "promo": i["price_info"].get("promo"),
-                }
-                for i in items
-            ],
-            "subtotal": round(subtotal, 2),
-            "coupon_discount": round(coupon_discount, 2),
-            "coupons_applied": applied_coupons,
-            "balance_used": round(balance_used, 2),
-            "after_discounts": round(after_discounts, 2),
-            "delivery": round(delivery, 2),
-            "total": round(total, 2),
-        }
+def _assignments_total(market: str, items: list, market_config: dict,
+                       books: dict[str, CouponBook] | None = None) -> float:
+    result = build_market_result(market, items, market_config, books)
+    return result["total"] if result else 0.0
+
+
+def rebalance_coupons(assignments: dict[str, list], market_config: dict, matrix: PriceMatrix,
+                      books: dict[str, CouponBook]) -> None:
+    """
+    Passo 3b: para cada cupão ainda por usar (min_spend por atingir ou sem itens da
+    categoria), tenta mover-lhe os itens de outros mercados que menos custam a mais no
+    mercado alvo — primeiro um da categoria do cupão, se for preciso, depois os restantes
+    até chegar ao min_spend. O movimento só é aplicado se baixar o total do split
+    (cupões perdidos nos mercados de origem incluídos). Altera `assignments`.
+    """
+    def split_total(split: dict[str, list]) -> float:
+        return sum(_assignments_total(m, split[m], market_config, books) for m in matrix.markets)
+
+    for target, target_market in enumerate(matrix.markets):
+        book = books.get(target_market)
+        if not book:
+            continue
+        for coupon in sorted(book.coupons, key=lambda c: -c.discount_cents):
+            current = assignments[target_market]
+            subtotal = sum(a["price"] for a in current)
+            categories = {a["item"].get("category", "outros") for a in current}
+            if coupon.discount_cents <= 0 or coupon in book.applicable(subtotal, categories):
+                continue
+
+            # (custo extra de mover, preço no alvo, mercado de origem, atribuição)
+            candidates = sorted(
+                (
+                    (matrix.price(a["row"], target) - a["price"], matrix.price(a["row"], target), market, a)
+                    for market in matrix.markets if market != target_market
+                    for a in assignments[market]
+                    if not a.get("preferred_store_honored") and matrix.available[target][a["row"]]
+                ),
+                key=lambda x: x[0],
+            )
+            moved = []
+            if coupon.categories and not coupon.categories & categories:
+                moved = [c for c in candidates if c[3]["item"].get("category", "outros") in coupon.categories][:1]
+                if not moved:
+                    continue
+            gap_remaining = coupon.min_spend - subtotal - sum(c[1] for c in moved)
+            for candidate in candidates:
+                if gap_remaining <= 0:
+                    break
+                if candidate not in moved:
+                    moved.append(candidate)
+                    gap_remaining -= candidate[1]
+            if gap_remaining > 0:
+                continue  # nem movendo tudo se chega ao min_spend
+
+            moved_ids = {id(c[3]) for c in moved}
+            new_split = {m: [a for a in items if id(a) not in moved_ids] for m, items in assignments.items()}
+            new_split[target_market] = current + [_assignment(matrix, c[3]["row"], target) for c in moved]
+            if split_total(new_split) < split_total(assignments):
+                assignments.update(new_split)
+
+
+def rebalance_delivery(assignments: dict[str, list], market_config: dict, matrix: PriceMatrix,
+                       books: dict[str, CouponBook] | None = None) -> None:
+    """
+    Passo 3: se a um mercado faltam ≤ DELIVERY_GAP_THRESHOLD para a entrega grátis,
+    tenta mover-lhe os itens de outro mercado que lá são mais baratos até fechar a
+    diferença, ao preço do mercado alvo. O movimento só é aplicado se baixar o total
+    dos dois mercados (entrega, cupões e saldo incluídos). Altera `assignments`.
+    """
+    for target, target_market in enumerate(matrix.markets):
+        current = build_market_result(target_market, assignments[target_market], market_config, books)
+        if current is None:
+            continue
+        gap = gap_to_free_delivery(target_market, current["after_discounts"])
+        if not (0 < gap <= DELIVERY_GAP_THRESHOLD and current["delivery"] > 0):
+            continue
 
+        for other_market in matrix.markets:
+            if other_market == target_market or not assignments[other_market]:
+                continue
+            candidates = sorted(
+                (
+                    (matrix.price(candidate["row"], target), candidate)
+                    for candidate in assignments[other_market]
+                    if not candidate.get("preferred_store_honored") and matrix.available[target][candidate["row"]]
+                ),
+                key=lambda x: x[0],
+            )
+            moved = []
+            gap_remaining = gap
+            for price_in_target, candidate in candidates:
+                moved.append((price_in_target, candidate))
+                gap_remaining -= price_in_target
+                if gap_remaining <= 0:
+                    break
+            if gap_remaining > 0:
+                continue  # nem movendo tudo se chega ao limiar
+
+            moved_ids = {id(candidate) for _, candidate in moved}
+            new_target = assignments[target_market] + [
+                _assignment(matrix, candidate["row"], target) for _, candidate in moved
+            ]
+            new_other = [c for c in assignments[other_market] if id(c) not in moved_ids]
+            before = (_assignments_total(target_market, assignments[target_market], market_config, books)
+                      + _assignments_total(other_market, assignments[other_market], market_config, books))
+            after = (_assignments_total(target_market, new_target, market_config, books)
+                     + _assignments_total(other_market, new_other, market_config, books))
+            if after < before:
+                assignments[target_market] = new_target
+                assignments[other_market] = new_other
+                break
+
+
+def summarize_split(items_with_prices: list, assignments: dict[str, list], unavailable_items: list,
+                    market_config: dict, matrix: PriceMatrix | None = None,
+                    books: dict[str, CouponBook] | None = None) -> dict:
+    """Passos 2, 4–6: resultados por mercado, alternativas single-store e recomendação."""
+    if matrix is None:
+        matrix = PriceMatrix(items_with_prices, MARKETS)
     result_markets = {}
     for market in MARKETS:
-        m_result = build_market_result(market, assignments[market])
+        m_result = build_market_result(market, assignments[market], market_config, books)
         if m_result:
             result_markets[market] = m_result
+    return summarize_results(items_with_prices, result_markets, unavailable_items, market_config, matrix, books)
 
-    # Passo 3: Rebalanceamento de threshold de entrega
-    # Se um mercado está perto do threshold de entrega grátis (falta <€5),
-    # tentar mover itens baratos do outro mercado para atingir o threshold.
-    for target_market in MARKETS:
-        if target_market not in result_markets:
-            continue
-        m = result_markets[target_market]
-        gap = gap_to_free_delivery(target_market, m["after_discounts"])
-        if 0 < gap <= DELIVERY_GAP_THRESHOLD and m["delivery"] > 0:
-            # Procurar itens candidatos no outro mercado para mover
-            other_markets = [mk for mk in MARKETS if mk != target_market and mk in result_markets]
-            for other_market in other_markets:
-                other = result_markets[other_market]
-                candidates = sorted(
-                    assignments[other_market],
-                    key=lambda x: x["price"],
-                )
-                moved = []
-                gap_remaining = gap
-                for candidate in candidates:
-                    price_in_target = (
-                        candidate["item_data"]["prices"].get(target_market, {}).get("price")
-                        if "item_data" in candidate
-                        else None
-                    )
-                    # Usar o preço do candidato no mercado alvo (se disponível)
-                    move_price = price_in_target or candidate["price"]
-                    if gap_remaining > 0:
-                        moved.append(candidate)
-                        gap_remaining -= move_price
-                        if gap_remaining <= 0:
-                            break
-
-                if moved:
-                    # Verificar se mover é vantajoso:
-                    delivery_saved = m["delivery"]  # entrega que passaria a ser grátis
-                    extra_cost = sum(
-                        (mv.get("price_in_target", mv["price"]) - mv["price"])
-                        for mv in moved
-                    )
-                    if delivery_saved > extra_cost:
-                        # Aplicar rebalanceamento
-                        for mv in moved:
-                            assignments[other_market].remove(mv)
-                            assignments[target_market].append(mv)
-                        # Reconstruir resultados
-                        m_new = build_market_result(target_market, assignments[target_market])
-                        o_new = build_market_result(other_market, assignments[other_market])
-                        if m_new:
-                            result_markets[target_market] = m_new
-                        if o_new:
-                            result_markets[other_market] = o_new
-                        elif other_market in result_markets:
-                            del result_markets[other_market]
 
+def summarize_results(items_with_prices: list, result_markets: dict[str, dict], unavailable_items: list,
+                      market_config: dict, matrix: PriceMatrix, books: dict[str, CouponBook] | None = None,
+                      categories: set[str] | None = None) -> dict:
+    """Passos 4–6 a partir dos resultados por mercado já calculados (build_market_result)."""
     # Passo 4: Total do split ótimo
     total_split = sum(m["total"] for m in result_markets.values())
 
     # Passo 5: Alternativas single-store
+    cats = categories if categories is not None else {
+        id["item"].get("category", "outros") for id in items_with_prices
+    }
     alternatives = []
-    for market in MARKETS:
-        alt_subtotal = 0.0
-        all_available = True
-        for item_data in items_with_prices:
-            price_info = item_data["prices"].get(market)
-            if price_info and price_info.get("available", True):
-                p = price_info.get("promo_effective_price") or price_info.get("price", 0.0)
-                alt_subtotal += p or 0.0
-            else:
-                all_available = False
+    for j, market in enumerate(matrix.markets):
+        alt_subtotal, all_available = matrix.column_total(j)
 
         # Aplicar cupões e saldo para single-store
-        cats = {id["item"].get("category", "outros") for id in items_with_prices}
-        coupons = market_config.get(market, {}).get("coupons", [])
-        coupon_disc, _ = apply_coupons(alt_subtotal, coupons, cats)
-        balance = market_config.get(market, {}).get("balance", 0.0)
-        balance_used = min(balance, max(0.0, alt_subtotal - coupon_disc))
-        after = alt_subtotal - coupon_disc - balance_used
-        delivery = calculate_delivery(market, after)
-        alt_total = after + delivery
-
+        cost = market_cost(market, alt_subtotal, cats, market_config, books)
         alternatives.append({
             "strategy": f"all_{market}",
             "subtotal": round(alt_subtotal, 2),
-            "coupon_discount": round(coupon_disc, 2),
-            "balance_used": round(balance_used, 2),
-            "delivery": round(delivery, 2),
-            "total": round(alt_total, 2),
+            "coupon_discount": round(cost["coupon_discount"], 2),
+            "balance_used": round(cost["balance_used"], 2),
+            "delivery": round(cost["delivery"], 2),
+            "total": round(cost["total"], 2),
             "all_available": all_available,
         })
 
@@ -376,6 +560,223 @@ def optimize_split(items_with_prices: list, market_config: dict | None = None) -
     }
 
 
+def default_market_config() -> dict:
+    return {m: {"coupons": [], "balance": 0.0} for m in MARKETS}
+
+
+def optimize_split(items_with_prices: list, market_config: dict | None = None,
+                   pricer: LinePricer | None = None) -> dict:
+    """
+    Algoritmo greedy com rebalanceamento para encontrar split ótimo.
+
+    Input:
+        items_with_prices: lista de {item, prices: {market: price_info}}
+        market_config: config de cupões/saldo por mercado (opcional)
+            {market: {coupons: [...], balance: float}}
+        pricer: LinePricer a reutilizar entre chamadas (opcional) — o custo de cada
+            item é o da quantidade pedida, com promoções multi-unidade
+
+    Output: {markets, total, savings_vs_best_single, alternatives, unavailable, recommendation_note}
+    """
+    if market_config is None:
+        market_config = default_market_config()
+
+    matrix = PriceMatrix(items_with_prices, MARKETS, pricer)
+    books = coupon_books(market_config)
+    assignments, unavailable_items = greedy_assignments(items_with_prices, matrix)
+    rebalance_delivery(assignments, market_config, matrix, books)
+    rebalance_coupons(assignments, market_config, matrix, books)
+    return summarize_split(items_with_prices, assignments, unavailable_items, market_config, matrix, books)
+
+
+def optimize_exact(items_with_prices: list, market_config: dict | None = None,
+                   time_budget: float | None = EXACT_TIME_BUDGET_SECONDS, pricer: LinePricer | None = None) -> dict:
+    """
+    Split ótimo por branch-and-bound: minimiza Σ preços + entregas − cupões − saldo,
+    respeitando limiares de entrega grátis, min_order (sobre o subtotal) e as condições
+    dos cupões (min_spend, categorias). Itens com preferred_store disponível ficam fixos,
+    como no greedy.
+
+    A melhor de greedy (com rebalanceamento) e single-store serve de incumbente; os
+    itens são ramificados por ordem de arrependimento (2.º melhor preço − melhor). O
+    limite inferior de um nó é o subtotal atribuído + o preço mínimo de cada item por
+    atribuir + o melhor ajuste possível por mercado: desconto máximo (cupões + saldo)
+    alcançável com o maior subtotal que o mercado ainda pode ter, mais a entrega se
+    nem esse subtotal chega ao limiar de entrega grátis.
+
+    Se `time_budget` (segundos) se esgotar, devolve a melhor solução encontrada e o gap
+    para o menor limite inferior ainda por explorar.
+
+    Output: o de optimize_split + solver: {mode, optimal, nodes, elapsed_s, lower_bound,
+            gap_eur, gap_pct, greedy_total}
+    """
+    if market_config is None:
+        market_config = default_market_config()
+    started = time.monotonic()
+    deadline = started + time_budget if time_budget is not None else None
+
+    matrix = PriceMatrix(items_with_prices, MARKETS, pricer)
+    books = coupon_books(market_config)
+    markets = matrix.markets
+    n_markets = len(markets)
+    categories = [d["item"].get("category", "outros") for d in items_with_prices]
+    base_choice = [-1] * matrix.n  # itens fixos; -1 nos livres e nos indisponíveis
+    free = []  # (linha, categoria, [(preço, índice do mercado)] por preço)
+
+    for i, category in enumerate(categories):
+        j = matrix.preferred[i]
+        options = [(matrix.price(i, j), j)] if j >= 0 else matrix.options(i)
+        if len(options) == 1:
+            base_choice[i] = options[0][1]
+        elif options:
+            free.append((i, category, options))
+
+    def market_state(choice: list[int]) -> tuple[list[float], list[int], list[frozenset]]:
+        subs = matrix.subtotals(choice)
+        counts = [choice.count(j) for j in range(n_markets)]
+        cats = [frozenset(compress(categories, map(eq, choice, repeat(j)))) for j in range(n_markets)]
+        return subs, counts, cats
+
+    base_sub, base_count, base_cats = market_state(base_choice)
+
+    # Maior arrependimento primeiro: as decisões que mais pesam fecham o limite mais cedo
+    free.sort(key=lambda f: (f[2][1][0] - f[2][0][0], f[2][0][0]), reverse=True)
+    n = len(free)
+
+    # Sufixos: preço mínimo restante e, por mercado, subtotal/categorias ainda possíveis
+    rest_min = [0.0] * (n + 1)
+    rest_at = [[0.0] * (n + 1) for _ in markets]
+    rest_cats = [[frozenset()] * (n + 1) for _ in markets]
+    for d in range(n - 1, -1, -1):
+        _, category, options = free[d]
+        rest_min[d] = rest_min[d + 1] + options[0][0]
+        for mi in range(n_markets):
+            rest_at[mi][d] = rest_at[mi][d + 1]
+            rest_cats[mi][d] = rest_cats[mi][d + 1]
+        for price, mi in options:
+            rest_at[mi][d] += price
+            rest_cats[mi][d] = rest_cats[mi][d] | {category}
+
+    params = market_params(markets, market_config, books)
+
+    def lower_bound(d, subs, counts, cats) -> float:
+        bound = rest_min[d]
+        for mi in range(n_markets):
+            cost, threshold, min_order, book, balance = params[mi]
+            subtotal = subs[mi]
+            reachable = subtotal + rest_at[mi][d]
+            if reachable < min_order:
+                if counts[mi]:
+                    return float("inf")
+                continue
+            if not counts[mi] and reachable == 0:
+                continue
+            possible_cats = cats[mi] | rest_cats[mi][d]
+            # o desconto ótimo só cresce com o subtotal e as categorias → limite válido
+            max_coupons = book.max_discount(reachable, possible_cats) if book else 0.0
+            adjustment = -min(reachable, max_coupons + balance)
+            if threshold is None or reachable < threshold:
+                adjustment += cost
+            bound += subtotal + (adjustment if counts[mi] else min(0.0, adjustment))
+        return bound
+
+    def leaf_total(subs, counts, cats) -> float:
+        total = 0.0
+        for mi, market in enumerate(markets):
+            if not counts[mi]:
+                continue
+            if subs[mi] < params[mi][2]:
+                return float("inf")
+            total += market_cost(market, subs[mi], cats[mi], market_config, books)["total"]
+        return total
+
+    def full_choice(choice: list[int]) -> list[int]:
+        full = list(base_choice)
+        for (i, _, _), mi in zip(free, choice):
+            full[i] = mi
+        return full
+
+    def evaluate(choice: list[int]) -> float:
+        return leaf_total(*market_state(full_choice(choice)))
+
+    # Incumbentes: greedy com rebalanceamento e cada single-store (com o mais barato onde faltar)
+    greedy, greedy_unavailable = greedy_assignments(items_with_prices, matrix)
+    rebalance_delivery(greedy, market_config, matrix, books)
+    rebalance_coupons(greedy, market_config, matrix, books)
+    greedy_market = {id(a["item"]): markets.index(m) for m, assigned in greedy.items() for a in assigned}
+    candidates = [[greedy_market[id(items_with_prices[i]["item"])] for i, _, _ in free]]
+    for mi in range(n_markets):
+        candidates.append([
+            mi if any(m == mi for _, m in options) else options[0][1] for _, _, options in free
+        ])
+    best, best_choice = float("inf"), None
+    for choice in candidates:
+        total = evaluate(choice)
+        if total < best:
+            best, best_choice = total, choice
+
+    # DFS com pilha explícita; o caminho é uma lista ligada (mercado, pai)
+    eps = 1e-9
+    root_bound = lower_bound(0, base_sub, base_count, base_cats)
+    stack = [(root_bound, 0, tuple(base_sub), tuple(base_count), tuple(base_cats), None)]
+    nodes = 0
+    timed_out = False
+    while stack:
+        if deadline is not None and nodes % 256 == 0 and time.monotonic() > deadline:
+            timed_out = True
+            break
+        bound, d, subs, counts, cats, path = stack.pop()
+        nodes += 1
+        if bound >= best - eps:
+            continue
+        if d == n:
+            total = leaf_total(subs, counts, cats)
+            if total < best:
+                best = total
+                best_choice = []
+                while path is not None:
+                    best_choice.append(path[0])
+                    path = path[1]
+                best_choice.reverse()
+            continue
+        _, category, options = free[d]
+        children = []
+        for price, mi in options:
+            c_subs = subs[:mi] + (subs[mi] + price,) + subs[mi + 1:]
+            c_counts = counts[:mi] + (counts[mi] + 1,) + counts[mi + 1:]
+            c_cats = cats if category in cats[mi] else cats[:mi] + (cats[mi] | {category},) + cats[mi + 1:]
+            c_bound = lower_bound(d + 1, c_subs, c_counts, c_cats)
+            if c_bound < best - eps:
+                children.append((c_bound, d + 1, c_subs, c_counts, c_cats, (mi, path)))
+        # o filho mais barato fica no topo da pilha
+        stack.extend(reversed(children))
+
+    if best_choice is None:
+        result = summarize_split(items_with_prices, greedy, greedy_unavailable, market_config, matrix, books)
+        result["solver"] = {
+            "mode": "exact", "optimal": False, "feasible": False, "nodes": nodes,
+            "elapsed_s": round(time.monotonic() - started, 3),
+            "note": "Nenhuma distribuição respeita o min_order dos mercados; devolvido o greedy.",
+        }
+        return result
+
+    lower = min([best] + [node[0] for node in stack]) if timed_out else best
+    assignments, unavailable_items = _assignments_from_choice(items_with_prices, matrix, full_choice(best_choice))
+    result = summarize_split(items_with_prices, assignments, unavailable_items, market_config, matrix, books)
+    greedy_total = sum(_assignments_total(m, greedy[m], market_config, books) for m in MARKETS)
+    result["solver"] = {
+        "mode": "exact",
+        "optimal": not timed_out,
+        "nodes": nodes,
+        "elapsed_s": round(time.monotonic() - started, 3),
+        "lower_bound": round(lower, 2),
+        "gap_eur": round(best - lower, 2),
+        "gap_pct": round((best - lower) / best * 100, 2) if best > 0 else 0.0,
+        "greedy_total": round(greedy_total, 2),
+    }
+    return result
+
+
 # ---------------------------------------------------------------------------
 # Budget check
 # ---------------------------------------------------------------------------
@@ -396,37 +797,130 @@ def check_budget(total: float, prefs: dict) -> dict:
 # Main
 # ---------------------------------------------------------------------------
 
-def main():
-    parser = argparse.ArgumentParser(description="Comparação de preços multi-mercado")
-    parser.add_argument("--output", "-o", help="Ficheiro de output (default: stdout)")
-    args = parser.parse_args()
-
-    shopping_list = load_shopping_list()
-    cache = load_price_cache()
-    prefs = load_preferences()
-
-    if not shopping_list:
-        print(json.dumps({"error": "Lista de compras vazia"}, ensure_ascii=False))
-        sys.exit(0)
-
-    # Recolher preços do cache
-    items_with_prices = []
+def run_comparison(exact: bool = False, time_budget: float | None = EXACT_TIME_BUDGET_SECONDS,
+                   optimizer: Callable[[list], dict] | None = None, use_result_cache: bool = True,
+                   pareto: bool = True, brand_penalty_pct: float | None = BRAND_PENALTY_PCT) -> dict:
+    """
+    Lista de compras + cache + preferências → distribuição ótima com budget check.
+    Com `exact`, usa optimize_exact (branch-and-bound limitado a `time_budget` segundos).
+    `optimizer` substitui optimize_split (ex.: SplitSession.solve, que só reavalia o que mudou).
+    Com `pareto`, `pareto` no output traz as distribuições não dominadas em custo,
+    nº de encomendas e substituições de marca (pareto.py).
+    Antes de otimizar, cada item pode passar para um candidato mais barato das suas
+    marcas aceitáveis, com `brand_penalty_pct` % de agravamento para marcas que não a
+    preferida (substitutions.py; None desliga). As trocas vêm em `brand_substitutions`.
+
+    Com `use_result_cache` (e sem `optimizer`), o resultado do otimizador é reutilizado
+    se a lista resolvida, as entradas de cache usadas e a config de entrega/cupões forem
+    as mesmas; com os ficheiros intactos nem a cache é lida (ver result_cache.py).
+    `result_cache` no output indica hit/miss.
+    """
+    store = ResultCache(DATA_DIR / "comparison_cache") if use_result_cache and optimizer is None else None
+    settings = {"market_config": default_market_config(), "delivery": DELIVERY_CONFIG,
+                "mode": {"exact": exact, "time_budget": time_budget if exact else None, "pareto": pareto,
+                         "brand_penalty_pct": brand_penalty_pct}}
+    entry = cache_status = sources = None
+    if store is not None:
+        # assinatura antes de ler: uma escrita entretanto muda-a e o atalho não se aplica
+        sources = source_signature([DATA_DIR / "inventory.json", DATA_DIR / "consumption_model.json",
+                                    DATA_DIR / "family_preferences.json", *cache_files()], settings)
+        key = store.key_for_sources(sources)
+        if key is not None:
+            # chave ligada mas já removida pela LRU: o miss conta na consulta pela impressão digital
+            entry, cache_status = store.get(key, count_miss=False)
+
+    if entry is not None:
+        result, run = entry["result"], entry["run"]
+    else:
+        shopping_list = load_shopping_list()
+        if not shopping_list:
+            return {"error": "Lista de compras vazia"}
+        cache = load_price_cache()
+
+        # Recolher preços do cache (e candidatos das marcas aceitáveis)
+        index = PriceIndex(cache, prefilter=len(shopping_list) >= PRICE_INDEX_MIN_ITEMS)
+        with get_store() as price_store:
+            substitute = None
+            if brand_penalty_pct is not None:
+                substitute = partial(substitute_brands, store=price_store, cache=cache,
+                                     sources=load_brand_sources(load_preferences()), penalty_pct=brand_penalty_pct)
+            items_with_prices, run = resolve_prices(index, shopping_list, substitute)
+
+        # Otimizar (ou reutilizar o resultado de uma execução com as mesmas entradas)
+        stored = False
+        if store is not None:
+            key = fingerprint(items_with_prices, settings)
+            entry, cache_status = store.get(key)
+            stored = entry is not None
+        if stored:
+            result = entry["result"]
+        else:
+            if exact:
+                result = optimize_exact(items_with_prices, time_budget=time_budget)
+            elif optimizer is not None:
+                result = optimizer(items_with_prices)
+            else:
+                result = optimize_split(items_with_prices)
+            # um resultado interrompido pelo orçamento de tempo (exato ou fronteira) não se guarda
+            complete = not exact or result["solver"].get("optimal")
+            if pareto:
+                from pareto import pareto_frontier  # import tardio: pareto importa price_compare
+                result["pareto"] = pareto_frontier(items_with_prices)
+                complete = complete and result["pareto"]["complete"]
+            if store is not None and complete:
+                store.put(key, result, run)
+                stored = True
+        if stored:
+            # o atalho vale até expirar a primeira entrada usada (a lista resolvida mudaria)
+            expiries = [entry_expiry(info) for d in items_with_prices for info in d["prices"].values()]
+            store.link(sources, key, min(expiries) if expiries else None)
+
+    record_hits([tuple(pair) for pair in run["hits"]])
+    record_lookups({m: tuple(counts) for m, counts in run["lookups"].items()})
+    if cache_status is not None:
+        cache_status["key"] = key[:16]
+        result["result_cache"] = cache_status
+    return annotate_result(result, run, load_preferences())
+
+
+def resolve_prices(index: PriceIndex, shopping_list: list,
+                   substitute: Callable[[list], tuple[list, list]] | None = None) -> tuple[list, dict]:
+    """
+    Preços da lista no `index` → (itens {item, prices}, `run`: items_count,
+    missing_from_cache, substitutions, hits e lookups desta lista, para registar e
+    anotar o resultado). `substitute` (ex.: substitute_brands com a store e as marcas
+    já ligadas) troca entradas no lugar e devolve (substituições, hits).
+    """
+    start = len(index.hits)
+    items_with_prices = [
+        {"item": item, "prices": prices} for item, prices in zip(shopping_list, index.resolve(shopping_list))
+    ]
+    hits = index.hits[start:]
+    substitutions = []
+    if substitute is not None:
+        substitutions, substitute_hits = substitute(items_with_prices)
+        hits += substitute_hits
     missing_from_cache = []
-    for item in shopping_list:
-        prices = {}
-        for market in MARKETS:
-            cached = get_cached_price(cache, market, item["name"])
-            if cached:
-                prices[market] = cached
-        items_with_prices.append({"item": item, "prices": prices})
-        if not prices:
-            missing_from_cache.append(item["name"])
-
-    # Otimizar
-    result = optimize_split(items_with_prices)
+    found = {m: 0 for m in MARKETS}
+    for d in items_with_prices:
+        for market in d["prices"]:
+            found[market] += 1
+        if not d["prices"]:
+            missing_from_cache.append(d["item"]["name"])
+    run = {"items_count": len(shopping_list), "missing_from_cache": missing_from_cache,
+           "substitutions": substitutions, "hits": hits,
+           "lookups": {m: (len(shopping_list), found[m]) for m in MARKETS}}
+    return items_with_prices, run
+
+
+def annotate_result(result: dict, run: dict, prefs: dict) -> dict:
+    """Data, nº de itens, substituições de marca, aviso dos itens sem preço e budget check no resultado."""
     result["generated_at"] = datetime.now(timezone.utc).isoformat()
-    result["items_count"] = len(shopping_list)
+    result["items_count"] = run["items_count"]
+    if run.get("substitutions"):
+        result["brand_substitutions"] = run["substitutions"]
 
+    missing_from_cache = run["missing_from_cache"]
     if missing_from_cache:
         result["missing_from_cache"] = missing_from_cache
         result["warning"] = (
@@ -436,6 +930,64 @@ def main():
 
     # Verificar budget
     result["budget_check"] = check_budget(result["total"], prefs)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparação de preços multi-mercado")
+    parser.add_argument("--output", "-o", help="Ficheiro de output (default: stdout)")
+    parser.add_argument("--exact", action="store_true",
+                        help="Split ótimo por branch-and-bound (entrega, min_order, cupões)")
+    parser.add_argument("--time-budget", type=float, default=EXACT_TIME_BUDGET_SECONDS,
+                        help=f"Segundos para o modo --exact (default: {EXACT_TIME_BUDGET_SECONDS})")
+    parser.add_argument("--no-result-cache", action="store_true",
+                        help="Otimizar sempre, sem reutilizar resultados de data/comparison_cache/")
+    parser.add_argument("--no-pareto", action="store_true",
+                        help="Sem a fronteira custo × encomendas × substituições de marca")
+    parser.add_argument("--brand-penalty", type=float, default=BRAND_PENALTY_PCT, metavar="PCT",
+                        help="Agravamento (%%) das marcas aceitáveis que não a preferida "
+                             f"(default: {BRAND_PENALTY_PCT:g})")
+    parser.add_argument("--no-substitution", action="store_true",
+                        help="Só as entradas encontradas pelo nome, sem candidatos de marcas aceitáveis")
+    parser.add_argument("--scenarios", metavar="FICHEIRO",
+                        help="Cenários NDJSON (- para stdin): um resultado NDJSON por cenário (ver scenarios.py)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Processos para --scenarios (default: nº de CPUs)")
+    args = parser.parse_args()
+    if args.brand_penalty < 0:
+        print(json.dumps({"error": "--brand-penalty não pode ser negativo"}, ensure_ascii=False))
+        sys.exit(0)
+
+    if args.scenarios:
+        from scenarios import run_scenarios  # import tardio: scenarios importa price_compare
+        if args.scenarios != "-" and not Path(args.scenarios).exists():
+            print(json.dumps({"error": f"Ficheiro não encontrado: {args.scenarios}"}, ensure_ascii=False))
+            sys.exit(0)
+        lines = sys.stdin if args.scenarios == "-" else open(args.scenarios)
+        out = open(args.output, "w") if args.output else sys.stdout
+
+        def write(line: str) -> None:
+            out.write(line + "\n")
+            out.flush()  # cada cenário sai assim que termina
+
+        try:
+            summary = run_scenarios(lines, write, jobs=args.jobs,
+                                    brand_penalty_pct=None if args.no_substitution else args.brand_penalty)
+        finally:
+            if lines is not sys.stdin:
+                lines.close()
+            if out is not sys.stdout:
+                out.close()
+        # o resumo vai para stderr: stdout fica só com uma linha por cenário
+        print(json.dumps(summary, ensure_ascii=False), file=sys.stderr)
+        return
+
+    result = run_comparison(exact=args.exact, time_budget=args.time_budget,
+                            use_result_cache=not args.no_result_cache, pareto=not args.no_pareto,
+                            brand_penalty_pct=None if args.no_substitution else args.brand_penalty)
+    if "error" in result:
+        print(json.dumps(result, ensure_ascii=False))
+        sys.exit(0)
 
     output = json.dumps(result, indent=2, ensure_ascii=False)
 
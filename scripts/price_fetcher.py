@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Recolha concorrente de preços a partir das páginas de pesquisa dos mercados.
+
+Complementa a recolha manual via browser tool: recebe pares (mercado, pesquisa),
+faz os pedidos em paralelo com asyncio + aiohttp e grava os resultados na cache
+numa única escrita (price_cache.write_entries).
+
+Por mercado (config.FETCH_CONFIG):
+  - semáforo: no máximo `concurrency` pedidos em simultâneo
+  - token bucket: `rate_per_second` pedidos/s em média, rajadas até `burst`
+  - retry com backoff exponencial e jitter (429/5xx/erros de rede; respeita Retry-After)
+
+Os parsers são registados por mercado (@register_parser). Os dois mercados atuais
+lêem os dados estruturados schema.org (JSON-LD) das páginas — sem seletores CSS,
+como nos guias de referência. Preços em texto passam por parse_price_pt.
+
+Usage:
+  python3 price_fetcher.py fetch [--jobs jobs.ndjson] [--dry-run]   ({"market", "query"} por linha; stdin por omissão)
+  python3 price_fetcher.py fetch --plan [--limit 50] [--dry-run]     (fila de price_cache.py refresh-plan)
+
+Requer aiohttp (requirements.txt); os parsers e o rate limiting não dependem dele.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from urllib.parse import quote_plus
+
+from config import FETCH_CONFIG
+from price_cache import build_entry, parse_price_pt, write_entries
+
+try:
+    import aiohttp
+except ImportError:  # a recolha automática é opcional; o resto da skill não precisa de aiohttp
+    aiohttp = None
+
+MAX_ATTEMPTS = 4
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+REQUEST_TIMEOUT_SECONDS = 20.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+USER_AGENT = "grocery-manager-pt/0.2 (+https://github.com/nmcarv/grocery-manager-pt)"
+
+FETCH_ERRORS: tuple = (OSError, asyncio.TimeoutError) + ((aiohttp.ClientError,) if aiohttp else ())
+
+
+# ---------------------------------------------------------------------------
+# Rate limiting
+# ---------------------------------------------------------------------------
+
+class TokenBucket:
+    """Token bucket para um único event loop: `rate` tokens/s, no máximo `capacity` acumulados."""
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def backoff_delay(attempt: int, rng: random.Random, retry_after: float | None = None) -> float:
+    """Full jitter: uniforme em [0, min(máx, base·2^tentativa)], nunca abaixo do Retry-After."""
+    delay = rng.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
+
+
+def _retry_after(headers) -> float | None:
+    value = (headers or {}).get("Retry-After")
+    try:
+        return min(BACKOFF_MAX_SECONDS, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Parsers
+# ---------------------------------------------------------------------------
+
+PARSERS: dict = {}
+
+
+def register_parser(*markets: str):
+    """Regista `fn(texto) → [data]` como parser da página de pesquisa dos mercados indicados."""
+    def decorator(fn):
+        for market in markets:
+            PARSERS[market] = fn
+        return fn
+    return decorator
+
+
+_JSON_LD_RE = re.compile(
+    r"<script[^>]*type=[\"']application/ld\+json[\"'][^>]*>(.*?)</script>", re.DOTALL | re.IGNORECASE
+)
+
+# UN/CEFACT (referenceQuantity.unitCode) → unidade da cache
+_UNIT_CODES = {"KGM": "kg", "GRM": "g", "LTR": "L", "MLT": "ml", "CLT": "cl", "H87": "un", "C62": "un"}
+
+
+def _as_price(value) -> float | None:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return parse_price_pt(value) if isinstance(value, str) else None
+
+
+def _iter_products(node):
+    """Produtos schema.org num documento JSON-LD (diretos, em @graph ou em ItemList)."""
+    if isinstance(node, list):
+        for item in node:
+            yield from _iter_products(item)
+    elif isinstance(node, dict):
+        types = node.get("@type")
+        if types == "Product" or (isinstance(types, list) and "Product" in types):
+            yield node
+        for field in ("@graph", "itemListElement", "item"):
+            if field in node:
+                yield from _iter_products(node[field])
+
+
+def _product_data(product: dict) -> dict | None:
+    offers = product.get("offers")
+    offer = offers[0] if isinstance(offers, list) and offers else offers
+    if not isinstance(offer, dict):
+        return None
+    price = _as_price(offer.get("price", offer.get("lowPrice")))
+    if price is None:
+        return None
+
+    data = {"price": price, "unit": "un", "title": product.get("name")}
+    specs = offer.get("priceSpecification") or []
+    for spec in specs if isinstance(specs, list) else [specs]:
+        if not isinstance(spec, dict) or spec.get("@type") != "UnitPriceSpecification":
+            continue
+        quantity = spec.get("referenceQuantity")
+        if not isinstance(quantity, dict):
+            quantity = {}
+        unit = _UNIT_CODES.get(quantity.get("unitCode")) or quantity.get("unitText")
+        per_unit = _as_price(spec.get("price"))
+        if unit and per_unit is not None:
+            data["price_per_unit"], data["unit"] = per_unit, unit
+            break
+
+    brand = product.get("brand")
+    data["brand"] = brand.get("name") if isinstance(brand, dict) else brand
+    availability = str(offer.get("availability", ""))
+    data["available"] = not availability.endswith(("OutOfStock", "SoldOut", "Discontinued"))
+    url = offer.get("url") or product.get("url")
+    if url:
+        data["product_url"] = url
+    return data
+
+
+@register_parser("continente", "pingodoce")
+def parse_json_ld(text: str) -> list[dict]:
+    """Produtos (pela ordem da página) a partir dos blocos <script type="application/ld+json">."""
+    products = []
+    for block in _JSON_LD_RE.findall(text):
+        try:
+            doc = json.loads(block)
+        except json.JSONDecodeError:
+            continue
+        for product in _iter_products(doc):
+            data = _product_data(product)
+            if data is not None:
+                products.append(data)
+    return products
+
+
+# ---------------------------------------------------------------------------
+# Fetch
+# ---------------------------------------------------------------------------
+
+async def fetch_job(get, market: str, query: str, url: str, semaphore, bucket, rng) -> dict:
+    """Um par (mercado, pesquisa), com retry. `get(url)` → (status, headers, texto)."""
+    result = {"market": market, "query": query, "attempts": 0}
+    for attempt in range(MAX_ATTEMPTS):
+        result["attempts"] = attempt + 1
+        status, headers, error = None, None, None
+        async with semaphore:
+            await bucket.acquire()
+            try:
+                status, headers, text = await get(url)
+            except FETCH_ERRORS as e:
+                error = f"{type(e).__name__}: {e}"
+            except Exception as e:  # resposta ilegível (p.ex. decode): só esta pesquisa falha, sem retry
+                result.update(status=None, error=f"{type(e).__name__}: {e}")
+                return result
+
+        if status == 200:
+            try:
+                products = PARSERS[market](text)
+            except Exception as e:  # um parser que falha numa página não interrompe as outras pesquisas
+                result.update(status=status, error=f"Parser: {type(e).__name__}: {e}")
+                return result
+            result.update(status=status, products=products)
+            # um retry bem-sucedido não herda o erro da tentativa anterior
+            result.pop("error", None)
+            if not products:
+                result["error"] = "Sem resultados"
+            return result
+        if status is not None and status not in RETRY_STATUSES:
+            result.update(status=status, error=f"HTTP {status}")
+            return result
+        result.update(status=status, error=error or f"HTTP {status}")
+        if attempt + 1 < MAX_ATTEMPTS:
+            await asyncio.sleep(backoff_delay(attempt, rng, _retry_after(headers)))
+    return result
+
+
+def _aiohttp_get(session):
+    async def get(url: str):
+        async with session.get(url) as response:
+            return response.status, response.headers, await response.text()
+    return get
+
+
+async def fetch_all(
+    jobs: list[tuple[str, str]], get=None, config: dict | None = None, seed: int | None = None
+) -> list[dict]:
+    """
+    Resultados de cada par (mercado, pesquisa) único, pela ordem de `jobs`.
+    Sem `get`, abre uma sessão aiohttp.
+    """
+    config = FETCH_CONFIG if config is None else config
+    jobs = list(dict.fromkeys((market.lower(), query.strip()) for market, query in jobs))
+    unknown = sorted({m for m, _ in jobs if m not in config or m not in PARSERS})
+    if unknown:
+        raise ValueError(f"Mercado sem configuração de recolha: {unknown}")
+
+    if get is None:
+        if aiohttp is None:
+            raise RuntimeError("price_fetcher requer aiohttp (pip install -r requirements.txt)")
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_SECONDS)
+        async with aiohttp.ClientSession(timeout=timeout, headers={"User-Agent": USER_AGENT}) as session:
+            return await fetch_all(jobs, _aiohttp_get(session), config, seed)
+
+    rng = random.Random(seed)
+    markets = {m for m, _ in jobs}
+    semaphores = {m: asyncio.Semaphore(config[m]["concurrency"]) for m in markets}
+    buckets = {m: TokenBucket(config[m]["rate_per_second"], config[m]["burst"]) for m in markets}
+    return await asyncio.gather(*(
+        fetch_job(
+            get, market, query, config[market]["search_url"].format(query=quote_plus(query)),
+            semaphores[market], buckets[market], rng,
+        )
+        for market, query in jobs
+    ))
+
+
+def store_results(results: list[dict], dry_run: bool = False) -> dict:
+    """
+    Grava o primeiro produto (o mais relevante, pela ordem da página) de cada
+    pesquisa bem-sucedida, com o nome lido da página como nome do produto na cache
+    (a chave sai de normalize_key, como no `price_cache.py update`); sem nome, a pesquisa.
+    """
+    rows = []
+    for r in results:
+        if r.get("products"):
+            product = r["products"][0]
+            data = {k: v for k, v in product.items() if k != "title"}
+            name = product.get("title") if isinstance(product.get("title"), str) else None
+            rows.append(build_entry(r["market"], (name or "").strip() or r["query"], data, field="products[0]"))
+    if rows and not dry_run:
+        write_entries(rows)
+    return {
+        "jobs": len(results),
+        "stored": 0 if dry_run else len(rows),
+        "failed": [
+            {"market": r["market"], "query": r["query"], "status": r.get("status"), "error": r.get("error")}
+            for r in results if not r.get("products")
+        ],
+        "results": [
+            {
+                "market": r["market"], "query": r["query"], "attempts": r["attempts"],
+                "match": r["products"][0] if r.get("products") else None,
+            }
+            for r in results
+        ],
+    }
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def read_jobs(lines: list[str]) -> tuple[list[tuple[str, str]], list[dict]]:
+    """NDJSON {"market", "query"} (ou "product") → (jobs, erros por linha)."""
+    jobs, errors = [], []
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            errors.append({"line": line_no, "error": f"JSON inválido: {e}"})
+            continue
+        if not isinstance(record, dict):
+            record = {}
+        query = record.get("query") or record.get("product")
+        if not isinstance(query, str) or not isinstance(record.get("market"), str):
+            errors.append({"line": line_no, "error": 'Registo deve ter "market" e "query"'})
+            continue
+        jobs.append((record["market"], query))
+    return jobs, errors
+
+
+def cmd_fetch(args) -> dict:
+    if args.plan:
+        from price_cache import cmd_refresh_plan
+        plan = cmd_refresh_plan(argparse.Namespace(limit=args.limit, market=None))
+        jobs, errors = [(row["market"], row["product"]) for row in plan["queue"]], []
+    else:
+        if args.jobs and args.jobs != "-":
+            path = Path(args.jobs)
+            if not path.exists():
+                return {"error": f"Ficheiro não encontrado: {path}"}
+            lines = path.read_text().splitlines()
+        else:
+            lines = sys.stdin.read().splitlines()
+        jobs, errors = read_jobs(lines)
+
+    if not jobs:
+        return {"jobs": 0, "stored": 0, "errors": errors}
+    try:
+        results = asyncio.run(fetch_all(jobs))
+    except (ValueError, RuntimeError) as e:
+        return {"error": str(e)}
+    summary = store_results(results, dry_run=args.dry_run)
+    if errors:
+        summary["errors"] = errors
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recolha concorrente de preços (asyncio + aiohttp)")
+    sub = parser.add_subparsers(dest="command")
+
+    p_fetch = sub.add_parser("fetch", help="Pesquisar preços e gravar na cache")
+    p_fetch.add_argument("--jobs", default=None, help='NDJSON com {"market", "query"} por linha (default: stdin)')
+    p_fetch.add_argument("--plan", action="store_true", help="Usar a fila de price_cache.py refresh-plan")
+    p_fetch.add_argument("--limit", type=int, default=None, help="Tamanho da fila com --plan")
+    p_fetch.add_argument("--dry-run", action="store_true", help="Não gravar na cache")
+
+    args = parser.parse_args()
+
+    if args.command == "fetch":
+        result = cmd_fetch(args)
+    else:
+        parser.print_help()
+        sys.exit(1)
+        return
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
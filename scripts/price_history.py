@@ -0,0 +1,168 @@
+"""
+Histórico de preços por produto (série temporal append-only).
+
+A cache guarda apenas o último preço de cada produto; este módulo guarda todos
+os preços observados, para responder a perguntas como "esta promoção é mesmo
+barata?" sem voltar a fazer scraping.
+
+Formato em disco — um ficheiro por (mercado, produto):
+  data/price_history/<market>/<sha1(key)[:20]>.bin
+  cabeçalho: b"GPH1" + uint16 (tamanho da chave) + chave UTF-8
+  registos:  struct "<ddd" → (timestamp epoch, price, effective_price), NaN = ausente
+
+Cada `update` acrescenta um registo (24 bytes) apenas se o preço mudou desde o
+último registo. Em memória a série vive em arrays tipados (array("d")), não em
+listas de dicts, e só a série consultada é carregada.
+"""
+
+import bisect
+import fcntl
+import hashlib
+import math
+import os
+import struct
+import time
+from array import array
+from pathlib import Path
+
+MAGIC = b"GPH1"
+_HEADER_LEN = struct.Struct("<H")
+RECORD = struct.Struct("<ddd")
+
+
+def effective_price(entry: dict) -> float | None:
+    """Preço efetivo de uma entrada de cache (promoção se existir)."""
+    return entry.get("promo_effective_price") or entry.get("price")
+
+
+def _as_float(value) -> float:
+    return float(value) if isinstance(value, (int, float)) else math.nan
+
+
+def _same(a: float, b: float) -> bool:
+    return a == b or (math.isnan(a) and math.isnan(b))
+
+
+def series_path(base_dir: Path, market: str, key: str) -> Path:
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+    return Path(base_dir) / market / f"{digest}.bin"
+
+
+def append_price(base_dir: Path, market: str, key: str, ts: float, entry: dict) -> bool:
+    """
+    Acrescenta (ts, price, effective) à série de (market, key).
+    Retorna False (sem escrever) se o preço é igual ao do último registo.
+    """
+    price = _as_float(entry.get("price"))
+    effective = _as_float(effective_price(entry))
+    if math.isnan(price) and math.isnan(effective):
+        return False
+
+    path = series_path(base_dir, market, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        size = os.fstat(fd).st_size
+        if size == 0:
+            raw_key = key.encode("utf-8")
+            os.write(fd, MAGIC + _HEADER_LEN.pack(len(raw_key)) + raw_key)
+        else:
+            header = len(MAGIC) + _HEADER_LEN.size + len(key.encode("utf-8"))
+            if size >= header + RECORD.size:
+                _, last_price, last_effective = RECORD.unpack(os.pread(fd, RECORD.size, size - RECORD.size))
+                if _same(last_price, price) and _same(last_effective, effective):
+                    return False
+        os.write(fd, RECORD.pack(ts, price, effective))
+        return True
+    finally:
+        os.close(fd)
+
+
+class PriceSeries:
+    """Série de preços de um produto num mercado, em arrays tipados paralelos."""
+
+    def __init__(self, key: str, timestamps: array, prices: array, effective: array):
+        self.key = key
+        self.timestamps = timestamps
+        self.prices = prices
+        self.effective = effective
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @classmethod
+    def load(cls, path: Path) -> "PriceSeries | None":
+        if not path.exists():
+            return None
+        raw = path.read_bytes()
+        if not raw.startswith(MAGIC):
+            return None
+        offset = len(MAGIC)
+        (key_len,) = _HEADER_LEN.unpack_from(raw, offset)
+        offset += _HEADER_LEN.size
+        key = raw[offset:offset + key_len].decode("utf-8")
+        offset += key_len
+        body = raw[offset:]
+        body = body[:len(body) - len(body) % RECORD.size]  # registo incompleto no fim
+        values = array("d")
+        values.frombytes(body)
+        return cls(key, values[0::3], values[1::3], values[2::3])
+
+    def stats(self, window_days: float | None = None, now: float | None = None) -> dict:
+        """
+        min, max, média e preço actual (normal e efetivo) na janela [now - window, now].
+        Sem `window_days`, usa a série completa; com 0, só o preço em vigor em `now`.
+        Levanta ValueError com uma janela negativa.
+        """
+        if window_days is not None and window_days < 0:
+            raise ValueError(f"Janela negativa: {window_days}")
+        now = time.time() if now is None else now
+        if window_days is None:
+            start = self.timestamps[0] if self else now
+        else:
+            start = now - window_days * 86400
+        return {
+            "observations": len(self),
+            "price": self._summary(self.prices, start, now),
+            "effective": self._summary(self.effective, start, now),
+        }
+
+    def _summary(self, values: array, start: float, now: float) -> dict | None:
+        """
+        A série é uma função em escada (cada preço vale até à mudança seguinte), por
+        isso o preço em vigor no início da janela também conta, e a média pesa cada
+        preço pelo tempo em que esteve em vigor.
+        """
+        ts = self.timestamps
+        if not ts:
+            return None
+        first = max(0, bisect.bisect_right(ts, start) - 1)
+
+        lo, hi = math.inf, -math.inf
+        weighted = 0.0
+        duration = 0.0
+        for i in range(first, len(ts)):
+            v = values[i]
+            if math.isnan(v):
+                continue
+            lo = min(lo, v)
+            hi = max(hi, v)
+            seg_start = max(ts[i], start)
+            seg_end = ts[i + 1] if i + 1 < len(ts) else now
+            span = max(0.0, seg_end - seg_start)
+            weighted += v * span
+            duration += span
+        if lo == math.inf:
+            return None
+        current = values[-1]
+        return {
+            "min": round(lo, 2),
+            "max": round(hi, 2),
+            "mean": round(weighted / duration, 2) if duration > 0 else round(hi, 2),
+            "current": None if math.isnan(current) else round(current, 2),
+        }
+
+
+def load_series(base_dir: Path, market: str, key: str) -> PriceSeries | None:
+    return PriceSeries.load(series_path(base_dir, market, key))
@@ -0,0 +1,188 @@
+"""
+Matriz de custos de linha itens × mercados para o price_compare.
+
+Cada mercado é uma coluna `array('d')` com o custo de cada item na quantidade
+pedida — promoções multi-unidade incluídas (promotions.py); sem quantidade nem
+promoção, o `promo_effective_price` ou `price` — e `inf` onde o item não está
+disponível; `available` guarda a máscara correspondente em bytes. Os dicts de preços são
+lidos uma única vez, na construção — greedy, subtotais e alternativas
+single-store passam a ser operações por coluna (`map(min, ...)`, `compress`,
+`sum`) executadas em C, em vez de ciclos Python sobre `prices.get(market)`.
+
+Usado por:
+  - price_compare.greedy_assignments → `cheapest()` (com preferred_store)
+  - price_compare.summarize_split    → `column_total()` (alternativas single-store)
+  - price_compare.optimize_exact     → `options()` por item
+  - split_session.SplitSession       → `insert_row()`/`set_row()`/`delete_row()` e `best()`
+"""
+
+import math
+from array import array
+from itertools import compress, repeat
+from operator import add, eq, lt, mul, sub
+
+from config import ONLINE_MARKET_IDS
+from promotions import LinePricer
+
+INF = math.inf
+
+
+def effective_price(price_info: dict | None) -> float | None:
+    """Preço efetivo (promo se existir) de um item disponível; None se indisponível."""
+    if not price_info or not price_info.get("available", True):
+        return None
+    return price_info.get("promo_effective_price") or price_info.get("price")
+
+
+class PriceMatrix:
+    """
+    Custo de linha de `items_with_prices` ({item, prices}) nos `markets`, por coluna:
+    o preço da quantidade pedida (`item.quantity`) com as promoções multi-unidade,
+    calculado pelo `pricer` (LinePricer, partilhável entre execuções).
+    """
+
+    def __init__(self, items_with_prices: list, markets: list[str], pricer: LinePricer | None = None):
+        self.markets = list(markets)
+        self.n = len(items_with_prices)
+        self.items = items_with_prices
+        self.pricer = pricer if pricer is not None else LinePricer()
+        line_cost = self.pricer.total
+        self.columns: list[array] = [array("d") for _ in self.markets]
+        online = {m: j for j, m in enumerate(self.markets) if m in ONLINE_MARKET_IDS}
+        wanted = []  # (linha, índice) dos itens com preferred_store online
+        # uma passagem pelos itens. Sem quantidade nem promoção o custo é o preço efetivo,
+        # com o corpo de effective_price inline (é o ciclo quente); o resto vai ao pricer
+        appends = list(zip(self.markets, (column.append for column in self.columns)))
+        for i, d in enumerate(items_with_prices):
+            item = d["item"]
+            preferred = item.get("preferred_store")
+            if preferred in online:
+                wanted.append((i, online[preferred]))
+            quantity = item.get("quantity")
+            prices = d["prices"]
+            for market, append in appends:
+                info = prices.get(market)
+                if not info or not info.get("available", True):
+                    append(INF)
+                    continue
+                if quantity or info.get("promo"):
+                    p = line_cost(info, quantity)
+                else:
+                    p = info.get("promo_effective_price") or info.get("price")
+                append(INF if p is None else p)
+        self.available: list[bytearray] = [bytearray(map(math.isfinite, column)) for column in self.columns]
+
+        # Índice do mercado online preferido, se lá estiver disponível; -1 caso contrário
+        self.preferred = array("i", repeat(-1, self.n))
+        for i, j in wanted:
+            if self.available[j][i]:
+                self.preferred[i] = j
+
+    def _row(self, item_data: dict) -> tuple[list[float], int]:
+        """(custo em cada mercado, índice do mercado online preferido ou -1) — o cálculo de __init__."""
+        item = item_data["item"]
+        quantity = item.get("quantity")
+        prices = item_data["prices"]
+        costs = []
+        for market in self.markets:
+            info = prices.get(market)
+            if not info or not info.get("available", True):
+                costs.append(INF)
+                continue
+            if quantity or info.get("promo"):
+                p = self.pricer.total(info, quantity)
+            else:
+                p = info.get("promo_effective_price") or info.get("price")
+            costs.append(INF if p is None else p)
+        preferred = item.get("preferred_store")
+        j = self.markets.index(preferred) if preferred in ONLINE_MARKET_IDS and preferred in self.markets else -1
+        return costs, (j if j >= 0 and math.isfinite(costs[j]) else -1)
+
+    def append_row(self, item_data: dict) -> int:
+        """Acrescenta um item (no fim de `items`). Devolve a linha."""
+        return self.insert_row(self.n, item_data)
+
+    def insert_row(self, i: int, item_data: dict) -> int:
+        """Insere um item na linha `i`; as seguintes sobem uma posição. Devolve a linha."""
+        i = min(max(i, 0), self.n)
+        costs, preferred = self._row(item_data)
+        for column, mask, cost in zip(self.columns, self.available, costs):
+            column.insert(i, cost)
+            mask.insert(i, math.isfinite(cost))
+        self.preferred.insert(i, preferred)
+        self.items.insert(i, item_data)
+        self.n += 1
+        return i
+
+    def set_row(self, i: int, item_data: dict) -> None:
+        """Substitui o item da linha `i` (preços ou quantidade alterados)."""
+        costs, preferred = self._row(item_data)
+        for column, mask, cost in zip(self.columns, self.available, costs):
+            column[i] = cost
+            mask[i] = math.isfinite(cost)
+        self.preferred[i] = preferred
+        self.items[i] = item_data
+
+    def delete_row(self, i: int) -> None:
+        """Remove a linha `i`; as seguintes descem uma posição."""
+        for column, mask in zip(self.columns, self.available):
+            del column[i]
+            del mask[i]
+        del self.preferred[i]
+        del self.items[i]
+        self.n -= 1
+
+    def best(self, i: int, honor_preferred: bool = True) -> int:
+        """Mercado de `cheapest()` para a linha `i` (-1 se indisponível em todos)."""
+        if honor_preferred and self.preferred[i] >= 0:
+            return self.preferred[i]
+        choice, best = -1, INF
+        for j, column in enumerate(self.columns):
+            if column[i] < best:
+                choice, best = j, column[i]
+        return choice
+
+    def price(self, i: int, j: int) -> float:
+        return self.columns[j][i]
+
+    def line(self, i: int, j: int) -> dict | None:
+        """Detalhe da linha (unidades, preço unitário, promoção aplicada) do item `i` no mercado `j`."""
+        d = self.items[i]
+        return self.pricer.line(d["prices"].get(self.markets[j]), d["item"].get("quantity"))
+
+    def options(self, i: int) -> list[tuple[float, int]]:
+        """(preço, índice do mercado) disponíveis para o item `i`, do mais barato ao mais caro."""
+        return sorted((col[i], j) for j, col in enumerate(self.columns) if self.available[j][i])
+
+    def cheapest(self, honor_preferred: bool = True) -> tuple[list[int], list[float]]:
+        """
+        Mercado (índice, -1 se indisponível em todos) e preço de cada item: o mais barato,
+        com empates para o primeiro mercado da lista. Com `honor_preferred`, itens com
+        preferred_store disponível ficam nesse mercado.
+        """
+        # argmin coluna a coluna, sem ciclo Python por item: choice += (col < best) × (j − choice).
+        # Só um preço estritamente menor muda o mercado — empates ficam com o primeiro.
+        best = list(self.columns[0]) if self.columns else [INF] * self.n
+        choice = [0] * self.n
+        for j in range(1, len(self.columns)):
+            column = self.columns[j]
+            better = bytes(map(lt, column, best))
+            best = list(map(min, best, column))
+            choice = list(map(add, choice, map(mul, better, map(sub, repeat(j), choice))))
+        for i in compress(range(self.n), map(INF.__eq__, best)):
+            choice[i] = -1
+        if honor_preferred:
+            for i in compress(range(self.n), map((-1).__ne__, self.preferred)):
+                j = self.preferred[i]
+                choice[i] = j
+                best[i] = self.columns[j][i]
+        return choice, best
+
+    def column_total(self, j: int) -> tuple[float, bool]:
+        """(subtotal dos itens disponíveis no mercado `j`, se todos estão disponíveis)."""
+        mask = self.available[j]
+        return sum(compress(self.columns[j], mask)), mask.count(0) == 0
+
+    def subtotals(self, choice: list[int]) -> list[float]:
+        """Subtotal de cada mercado para uma atribuição `choice` (índices por item)."""
+        return [sum(compress(col, map(eq, choice, repeat(j)))) for j, col in enumerate(self.columns)]
@@ -0,0 +1,335 @@
+"""
+Preço de linha com quantidade e promoções multi-unidade.
+
+O campo `promo` da cache é texto livre copiado do site ("Leve 3 pague 2",
+"50% na 2ª unidade", "2 por 4,50€", "Poupa 20%") ou um descritor estruturado:
+
+  {"type": "multi_buy",   "buy": 3, "pay": 2}
+  {"type": "nth_unit",    "nth": 2, "percent": 50}
+  {"type": "bundle",      "units": 2, "price": 4.50}
+  {"type": "percent_off", "percent": 20}
+
+todos com `max_units` opcional (a promoção só se aplica às primeiras N unidades).
+`parse_promo` converte ambos num PromoRule; texto não reconhecido dá None e o
+preço efetivo continua a ser `promo_effective_price`, como antes.
+
+A quantidade pedida ({value, unit} da lista de compras) é convertida em
+embalagens a partir do tamanho da embalagem: `pack_size` da entrada, senão o
+tamanho no nome ("1.5L", "12un", "6x1L"), senão `price` / `price_per_unit`.
+Com promoções de grupo, compra-se mais uma ou outra unidade se isso sair mais
+barato (ex: "3 por 3,50€" a 2€/un para 2 unidades → 3 unidades por 3,50€).
+
+LinePricer memoiza o resultado por (entrada, quantidade): o optimizer avalia
+as mesmas linhas em cada mercado, alternativa e passo de rebalanceamento.
+"""
+
+import math
+import re
+from abc import ABC, abstractmethod
+
+from cache_store import UNIT_BASES
+
+# Folga ao arredondar para embalagens: 24 ovos em caixas de "11,86" (preço/preço
+# unitário arredondado ao cêntimo) continuam a ser 2 caixas, não 3.
+PACK_ROUNDING_TOLERANCE = 0.05
+
+_NUM = r"(\d+(?:[.,]\d+)?)"
+_UNITS = "|".join(sorted(UNIT_BASES, key=len, reverse=True))
+_MULTIPACK_RE = re.compile(rf"(\d+)\s*x\s*{_NUM}\s*({_UNITS})\b", re.IGNORECASE)
+_PACK_RE = re.compile(rf"{_NUM}\s*({_UNITS})\b", re.IGNORECASE)
+_MULTI_BUY_RE = re.compile(r"leve\s*(\d+)\W*pague\s*(\d+)")
+_NTH_UNIT_RE = re.compile(rf"{_NUM}\s*%(?:\s*de\s*desconto)?\s*na\s*(\d+)\s*[ªºa.o]?\s*(?:unidade|unid|un)")
+_BUNDLE_RE = re.compile(rf"(\d+)\s*(?:un\w*\s*)?por\s*{_NUM}\s*(?:€|eur)")
+_PERCENT_RE = re.compile(rf"(?:poupa|desconto|-)\s*{_NUM}\s*%")
+_MAX_RE = re.compile(r"m[aá]x(?:imo)?\.?\s*(\d+)")
+
+
+def _number(text: str) -> float:
+    return float(text.replace(",", "."))
+
+
+# ---------------------------------------------------------------------------
+# Regras
+# ---------------------------------------------------------------------------
+
+class PromoRule(ABC):
+    """Promoção sobre o preço base de uma unidade. `group` = unidades por ciclo da promoção."""
+
+    group = 1
+
+    def __init__(self, max_units: int | None = None):
+        self.max_units = max_units
+
+    @abstractmethod
+    def _discounted(self, units: int, price: float) -> float:
+        """Custo de `units` unidades, todas abrangidas pela promoção."""
+
+    def total(self, units: int, price: float) -> float:
+        """Custo de `units` unidades a `price` cada, com a promoção até `max_units`."""
+        eligible = units if self.max_units is None else min(units, self.max_units)
+        return self._discounted(eligible, price) + (units - eligible) * price
+
+    @abstractmethod
+    def describe(self) -> str:
+        """Texto da promoção para mostrar ao utilizador."""
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and vars(self) == vars(other)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{k}={v!r}' for k, v in vars(self).items())})"
+
+
+class MultiBuy(PromoRule):
+    """Leve `buy` pague `pay`."""
+
+    def __init__(self, buy: int, pay: int, max_units: int | None = None):
+        super().__init__(max_units)
+        self.buy, self.pay = buy, pay
+        self.group = buy
+
+    def _discounted(self, units: int, price: float) -> float:
+        groups, rest = divmod(units, self.buy)
+        return (groups * self.pay + rest) * price
+
+    def describe(self) -> str:
+        return f"Leve {self.buy} pague {self.pay}"
+
+
+class NthUnitDiscount(PromoRule):
+    """`percent`% de desconto em cada `nth`-ésima unidade."""
+
+    def __init__(self, nth: int, percent: float, max_units: int | None = None):
+        super().__init__(max_units)
+        self.nth, self.percent = nth, percent
+        self.group = nth
+
+    def _discounted(self, units: int, price: float) -> float:
+        return units * price - (units // self.nth) * price * self.percent / 100
+
+    def describe(self) -> str:
+        return f"{self.percent:g}% na {self.nth}ª unidade"
+
+
+class BundlePrice(PromoRule):
+    """`units` unidades por `price` €."""
+
+    def __init__(self, units: int, price: float, max_units: int | None = None):
+        super().__init__(max_units)
+        self.units, self.price = units, price
+        self.group = units
+
+    def _discounted(self, units: int, price: float) -> float:
+        groups, rest = divmod(units, self.units)
+        return groups * min(self.price, self.units * price) + rest * price
+
+    def describe(self) -> str:
+        return f"{self.units} por {self.price:.2f}€".replace(".", ",")
+
+
+class PercentOff(PromoRule):
+    """`percent`% de desconto em todas as unidades."""
+
+    def __init__(self, percent: float, max_units: int | None = None):
+        super().__init__(max_units)
+        self.percent = percent
+
+    def _discounted(self, units: int, price: float) -> float:
+        return units * price * (1 - self.percent / 100)
+
+    def describe(self) -> str:
+        return f"-{self.percent:g}%"
+
+
+_RULE_TYPES = {
+    "multi_buy": (MultiBuy, ("buy", "pay")),
+    "nth_unit": (NthUnitDiscount, ("nth", "percent")),
+    "bundle": (BundlePrice, ("units", "price")),
+    "percent_off": (PercentOff, ("percent",)),
+}
+
+_PARSED: dict[str, PromoRule | None] = {}
+
+
+def _valid(rule: PromoRule) -> PromoRule | None:
+    """Descarta regras sem desconto ou inconsistentes (ex: "leve 2 pague 3")."""
+    if isinstance(rule, MultiBuy) and not 0 <= rule.pay < rule.buy:
+        return None
+    if isinstance(rule, NthUnitDiscount) and not (rule.nth >= 1 and 0 < rule.percent <= 100):
+        return None
+    if isinstance(rule, BundlePrice) and not (rule.units >= 1 and rule.price >= 0):
+        return None
+    if isinstance(rule, PercentOff) and not 0 < rule.percent <= 100:
+        return None
+    if rule.max_units is not None and rule.max_units < 1:
+        return None
+    return rule
+
+
+def _parse_text(text: str) -> PromoRule | None:
+    text = text.lower()
+    limit = _MAX_RE.search(text)
+    max_units = int(limit.group(1)) if limit else None
+    if m := _MULTI_BUY_RE.search(text):
+        return MultiBuy(int(m.group(1)), int(m.group(2)), max_units)
+    if m := _NTH_UNIT_RE.search(text):
+        return NthUnitDiscount(int(m.group(2)), _number(m.group(1)), max_units)
+    if m := _BUNDLE_RE.search(text):
+        return BundlePrice(int(m.group(1)), _number(m.group(2)), max_units)
+    if m := _PERCENT_RE.search(text):
+        return PercentOff(_number(m.group(1)), max_units)
+    return None
+
+
+def parse_promo(promo) -> PromoRule | None:
+    """Texto ou descritor de `promo` → PromoRule; None se vazio ou não reconhecido."""
+    if isinstance(promo, str):
+        if promo not in _PARSED:
+            rule = _parse_text(promo)
+            _PARSED[promo] = _valid(rule) if rule else None
+        return _PARSED[promo]
+    if isinstance(promo, dict):
+        spec = _RULE_TYPES.get(promo.get("type"))
+        if spec is None:
+            return None
+        cls, fields = spec
+        try:
+            values = [promo[f] for f in fields]
+        except KeyError:
+            return None
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            return None
+        if cls is not PercentOff and not isinstance(values[0], int):
+            return None
+        max_units = promo.get("max_units")
+        if max_units is not None and not isinstance(max_units, int):
+            return None
+        return _valid(cls(*values, max_units=max_units))
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Quantidade → embalagens
+# ---------------------------------------------------------------------------
+
+def _to_base(value: float, unit: str | None) -> tuple[float, str] | None:
+    base = UNIT_BASES.get(str(unit or "").lower().strip())
+    if base is None:
+        return None
+    return value / base[1], base[0]
+
+
+def pack_size(entry: dict) -> tuple[float, str] | None:
+    """Tamanho de uma embalagem na unidade base (kg, L, un), ou None se desconhecido."""
+    explicit = entry.get("pack_size")
+    if isinstance(explicit, (int, float)) and not isinstance(explicit, bool) and explicit > 0:
+        return _to_base(explicit, entry.get("unit") or "un")
+
+    name = entry.get("name") or ""
+    if m := _MULTIPACK_RE.search(name):
+        size = _to_base(int(m.group(1)) * _number(m.group(2)), m.group(3))
+        if size and size[0] > 0:
+            return size
+    if m := _PACK_RE.search(name):
+        size = _to_base(_number(m.group(1)), m.group(2))
+        if size and size[0] > 0:
+            return size
+
+    price, per_unit = entry.get("price"), entry.get("price_per_unit")
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) and v > 0 for v in (price, per_unit)):
+        return _to_base(price / per_unit, entry.get("unit") or "un")
+    return None
+
+
+def units_needed(entry: dict, quantity: dict | None) -> int:
+    """
+    Embalagens a comprar para `quantity` ({value, unit}). Sem quantidade → 1.
+    Se a unidade pedida não for comparável com a da embalagem (ex: "pack"),
+    `value` conta embalagens — exceto pesos e volumes (300 g de queijo sem
+    tamanho de embalagem conhecido são 1 embalagem, não 300).
+    """
+    if not quantity:
+        return 1
+    value = quantity.get("value", 1)
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0:
+        return 1
+    wanted = _to_base(value, quantity.get("unit") or "un")
+    pack = pack_size(entry)
+    if wanted and pack and wanted[1] == pack[1]:
+        value = wanted[0] / pack[0]
+    elif wanted and wanted[1] != "un":
+        return 1
+    return max(1, math.ceil(value - PACK_ROUNDING_TOLERANCE))
+
+
+# ---------------------------------------------------------------------------
+# Preço de linha
+# ---------------------------------------------------------------------------
+
+def line_total(entry: dict, quantity: dict | None = None) -> dict | None:
+    """
+    Custo de comprar `quantity` de `entry` → {units, total, unit_price, promo, savings}.
+    `promo` é a descrição da regra aplicada (None sem promoção reconhecida);
+    `savings` é o desconto face a `units` × preço base. None se indisponível.
+    """
+    if not entry or not entry.get("available", True):
+        return None
+    price = entry.get("price")
+    effective = entry.get("promo_effective_price") or price
+    if effective is None:
+        return None
+    units = units_needed(entry, quantity)
+    rule = parse_promo(entry.get("promo")) if isinstance(price, (int, float)) else None
+
+    if rule is None:
+        total = units * effective
+        base = price if isinstance(price, (int, float)) else effective
+        return {"units": units, "total": total, "unit_price": effective,
+                "promo": None, "savings": max(0.0, units * base - total)}
+
+    # Completar um grupo da promoção se sair mais barato (ou igual com menos unidades: não)
+    best_units, best_total = units, rule.total(units, price)
+    for extra in range(1, rule.group):
+        total = rule.total(units + extra, price)
+        if total < best_total - 1e-9:
+            best_units, best_total = units + extra, total
+    return {"units": best_units, "total": best_total, "unit_price": price,
+            "promo": rule.describe(), "savings": best_units * price - best_total}
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class LinePricer:
+    """line_total memoizado por (entrada, quantidade) para uma execução do optimizer."""
+
+    _FIELDS = ("name", "price", "promo_effective_price", "price_per_unit", "unit", "pack_size", "available")
+
+    def __init__(self):
+        self._memo: dict[tuple, dict | None] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def line(self, entry: dict | None, quantity: dict | None = None) -> dict | None:
+        if not entry:
+            return None
+        quantity = quantity or {}
+        key = (
+            tuple(entry.get(f) for f in self._FIELDS), _freeze(entry.get("promo")),
+            quantity.get("value"), quantity.get("unit"),
+        )
+        if key in self._memo:
+            self.hits += 1
+            return self._memo[key]
+        self.misses += 1
+        result = self._memo[key] = line_total(entry, quantity)
+        return result
+
+    def total(self, entry: dict | None, quantity: dict | None = None) -> float | None:
+        line = self.line(entry, quantity)
+        return None if line is None else line["total"]
@@ -0,0 +1,165 @@
+"""
+Cache de resultados do price_compare, por impressão digital das entradas.
+
+A triagem de domingo, o "mostra a comparação" no WhatsApp e o fluxo de aprovação
+correm muitas vezes o price_compare seguido sobre os mesmos ficheiros. O
+resultado do otimizador é guardado em data/comparison_cache/<sha256>.json, com o
+SHA-256 de:
+  - a lista resolvida: cada item com as entradas de cache que lhe correspondem
+    (preço, promoção, `cached_at`/`expires_at`, ...) — qualquer atualização de
+    preço de um item da lista, ou uma entrada que expira, muda a chave;
+  - DELIVERY_CONFIG e a config de cupões/saldo por mercado;
+  - o modo (split ou exato, com o orçamento de tempo) e RESULT_CACHE_VERSION.
+Atualizações de produtos fora da lista não mudam a chave.
+
+Resolver a lista custa mais do que o optimize_split, por isso há um atalho:
+sources.json liga a assinatura (mtime, tamanho, inode) de inventory.json e dos
+ficheiros da cache à chave calculada da última vez, até à expiração da primeira
+entrada usada. Com os ficheiros intactos, o resultado sai sem ler a cache. Só se
+ligam assinaturas de ficheiros escritos há mais de SOURCE_SETTLE_NS (uma escrita
+no mesmo "tick" de mtime com o mesmo tamanho passaria despercebida).
+
+Ficam os RESULT_CACHE_MAX_ENTRIES resultados usados mais recentemente (LRU pelo
+mtime, renovado a cada hit); hits e misses acumulados ficam em stats.json.
+Gravação com tmp + os.replace: um leitor nunca vê um ficheiro a meio. As
+atualizações de stats.json e sources.json (ler, alterar, reescrever) fazem-se sob
+flock exclusivo em cache.lock, para execuções concorrentes não perderem contagens
+nem ligações.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Aumentar quando o otimizador passar a dar outro resultado para as mesmas entradas
+RESULT_CACHE_VERSION = 1
+RESULT_CACHE_MAX_ENTRIES = 32
+SOURCE_SETTLE_NS = 50_000_000
+
+
+def _digest(payload) -> str:
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def fingerprint(items_with_prices: list, settings: dict) -> str:
+    """Chave do resultado: lista resolvida + `settings` (entrega, cupões/saldo, modo)."""
+    return _digest({"version": RESULT_CACHE_VERSION, "items": items_with_prices, "settings": settings})
+
+
+def source_signature(paths: list[Path], settings: dict) -> str | None:
+    """
+    Assinatura dos ficheiros de entrada (+ `settings`), ou None se algum foi escrito
+    há menos de SOURCE_SETTLE_NS. Tirar antes de ler os ficheiros.
+    """
+    now = time.time_ns()
+    stats = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            stats.append(None)
+            continue
+        if now - st.st_mtime_ns < SOURCE_SETTLE_NS:
+            return None
+        stats.append([str(path), st.st_mtime_ns, st.st_size, st.st_ino])
+    return _digest({"version": RESULT_CACHE_VERSION, "files": stats, "settings": settings})
+
+
+class ResultCache:
+    """Um ficheiro JSON por chave num diretório, com LRU por mtime, atalho por assinatura e contadores."""
+
+    STATS = "stats.json"
+    SOURCES = "sources.json"
+    LOCK = "cache.lock"
+
+    def __init__(self, directory: Path, max_entries: int = RESULT_CACHE_MAX_ENTRIES):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+
+    @contextmanager
+    def _lock(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / self.LOCK, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _write(self, path: Path, data: dict) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        # json.dumps (encoder em C) em vez de json.dump, que codifica em Python aos bocados
+        tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+        os.replace(tmp, path)
+
+    def _read(self, path: Path) -> dict | None:
+        try:
+            data = json.loads(path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return data if isinstance(data, dict) and data.get("version") == RESULT_CACHE_VERSION else None
+
+    def _count(self, field: str) -> dict:
+        path = self.directory / self.STATS
+        with self._lock():
+            stats = self._read(path) or {"version": RESULT_CACHE_VERSION, "hits": 0, "misses": 0}
+            stats[field] += 1
+            self._write(path, stats)
+        return stats
+
+    def key_for_sources(self, signature: str | None) -> str | None:
+        """Chave ligada a `signature` por `link`, se ainda dentro da validade."""
+        if signature is None:
+            return None
+        link = (self._read(self.directory / self.SOURCES) or {}).get("links", {}).get(signature)
+        if not link or (link["valid_until"] is not None and time.time() >= link["valid_until"]):
+            return None
+        return link["key"]
+
+    def link(self, signature: str | None, key: str, valid_until: float | None) -> None:
+        if signature is None:
+            return
+        path = self.directory / self.SOURCES
+        with self._lock():
+            data = self._read(path) or {"version": RESULT_CACHE_VERSION, "links": {}}
+            links = data["links"]
+            links.pop(signature, None)
+            links[signature] = {"key": key, "valid_until": valid_until}
+            for old in list(links)[:max(0, len(links) - self.max_entries)]:
+                del links[old]
+            self._write(path, data)
+
+    def get(self, key: str | None, count_miss: bool = True) -> tuple[dict | None, dict]:
+        """
+        (entrada {result, run} guardada ou None, {status, hits, misses}). Conta o hit/miss;
+        com `count_miss=False` um miss não conta (há uma segunda consulta a seguir).
+        """
+        path = self.directory / f"{key}.json"
+        entry = self._read(path) if key else None
+        if entry is not None:
+            os.utime(path)  # mais recente para a LRU
+        elif not count_miss:
+            return None, {"status": "miss"}
+        stats = self._count("misses" if entry is None else "hits")
+        status = {"status": "miss" if entry is None else "hit", "hits": stats["hits"], "misses": stats["misses"]}
+        if entry is not None:
+            status["stored_at"] = entry["stored_at"]
+        return entry, status
+
+    def put(self, key: str, result: dict, run: dict | None = None) -> None:
+        """Guarda `result` (e `run`: o que a execução precisa de repetir sem resolver a lista)."""
+        entry = {"version": RESULT_CACHE_VERSION, "stored_at": datetime.now(timezone.utc).isoformat(),
+                 "result": result, "run": run or {}}
+        self._write(self.directory / f"{key}.json", entry)
+        files = [p for p in self.directory.glob("*.json") if p.name not in (self.STATS, self.SOURCES)]
+        if len(files) > self.max_entries:
+            files.sort(key=lambda p: p.stat().st_mtime_ns)
+            for old in files[:len(files) - self.max_entries]:
+                old.unlink(missing_ok=True)
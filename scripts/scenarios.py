@@ -0,0 +1,213 @@
+"""
+Modo de cenários do price_compare: várias listas comparadas num só processo.
+
+Para o planeamento mensal compara-se a lista semanal, a lista a granel e
+variantes "e se" (sem alguns itens, com outra marca, outra quantidade). Cada
+cenário é uma linha NDJSON:
+
+  {"id": "semanal", "list": "weekly"}
+  {"id": "granel", "list": "bulk", "exact": true}
+  {"id": "sem-vinho", "list": "weekly", "drop": ["vinho"], "set": {"leite": {"preferred_brand": "Agros"}}}
+  {"id": "extra", "items": [{"name": "azeite", "quantity": {"value": 2, "unit": "L"}}], "pareto": false}
+
+  list     shopping_list (default, a de inventory.json), weekly
+           (list_optimizer.generate_weekly_list) ou bulk (generate_bulk_list)
+  items    lista explícita, em vez de `list`
+  drop     nomes a retirar; add: itens a acrescentar; set: {nome: {campo: valor}}
+  exact, time_budget, pareto   como em run_comparison
+  brand_penalty_pct   agravamento das marcas não preferidas (null: sem substituição de marcas)
+  budget   limite do budget check (default: o da lista — semanal ou granel)
+
+A cache e as preferências são lidas uma vez e todos os cenários são resolvidos
+num único PriceIndex (nomes repetidos entre cenários são procurados uma vez).
+A otimização corre num ProcessPoolExecutor a partir de SCENARIO_POOL_MIN
+cenários, com um LinePricer por processo. Cada resultado é escrito como uma
+linha NDJSON ({id, line, ...resultado do run_comparison} ou {id, line, error})
+assim que fica pronto — pela ordem em que terminam, não pela do ficheiro.
+"""
+
+import copy
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
+from list_optimizer import generate_bulk_list, generate_weekly_list
+from pareto import pareto_frontier
+from price_cache import get_store, record_hits, record_lookups
+from price_compare import (
+    EXACT_TIME_BUDGET_SECONDS, MARKETS, PRICE_INDEX_MIN_ITEMS, LinePricer, PriceIndex, annotate_result,
+    load_brand_sources, load_preferences, load_price_cache, load_shopping_list, optimize_exact, optimize_split,
+    resolve_prices,
+)
+from substitutions import BRAND_PENALTY_PCT, substitute_brands
+
+SCENARIO_POOL_MIN = 4  # abaixo disto arrancar processos custa mais do que otimizar em série
+SCENARIO_LISTS = ("shopping_list", "weekly", "bulk")
+
+_PRICER: LinePricer | None = None  # um por processo (memoização das linhas entre cenários)
+
+
+def parse_scenarios(lines) -> list[dict]:
+    """Linhas NDJSON → cenários {line, id, ...}; linhas inválidas ficam com `error`."""
+    scenarios = []
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            scenarios.append({"line": line_no, "id": None, "error": f"JSON inválido: {e}"})
+            continue
+        if not isinstance(record, dict):
+            scenarios.append({"line": line_no, "id": None,
+                              "error": f"Cenário deve ser um objeto JSON, recebido: {type(record).__name__}"})
+            continue
+        scenario = {**record, "line": line_no, "id": record.get("id", f"cenario-{line_no}")}
+        penalty = scenario.get("brand_penalty_pct")
+        if scenario.get("list", "shopping_list") not in SCENARIO_LISTS:
+            scenario["error"] = f"list desconhecida: {scenario['list']} (usar {', '.join(SCENARIO_LISTS)})"
+        elif penalty is not None and (isinstance(penalty, bool) or not isinstance(penalty, (int, float))
+                                      or penalty < 0):
+            scenario["error"] = f"brand_penalty_pct deve ser um número ≥ 0 ou null, recebido: {penalty!r}"
+        scenarios.append(scenario)
+    return scenarios
+
+
+class ListSource:
+    """Listas base dos cenários (e o limite de budget de cada), geradas uma só vez."""
+
+    def __init__(self, prefs: dict):
+        self.prefs = prefs
+        self._lists: dict[str, tuple[list, float]] = {}
+
+    def get(self, name: str) -> tuple[list, float]:
+        if name not in self._lists:
+            weekly_limit = self.prefs.get("budget", {}).get("weekly_limit_eur", 150.0)
+            if name == "weekly":
+                generated = generate_weekly_list()
+                self._lists[name] = (generated["items"], generated["budget_limit"])
+            elif name == "bulk":
+                generated = generate_bulk_list()
+                self._lists[name] = (generated["items"], generated["budget_limit"])
+            else:
+                self._lists[name] = (load_shopping_list(), weekly_limit)
+        return self._lists[name]
+
+
+def build_items(scenario: dict, sources: ListSource) -> tuple[list, float]:
+    """(lista de compras do cenário, limite de budget): base + drop, set e add."""
+    if "items" in scenario:
+        items, limit = scenario["items"], sources.get("shopping_list")[1]
+    else:
+        items, limit = sources.get(scenario.get("list", "shopping_list"))
+    items = copy.deepcopy(items)  # as listas base são partilhadas entre cenários
+    drop = {name.lower() for name in scenario.get("drop", [])}
+    if drop:
+        items = [item for item in items if item["name"].lower() not in drop]
+    changes = {name.lower(): fields for name, fields in scenario.get("set", {}).items()}
+    for item in items:
+        item.update(changes.get(item["name"].lower(), {}))
+    items.extend(copy.deepcopy(scenario.get("add", [])))
+    return items, scenario.get("budget", limit)
+
+
+def optimize_scenario(task: dict) -> dict:
+    """Otimiza um cenário já resolvido: {items_with_prices, exact, time_budget, pareto}."""
+    global _PRICER
+    if _PRICER is None:
+        _PRICER = LinePricer()
+    items_with_prices = task["items_with_prices"]
+    if task["exact"]:
+        result = optimize_exact(items_with_prices, time_budget=task["time_budget"], pricer=_PRICER)
+    else:
+        result = optimize_split(items_with_prices, pricer=_PRICER)
+    if task["pareto"]:
+        result["pareto"] = pareto_frontier(items_with_prices, pricer=_PRICER)
+    return result
+
+
+def run_scenarios(lines, write, jobs: int | None = None,
+                  brand_penalty_pct: float | None = BRAND_PENALTY_PCT) -> dict:
+    """
+    Corre os cenários de `lines` (NDJSON) e chama `write(linha)` com o resultado de
+    cada um, à medida que terminam. `jobs`: processos (default: os.cpu_count()).
+    `brand_penalty_pct`: default dos cenários sem `brand_penalty_pct` próprio.
+
+    Output: {scenarios, errors, workers, elapsed_s}
+    """
+    started = time.monotonic()
+    scenarios = parse_scenarios(lines)
+    prefs = load_preferences()
+    sources = ListSource(prefs)
+    errors = 0
+
+    def emit(scenario: dict, payload: dict) -> None:
+        nonlocal errors
+        errors += "error" in payload
+        write(json.dumps({"id": scenario["id"], "line": scenario["line"], **payload}, ensure_ascii=False))
+
+    pending = []  # (cenário, lista, limite)
+    for scenario in scenarios:
+        if "error" in scenario:
+            emit(scenario, {"error": scenario["error"]})
+            continue
+        try:
+            items, limit = build_items(scenario, sources)
+        except (AttributeError, KeyError, TypeError) as e:
+            emit(scenario, {"error": f"Cenário inválido: {e}"})
+            continue
+        if not items:
+            emit(scenario, {"error": "Lista de compras vazia"})
+            continue
+        pending.append((scenario, items, limit))
+
+    # Uma leitura da cache e um PriceIndex para todos os cenários
+    tasks = []
+    if pending:
+        cache = load_price_cache()
+        index = PriceIndex(cache, prefilter=sum(len(items) for _, items, _ in pending) >= PRICE_INDEX_MIN_ITEMS)
+        brands = load_brand_sources(prefs)
+        with get_store() as store:
+            resolved = []
+            for scenario, items, limit in pending:
+                penalty = scenario.get("brand_penalty_pct", brand_penalty_pct)
+                substitute = None if penalty is None else partial(
+                    substitute_brands, store=store, cache=cache, sources=brands, penalty_pct=penalty)
+                resolved.append((scenario, limit, *resolve_prices(index, items, substitute)))
+        for scenario, limit, items_with_prices, run in resolved:
+            task = {"items_with_prices": items_with_prices, "exact": bool(scenario.get("exact")),
+                    "time_budget": scenario.get("time_budget", EXACT_TIME_BUDGET_SECONDS),
+                    "pareto": scenario.get("pareto", True)}
+            tasks.append((scenario, task, run, limit))
+        record_hits([hit for _, _, run, _ in tasks for hit in run["hits"]])
+        lookups = {m: [0, 0] for m in MARKETS}
+        for _, _, run, _ in tasks:
+            for market, (n, found) in run["lookups"].items():
+                lookups[market][0] += n
+                lookups[market][1] += found
+        record_lookups({m: tuple(counts) for m, counts in lookups.items()})
+
+    def finish(scenario, run, limit, optimize) -> None:
+        try:
+            result = optimize()
+        except Exception as e:  # um cenário que falha não interrompe os outros
+            emit(scenario, {"error": f"{type(e).__name__}: {e}"})
+            return
+        emit(scenario, annotate_result(result, run, {"budget": {"weekly_limit_eur": limit}}))
+
+    workers = min(jobs or os.cpu_count() or 1, len(tasks))
+    if len(tasks) >= SCENARIO_POOL_MIN and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(optimize_scenario, task): (scenario, run, limit)
+                       for scenario, task, run, limit in tasks}
+            for future in as_completed(futures):
+                finish(*futures[future], future.result)
+    else:
+        workers = 1 if tasks else 0
+        for scenario, task, run, limit in tasks:
+            finish(scenario, run, limit, lambda: optimize_scenario(task))
+
+    return {"scenarios": len(scenarios), "errors": errors, "workers": workers,
+            "elapsed_s": round(time.monotonic() - started, 3)}
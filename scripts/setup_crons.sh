@@ -121,7 +121,7 @@ openclaw cron add \
   --cron "0 6 * * 3,6" \
   --tz "Europe/Lisbon" \
   --session isolated \
-  --message "Atualiza cache de preços: (1) corre '{baseDir}/.venv/bin/python3 {baseDir}/scripts/price_cache.py expired' para listar entradas expiradas, (2) usa browser tool para pesquisar preços atualizados dos 20 produtos mais frequentes em consumption_model.json no Continente e Pingo Doce, (3) atualiza price_cache.json via '{baseDir}/.venv/bin/python3 {baseDir}/scripts/price_cache.py update ...', (4) se algum produto subiu >10%, registar para relatório semanal. Não enviar mensagem a menos que encontre variação significativa."
+  --message "Atualiza cache de preços: (1) corre '{baseDir}/.venv/bin/python3 {baseDir}/scripts/price_cache.py refresh-plan --limit 50' para obter a fila de pares (mercado, produto) a atualizar, já ordenada por prioridade, (2) usa browser tool para pesquisar os preços dessa fila, pela ordem indicada e apenas no mercado de cada par, (3) atualiza price_cache.json via '{baseDir}/.venv/bin/python3 {baseDir}/scripts/price_cache.py update ...', (4) se algum produto subiu >10%, registar para relatório semanal, (5) no fim, corre '{baseDir}/.venv/bin/python3 {baseDir}/scripts/price_cache.py gc' para remover entradas antigas ou pouco usadas. Não enviar mensagem a menos que encontre variação significativa."
 
 echo "  ✅ Criado (sem entrega WhatsApp — apenas interno)"
 
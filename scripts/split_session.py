@@ -0,0 +1,266 @@
+"""
+Re-otimização incremental do split quando a lista de compras muda.
+
+Cada "Acabou o leite" / "Remove X" no WhatsApp corria o price_compare do zero:
+reler ficheiros, resolver todos os preços, reconstruir a matriz e otimizar.
+SplitSession guarda o estado da última solução — itens com preços, PriceMatrix,
+mercado de cada item e resultado de cada mercado — e aplica as alterações como
+deltas:
+
+  add(item_data, index=None)        item novo (na posição `index`, por omissão no fim)
+  remove(name)                      item removido (o primeiro com esse nome)
+  update(item_data)                 item com o mesmo nome e outros preços/quantidade
+  set_price(name, market, info)     um preço novo (info=None → indisponível)
+  sync(items_with_prices)           diferença por (nome, ocorrência) contra uma lista
+                                    resolvida: um produto repetido são duas linhas; os
+                                    itens novos entram na posição que têm nela, e a
+                                    lista fica pela mesma ordem que a de um
+                                    optimize_split de raiz
+  solve(items_with_prices)          sync + result() (optimizer do run_comparison)
+
+Num delta só a linha alterada volta ao greedy (PriceMatrix.best) e só os mercados
+de onde sai e para onde vai são recalculados (subtotal, cupões, saldo, entrega).
+O resultado é o do optimize_split sobre a lista atual enquanto os passos de
+rebalanceamento não tiverem nada a fazer. Por isso um delta resolve tudo de novo
+(a partir da matriz guardada, sem resolver preços) quando:
+  - a solução anterior já tinha itens movidos pelo rebalanceamento;
+  - um mercado fica a ≤ DELIVERY_GAP_THRESHOLD da entrega grátis (rebalance_delivery);
+  - um cupão por usar passa a ser alcançável movendo itens de outros mercados
+    (rebalance_coupons: categoria disponível e min_spend atingível).
+"""
+
+from bisect import bisect_left
+
+from price_compare import (
+    DELIVERY_GAP_THRESHOLD, MARKETS, UNAVAILABLE_REASON, CouponBook, LinePricer, PriceMatrix,
+    _assignment, _assignments_from_choice, build_market_result, coupon_books, default_market_config,
+    gap_to_free_delivery, rebalance_coupons, rebalance_delivery, summarize_results,
+)
+
+
+class SplitSession:
+    """Split de optimize_split mantido entre alterações à lista de compras."""
+
+    def __init__(self, items_with_prices: list | None = None, market_config: dict | None = None,
+                 pricer: LinePricer | None = None):
+        self.market_config = market_config if market_config is not None else default_market_config()
+        self.books: dict[str, CouponBook] = coupon_books(self.market_config)
+        # a matriz é dona da lista: as linhas mudam com os deltas
+        self.matrix = PriceMatrix(list(items_with_prices or []), MARKETS, pricer)
+        self.choice: list[int] = []  # mercado (índice) de cada linha no greedy, -1 = indisponível
+        self.assignments: dict[str, list] = {m: [] for m in MARKETS}
+        self.results: dict[str, dict | None] = {m: None for m in MARKETS}
+        self.rebalanced = False  # há itens fora do mercado de `choice` (movidos pelo rebalanceamento)
+        self.stats = {"local": 0, "full": 0}
+        self._full_solve()
+
+    @property
+    def items(self) -> list:
+        """Itens atuais ({item, prices}), pela ordem das linhas da matriz."""
+        return self.matrix.items
+
+    def _row_of(self, name: str) -> int:
+        """Linha do primeiro item com este nome (a lista pode repetir um produto)."""
+        for i, item_data in enumerate(self.matrix.items):
+            if item_data["item"].get("name") == name:
+                return i
+        raise KeyError(name)
+
+    # ------------------------------------------------------------------
+    # Deltas
+    # ------------------------------------------------------------------
+
+    def add(self, item_data: dict, index: int | None = None) -> None:
+        i = self.matrix.insert_row(self.matrix.n if index is None else index, item_data)
+        self.choice.insert(i, -1)
+        for assigned in self.assignments.values():
+            for a in assigned:
+                if a["row"] >= i:
+                    a["row"] += 1
+        self._relocate(i)
+
+    def remove(self, name: str) -> None:
+        self._remove_row(self._row_of(name))
+
+    def update(self, item_data: dict) -> None:
+        self._update_row(self._row_of(item_data["item"].get("name")), item_data)
+
+    def set_price(self, name: str, market: str, price_info: dict | None) -> None:
+        item_data = self.matrix.items[self._row_of(name)]
+        prices = {m: info for m, info in item_data["prices"].items() if m != market}
+        if price_info is not None:
+            prices[market] = price_info
+        self.update({"item": item_data["item"], "prices": prices})
+
+    def sync(self, items_with_prices: list) -> dict:
+        """
+        Aplica a diferença entre a lista atual e `items_with_prices`, por (nome, ocorrência):
+        um produto repetido na lista conta como linhas distintas. Os itens novos são
+        inseridos na sua posição; se os que ficam mudaram de ordem entre si, a matriz é
+        refeita pela nova ordem e tudo se resolve de novo.
+        """
+        new = _by_occurrence(items_with_prices)
+        current = _by_occurrence(self.matrix.items)
+        removed = [key for key in current if key not in new]
+        changed = [key for key, d in new.items() if key in current and d != current[key]]
+        added = [key for key in new if key not in current]
+        delta = {"added": len(added), "removed": len(removed), "changed": len(changed)}
+        kept = [key for key in current if key in new]
+        if kept != [key for key in new if key in current]:
+            self.matrix = PriceMatrix(list(items_with_prices), MARKETS, self.matrix.pricer)
+            self._full_solve()
+            return delta
+        # `current` está pela ordem das linhas: remover de baixo para cima mantém os índices
+        rows = {key: i for i, key in enumerate(current)}
+        for key in reversed(removed):
+            self._remove_row(rows[key])
+        rows = {key: i for i, key in enumerate(kept)}
+        for key in changed:
+            self._update_row(rows[key], new[key])
+        for i, key in enumerate(new):
+            if key not in current:
+                self.add(new[key], i)
+        return delta
+
+    # ------------------------------------------------------------------
+    # Deltas por linha
+    # ------------------------------------------------------------------
+
+    def _remove_row(self, i: int) -> None:
+        old = self.choice[i]
+        if self.rebalanced:
+            self.matrix.delete_row(i)
+            del self.choice[i]
+            self._full_solve()
+            return
+        if old >= 0:
+            market = MARKETS[old]
+            assigned = self.assignments[market]
+            del assigned[bisect_left(assigned, i, key=_row)]
+        self.matrix.delete_row(i)
+        del self.choice[i]
+        for assigned in self.assignments.values():
+            for a in assigned:
+                if a["row"] > i:
+                    a["row"] -= 1
+        self._settle({old} - {-1})
+
+    def _update_row(self, i: int, item_data: dict) -> None:
+        self.matrix.set_row(i, item_data)
+        self._relocate(i)
+
+    # ------------------------------------------------------------------
+    # Atualização local / solução completa
+    # ------------------------------------------------------------------
+
+    def _relocate(self, i: int) -> None:
+        """Linha `i` alterada: volta ao mercado mais barato e recalcula os mercados afetados."""
+        if self.rebalanced:
+            self._full_solve()
+            return
+        old, new = self.choice[i], self.matrix.best(i)
+        if old >= 0:
+            assigned = self.assignments[MARKETS[old]]
+            del assigned[bisect_left(assigned, i, key=_row)]
+        if new >= 0:
+            extra = {"preferred_store_honored": True} if self.matrix.preferred[i] == new else {}
+            assigned = self.assignments[MARKETS[new]]
+            assigned.insert(bisect_left(assigned, i, key=_row), _assignment(self.matrix, i, new, **extra))
+        self.choice[i] = new
+        self._settle({old, new} - {-1})
+
+    def _settle(self, affected: set[int]) -> None:
+        for j in affected:
+            market = MARKETS[j]
+            self.results[market] = build_market_result(market, self.assignments[market], self.market_config, self.books)
+        if self._rebalance_possible():
+            self._full_solve()
+        else:
+            self.stats["local"] += 1
+
+    def _full_solve(self) -> None:
+        """Greedy + rebalanceamento sobre a matriz guardada (o optimize_split, sem resolver preços)."""
+        self.stats["full"] += 1
+        matrix = self.matrix
+        self.choice, _ = matrix.cheapest()
+        self.assignments, _ = _assignments_from_choice(matrix.items, matrix, self.choice)
+        greedy = {m: list(map(id, assigned)) for m, assigned in self.assignments.items()}
+        rebalance_delivery(self.assignments, self.market_config, matrix, self.books)
+        rebalance_coupons(self.assignments, self.market_config, matrix, self.books)
+        self.rebalanced = any(list(map(id, self.assignments[m])) != greedy[m] for m in MARKETS)
+        self.results = {
+            m: build_market_result(m, self.assignments[m], self.market_config, self.books) for m in MARKETS
+        }
+
+    def _rebalance_possible(self) -> bool:
+        """Se rebalance_delivery ou rebalance_coupons podem mover itens no estado greedy atual."""
+        for market, current in self.results.items():
+            if current is None:
+                continue
+            gap = gap_to_free_delivery(market, current["after_discounts"])
+            if 0 < gap <= DELIVERY_GAP_THRESHOLD and current["delivery"] > 0:
+                return True
+
+        matrix = self.matrix
+        for target, market in enumerate(MARKETS):
+            book = self.books.get(market)
+            if not book:
+                continue
+            assigned = self.assignments[market]
+            subtotal = sum(a["price"] for a in assigned)
+            categories = {a["item"].get("category", "outros") for a in assigned}
+            applicable = book.applicable(subtotal, categories)
+            unmet = [c for c in book.coupons if c.discount_cents > 0 and c not in applicable]
+            if not unmet:
+                continue
+            # candidatos do rebalance_coupons: itens de outros mercados, sem preferred_store, disponíveis aqui
+            column, mask = matrix.columns[target], matrix.available[target]
+            movable = [
+                i for i, j in enumerate(self.choice)
+                if j >= 0 and j != target and matrix.preferred[i] < 0 and mask[i]
+            ]
+            reachable = subtotal + sum(column[i] for i in movable)
+            movable_cats = {matrix.items[i]["item"].get("category", "outros") for i in movable}
+            for coupon in unmet:
+                if coupon.categories and not coupon.categories & categories and not coupon.categories & movable_cats:
+                    continue
+                if reachable >= coupon.min_spend - 1e-9:  # folga para a ordem das somas
+                    return True
+        return False
+
+    # ------------------------------------------------------------------
+    # Resultado
+    # ------------------------------------------------------------------
+
+    def solve(self, items_with_prices: list) -> dict:
+        """sync + result, com o resumo dos deltas em `session` (optimizer do run_comparison)."""
+        before = dict(self.stats)
+        delta = self.sync(items_with_prices)
+        result = self.result()
+        result["session"] = {**delta, **{k: self.stats[k] - before[k] for k in self.stats}}
+        return result
+
+    def result(self) -> dict:
+        """Mesmo formato (e valores) que optimize_split sobre `items`."""
+        items = self.matrix.items
+        unavailable = [
+            {"name": items[i]["item"].get("name"), "reason": UNAVAILABLE_REASON}
+            for i, j in enumerate(self.choice) if j < 0
+        ]
+        result_markets = {m: r for m, r in self.results.items() if r}
+        return summarize_results(items, result_markets, unavailable, self.market_config, self.matrix, self.books)
+
+
+def _row(assignment: dict) -> int:
+    return assignment["row"]
+
+
+def _by_occurrence(items_with_prices: list) -> dict[tuple[str, int], dict]:
+    """{(nome, nº da ocorrência desse nome): item}, pela ordem da lista."""
+    seen: dict[str, int] = {}
+    keyed = {}
+    for d in items_with_prices:
+        name = d["item"].get("name")
+        seen[name] = seen.get(name, -1) + 1
+        keyed[(name, seen[name])] = d
+    return keyed
@@ -0,0 +1,156 @@
+"""
+Substituição de marcas do price_compare: candidatos de marcas aceitáveis antes da otimização.
+
+O price_compare procura cada item pelo nome, por isso uma marca aceitável mais
+barata que esteja na cache com outro nome nunca era considerada. Antes de
+otimizar, cada item com marcas conhecidas é expandido nos candidatos da cache
+dessas marcas:
+  - marcas: `preferred_brand`/`acceptable_brands` do item; sem elas, as do produto
+    em consumption_model.json (pelo nome) e depois brand_preferences de
+    family_preferences.json ({preferred, acceptable}). As marcas encontradas são
+    copiadas para o item, para que o pareto não as conte como substituições;
+  - candidatos: CacheStore.brand_candidates — o índice persistente (categoria,
+    unidade base, marca, preço unitário), sem varrer a cache. A chave tem de conter
+    todas as palavras do nome do item; ficam os BRAND_CANDIDATES_PER_MARKET mais
+    baratos por mercado;
+  - escolha: por mercado, o menor custo da quantidade pedida (LinePricer — o que
+    o otimizador cobra, em embalagens inteiras e com promoções) agravado em
+    `penalty_pct` % quando a marca não é a preferida. O preço unitário (€/kg, €/L,
+    €/un) só ordena os candidatos no índice e desempata: um pack de 6 mais barato
+    ao litro não substitui 1 L. A entrada encontrada pelo nome concorre com os
+    candidatos e fica em caso de empate; sem ela, o melhor candidato preenche o
+    mercado em falta.
+
+O otimizador continua a receber uma entrada por item e mercado: o custo de
+entrega, cupões e saldo só depende do subtotal, e entre entradas do mesmo item
+no mesmo mercado a escolha é a de menor custo penalizado.
+"""
+
+import time
+
+from cache_store import UNIT_BASES, entry_brand, entry_category, entry_unit_price
+from config import MARKETS
+from price_cache import normalize_key
+from promotions import LinePricer
+
+# Agravamento (%) do preço unitário de uma marca aceitável que não é a preferida
+BRAND_PENALTY_PCT = 10.0
+# Candidatos por item e mercado lidos do índice (os mais baratos por preço unitário)
+BRAND_CANDIDATES_PER_MARKET = 3
+
+
+def _norm(brand) -> str | None:
+    return (brand.strip().casefold() or None) if isinstance(brand, str) else None
+
+
+def brand_sources(model: dict, prefs: dict) -> dict[str, tuple[str | None, list[str]]]:
+    """{nome normalizado: (marca preferida, marcas aceitáveis)} do modelo de consumo e das preferências."""
+    sources = {}
+    for product, fields in prefs.get("brand_preferences", {}).items():
+        if isinstance(fields, dict) and not product.startswith("_"):
+            sources[normalize_key(product)] = (fields.get("preferred"), list(fields.get("acceptable") or []))
+    for product in model.values():
+        if isinstance(product, dict) and product.get("name"):
+            preferred, acceptable = product.get("preferred_brand"), product.get("acceptable_brands") or []
+            if preferred or acceptable:
+                sources[normalize_key(product["name"])] = (preferred, list(acceptable))
+    return sources
+
+
+def item_brands(item: dict, sources: dict) -> tuple[str | None, list[str]]:
+    """(marca preferida, marcas aceitáveis) do item, completadas com `sources` se o item não as tiver."""
+    preferred, acceptable = item.get("preferred_brand"), item.get("acceptable_brands")
+    if preferred and acceptable is not None:
+        return preferred, list(acceptable)
+    source_preferred, source_acceptable = sources.get(normalize_key(item["name"]), (None, []))
+    if preferred and source_preferred and _norm(preferred) != _norm(source_preferred):
+        return preferred, list(acceptable or [])  # as aceitáveis do modelo são de outra preferida
+    return preferred or source_preferred, list(acceptable if acceptable is not None else source_acceptable)
+
+
+def _base_unit(item: dict, prices: dict) -> str | None:
+    """Unidade base para comparar candidatos: a da entrada encontrada pelo nome, senão a da quantidade."""
+    for entry in prices.values():
+        unit_price = entry_unit_price(entry)
+        if unit_price is not None:
+            return unit_price[1]
+    unit = str((item.get("quantity") or {}).get("unit") or "").lower()
+    return UNIT_BASES[unit][0] if unit in UNIT_BASES else None
+
+
+def substitute_brands(items_with_prices: list, store, cache: dict, sources: dict,
+                      penalty_pct: float = BRAND_PENALTY_PCT, now: float | None = None,
+                      markets: list[str] | None = None,
+                      pricer: LinePricer | None = None) -> tuple[list[dict], list[tuple[str, str]]]:
+    """
+    Substitui, em `items_with_prices` (no lugar), a entrada de cada item e mercado pelo
+    candidato de marca aceitável de menor custo penalizado para a quantidade do item.
+    `store` responde a brand_candidates e `cache` ({market: Mapping}) dá as entradas
+    dos candidatos.
+
+    Output: (substituições [{item, market, product, brand, unit_price, replaces}],
+    (market, key) dos candidatos escolhidos — para record_hits)
+    """
+    markets = list(markets or MARKETS)
+    now = time.time() if now is None else now
+    pricer = pricer or LinePricer()
+    factor = 1 + penalty_pct / 100
+    queries, targets = [], []
+    for d in items_with_prices:
+        item = d["item"]
+        preferred, acceptable = item_brands(item, sources)
+        brands = tuple(dict.fromkeys(b for b in map(_norm, [preferred, *acceptable]) if b))
+        if not brands:
+            continue
+        if (preferred, acceptable) != (item.get("preferred_brand"), item.get("acceptable_brands")):
+            d["item"] = {**item, "preferred_brand": preferred, "acceptable_brands": acceptable}
+        category = (item.get("category") or "").lower().strip()
+        base_unit = _base_unit(item, d["prices"])
+        terms = tuple(normalize_key(item["name"]).split())
+        if category and base_unit and terms:
+            queries.append((category, base_unit, brands, terms))
+            targets.append((d, _norm(preferred), base_unit))
+    if not queries:
+        return [], []
+
+    def score(entry: dict, quantity: dict | None, preferred: str | None) -> float | None:
+        total = pricer.total(entry, quantity)
+        if total is None:
+            return None
+        brand = entry_brand(entry)
+        return total * factor if preferred and brand and brand != preferred else total
+
+    substitutions, hits = [], []
+    for (d, preferred, base_unit), found in zip(targets, store.brand_candidates(
+            queries, markets, now, BRAND_CANDIDATES_PER_MARKET)):
+        for market in markets:
+            if market not in found:
+                continue
+            candidates = found[market]
+            current = d["prices"].get(market)
+            quantity = d["item"].get("quantity")
+            best, best_score = None, None
+            if current is not None:
+                unit_price = entry_unit_price(current)
+                if unit_price is None or unit_price[1] != base_unit:
+                    continue  # sem preço unitário comparável fica a entrada encontrada pelo nome
+                best_score = score(current, quantity, preferred)
+            # candidatos por preço unitário crescente: em empate de custo fica o mais barato ao kg/L/un
+            for unit_price, key in candidates:
+                entry = cache.get(market, {}).get(key)
+                if entry is None or entry is current or entry_category(entry) is None:
+                    continue
+                candidate_score = score(entry, quantity, preferred)
+                if candidate_score is not None and (best_score is None or candidate_score < best_score):
+                    best, best_score = (key, entry, unit_price), candidate_score
+            if best is None:
+                continue
+            key, entry, unit_price = best
+            d["prices"][market] = entry
+            hits.append((market, key))
+            substitutions.append({
+                "item": d["item"]["name"], "market": market, "product": entry.get("name", key),
+                "brand": entry.get("brand"), "unit_price": unit_price,
+                "replaces": current.get("name") if current is not None else None,
+            })
+    return substitutions, hits
@@ -0,0 +1,309 @@
+"""
+Índice invertido de trigramas para pesquisa por substring em chaves de cache.
+
+Se `q` é substring de `k`, todos os trigramas de `q` aparecem em `k`. O índice usa
+esta propriedade para reduzir o conjunto de chaves a testar; o teste final
+(`q in k`) continua a ser feito pelo chamador, pelo que os resultados são
+idênticos aos de um varrimento linear.
+
+Usado por:
+  - price_cache.fuzzy_search      → chaves que podem conter a pesquisa
+  - price_compare.get_cached_price → fallback "key in k or k in key"
+  - cache_store.SqliteCacheStore  → versão persistente (tabela trigrams)
+  - cache_store.JsonCacheStore    → versão persistente (price_cache.trigrams, ver
+                                    write_trigram_file), exposta por MarketView.trigrams
+
+Formato de price_cache.trigrams: uma linha JSON {"snapshot", "version", "markets":
+{market: [offset das chaves, tamanho, offset do diretório, tamanho]}}; depois, por
+mercado, as chaves (uint32 com o tamanho + UTF-8, pela ordem da cache), as
+listas de postings (uint32 com o offset de cada chave na secção de chaves, por
+ordem crescente) e o diretório {trigrama: [offset, nº de postings]} em JSON. Os
+offsets são relativos ao fim do cabeçalho. Uma consulta lê o diretório do mercado
+e só as listas dos trigramas pedidos.
+"""
+
+import json
+import mmap
+import os
+import struct
+from array import array
+from collections import defaultdict
+from pathlib import Path
+
+GRAM_SIZE = 3
+TRIGRAM_FILE_VERSION = 1
+_LEN = struct.Struct("<I")
+
+
+def trigrams(text: str) -> set[str]:
+    """Conjunto de trigramas de `text` (vazio se len(text) < 3)."""
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+class TrigramIndex:
+    """Índice em memória de um conjunto de chaves.
+
+    As chaves mantêm a ordem de inserção (como um dict), e os métodos de consulta
+    devolvem candidatos nessa ordem — o "primeiro match" de quem percorre os
+    candidatos é o mesmo que o de quem percorre o dict original.
+    """
+
+    def __init__(self, keys=()):
+        self._postings: dict[str, set[str]] = defaultdict(set)
+        self._order: dict[str, int] = {}
+        self._next = 0
+        for key in keys:
+            self.add(key)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._order
+
+    def add(self, key: str) -> None:
+        if key in self._order:
+            return
+        self._order[key] = self._next
+        self._next += 1
+        postings = self._postings
+        for g in trigrams(key):
+            postings[g].add(key)
+
+    def discard(self, key: str) -> None:
+        if key not in self._order:
+            return
+        del self._order[key]
+        for g in trigrams(key):
+            postings = self._postings[g]
+            postings.discard(key)
+            if not postings:
+                del self._postings[g]
+
+    def position(self, key: str) -> int:
+        """Posição de inserção da chave (para ordenar uniões de candidatos)."""
+        return self._order[key]
+
+    def _ordered(self, keys) -> list[str]:
+        return sorted(keys, key=self._order.__getitem__)
+
+    def containing(self, query: str) -> list[str]:
+        """Chaves que podem conter `query` como substring (superconjunto dos matches)."""
+        grams = trigrams(query)
+        if not grams:
+            return self._ordered(self._order)
+        postings = sorted((self._postings.get(g, set()) for g in grams), key=len)
+        candidates = postings[0]
+        for p in postings[1:]:
+            if not candidates:
+                break
+            candidates = candidates & p
+        return self._ordered(candidates)
+
+    def contained_in(self, text: str) -> list[str]:
+        """Chaves que são substring de `text` (resultado exacto).
+
+        Os nomes pesquisados são curtos, por isso enumerar as O(len²) substrings
+        de `text` e procurá-las no conjunto de chaves é mais barato do que
+        percorrer listas de postings.
+        """
+        order = self._order
+        n = len(text)
+        found = {text[i:j] for i in range(n + 1) for j in range(i, n + 1)}
+        return self._ordered(k for k in found if k in order)
+
+
+# ---------------------------------------------------------------------------
+# Índice persistente (backend JSON)
+# ---------------------------------------------------------------------------
+
+_LITTLE_ENDIAN = array("I", [1]).tobytes()[0] == 1
+
+
+def _postings_bytes(values: array) -> bytes:
+    if not _LITTLE_ENDIAN:
+        values = array("I", values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_trigram_file(path: Path, market_keys: dict, source: tuple[int, int]) -> None:
+    """
+    Grava o índice de trigramas de `market_keys` ({market: chaves, pela ordem da
+    cache}) em `path` (tmp + os.replace). `source` é o (mtime_ns, tamanho) do
+    snapshot JSON de que deriva.
+    """
+    blocks, markets, offset = [], {}, 0
+    for market, ordered in market_keys.items():
+        keys = bytearray()
+        postings: dict[str, array] = {}
+        for key in ordered:
+            position = len(keys)
+            for g in trigrams(key):
+                found = postings.get(g)
+                if found is None:
+                    found = postings[g] = array("I")
+                found.append(position)
+            raw = key.encode("utf-8")
+            keys += _LEN.pack(len(raw)) + raw
+        keys_offset = offset
+        blocks.append(bytes(keys))
+        offset += len(keys)
+        directory = {}
+        for g, found in postings.items():
+            directory[g] = [offset, len(found)]
+            blocks.append(_postings_bytes(found))
+            offset += 4 * len(found)
+        raw_dir = json.dumps(directory, ensure_ascii=False).encode("utf-8")
+        markets[market] = [keys_offset, len(keys), offset, len(raw_dir)]
+        blocks.append(raw_dir)
+        offset += len(raw_dir)
+
+    header = json.dumps(
+        {"snapshot": list(source), "version": TRIGRAM_FILE_VERSION, "markets": markets}, ensure_ascii=False,
+    ).encode("utf-8") + b"\n"
+    path = Path(path)
+    # sufixo por processo: dois leitores podem reconstruir o ficheiro em simultâneo
+    tmp = path.with_suffix(f".trigrams.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.writelines(blocks)
+    os.replace(tmp, path)
+
+
+class TrigramFile:
+    """Leitor de price_cache.trigrams por mmap; `market(m, view)` dá as consultas de um mercado."""
+
+    def __init__(self, mm: mmap.mmap, markets: dict, base: int):
+        self._mm = mm
+        self._markets = markets
+        self._base = base
+
+    @classmethod
+    def open(cls, path: Path, source: tuple[int, int]) -> "TrigramFile | None":
+        """Abre `path` se existir e derivar do snapshot `source` ((mtime_ns, tamanho)); senão None."""
+        try:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):  # ValueError: ficheiro vazio
+            return None
+        end = mm.find(b"\n")
+        try:
+            header = json.loads(mm[:end]) if end >= 0 else None
+        except json.JSONDecodeError:
+            header = None
+        if (
+            not isinstance(header, dict) or header.get("version") != TRIGRAM_FILE_VERSION
+            or header.get("snapshot") != list(source)
+        ):
+            mm.close()
+            return None
+        return cls(mm, header["markets"], end + 1)
+
+    def market(self, market: str, view=None) -> "MarketTrigrams":
+        return MarketTrigrams(self._mm, self._base, self._markets.get(market), view)
+
+
+class MarketTrigrams:
+    """
+    Consultas de TrigramIndex (`containing`, `contained_in`, `position`, `in`) sobre um
+    mercado do ficheiro. A posição de uma chave é o seu offset na secção de chaves (a
+    ordem da cache); `view` (MarketView) acrescenta as chaves novas do log, no fim —
+    a ordem é a de iteração da view — e responde a `in`.
+    """
+
+    def __init__(self, mm: mmap.mmap, base: int, location: list | None, view=None):
+        self._mm = mm
+        keys_offset, keys_size, dir_offset, dir_size = location or (0, 0, 0, 0)
+        self._keys = (base + keys_offset, keys_size)
+        self._dir_span = (base + dir_offset, dir_size)
+        self._base = base
+        self._view = view
+        self._directory: dict | None = None
+        self._positions: dict[str, int] = {}
+        self._added: list[str] | None = None
+        self._every: list[str] | None = None
+
+    def _dir(self) -> dict:
+        if self._directory is None:
+            start, size = self._dir_span
+            self._directory = json.loads(self._mm[start:start + size]) if size else {}
+        return self._directory
+
+    def _added_keys(self) -> list[str]:
+        if self._added is None:
+            self._added = self._view._added() if self._view is not None else []
+        return self._added
+
+    def _key_at(self, position: int) -> str:
+        start = self._keys[0] + position
+        (size,) = _LEN.unpack_from(self._mm, start)
+        key = self._mm[start + _LEN.size:start + _LEN.size + size].decode("utf-8")
+        self._positions[key] = position
+        return key
+
+    def _all_keys(self) -> list[str]:
+        if self._every is None:
+            keys, position = [], 0
+            while position < self._keys[1]:
+                keys.append(self._key_at(position))
+                position += _LEN.size + _LEN.unpack_from(self._mm, self._keys[0] + position)[0]
+            self._every = keys
+        return self._every
+
+    def _postings(self, gram: str) -> array | None:
+        found = self._dir().get(gram)
+        if found is None:
+            return None
+        offset, count = found
+        start = self._base + offset
+        values = array("I")
+        values.frombytes(self._mm[start:start + 4 * count])
+        if not _LITTLE_ENDIAN:
+            values.byteswap()
+        return values
+
+    def __len__(self) -> int:
+        return len(self._all_keys()) + len(self._added_keys())
+
+    def __contains__(self, key: str) -> bool:
+        if self._view is not None:
+            return key in self._view
+        return key in self._positions or key in self._all_keys()
+
+    def containing(self, query: str) -> list[str]:
+        """Chaves que podem conter `query` como substring (superconjunto dos matches)."""
+        grams = trigrams(query)
+        if not grams:
+            return [*self._all_keys(), *self._added_keys()]
+        lists = []
+        for g in grams:
+            found = self._postings(g)
+            if found is None:
+                return list(self._added_keys())
+            lists.append(found)
+        lists.sort(key=len)
+        candidates = set(lists[0])
+        for other in lists[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(other)
+        return [self._key_at(p) for p in sorted(candidates)] + self._added_keys()
+
+    def contained_in(self, text: str) -> list[str]:
+        """Chaves que são substring de `text` (resultado exacto)."""
+        n = len(text)
+        found = {text[i:j] for i in range(n + 1) for j in range(i, n + 1)}
+        return sorted((k for k in found if k in self), key=self.position)
+
+    def position(self, key: str) -> int:
+        """Posição da chave na ordem da view (as novas do log a seguir às do ficheiro)."""
+        if key not in self._positions:
+            added = self._added_keys()
+            if key in added:
+                return self._keys[1] + added.index(key)
+            if len(key) < GRAM_SIZE:
+                self._all_keys()
+            else:
+                self.containing(key)
+        return self._positions[key]
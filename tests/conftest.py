@@ -0,0 +1,44 @@
+"""
+Fixtures partilhadas pelos testes que correm o price_compare/daemon sobre um data/ temporário.
+"""
+import json
+
+import pytest
+import consumption_tracker as ct
+import list_optimizer as lo
+import price_cache as pcache
+import price_compare as pc
+
+
+@pytest.fixture
+def seed() -> dict:
+    """
+    Conteúdo do data_dir de cada teste: {ficheiro: JSON} e, em "price_cache", as
+    entradas [(mercado, produto, dados)] a gravar. Os módulos redefinem-na.
+    """
+    return {}
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch, seed):
+    """
+    data/ num diretório temporário, com o backend JSON: price_compare, price_cache,
+    list_optimizer e consumption_tracker passam a ler e escrever aí. Sem `seed`, a
+    lista de compras, o modelo e as preferências ficam vazios.
+    """
+    monkeypatch.setattr(pc, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(lo, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(ct, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(ct, "MODEL_FILE", tmp_path / "consumption_model.json")
+    monkeypatch.setattr(ct, "HISTORY_FILE", tmp_path / "shopping_history.json")
+    monkeypatch.setattr(pcache, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(pcache, "CACHE_FILE", tmp_path / "price_cache.json")
+    monkeypatch.setenv("GROCERY_CACHE_BACKEND", "json")
+    files = {"inventory.json": {"shopping_list": []}, "consumption_model.json": {}, "family_preferences.json": {}}
+    files.update(seed)
+    rows = files.pop("price_cache", [])
+    for name, content in files.items():
+        (tmp_path / name).write_text(json.dumps(content, ensure_ascii=False))
+    if rows:
+        pcache.write_entries([pcache.build_entry(market, product, data) for market, product, data in rows])
+    return tmp_path
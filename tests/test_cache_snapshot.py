@@ -0,0 +1,90 @@
+"""Testes para scripts/cache_snapshot.py"""
+import json
+
+import pytest
+import cache_snapshot as snap
+
+
+CACHE = {
+    "continente": {"leite": {"price": 0.89}, "arroz": {"price": 1.29}, "pão de forma": {"price": 1.5}},
+    "pingodoce": {},
+    "auchan": {"leite": {"price": 0.95}},
+}
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    source = tmp_path / "price_cache.json"
+    source.write_text(json.dumps(CACHE))
+    st = source.stat()
+    snap.write_snapshot(tmp_path / "price_cache.bin", CACHE, (st.st_mtime_ns, st.st_size))
+    return snap.BinarySnapshot.open(tmp_path / "price_cache.bin", source)
+
+
+# ---------------------------------------------------------------------------
+# BinarySnapshot
+# ---------------------------------------------------------------------------
+
+class TestBinarySnapshot:
+    def test_get(self, snapshot):
+        assert snapshot.get("continente", "arroz") == {"price": 1.29}
+        assert snapshot.get("continente", "pão de forma") == {"price": 1.5}
+        assert snapshot.get("auchan", "leite") == {"price": 0.95}
+        assert snapshot.get("auchan", "arroz") is None
+        assert snapshot.get("lidl", "leite") is None
+        assert len(snapshot) == 4
+
+    def test_keys_keep_json_order(self, snapshot):
+        assert snapshot.keys("continente") == ["leite", "arroz", "pão de forma"]
+        assert snapshot.markets() == ["continente", "pingodoce", "auchan"]
+        assert snapshot.keys("pingodoce") == []
+
+    def test_every_key_is_found(self, tmp_path):
+        cache = {"continente": {f"produto {i:04d}": {"price": i} for i in range(500, 0, -1)}}
+        source = tmp_path / "price_cache.json"
+        source.write_text("{}")
+        st = source.stat()
+        snap.write_snapshot(tmp_path / "c.bin", cache, (st.st_mtime_ns, st.st_size))
+        reader = snap.BinarySnapshot.open(tmp_path / "c.bin", source)
+        assert all(reader.get("continente", k) == v for k, v in cache["continente"].items())
+        assert reader.get("continente", "produto 0000") is None
+
+    def test_stale_or_missing_file_is_rejected(self, tmp_path, snapshot):
+        source = tmp_path / "price_cache.json"
+        assert snap.BinarySnapshot.open(tmp_path / "nope.bin", source) is None
+        source.write_text(json.dumps(CACHE) + " ")
+        assert snap.BinarySnapshot.open(tmp_path / "price_cache.bin", source) is None
+
+    def test_corrupt_file_is_rejected(self, tmp_path):
+        source = tmp_path / "price_cache.json"
+        source.write_text("{}")
+        (tmp_path / "price_cache.bin").write_bytes(b"")
+        assert snap.BinarySnapshot.open(tmp_path / "price_cache.bin", source) is None
+        (tmp_path / "price_cache.bin").write_bytes(b"XXXX" + bytes(100))
+        assert snap.BinarySnapshot.open(tmp_path / "price_cache.bin", source) is None
+
+
+# ---------------------------------------------------------------------------
+# MarketView
+# ---------------------------------------------------------------------------
+
+class TestMarketView:
+    def test_overrides_keep_replay_order(self, snapshot):
+        view = snap.MarketView(snapshot, "continente", {"arroz": {"price": 2.0}, "ovos": {"price": 2.5}})
+        replayed = dict(CACHE["continente"], arroz={"price": 2.0}, ovos={"price": 2.5})
+        assert list(view) == list(replayed)
+        assert dict(view.items()) == replayed
+        assert list(view.items()) == list(replayed.items())
+        assert len(view) == 4
+
+    def test_entries_scan_in_order(self, snapshot):
+        assert list(snapshot.entries("continente")) == list(CACHE["continente"].items())
+        assert list(snapshot.entries("lidl")) == []
+
+    def test_mapping_access(self, snapshot):
+        view = snap.MarketView(snapshot, "continente")
+        assert "leite" in view and "ovos" not in view
+        assert view["leite"] == {"price": 0.89}
+        assert view.get("ovos", "x") == "x"
+        with pytest.raises(KeyError):
+            view["ovos"]
@@ -0,0 +1,516 @@
+"""Testes para scripts/cache_store.py"""
+import fcntl
+import json
+from datetime import datetime, timezone, timedelta
+
+import pytest
+import cache_store as cs
+
+
+MARKETS = ["continente", "pingodoce"]
+
+
+def _entry(name, hours_ago=1.0, price=1.0):
+    ts = (datetime.now(timezone.utc) - timedelta(hours=hours_ago)).isoformat()
+    return {"name": name, "price": price, "cached_at": ts}
+
+
+def _now():
+    return datetime.now(timezone.utc).timestamp()
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    s = cs.open_store(request.param, tmp_path / "price_cache.json", MARKETS)
+    yield s
+    s.close()
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+class TestEntryTimestamp:
+    def test_parses_iso(self):
+        ts = cs.entry_timestamp({"cached_at": "2026-02-22T08:00:00+00:00"})
+        assert ts == datetime(2026, 2, 22, 8, tzinfo=timezone.utc).timestamp()
+
+    def test_missing_or_invalid(self):
+        assert cs.entry_timestamp({}) is None
+        assert cs.entry_timestamp({"cached_at": "ontem"}) is None
+
+
+class TestEntryExpiry:
+    def test_prefers_expires_at(self):
+        assert cs.entry_expiry({"expires_at": 123.0, "cached_at": "2026-02-22T08:00:00+00:00"}) == 123.0
+
+    def test_legacy_entry_uses_cached_at_plus_ttl(self):
+        ts = datetime(2026, 2, 22, 8, tzinfo=timezone.utc).timestamp()
+        assert cs.entry_expiry({"cached_at": "2026-02-22T08:00:00+00:00"}, ttl_hours=2) == ts + 7200
+
+    def test_no_timestamp_is_already_expired(self):
+        assert cs.entry_expiry({}) == 0.0
+
+
+class TestEntryUnitPrice:
+    def test_normalizes_to_base_unit(self):
+        assert cs.entry_unit_price({"price": 1.0, "price_per_unit": 0.9, "unit": "ml"}) == (900.0, "L")
+        assert cs.entry_unit_price({"price": 1.0, "price_per_unit": 2.5, "unit": "€/kg"}) == (2.5, "kg")
+
+    def test_applies_promo_ratio(self):
+        entry = {"price": 2.0, "price_per_unit": 4.0, "unit": "kg", "promo_effective_price": 1.5}
+        assert cs.entry_unit_price(entry) == (3.0, "kg")
+
+    def test_unit_items_without_price_per_unit(self):
+        assert cs.entry_unit_price({"price": 0.5}) == (0.5, "un")
+        assert cs.entry_unit_price({"price": 0.5, "unit": "kg"}) is None
+
+    def test_unavailable_or_unknown_unit(self):
+        assert cs.entry_unit_price({"price": 1.0, "available": False}) is None
+        assert cs.entry_unit_price({"price": 1.0, "price_per_unit": 1.0, "unit": "caixa"}) is None
+
+
+class TestEntryBrand:
+    def test_normalized(self):
+        assert cs.entry_brand({"brand": " Terra Nostra "}) == "terra nostra"
+
+    def test_missing_or_blank(self):
+        assert cs.entry_brand({}) is None
+        assert cs.entry_brand({"brand": "  "}) is None
+        assert cs.entry_brand({"brand": {"name": "X"}}) is None
+
+
+class TestIterEntries:
+    def test_skips_non_market_keys(self):
+        cache = {"continente": {"leite": {"price": 1.0}}, "last_updated": {}, "version": 1}
+        assert list(cs.iter_entries(cache)) == [("continente", "leite", {"price": 1.0})]
+
+
+# ---------------------------------------------------------------------------
+# Comportamento comum aos backends
+# ---------------------------------------------------------------------------
+
+class TestStoreContract:
+    def test_empty_store_has_all_markets(self, store):
+        assert store.load_all() == {"continente": {}, "pingodoce": {}}
+
+    def test_put_and_get(self, store):
+        store.put("continente", "leite", _entry("Leite"))
+        assert store.get("continente", "leite")["name"] == "Leite"
+        assert store.get("pingodoce", "leite") is None
+
+    def test_put_replaces(self, store):
+        store.put("continente", "leite", _entry("Leite", price=1.0))
+        store.put("continente", "leite", _entry("Leite", price=2.0))
+        assert store.get("continente", "leite")["price"] == 2.0
+        assert len(store.market_entries("continente")) == 1
+
+    def test_save_all_roundtrip(self, store):
+        cache = {"continente": {"leite": _entry("Leite")}, "pingodoce": {"ovos": _entry("Ovos")}}
+        store.save_all(cache)
+        assert store.load_all() == cache
+
+    def test_delete_many(self, store):
+        store.save_all({"continente": {"leite": _entry("Leite"), "ovos": _entry("Ovos")}, "pingodoce": {}})
+        store.put("pingodoce", "arroz", _entry("Arroz"))
+        assert store.delete_many([("continente", "ovos"), ("pingodoce", "arroz"), ("pingodoce", "nada")]) == 2
+        assert store.load_all() == {"continente": {"leite": store.get("continente", "leite")}, "pingodoce": {}}
+        assert "ovos" not in store.search_entries("continente", "ovo")
+
+    def test_expired_and_counts(self, store):
+        store.put("continente", "leite", _entry("Leite", hours_ago=1))
+        store.put("continente", "ovos", _entry("Ovos", hours_ago=30))
+        store.put("pingodoce", "arroz", {"name": "Arroz", "price": 0.8})
+        expired = store.expired(MARKETS, _now())
+        assert {(m, k) for m, k, _ in expired} == {("continente", "ovos"), ("pingodoce", "arroz")}
+        assert store.counts(MARKETS, _now()) == {"continente": (2, 1), "pingodoce": (1, 0)}
+
+
+    def test_expires_at_overrides_cached_at(self, store):
+        fresh_but_expired = {**_entry("Leite", hours_ago=1), "expires_at": _now() - 1}
+        store.put("continente", "leite", fresh_but_expired)
+        assert store.counts(["continente"], _now()) == {"continente": (1, 0)}
+
+    def test_expired_sorted_oldest_first(self, store):
+        store.put_many([
+            ("continente", "b", _entry("B", hours_ago=30)),
+            ("continente", "a", _entry("A", hours_ago=50)),
+            ("continente", "c", _entry("C", hours_ago=40)),
+        ])
+        assert [k for _, k, _ in store.expired(["continente"], _now())] == ["a", "c", "b"]
+
+    def test_histogram_maintained_across_writes(self, store):
+        now = _now()
+        boundary = cs.time_bucket(now) * cs.HISTOGRAM_BUCKET_SECONDS
+        store.save_all({"continente": {"a": _entry("A", 1), "b": _entry("B", 30)}, "pingodoce": {}})
+        store.put_many([
+            ("continente", "a", _entry("A", 40)),                                   # substituída
+            ("continente", "c", {**_entry("C"), "expires_at": boundary}),          # no balde actual, vencida
+            ("continente", "d", {**_entry("D"), "expires_at": now + 1}),           # no balde actual, válida
+            ("pingodoce", "e", {"name": "E", "price": 1.0}),                       # sem cached_at
+        ])
+        store.delete_many([("continente", "b")])
+        store.put("continente", "f", _entry("F", 2))
+        hist = store.histogram(MARKETS, now)
+        assert hist == store.recount(MARKETS, now)
+        assert (hist["continente"]["total"], hist["continente"]["expired"]) == (4, 2)
+        assert hist["pingodoce"]["cached"] == {-1: 1}
+
+    def test_rebuild_counters(self, store):
+        store.save_all({"continente": {"a": _entry("A", 30)}, "pingodoce": {}})
+        store.put("continente", "b", _entry("B"))
+        store.rebuild_counters()
+        assert store.histogram(MARKETS, _now()) == store.recount(MARKETS, _now())
+
+    def test_incomplete_backend_cannot_be_created(self):
+        class Partial(cs.CacheStore):
+            def load_all(self):
+                return {}
+
+        with pytest.raises(TypeError):
+            Partial(MARKETS)
+
+
+class TestSearchEntries:
+    def test_returns_superset_of_substring_matches(self, store):
+        for key in ["leite meio-gordo", "leite uht", "ovos", "pão"]:
+            store.put("continente", key, _entry(key))
+        found = store.search_entries("continente", "leite")
+        assert {"leite meio-gordo", "leite uht"} <= set(found)
+
+    def test_short_query_returns_everything(self, store):
+        store.put("continente", "ovos", _entry("Ovos"))
+        assert "ovos" in store.search_entries("continente", "ov")
+
+
+class TestBrandCandidates:
+    def _priced(self, name, per_l, brand, category="Lacticínios", hours_ago=1.0):
+        return {**_entry(name, hours_ago), "price_per_unit": per_l, "unit": "L", "brand": brand,
+                "category": category}
+
+    def test_filters_brand_terms_and_orders_by_unit_price(self, store):
+        store.save_all({"continente": {
+            "leite uht mimosa": self._priced("Leite UHT Mimosa", 0.95, "Mimosa"),
+            "leite uht agros": self._priced("Leite UHT Agros", 0.85, "AGROS"),
+            "leite uht gresso": self._priced("Leite UHT Gresso", 0.60, "Gresso"),
+            "leite achocolatado agros": self._priced("Leite Achocolatado Agros", 0.50, "Agros"),
+            "natas agros": self._priced("Natas Agros", 0.40, "Agros"),
+        }, "pingodoce": {"leite uht mimosa": self._priced("Leite UHT Mimosa", 0.89, "Mimosa")}})
+        [found] = store.brand_candidates(
+            [("lacticínios", "L", ("mimosa", "agros"), ("leite", "uht"))], MARKETS, _now(), 5)
+        assert found == {"continente": [(0.85, "leite uht agros"), (0.95, "leite uht mimosa")],
+                         "pingodoce": [(0.89, "leite uht mimosa")]}
+
+    def test_limit_per_market_and_expired(self, store):
+        store.save_all({"continente": {
+            f"leite {i}": self._priced(f"Leite {i}", 1.0 + i / 10, "Agros", hours_ago=30 if i == 0 else 1)
+            for i in range(5)
+        }, "pingodoce": {}})
+        [found] = store.brand_candidates([("lacticínios", "L", ("agros",), ("leite",))], MARKETS, _now(), 2)
+        assert found == {"continente": [(1.1, "leite 1"), (1.2, "leite 2")]}
+
+    def test_sees_writes_after_snapshot(self, store):
+        store.save_all({"continente": {"leite a": self._priced("Leite A", 1.0, "Agros")}, "pingodoce": {}})
+        store.put("continente", "leite a", self._priced("Leite A", 1.0, "Mimosa"))
+        store.put("pingodoce", "leite b", self._priced("Leite B", 0.9, "Agros"))
+        [agros, other] = store.brand_candidates(
+            [("lacticínios", "L", ("agros",), ("leite",)), ("mercearia", "L", ("agros",), ("leite",))],
+            MARKETS, _now(), 3)
+        assert agros == {"pingodoce": [(0.9, "leite b")]}
+        assert other == {}
+
+
+class TestJsonWriteAheadLog:
+    @pytest.fixture
+    def store(self, tmp_path):
+        return cs.JsonCacheStore(tmp_path / "price_cache.json", MARKETS)
+
+    def test_put_appends_without_rewriting_snapshot(self, store):
+        store.save_all({"continente": {"ovos": _entry("Ovos")}, "pingodoce": {}})
+        snapshot = store.path.read_text()
+        store.put("continente", "leite", _entry("Leite"))
+        assert store.path.read_text() == snapshot
+        assert len(store.log_path.read_text().splitlines()) == 1
+        assert set(store.load_all()["continente"]) == {"ovos", "leite"}
+
+    def test_store_lock_is_the_store_lock(self, store):
+        with cs.store_lock(store.path, exclusive=True):
+            with open(store.path.with_suffix(".lock")) as f:
+                with pytest.raises(BlockingIOError):
+                    fcntl.flock(f, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        with store._lock(exclusive=False):
+            with cs.store_lock(store.path, exclusive=False):
+                assert store.get("continente", "leite") is None
+
+    def test_compact_folds_log_into_snapshot(self, store):
+        store.put("continente", "leite", _entry("Leite", price=1.0))
+        store.put("continente", "leite", _entry("Leite", price=1.5))
+        result = store.compact()
+        assert result == {"compacted": True, "log_bytes": result["log_bytes"], "folded": 2}
+        assert store.log_path.read_text() == ""
+        assert store._read_snapshot()["continente"]["leite"]["price"] == 1.5
+        assert store.compact()["compacted"] is False
+
+    def test_torn_trailing_line_is_ignored(self, store):
+        store.put("continente", "leite", _entry("Leite"))
+        with open(store.log_path, "a") as f:
+            f.write('{"op": "put", "market": "continente", "key": "ov')
+        assert list(store.load_all()["continente"]) == ["leite"]
+
+    def test_save_all_discards_log(self, store):
+        store.put("continente", "leite", _entry("Leite"))
+        store.save_all({"continente": {}, "pingodoce": {}})
+        assert store.load_all() == {"continente": {}, "pingodoce": {}}
+
+    def test_auto_compaction_threshold(self, store, monkeypatch):
+        monkeypatch.setattr(cs, "WAL_COMPACT_BYTES", 300)
+        for i in range(5):
+            store.put("continente", f"produto {i}", _entry(f"Produto {i}"))
+        assert store.path.exists()
+        assert store.log_path.stat().st_size < 300
+        assert len(store.load_all()["continente"]) == 5
+
+    def test_concurrent_writers_do_not_lose_updates(self, tmp_path):
+        import threading
+        path = tmp_path / "price_cache.json"
+
+        def writer(market):
+            s = cs.JsonCacheStore(path, MARKETS)
+            for i in range(50):
+                s.put(market, f"produto {i}", _entry(f"Produto {i}"))
+
+        threads = [threading.Thread(target=writer, args=(m,)) for m in MARKETS]
+        for t in threads:
+            t.start()
+        cs.JsonCacheStore(path, MARKETS).compact()
+        for t in threads:
+            t.join()
+        cache = cs.JsonCacheStore(path, MARKETS).load_all()
+        assert all(len(cache[m]) == 50 for m in MARKETS)
+
+
+class TestJsonExpiryIndex:
+    @pytest.fixture
+    def store(self, tmp_path):
+        return cs.JsonCacheStore(tmp_path / "price_cache.json", MARKETS)
+
+    def test_snapshot_writes_sorted_index(self, store):
+        store.save_all({"continente": {"a": _entry("A", 1), "b": _entry("B", 30)}, "pingodoce": {}})
+        counts, cached, rows = store._read_expiry_index(0, cs.time_bucket(_now()) + 48)
+        assert [row[2] for row in rows] == ["b", "a"]
+        assert sum(c["continente"] for c in counts.values()) == 2
+        assert sum(cached["continente"].values()) == 2
+
+    def test_expired_reads_only_due_buckets(self, store):
+        store.save_all({"continente": {"a": _entry("A", 1), "b": _entry("B", 30)}, "pingodoce": {}})
+        _, _, rows = store._read_expiry_index(0, cs.time_bucket(_now()))
+        assert [row[2] for row in rows] == ["b"]
+
+    def test_log_overrides_index(self, store):
+        store.save_all({"continente": {"a": _entry("A", 1), "b": _entry("B", 30)}, "pingodoce": {}})
+        store.put("continente", "b", _entry("B", 1))      # renovada
+        store.put("continente", "c", _entry("C", 30))     # nova e expirada
+        assert [k for _, k, _ in store.expired(MARKETS, _now())] == ["c"]
+        assert store.counts(MARKETS, _now())["continente"] == (3, 2)
+
+    def test_stale_index_falls_back_to_snapshot(self, store):
+        store.save_all({"continente": {"a": _entry("A", 1)}, "pingodoce": {}})
+        store.path.write_text(json.dumps({"continente": {"x": _entry("X", 30)}, "pingodoce": {}}))
+        assert store._read_expiry_index(0, cs.time_bucket(_now())) is None
+        assert store.counts(MARKETS, _now())["continente"] == (1, 0)
+        assert [k for _, k, _ in store.expired(MARKETS, _now())] == ["x"]
+
+
+class TestJsonUnitIndex:
+    @pytest.fixture
+    def store(self, tmp_path):
+        return cs.JsonCacheStore(tmp_path / "price_cache.json", MARKETS)
+
+    def _priced(self, name, per_kg, category="Mercearia"):
+        return {**_entry(name), "price_per_unit": per_kg, "unit": "kg", "category": category}
+
+    def test_reads_only_requested_category(self, store):
+        store.save_all({"continente": {"a": self._priced("A", 2.0), "b": self._priced("B", 1.0),
+                                       "c": self._priced("C", 0.5, "Fruta")}, "pingodoce": {}})
+        assert [k for _, _, k in store.cheapest("mercearia", "kg", MARKETS, _now(), 5)] == ["b", "a"]
+        assert store._read_unit_rows("bebidas") == []
+
+    def test_stale_index_falls_back_to_snapshot(self, store):
+        store.save_all({"continente": {"a": self._priced("A", 2.0)}, "pingodoce": {}})
+        store.path.write_text(json.dumps({"continente": {"x": self._priced("X", 1.0)}, "pingodoce": {}}))
+        assert store._read_unit_rows("mercearia") is None
+        assert store.cheapest("mercearia", "kg", MARKETS, _now(), 5) == [(1.0, "continente", "x")]
+
+    def test_index_without_brands_is_ignored(self, store):
+        store.save_all({"continente": {"a": self._priced("A", 2.0)}, "pingodoce": {}})
+        lines = store.units_path.read_bytes().split(b"\n", 1)
+        header = json.loads(lines[0])
+        del header["version"]
+        store.units_path.write_bytes(json.dumps(header).encode() + b"\n" + lines[1])
+        assert store._read_unit_rows("mercearia") is None
+        assert store.cheapest("mercearia", "kg", MARKETS, _now(), 5) == [(2.0, "continente", "a")]
+
+
+class TestJsonBinarySnapshot:
+    @pytest.fixture
+    def store(self, tmp_path):
+        return cs.JsonCacheStore(tmp_path / "price_cache.json", MARKETS)
+
+    def test_snapshot_writes_binary(self, store):
+        store.save_all({"continente": {"a": _entry("A")}, "pingodoce": {}})
+        assert store.binary_path.exists()
+        assert store._open_binary().get("continente", "a")["name"] == "A"
+
+    def test_get_sees_log_over_binary(self, store):
+        store.save_all({"continente": {"a": _entry("A", price=1.0)}, "pingodoce": {}})
+        store.put("continente", "a", _entry("A", price=2.0))
+        store.put("continente", "b", _entry("B"))
+        assert store.get("continente", "a")["price"] == 2.0
+        assert store.get("continente", "b")["name"] == "B"
+        assert store.get("pingodoce", "a") is None
+
+    def test_view_matches_load_all(self, store):
+        store.save_all({"continente": {"a": _entry("A"), "b": _entry("B")}, "pingodoce": {}})
+        store.put("continente", "a", _entry("A", price=3.0))
+        store.put("pingodoce", "c", _entry("C"))
+        view = store.load_view()
+        expected = store.load_all()
+        assert list(view) == list(expected)
+        assert {m: dict(v.items()) for m, v in view.items()} == expected
+
+    def test_stale_binary_is_rebuilt_from_json(self, store):
+        store.save_all({"continente": {"a": _entry("A")}, "pingodoce": {}})
+        store.path.write_text(json.dumps({"continente": {"x": _entry("X")}, "pingodoce": {}}))
+        assert store.get("continente", "a") is None
+        assert store.get("continente", "x")["name"] == "X"
+        assert store._open_binary().keys("continente") == ["x"]
+
+    def test_empty_store(self, store):
+        assert store.get("continente", "a") is None
+        assert store.load_view() == {"continente": {}, "pingodoce": {}}
+
+
+class TestJsonTrigramIndex:
+    @pytest.fixture
+    def store(self, tmp_path):
+        s = cs.JsonCacheStore(tmp_path / "price_cache.json", MARKETS)
+        s.save_all({"continente": {k: _entry(k) for k in ["leite uht", "ovos", "leite meio-gordo", "pão"]},
+                    "pingodoce": {}})
+        return s
+
+    def test_snapshot_writes_index_used_by_view(self, store):
+        assert store.trigrams_path.exists()
+        view = store.load_view()["continente"]
+        assert view.trigrams.containing("leite") == ["leite uht", "leite meio-gordo"]
+        assert store.search_entries("continente", "leite").trigrams is not None
+
+    def test_log_keys_are_candidates(self, store):
+        store.put("continente", "leite gordo", _entry("leite gordo"))
+        store.put("continente", "ovos", _entry("ovos", price=2.0))
+        view = store.load_view()["continente"]
+        assert view.trigrams.containing("leite") == ["leite uht", "leite meio-gordo", "leite gordo"]
+        assert sorted(view, key=view.trigrams.position) == list(view)
+
+    def test_missing_or_stale_index_is_rebuilt(self, store):
+        store.trigrams_path.unlink()
+        assert store.load_view()["continente"].trigrams.containing("ovos") == ["ovos"]
+        store.path.write_text(json.dumps({"continente": {"arroz": _entry("arroz")}, "pingodoce": {}}))
+        assert store.load_view()["continente"].trigrams.containing("arroz") == ["arroz"]
+
+
+class TestSqliteStore:
+    def test_persists_across_connections(self, tmp_path):
+        path = tmp_path / "price_cache.json"
+        with cs.open_store("sqlite", path, MARKETS) as s:
+            s.put("continente", "leite", _entry("Leite"))
+        with cs.open_store("sqlite", path, MARKETS) as s:
+            assert s.get("continente", "leite")["name"] == "Leite"
+        assert (tmp_path / "price_cache.db").exists()
+        assert not path.exists()
+
+    def test_upgrade_from_v1_indexes_existing_keys(self, tmp_path):
+        import sqlite3
+        db = tmp_path / "price_cache.db"
+        conn = sqlite3.connect(db)
+        conn.executescript(cs._SQLITE_MIGRATIONS[0])
+        conn.execute("INSERT INTO entries VALUES ('continente', 'leite uht', NULL, '{}')")
+        conn.execute("PRAGMA user_version = 1")
+        conn.commit()
+        conn.close()
+        with cs.open_store("sqlite", tmp_path / "price_cache.json", MARKETS) as s:
+            assert list(s.search_entries("continente", "uht")) == ["leite uht"]
+
+    def test_search_uses_trigram_table(self, tmp_path):
+        with cs.open_store("sqlite", tmp_path / "price_cache.json", MARKETS) as s:
+            s.put_many([("continente", k, _entry(k)) for k in ["leite uht", "ovos", "pão"]])
+            assert list(s.search_entries("continente", "leite")) == ["leite uht"]
+
+    def test_upgrade_from_v2_fills_expires_at(self, tmp_path):
+        import sqlite3
+        db = tmp_path / "price_cache.db"
+        conn = sqlite3.connect(db)
+        conn.executescript(cs._SQLITE_MIGRATIONS[0] + cs._SQLITE_MIGRATIONS[1])
+        old = datetime.now(timezone.utc).timestamp() - 30 * 3600
+        conn.execute("INSERT INTO entries VALUES ('continente', 'velho', ?, '{}')", (old,))
+        conn.execute("INSERT INTO entries VALUES ('continente', 'novo', ?, '{}')", (_now(),))
+        conn.execute("PRAGMA user_version = 2")
+        conn.commit()
+        conn.close()
+        with cs.open_store("sqlite", tmp_path / "price_cache.json", MARKETS) as s:
+            assert [k for _, k, _ in s.expired(MARKETS, _now())] == ["velho"]
+
+    def test_save_all_rebuilds_trigrams(self, tmp_path):
+        with cs.open_store("sqlite", tmp_path / "price_cache.json", MARKETS) as s:
+            s.put("continente", "leite", _entry("Leite"))
+            s.save_all({"continente": {"ovos": _entry("Ovos")}})
+            assert s.search_entries("continente", "leite") == {}
+            assert list(s.search_entries("continente", "ovo")) == ["ovos"]
+
+
+    def test_upgrade_from_v3_fills_unit_prices(self, tmp_path):
+        import sqlite3
+        db = tmp_path / "price_cache.db"
+        conn = sqlite3.connect(db)
+        conn.executescript("".join(cs._SQLITE_MIGRATIONS[:3]))
+        entry = {**_entry("Arroz"), "price_per_unit": 1.2, "unit": "kg", "category": "Mercearia"}
+        conn.execute(
+            "INSERT INTO entries (market, key, cached_at, expires_at, entry) VALUES (?, ?, ?, ?, ?)",
+            ("continente", "arroz", _now(), _now() + 3600, json.dumps(entry)),
+        )
+        conn.execute("PRAGMA user_version = 3")
+        conn.commit()
+        conn.close()
+        with cs.open_store("sqlite", tmp_path / "price_cache.json", MARKETS) as s:
+            assert s.cheapest("mercearia", "kg", MARKETS, _now(), 5) == [(1.2, "continente", "arroz")]
+            assert s.counts(MARKETS, _now()) == {"continente": (1, 1), "pingodoce": (0, 0)}
+
+    def test_upgrade_from_v5_fills_brands(self, tmp_path):
+        import sqlite3
+        db = tmp_path / "price_cache.db"
+        conn = sqlite3.connect(db)
+        conn.executescript("".join(cs._SQLITE_MIGRATIONS[:5]))
+        entry = {**_entry("Leite"), "price_per_unit": 0.9, "unit": "L", "category": "Lacticínios",
+                 "brand": "Mimosa"}
+        conn.execute(
+            "INSERT INTO entries (market, key, cached_at, expires_at, entry, category, base_unit, unit_price) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            ("continente", "leite", _now(), _now() + 3600, json.dumps(entry), "lacticínios", "L", 0.9),
+        )
+        conn.execute("PRAGMA user_version = 5")
+        conn.commit()
+        conn.close()
+        with cs.open_store("sqlite", tmp_path / "price_cache.json", MARKETS) as s:
+            found = s.brand_candidates([("lacticínios", "L", ("mimosa",), ("leite",))], MARKETS, _now(), 3)
+            assert found == [{"continente": [(0.9, "leite")]}]
+
+    def test_replace_keeps_histogram_exact(self, tmp_path):
+        with cs.open_store("sqlite", tmp_path / "price_cache.json", MARKETS) as s:
+            for hours in (1, 30, 2):
+                s.put("continente", "leite", _entry("Leite", hours))
+            rows = s._conn.execute("SELECT kind, SUM(n) FROM histogram GROUP BY kind").fetchall()
+            assert rows == [("cached", 1), ("expires", 1)]
+
+
+def test_unknown_backend_raises(tmp_path):
+    with pytest.raises(ValueError):
+        cs.open_store("redis", tmp_path / "price_cache.json", MARKETS)
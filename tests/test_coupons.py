@@ -0,0 +1,106 @@
+"""Testes para scripts/coupons.py"""
+import coupons as cp
+
+
+def _coupon(description, discount, min_spend=0.0, categories=(), **extra):
+    return {"description": description, "discount_eur": discount, "min_spend": min_spend,
+            "categories": list(categories), **extra}
+
+
+# ---------------------------------------------------------------------------
+# CouponBook.applicable — índice por categoria
+# ---------------------------------------------------------------------------
+
+class TestApplicable:
+    def test_general_and_category_coupons(self):
+        book = cp.CouponBook([
+            _coupon("geral", 1.0),
+            _coupon("limpeza", 2.0, categories=["limpeza"]),
+            _coupon("frescos", 3.0, categories=["frescos", "talho"]),
+        ])
+        found = [c.description for c in book.applicable(20.0, {"limpeza", "talho"})]
+        assert found == ["geral", "limpeza", "frescos"]
+        assert [c.description for c in book.applicable(20.0, {"bebidas"})] == ["geral"]
+
+    def test_min_spend_filters(self):
+        book = cp.CouponBook([_coupon("a", 1.0, min_spend=30.0), _coupon("b", 1.0, min_spend=10.0)])
+        assert [c.description for c in book.applicable(15.0, set())] == ["b"]
+
+    def test_coupon_listed_once_for_several_categories(self):
+        book = cp.CouponBook([_coupon("frescos", 3.0, categories=["frescos", "talho"])])
+        assert len(book.applicable(10.0, {"frescos", "talho"})) == 1
+
+    def test_empty_book_is_falsy(self):
+        assert not cp.CouponBook([])
+        assert not cp.CouponBook(None)
+        assert not cp.CouponBook([_coupon("zero", 0.0)])
+        assert cp.CouponBook([_coupon("a", 1.0)])
+
+
+# ---------------------------------------------------------------------------
+# CouponBook.best — escolha ótima
+# ---------------------------------------------------------------------------
+
+class TestBest:
+    def test_stacks_all_when_below_cap(self):
+        book = cp.CouponBook([_coupon("5€", 5.0), _coupon("2€", 2.0)])
+        discount, applied = book.best(20.0, set())
+        assert discount == 7.0
+        assert [a["discount_eur"] for a in applied] == [5.0, 2.0]
+
+    def test_knapsack_beats_largest_first(self):
+        # Subtotal 10€: 6€ primeiro deixaria 4€ de 5€ — 5€ + 5€ cobre tudo sem desperdício
+        book = cp.CouponBook([_coupon("6€", 6.0), _coupon("5€ a", 5.0), _coupon("5€ b", 5.0)])
+        discount, applied = book.best(10.0, set())
+        assert discount == 10.0
+        assert sorted(a["description"] for a in applied) == ["5€ a", "5€ b"]
+
+    def test_exclusive_group_picks_best_member(self):
+        book = cp.CouponBook([
+            _coupon("cartão 3€", 3.0, exclusive_group="cartao"),
+            _coupon("cartão 4€", 4.0, exclusive_group="cartao"),
+            _coupon("geral 1€", 1.0),
+        ])
+        discount, applied = book.best(50.0, set())
+        assert discount == 5.0
+        assert [a["description"] for a in applied] == ["cartão 4€", "geral 1€"]
+
+    def test_non_stackable_used_alone_when_better(self):
+        book = cp.CouponBook([_coupon("sozinho", 8.0, stackable=False), _coupon("a", 3.0), _coupon("b", 2.0)])
+        discount, applied = book.best(50.0, set())
+        assert discount == 8.0
+        assert [a["description"] for a in applied] == ["sozinho"]
+
+    def test_non_stackable_loses_to_combination(self):
+        book = cp.CouponBook([_coupon("sozinho", 4.0, stackable=False), _coupon("a", 3.0), _coupon("b", 2.0)])
+        assert book.best(50.0, set())[0] == 5.0
+
+    def test_cap_prefers_less_waste_then_fewer_coupons(self):
+        # Todas as opções chegam aos 4€ do subtotal: 4€ sozinho desperdiça 0 e usa 1 cupão
+        book = cp.CouponBook([_coupon("4€", 4.0), _coupon("3€", 3.0), _coupon("2€", 2.0), _coupon("6€", 6.0)])
+        discount, applied = book.best(4.0, set())
+        assert discount == 4.0
+        assert [a["description"] for a in applied] == ["4€"]
+
+    def test_discount_capped_at_subtotal(self):
+        book = cp.CouponBook([_coupon("100€", 100.0)])
+        discount, applied = book.best(10.0, set())
+        assert discount == 10.0
+        assert applied[0]["discount_eur"] == 10.0
+
+    def test_category_restriction(self):
+        book = cp.CouponBook([_coupon("limpeza", 2.0, categories=["limpeza"])])
+        assert book.best(50.0, {"lacticínios"}) == (0.0, [])
+        assert book.best(50.0, {"limpeza"})[0] == 2.0
+
+    def test_max_discount_monotone_in_subtotal(self):
+        book = cp.CouponBook([_coupon("a", 3.0, min_spend=10.0), _coupon("b", 2.0, min_spend=20.0)])
+        values = [book.max_discount(s, set()) for s in (5.0, 10.0, 19.99, 20.0, 40.0)]
+        assert values == [0.0, 3.0, 3.0, 5.0, 5.0]
+
+    def test_memoized_by_applicable_set(self):
+        book = cp.CouponBook([_coupon("a", 3.0), _coupon("b", 2.0)])
+        book.best(30.0, set())
+        size = len(book._memo)
+        book.best(45.0, {"bebidas"})  # mesmos cupões aplicáveis, subtotal não limita
+        assert len(book._memo) == size
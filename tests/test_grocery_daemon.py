@@ -0,0 +1,231 @@
+"""Testes para scripts/grocery_daemon.py e scripts/grocery_client.py"""
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pytest
+import consumption_tracker as ct
+import grocery_client as gc
+import grocery_daemon as gd
+import list_optimizer as lo
+import price_cache as pc
+import price_compare as pcomp
+
+
+def _age(path, seconds=10):
+    """Recua o mtime para fora da janela de escrita recente da memo."""
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+
+@pytest.fixture
+def seed():
+    return {"inventory.json": {"shopping_list": [{"name": "Leite"}]}}
+
+
+@pytest.fixture
+def memo(data_dir):
+    m = gd.MtimeMemo()
+    restore = gd.install_memo(m)
+    yield m
+    restore()
+
+
+@pytest.fixture
+def sock_path():
+    # AF_UNIX limita o caminho a ~100 bytes; o tmp_path do pytest pode exceder
+    with tempfile.TemporaryDirectory(prefix="gd") as d:
+        yield Path(d) / "grocery.sock"
+
+
+# ---------------------------------------------------------------------------
+# MtimeMemo
+# ---------------------------------------------------------------------------
+
+class TestMtimeMemo:
+    def test_reuses_value_while_file_unchanged(self, tmp_path):
+        path = tmp_path / "a.json"
+        path.write_text("{}")
+        _age(path)
+        memo = gd.MtimeMemo()
+        calls = []
+        loader = lambda: calls.append(1) or len(calls)
+        assert memo.get("a", [path], loader) == 1
+        assert memo.get("a", [path], loader) == 1
+        assert memo.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+    def test_reloads_when_file_changes(self, tmp_path):
+        path = tmp_path / "a.json"
+        path.write_text("{}")
+        _age(path, 20)
+        memo = gd.MtimeMemo()
+        memo.get("a", [path], lambda: "old")
+        path.write_text('{"x": 1}')
+        _age(path, 10)
+        assert memo.get("a", [path], lambda: "new") == "new"
+
+    def test_recently_written_file_is_not_memoized(self, tmp_path):
+        path = tmp_path / "a.json"
+        path.write_text("{}")
+        memo = gd.MtimeMemo()
+        memo.get("a", [path], lambda: "first")
+        assert memo.get("a", [path], lambda: "second") == "second"
+
+    def test_file_appearing_invalidates(self, tmp_path):
+        path = tmp_path / "a.log"
+        memo = gd.MtimeMemo()
+        memo.get("a", [path], lambda: "without")
+        path.write_text("x")
+        _age(path)
+        assert memo.get("a", [path], lambda: "with") == "with"
+
+
+class TestInstallMemo:
+    def test_load_json_is_memoized_across_modules(self, data_dir, memo):
+        _age(data_dir / "family_preferences.json")
+        lo.load_json(data_dir / "family_preferences.json")
+        pcomp.load_json(data_dir / "family_preferences.json")
+        assert (memo.hits, memo.misses) == (1, 1)
+
+    def test_callers_get_copies(self, data_dir, memo):
+        path = data_dir / "inventory.json"
+        _age(path)
+        lo.load_json(path)["shopping_list"][0]["source"] = "manual"
+        assert pcomp.load_json(path) == {"shopping_list": [{"name": "Leite"}]}
+
+    def test_weekly_list_does_not_leak_into_comparison(self, data_dir, memo):
+        gd.dispatch("price_cache.update", {"market": "continente", "product": "Leite", "data": {"price": 1.29}})
+        for p in data_dir.iterdir():
+            _age(p)
+        first = gd.dispatch("price_compare.run_comparison")
+        gd.dispatch("list_optimizer.generate_weekly_list")
+        assert pcomp.load_json(data_dir / "inventory.json") == {"shopping_list": [{"name": "Leite"}]}
+        second = gd.dispatch("price_compare.run_comparison")
+        assert second["result_cache"]["status"] == "hit"
+        assert second["result_cache"]["key"] == first["result_cache"]["key"]
+
+    def test_save_json_invalidates(self, data_dir, memo):
+        path = data_dir / "consumption_model.json"
+        _age(path)
+        ct.load_json(path)
+        ct.save_json(path, {"leite": {"name": "Leite"}})
+        _age(path)
+        assert ct.load_json(path) == {"leite": {"name": "Leite"}}
+
+    def test_price_cache_invalidated_by_update(self, data_dir, memo):
+        pc.cmd_update(gd._CmdArgs(market="continente", product="Leite", data={"price": 1.0}))
+        for p in data_dir.glob("price_cache.*"):
+            _age(p)
+        assert "leite" in pc.load_cache()["continente"]
+        pc.cmd_update(gd._CmdArgs(market="continente", product="Ovos", data={"price": 2.0}))
+        assert "ovos" in pcomp.load_cache_view()["continente"]
+
+    def test_restore_puts_originals_back(self, data_dir):
+        original = lo.load_json
+        restore = gd.install_memo(gd.MtimeMemo())
+        assert lo.load_json is not original
+        restore()
+        assert lo.load_json is original
+
+
+# ---------------------------------------------------------------------------
+# dispatch / handle_request
+# ---------------------------------------------------------------------------
+
+class TestDispatch:
+    def test_price_cache_command(self, data_dir):
+        gd.dispatch("price_cache.update", {"market": "continente", "product": "Leite", "data": {"price": 1.29}})
+        result = gd.dispatch("price_cache.get", {"market": "continente", "product": "leite"})
+        assert result["found"] is True
+
+    def test_optional_flags_default_to_none(self, data_dir):
+        assert "total" in gd.dispatch("price_cache.stats")
+        assert gd.dispatch("price_cache.expired")["expired_count"] == 0
+
+    def test_function_with_kwargs(self, data_dir):
+        assert gd.dispatch("list_optimizer.generate_triage", {"next_bulk_date": None})["type"] == "triage"
+
+    def test_run_comparison(self, data_dir):
+        result = gd.dispatch("price_compare.run_comparison")
+        assert result["missing_from_cache"] == ["Leite"]
+
+    def test_run_comparison_incremental(self, data_dir, monkeypatch):
+        monkeypatch.setattr(gd, "_SESSION", None)
+        gd.dispatch("price_cache.update", {"market": "continente", "product": "Leite", "data": {"price": 1.29}})
+        first = gd.dispatch("price_compare.run_comparison_incremental")
+        assert first["session"]["added"] == 1
+        assert first["total"] == gd.dispatch("price_compare.run_comparison")["total"]
+        (data_dir / "inventory.json").write_text(json.dumps({"shopping_list": [{"name": "Leite"}, {"name": "Arroz"}]}))
+        second = gd.dispatch("price_compare.run_comparison_incremental")
+        assert second["session"] == {"added": 1, "removed": 0, "changed": 0, "local": 1, "full": 0}
+        assert second["missing_from_cache"] == ["Arroz"]
+        assert gd.dispatch("daemon.stats")["split_session"]["items"] == 2
+
+    def test_unknown_method(self):
+        with pytest.raises(gc.RpcError) as exc:
+            gd.dispatch("os.system", {"command": "true"})
+        assert exc.value.code == gd.METHOD_NOT_FOUND
+
+    def test_invalid_params(self):
+        with pytest.raises(gc.RpcError) as exc:
+            gd.dispatch("consumption_tracker.check_stock", {"unexpected": 1})
+        assert exc.value.code == gd.INVALID_PARAMS
+
+    def test_handle_request_errors(self):
+        assert gd.handle_request(b"not json")["error"]["code"] == gd.PARSE_ERROR
+        assert gd.handle_request(b'{"id": 1}')["error"]["code"] == gd.INVALID_REQUEST
+        response = gd.handle_request(b'{"jsonrpc": "2.0", "id": 7, "method": "daemon.ping"}')
+        assert response == {"jsonrpc": "2.0", "id": 7, "result": "pong"}
+
+
+# ---------------------------------------------------------------------------
+# Servidor + cliente
+# ---------------------------------------------------------------------------
+
+class TestServer:
+    def test_roundtrip_and_shutdown(self, data_dir, sock_path):
+        thread = threading.Thread(target=gd.serve, args=(sock_path,))
+        thread.start()
+        try:
+            for _ in range(200):
+                try:
+                    assert gc.call("daemon.ping", fallback=False, path=sock_path) == "pong"
+                    break
+                except (FileNotFoundError, ConnectionRefusedError):
+                    time.sleep(0.01)
+            else:
+                pytest.fail("daemon não arrancou")
+            result = gc.call("list_optimizer.generate_weekly_list", fallback=False, path=sock_path)
+            assert result["total_items"] == 1
+            with pytest.raises(gc.RpcError):
+                gc.call("nope", fallback=False, path=sock_path)
+            assert gc.call("daemon.stats", fallback=False, path=sock_path)["memo"]["misses"] >= 1
+        finally:
+            gc._call_socket(sock_path, "daemon.shutdown", {})
+            thread.join(timeout=5)
+        assert not thread.is_alive()
+        assert not sock_path.exists()
+
+    def test_stale_socket_is_replaced(self, sock_path):
+        import socket
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.bind(str(sock_path))
+        s.close()
+        assert gd._clear_stale_socket(sock_path) is True
+        assert not sock_path.exists()
+
+
+class TestClientFallback:
+    def test_runs_in_process_without_daemon(self, data_dir, sock_path):
+        assert gc.call("daemon.ping", path=sock_path) == "pong"
+
+    def test_no_fallback_raises(self, sock_path):
+        with pytest.raises(FileNotFoundError):
+            gc.call("daemon.ping", fallback=False, path=sock_path)
+
+    def test_socket_path_env_override(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("GROCERY_DAEMON_SOCKET", str(tmp_path / "x.sock"))
+        assert gc.socket_path() == tmp_path / "x.sock"
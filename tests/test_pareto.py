@@ -0,0 +1,210 @@
+"""Testes para scripts/pareto.py"""
+import itertools
+import random
+
+import pytest
+import pareto as pt
+import price_compare as pc
+
+
+def _item(name, category, continente=None, pingodoce=None, preferred_brand=None, acceptable_brands=None,
+          preferred_store=None):
+    prices = {}
+    for market, entry in (("continente", continente), ("pingodoce", pingodoce)):
+        if entry is not None:
+            price, brand = entry if isinstance(entry, tuple) else (entry, None)
+            prices[market] = {"price": price, "brand": brand}
+    item = {"name": name, "category": category, "preferred_brand": preferred_brand,
+            "preferred_store": preferred_store}
+    if acceptable_brands is not None:
+        item["acceptable_brands"] = acceptable_brands
+    return {"item": item, "prices": prices}
+
+
+def _vectors(frontier):
+    return {(p["total"], p["orders"], p["substitutions"]) for p in frontier["points"]}
+
+
+def _brute_force(items, config):
+    """Vetores (total, encomendas, substituições) não dominados, por enumeração."""
+    books = pc.coupon_books(config)
+    options = []
+    for d in items:
+        available = [m for m in pc.MARKETS if m in d["prices"]]
+        preferred = d["item"].get("preferred_store")
+        options.append([preferred] if preferred in available else available or [None])
+    vectors = set()
+    for choice in itertools.product(*options):
+        subtotals, categories, n_subs = {}, {}, 0
+        for d, market in zip(items, choice):
+            if market is None:
+                continue
+            subtotals[market] = subtotals.get(market, 0.0) + d["prices"][market]["price"]
+            categories.setdefault(market, set()).add(d["item"]["category"])
+            n_subs += pt.brand_substitution(d["item"], d["prices"][market])
+        if any(s < (pc.DELIVERY_CONFIG[m].get("min_order") or 0.0) for m, s in subtotals.items()):
+            continue
+        total = sum(pc.market_cost(m, s, categories[m], config, books)["total"] for m, s in subtotals.items())
+        vectors.add((total, len(subtotals), n_subs))
+    front = {
+        v for v in vectors
+        if not any(w != v and w[0] <= v[0] + 1e-9 and w[1] <= v[1] and w[2] <= v[2] for w in vectors)
+    }
+    return {(round(t, 2), k, s) for t, k, s in front}
+
+
+# ---------------------------------------------------------------------------
+# brand_substitution
+# ---------------------------------------------------------------------------
+
+class TestBrandSubstitution:
+    def test_other_brand_is_substitution(self):
+        assert pt.brand_substitution({"preferred_brand": "Mimosa"}, {"brand": "Agros"}) is True
+
+    def test_preferred_and_acceptable_brands_case_insensitive(self):
+        item = {"preferred_brand": "Mimosa", "acceptable_brands": ["Agros"]}
+        assert pt.brand_substitution(item, {"brand": "MIMOSA "}) is False
+        assert pt.brand_substitution(item, {"brand": "agros"}) is False
+
+    def test_unknown_brand_or_no_preference(self):
+        assert pt.brand_substitution({"preferred_brand": "Mimosa"}, {"price": 1.0}) is False
+        assert pt.brand_substitution({"preferred_brand": None}, {"brand": "Agros"}) is False
+        assert pt.brand_substitution({"preferred_brand": "Mimosa"}, None) is False
+
+
+# ---------------------------------------------------------------------------
+# pareto_frontier
+# ---------------------------------------------------------------------------
+
+class TestParetoFrontier:
+    def test_one_order_vs_two(self):
+        # o split poupa €0.30 em preços mas paga duas entregas (abaixo dos limiares)
+        items = [
+            _item("leite", "lacticínios", continente=1.29, pingodoce=0.99),
+            _item("arroz", "mercearia", continente=0.79, pingodoce=1.09),
+        ]
+        frontier = pt.pareto_frontier(items)
+        assert frontier["complete"] is True
+        assert [(p["orders"], p["total"]) for p in frontier["points"]] == [(1, 5.07)]
+        assert frontier["points"][0]["label"] == "€5.07 com 1 encomenda"
+
+    def test_split_worth_it_gives_two_points(self, monkeypatch):
+        monkeypatch.setitem(pc.DELIVERY_CONFIG["continente"], "cost", 0.0)
+        monkeypatch.setitem(pc.DELIVERY_CONFIG["pingodoce"], "cost", 0.5)
+        items = [
+            _item("leite", "lacticínios", continente=3.0, pingodoce=1.0),
+            _item("arroz", "mercearia", continente=1.0, pingodoce=3.0),
+        ]
+        points = pt.pareto_frontier(items)["points"]
+        assert [(p["orders"], p["total"]) for p in points] == [(1, 4.0), (2, 2.5)]
+        assert points[1]["markets"] == {"continente": {"items": ["arroz"], "total": 1.0},
+                                        "pingodoce": {"items": ["leite"], "total": 1.5}}
+        assert points[1]["label"] == "€2.50 com 2 encomendas"
+
+    def test_brand_substitution_point(self, monkeypatch):
+        monkeypatch.setitem(pc.DELIVERY_CONFIG["pingodoce"], "cost", 0.0)
+        monkeypatch.setitem(pc.DELIVERY_CONFIG["continente"], "cost", 0.0)
+        items = [
+            _item("leite", "lacticínios", continente=(1.29, "Mimosa"), pingodoce=(0.89, "Pingo Doce"),
+                  preferred_brand="Mimosa"),
+            _item("arroz", "mercearia", continente=1.00, pingodoce=1.00),
+        ]
+        points = pt.pareto_frontier(items)["points"]
+        assert [(p["total"], p["orders"], p["substitutions"]) for p in points] == [(1.89, 1, 1), (2.29, 1, 0)]
+        assert points[0]["substituted"] == ["leite"]
+        assert points[0]["label"] == "€1.89 com 1 encomenda e 1 substituição de marca"
+
+    def test_cheapest_point_is_exact_optimum(self):
+        rng = random.Random(5)
+        items = [
+            _item(f"item{i}", "outros", continente=(round(rng.uniform(0.5, 9), 2), rng.choice("AB")),
+                  pingodoce=(round(rng.uniform(0.5, 9), 2), rng.choice("AB")), preferred_brand="A")
+            for i in range(14)
+        ]
+        frontier = pt.pareto_frontier(items, time_budget=None)
+        exact = pc.optimize_exact(items, time_budget=None)
+        assert min(p["total"] for p in frontier["points"]) == exact["total"]
+
+    def test_unavailable_and_preferred_store(self):
+        items = [
+            _item("cafe", "bebidas", continente=1.29, pingodoce=0.99, preferred_store="continente"),
+            _item("raro", "outros"),
+        ]
+        points = pt.pareto_frontier(items)["points"]
+        assert [p["markets"] for p in points] == [{"continente": {"items": ["cafe"], "total": 5.28}}]
+
+    def test_budget_exhausted_flags_incomplete(self):
+        rng = random.Random(1)
+        items = [
+            _item(f"item{i}", "outros", continente=(round(rng.uniform(0.5, 9), 2), rng.choice("ABC")),
+                  pingodoce=(round(rng.uniform(0.5, 9), 2), rng.choice("ABC")), preferred_brand="A")
+            for i in range(60)
+        ]
+        frontier = pt.pareto_frontier(items, time_budget=0)
+        assert frontier["complete"] is False
+        assert frontier["points"]  # incumbentes iniciais
+        vectors = [(p["total"], p["orders"], p["substitutions"]) for p in frontier["points"]]
+        for v in vectors:
+            assert not any(w != v and w[0] <= v[0] and w[1] <= v[1] and w[2] <= v[2] for w in vectors)
+
+    @pytest.mark.parametrize("seed", range(16))
+    def test_matches_brute_force(self, seed, monkeypatch):
+        rng = random.Random(seed)
+        monkeypatch.setitem(pc.DELIVERY_CONFIG["continente"], "free_threshold", 20.0)
+        monkeypatch.setitem(pc.DELIVERY_CONFIG["pingodoce"], "free_threshold", 15.0)
+        monkeypatch.setitem(pc.DELIVERY_CONFIG["pingodoce"], "min_order", rng.choice([0.0, 5.0]))
+        categories = ["lacticínios", "mercearia", "bebidas"]
+
+        def entry():
+            if rng.random() < 0.15:
+                return None
+            return round(rng.uniform(0.5, 6), 2), rng.choice(["A", "B", "C", None])
+
+        items = [
+            _item(f"item{i}", rng.choice(categories), continente=entry(), pingodoce=entry(),
+                  preferred_brand=rng.choice(["A", "B", None]), acceptable_brands=rng.choice([None, ["C"]]),
+                  preferred_store="continente" if rng.random() < 0.1 else None)
+            for i in range(8)
+        ]
+        coupons = [
+            {"description": "a", "discount_eur": 2.0, "min_spend": 10.0, "categories": [rng.choice(categories)]},
+            {"description": "b", "discount_eur": 1.5, "min_spend": 15.0, "categories": [], "exclusive_group": "x"},
+        ]
+        config = {m: {"coupons": coupons if m == "continente" else [], "balance": rng.choice([0.0, 1.0])}
+                  for m in pc.MARKETS}
+        frontier = pt.pareto_frontier(items, config, time_budget=None)
+        assert frontier["complete"] is True
+        assert _vectors(frontier) == _brute_force(items, config)
+
+
+# ---------------------------------------------------------------------------
+# run_comparison
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def seed():
+    return {
+        "inventory.json": {"shopping_list": [
+            {"name": "Leite", "category": "lacticínios", "preferred_brand": "Mimosa"},
+        ]},
+        "price_cache": [
+            ("continente", "Leite", {"price": 1.29, "brand": "Mimosa"}),
+            ("pingodoce", "Leite", {"price": 0.89, "brand": "Pingo Doce"}),
+        ],
+    }
+
+
+class TestRunComparison:
+    def test_output_has_frontier(self, data_dir):
+        result = pc.run_comparison(use_result_cache=False)
+        assert result["pareto"]["complete"] is True
+        assert [(p["total"], p["substitutions"]) for p in result["pareto"]["points"]] == [(3.88, 1), (5.28, 0)]
+
+    def test_frontier_is_cached_with_the_result(self, data_dir):
+        first = pc.run_comparison()
+        second = pc.run_comparison()
+        assert second["result_cache"]["status"] == "hit"
+        assert second["pareto"] == first["pareto"]
+
+    def test_no_pareto(self, data_dir):
+        assert "pareto" not in pc.run_comparison(use_result_cache=False, pareto=False)
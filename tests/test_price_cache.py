@@ -34,6 +34,76 @@ class TestParsePricePt:
         assert pc.parse_price_pt("  1,50 €  ") == 1.5
 
 
+class TestParsePricesPt:
+    def test_unit_suffixes(self):
+        assert pc.parse_price_unit_pt("0,99/kg") == (0.99, "€/kg")
+        assert pc.parse_price_unit_pt("1,20 €/L") == (1.2, "€/L")
+        assert pc.parse_price_unit_pt("0,35 € / un") == (0.35, "€/un")
+        assert pc.parse_price_unit_pt("2,49 €") == (2.49, None)
+
+    def test_unparseable(self):
+        assert pc.parse_price_unit_pt("") == (None, None)
+        assert pc.parse_price_unit_pt("grátis") == (None, None)
+
+    @pytest.mark.parametrize("noise", [
+        "0,99 €/100g", "Preço: 2,49 €", "", "€", ".", "2,49\n1,00", "1,2,3", "nan", "1e5", "grátis", "1 299,00 €",
+    ])
+    def test_batch_noise_matches_single_parser(self, noise):
+        block = ["2,49 €", noise, "1.299,00 €", "2.49"]
+        assert pc.parse_prices_pt(block) == [pc.parse_price_unit_pt(s) for s in block]
+
+    def test_batch_matches_single_parser(self):
+        import random
+        rng = random.Random(3)
+        strings = []
+        for _ in range(5000):
+            euros, cents = rng.randint(0, 5000), rng.randint(0, 99)
+            base = f"{euros:,}".replace(",", ".") + f",{cents:02d}"
+            strings.append(rng.choice([
+                f"{base} €", f"{base}/kg", f"{base} €/L", f"€ {base}", f"{base} €/un",
+                f"{euros}.{cents:02d}", f"{euros} €", f"{base} €/Kg", f"{euros} {cents:03d},00 €",
+            ]))
+        strings[1234] = "esgotado"
+        assert pc.parse_prices_pt(strings) == [pc.parse_price_unit_pt(s) for s in strings]
+        for s, (value, _) in zip(strings, pc.parse_prices_pt(strings)):
+            assert value == pc.parse_price_pt(s)
+
+    @pytest.mark.parametrize("text,expected", [
+        (",99", (0.99, None)), (".5", (0.5, None)), ("9,€/kg", (9.0, "€/kg")), ("4,.70", (4.7, None)),
+        ("2,8/.ml", (2.8, None)),
+    ])
+    def test_loose_separators_agree(self, text, expected):
+        assert pc.parse_price_unit_pt(text) == expected
+        assert pc.parse_prices_pt(["1,00", text, "2,00"])[1] == expected
+        assert pc.parse_prices_pt([text]) == [expected]
+
+    def test_random_strings_match_single_parser(self):
+        import random
+        rng = random.Random(8)
+        alphabet = list("0123456789") * 3 + list(".,.,€ /\t") + ["\xa0", "kg", "L", "un", "ml", "x", "é"]
+        for _ in range(3000):
+            block = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 8)))
+                     for _ in range(rng.randint(1, 6))]
+            assert pc.parse_prices_pt(block) == [pc.parse_price_unit_pt(s) for s in block], block
+
+    def test_stream_input(self):
+        gen = (s for s in ["2,49 €", "0,99/kg"] * 3)
+        assert list(pc.iter_parse_prices_pt(gen)) == [(2.49, None), (0.99, "€/kg")] * 3
+
+    def test_cmd_parse_price_batch(self, monkeypatch):
+        import io
+        monkeypatch.setattr("sys.stdin", io.StringIO('"2,49 €"\n{"price_str": "0,99/kg"}\nxx\n42\n'))
+        result = pc.cmd_parse_price(types.SimpleNamespace(price_str=None, batch=True))
+        assert result["count"] == 4
+        assert result["parsed"] == 2
+        assert result["results"][1] == {"line": 2, "input": "0,99/kg", "value": 0.99, "unit": "€/kg"}
+        assert "error" in result["results"][2] and "error" in result["results"][3]
+
+    def test_cmd_parse_price_single_reports_unit(self):
+        result = pc.cmd_parse_price(types.SimpleNamespace(price_str="0,99/kg", batch=False))
+        assert result == {"input": "0,99/kg", "value": 0.99, "unit": "€/kg"}
+
+
 # ---------------------------------------------------------------------------
 # normalize_key
 # ---------------------------------------------------------------------------
@@ -67,6 +137,12 @@ class TestIsCacheValid:
     def test_missing_cached_at(self):
         assert pc.is_cache_valid({"price": 1.0}) is False
 
+    def test_expires_at_takes_precedence(self):
+        entry = {**self._entry(1), "expires_at": datetime.now(timezone.utc).timestamp() - 1}
+        assert pc.is_cache_valid(entry) is False
+        entry = {**self._entry(30), "expires_at": datetime.now(timezone.utc).timestamp() + 60}
+        assert pc.is_cache_valid(entry) is True
+
 
 # ---------------------------------------------------------------------------
 # fuzzy_search
@@ -101,6 +177,29 @@ class TestFuzzySearch:
         results = pc.fuzzy_search(self._cache(), "continente", "leite", limit=1)
         assert len(results) == 1
 
+    def test_index_gives_same_results(self):
+        cache = self._cache()
+        index = pc.TrigramIndex(cache["continente"])
+        for query in ["leite", "ovos", "Leite UHT", "le", "chocolate"]:
+            assert pc.fuzzy_search(cache, "continente", query, index=index) == \
+                pc.fuzzy_search(cache, "continente", query)
+
+    def test_json_view_uses_persistent_index(self, tmp_path):
+        import cache_store
+        import price_compare
+        cache = self._cache()
+        store = cache_store.JsonCacheStore(tmp_path / "price_cache.json", ["continente", "pingodoce"])
+        store.save_all(cache)
+        store.put("continente", "leite magro", {"name": "Leite Magro", "price": 0.89,
+                                                "cached_at": datetime.now(timezone.utc).isoformat()})
+        view, loaded = store.load_view(), store.load_all()
+        assert view["continente"].trigrams is not None
+        for query in ["leite", "ovos", "Leite UHT", "le", "chocolate"]:
+            assert pc.fuzzy_search(view, "continente", query) == pc.fuzzy_search(loaded, "continente", query)
+        for name in ["Leite", "leite uht 1l", "ovos m", "magro", "chocolate"]:
+            assert price_compare.get_cached_price(view, "continente", name) == \
+                price_compare.get_cached_price(loaded, "continente", name), name
+
 
 # ---------------------------------------------------------------------------
 # cmd_update / cmd_get (integration with temp files)
@@ -133,6 +232,8 @@ class TestCacheUpdateGet:
         assert entry["found"] is True
         assert entry["price"] == 1.29
         assert entry["valid"] is True
+        expected = datetime.fromisoformat(entry["cached_at"]).timestamp() + pc.CACHE_TTL_HOURS * 3600
+        assert entry["expires_at"] == pytest.approx(expected)
 
     def test_update_invalid_json_syntax(self):
         # JSON com sintaxe inválida (não parseable)
@@ -146,7 +247,503 @@ class TestCacheUpdateGet:
         result = pc.cmd_update(args)
         assert "error" in result
 
+    def test_updates_go_to_log_until_compact(self, tmp_path):
+        pc.cmd_update(self._make_update_args("continente", "leite", {"price": 1.29}))
+        assert (tmp_path / "price_cache.log").exists()
+        assert not (tmp_path / "price_cache.json").exists()
+        result = pc.cmd_compact(types.SimpleNamespace())
+        assert result["compacted"] is True
+        assert json.loads((tmp_path / "price_cache.json").read_text())["continente"]["leite"]["price"] == 1.29
+
+    def test_update_records_history(self):
+        pc.cmd_update(self._make_update_args("continente", "leite", {"price": 1.29}))
+        pc.cmd_update(self._make_update_args("continente", "leite", {"price": 1.29}))
+        pc.cmd_update(self._make_update_args("continente", "leite", {"price": 1.39}))
+        result = pc.cmd_history(types.SimpleNamespace(market="continente", product="Leite", window=None))
+        assert result["found"] is True
+        assert result["observations"] == 2
+        assert result["price"]["min"] == 1.29
+        assert result["price"]["current"] == 1.39
+
+    def test_history_negative_window(self):
+        result = pc.cmd_history(types.SimpleNamespace(market="continente", product="Leite", window=-1))
+        assert "error" in result
+
+    def test_history_missing_product(self):
+        result = pc.cmd_history(types.SimpleNamespace(market="continente", product="nada", window=30))
+        assert result["found"] is False
+
     def test_get_missing_product(self):
         get_args = self._make_get_args("continente", "produto-inexistente")
         result = pc.cmd_get(get_args)
         assert result["found"] is False
+
+
+# ---------------------------------------------------------------------------
+# cmd_update_batch
+# ---------------------------------------------------------------------------
+
+class TestUpdateBatch:
+    @pytest.fixture(autouse=True)
+    def patch_cache_file(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(pc, "CACHE_FILE", tmp_path / "price_cache.json")
+        monkeypatch.setattr(pc, "DATA_DIR", tmp_path)
+        self.tmp = tmp_path
+
+    def _ndjson(self, *records):
+        return "\n".join(r if isinstance(r, str) else json.dumps(r) for r in records) + "\n"
+
+    def test_applies_all_records_in_one_write(self, monkeypatch):
+        path = self.tmp / "updates.ndjson"
+        path.write_text(self._ndjson(
+            {"market": "continente", "product": "Leite Mimosa", "data": {"price": 1.29}},
+            {"market": "pingodoce", "product": "Ovos", "data": '{"price": 2.59}'},
+        ))
+        appends = []
+        original = pc.JsonCacheStore._append
+        monkeypatch.setattr(pc.JsonCacheStore, "_append", lambda self, r: appends.append(r) or original(self, r))
+
+        result = pc.cmd_update_batch(types.SimpleNamespace(file=str(path)))
+        assert result["applied"] == 2
+        assert result["errors"] == 0
+        assert len(appends) == 1
+        cache = pc.load_cache()
+        assert cache["continente"]["leite mimosa"]["price"] == 1.29
+        assert cache["pingodoce"]["ovos"]["price"] == 2.59
+
+    def test_invalid_records_reported_per_line(self, monkeypatch):
+        import io
+        monkeypatch.setattr("sys.stdin", io.StringIO(self._ndjson(
+            {"market": "continente", "product": "arroz", "data": {"price": 0.89}},
+            "{not json",
+            {"market": "lidl", "product": "cafe", "data": {"price": 3.0}},
+            {"market": "continente", "product": "massa", "data": ["x"]},
+            "",
+            {"market": "continente", "data": {"price": 1.0}},
+        )))
+        result = pc.cmd_update_batch(types.SimpleNamespace(file=None))
+        assert result["applied"] == 1
+        assert result["errors"] == 4
+        assert [r["line"] for r in result["results"] if "error" in r] == [2, 3, 4, 6]
+        assert "arroz" in pc.load_cache()["continente"]
+
+    def test_update_and_batch_share_validation(self):
+        single = pc.cmd_update(types.SimpleNamespace(market="continente", product="x", data='"texto"'))
+        assert single["error"].startswith("--data deve ser um objeto JSON")
+
+    def test_missing_file(self):
+        result = pc.cmd_update_batch(types.SimpleNamespace(file=str(self.tmp / "nope.ndjson")))
+        assert "error" in result
+
+
+# ---------------------------------------------------------------------------
+# refresh-plan
+# ---------------------------------------------------------------------------
+
+def _ago(days=0.0, hours=0.0):
+    return (datetime.now(timezone.utc) - timedelta(days=days, hours=hours)).isoformat()
+
+
+class TestRefreshCandidates:
+    def test_sources_are_merged_by_normalized_key(self):
+        model = {
+            "_comment": "seed",
+            "leite": {"name": "Leite", "avg_purchase_interval_days": 7, "estimated_stock_remaining_days": 3},
+        }
+        history = {"purchases": [{"date": _ago(days=1), "items": [{"id": "leite", "name": "LEITE UHT"}, {"name": "Ovos"}]}]}
+        cands = pc.refresh_candidates(model, history, [{"name": " leite "}], datetime.now(timezone.utc))
+        assert set(cands) == {"leite", "ovos"}
+        assert cands["leite"]["per_week"] == 1.0
+        assert cands["leite"]["days_left"] == 0  # está na shopping_list
+
+    def test_physical_and_inactive_products_are_excluded(self):
+        model = {
+            "azeite": {"name": "Azeite", "preferred_store": "makro", "avg_purchase_interval_days": 7},
+            "gelado": {"name": "Gelado", "active": False, "avg_purchase_interval_days": 7},
+            "arroz": {"name": "Arroz", "preferred_store": "continente", "avg_purchase_interval_days": 14},
+        }
+        history = {"purchases": [{"date": _ago(days=2), "items": [{"name": "Azeite"}]}]}
+        assert set(pc.refresh_candidates(model, history, [], datetime.now(timezone.utc))) == {"arroz"}
+
+    def test_old_purchases_ignored(self):
+        history = {"purchases": [{"date": _ago(days=pc.REFRESH_HISTORY_DAYS + 1), "items": [{"name": "Ovos"}]}]}
+        assert pc.refresh_candidates({}, history, [], datetime.now(timezone.utc)) == {}
+
+
+class TestPlanRefresh:
+    def _cands(self, **products):
+        return {k: {"name": k, "per_week": pw, "days_left": dl} for k, (pw, dl) in products.items()}
+
+    def _lookup(self, cache, market, key):
+        entry = cache.get(market, {}).get(key)
+        return entry if entry and pc.is_cache_valid(entry) else None
+
+    def test_missing_before_fresh(self):
+        cache = {"continente": {"leite": {"cached_at": _ago(hours=1)}}, "pingodoce": {}}
+        plan = pc.plan_refresh(cache, self._cands(leite=(1.0, 2)), ["continente", "pingodoce"], 10, self._lookup)
+        assert [(r["market"], r["status"]) for r in plan] == [("pingodoce", "missing"), ("continente", "valid")]
+        assert plan[1]["staleness"] == pytest.approx(1 / 24, abs=0.01)
+
+    def test_expired_counts_as_fully_stale(self):
+        cache = {"continente": {"leite": {"cached_at": _ago(hours=30)}}}
+        [row] = pc.plan_refresh(cache, self._cands(leite=(1.0, None)), ["continente"], 10, self._lookup)
+        assert row["status"] == "expired" and row["staleness"] == 1.0
+
+    def test_ranks_by_frequency_and_urgency(self):
+        cands = self._cands(raro=(0.1, None), frequente=(2.0, None), acabar=(0.1, 0))
+        plan = pc.plan_refresh({}, cands, ["continente"], 10, self._lookup)
+        assert [r["key"] for r in plan] == ["acabar", "frequente", "raro"]
+
+    def test_zero_demand_excluded(self):
+        assert pc.plan_refresh({}, self._cands(nada=(0.0, None)), ["continente"], 10, self._lookup) == []
+
+    def test_limit_matches_full_sort(self):
+        import random
+        rng = random.Random(4)
+        cands = {f"p{i}": {"name": f"p{i}", "per_week": rng.random(), "days_left": rng.choice([None, 0, 3, 20])}
+                 for i in range(300)}
+        cache = {"continente": {f"p{i}": {"cached_at": _ago(hours=rng.uniform(0, 30))} for i in range(0, 300, 2)}}
+        full = pc.plan_refresh(cache, cands, ["continente", "pingodoce"], 10_000, self._lookup)
+        top = pc.plan_refresh(cache, cands, ["continente", "pingodoce"], 25, self._lookup)
+        assert [r["score"] for r in top] == [r["score"] for r in full[:25]]
+        assert len({(r["market"], r["key"]) for r in full}) == len(full)
+
+    def test_stops_looking_up_once_demand_below_top_k(self):
+        calls = []
+        cands = self._cands(**{f"p{i}": (1.0 - i / 1000, None) for i in range(500)})
+        pc.plan_refresh({}, cands, ["continente"], 5, lambda c, m, k: calls.append(k))
+        assert len(calls) <= 6
+
+
+class TestCmdRefreshPlan:
+    @pytest.fixture(autouse=True)
+    def patch_paths(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(pc, "CACHE_FILE", tmp_path / "price_cache.json")
+        monkeypatch.setattr(pc, "DATA_DIR", tmp_path)
+        monkeypatch.setenv("GROCERY_CACHE_BACKEND", "json")
+        self.tmp = tmp_path
+
+    def test_plan_uses_compare_lookup(self):
+        (self.tmp / "consumption_model.json").write_text(json.dumps({
+            "leite": {"name": "Leite", "avg_purchase_interval_days": 7, "estimated_stock_remaining_days": 1},
+        }))
+        # price_compare encontra "leite" por substring em "leite mimosa" → conta como válido
+        pc.cmd_update(types.SimpleNamespace(market="continente", product="Leite Mimosa", data='{"price": 1.0}'))
+        result = pc.cmd_refresh_plan(types.SimpleNamespace(limit=None, market=None))
+        assert result["limit"] == pc.REFRESH_PLAN_LIMIT
+        statuses = {r["market"]: r["status"] for r in result["queue"]}
+        assert statuses == {"pingodoce": "missing", "continente": "valid"}
+
+    def test_plan_compacts_hits(self):
+        pc.record_hits([("continente", "leite"), ("continente", "leite"), ("pingodoce", "pão")])
+        pc.record_hits([("continente", "leite")])
+        pc.cmd_refresh_plan(types.SimpleNamespace(limit=None, market=None))
+        assert len(pc.hits_file().read_text().splitlines()) == 2
+        assert pc.load_hits()[("continente", "leite")][1] == 3
+
+    def test_market_filter_and_empty_data(self):
+        result = pc.cmd_refresh_plan(types.SimpleNamespace(limit=5, market="pingodoce"))
+        assert result["queue"] == [] and result["candidates"] == 0
+
+
+# ---------------------------------------------------------------------------
+# Retenção (gc)
+# ---------------------------------------------------------------------------
+
+def _aged(hours_ago):
+    ts = datetime.now(timezone.utc) - timedelta(hours=hours_ago)
+    return {"price": 1.0, "cached_at": ts.isoformat(), "expires_at": ts.timestamp() + pc.CACHE_TTL_HOURS * 3600}
+
+
+class TestPlanGc:
+    def _now(self):
+        return datetime.now(timezone.utc).timestamp()
+
+    def test_evicts_stale_entries_beyond_max_age(self):
+        cache = {"continente": {"velho": _aged(24 + 50), "recente": _aged(30)}}
+        evict, _ = pc.plan_gc(cache, {}, [], ["continente"], self._now(), max_entries=10, max_stale_hours=48)
+        assert evict == [{"market": "continente", "key": "velho", "reason": "age"}]
+
+    def test_size_limit_keeps_most_used(self):
+        cache = {"continente": {f"p{i}": _aged(1) for i in range(4)}}
+        hits = {("continente", "p0"): (self._now(), 5), ("continente", "p3"): (self._now(), 1)}
+        evict, _ = pc.plan_gc(cache, hits, [], ["continente"], self._now(), max_entries=2)
+        assert sorted(e["key"] for e in evict) == ["p1", "p2"]
+        assert {e["reason"] for e in evict} == {"size"}
+
+    def test_recent_entry_beats_old_hits(self):
+        old_hit = self._now() - 90 * 86400
+        cache = {"continente": {"antigo": _aged(24 * 90), "novo": _aged(1)}}
+        hits = {("continente", "antigo"): (old_hit, 3)}
+        evict, _ = pc.plan_gc(cache, hits, [], ["continente"], self._now(), max_entries=1, max_stale_hours=24 * 365)
+        assert [e["key"] for e in evict] == ["antigo"]
+
+    def test_active_products_are_protected(self):
+        cache = {"continente": {
+            "leite meio-gordo mimosa": _aged(24 * 90), "ovos": _aged(24 * 90), "pão": _aged(24 * 90),
+        }}
+        evict, protected = pc.plan_gc(
+            cache, {}, ["leite meio-gordo", "ovos"], ["continente"], self._now(), max_entries=0, max_stale_hours=0
+        )
+        assert [e["key"] for e in evict] == ["pão"]
+        assert protected == 2
+
+
+class TestCmdGc:
+    @pytest.fixture(autouse=True, params=["json", "sqlite"])
+    def patch_paths(self, request, tmp_path, monkeypatch):
+        monkeypatch.setattr(pc, "CACHE_FILE", tmp_path / "price_cache.json")
+        monkeypatch.setattr(pc, "DATA_DIR", tmp_path)
+        monkeypatch.setenv("GROCERY_CACHE_BACKEND", request.param)
+        (tmp_path / "consumption_model.json").write_text(json.dumps({
+            "_comment": "seed",
+            "leite": {"name": "Leite", "active": True},
+            "cerveja": {"name": "Cerveja", "active": False},
+        }))
+        self.tmp = tmp_path
+
+    def _args(self, **kw):
+        return types.SimpleNamespace(**{"dry_run": False, "max_entries": None, "max_stale_hours": None,
+                                        "market": None, **kw})
+
+    def _seed(self):
+        with pc.get_store() as store:
+            store.put_many([("continente", k, _aged(24 * 60)) for k in ["leite", "cerveja", "sumo"]])
+
+    def test_removes_and_reports(self):
+        self._seed()
+        result = pc.cmd_gc(self._args(max_stale_hours=24))
+        assert result["evicted"] == 2 and result["by_reason"] == {"age": 2, "size": 0}
+        assert result["remaining"] == {"continente": 1, "pingodoce": 0}
+        assert list(pc.load_cache()["continente"]) == ["leite"]
+
+    def test_dry_run_keeps_entries(self):
+        self._seed()
+        result = pc.cmd_gc(self._args(max_stale_hours=24, dry_run=True))
+        assert result["evicted"] == 2
+        assert len(pc.load_cache()["continente"]) == 3
+
+    def test_search_hits_protect_from_size_eviction(self):
+        with pc.get_store() as store:
+            store.put_many([("continente", k, _aged(1)) for k in ["sumo laranja", "sumo maçã", "água"]])
+        pc.cmd_search(types.SimpleNamespace(product="laranja", market=None))
+        pc.cmd_gc(self._args(max_entries=1))
+        assert list(pc.load_cache()["continente"]) == ["sumo laranja"]
+        assert list(pc.load_hits()) == [("continente", "sumo laranja")]
+
+    def test_gc_keeps_hits_recorded_while_running(self, monkeypatch):
+        with pc.get_store() as store:
+            store.put_many([("continente", k, _aged(1)) for k in ["sumo laranja", "água"]])
+        pc.record_hits([("continente", "água"), ("continente", "água")])
+        plan_gc = pc.plan_gc
+
+        def plan_and_hit(*args, **kwargs):
+            # outro processo regista um hit depois de o gc ter lido o ficheiro
+            pc.record_hits([("continente", "água")])
+            return plan_gc(*args, **kwargs)
+        monkeypatch.setattr(pc, "plan_gc", plan_and_hit)
+        pc.cmd_gc(self._args(max_entries=1))
+        assert list(pc.load_cache()["continente"]) == ["água"]
+        assert pc.load_hits()[("continente", "água")][1] == 3
+        assert len(pc.hits_file().read_text().splitlines()) == 1
+
+    def test_gc_on_write(self, monkeypatch):
+        monkeypatch.setattr(pc, "CACHE_GC_ON_WRITE", True)
+        monkeypatch.setattr(pc, "CACHE_MAX_ENTRIES_PER_MARKET", 2)
+        for name in ["Sumo", "Água", "Leite Mimosa"]:
+            result = pc.cmd_update(types.SimpleNamespace(market="continente", product=name, data='{"price": 1.0}'))
+        assert result["gc_evicted"] == 1
+        assert len(pc.load_cache()["continente"]) == 2
+
+    def test_negative_limits_rejected(self):
+        assert "error" in pc.cmd_gc(self._args(max_entries=-1))
+
+
+# ---------------------------------------------------------------------------
+# cheapest (índice de preço unitário)
+# ---------------------------------------------------------------------------
+
+class TestCmdCheapest:
+    @pytest.fixture(autouse=True, params=["json", "sqlite"])
+    def patch_paths(self, request, tmp_path, monkeypatch):
+        monkeypatch.setattr(pc, "CACHE_FILE", tmp_path / "price_cache.json")
+        monkeypatch.setattr(pc, "DATA_DIR", tmp_path)
+        monkeypatch.setenv("GROCERY_CACHE_BACKEND", request.param)
+        (tmp_path / "consumption_model.json").write_text(json.dumps({
+            "_comment": "seed",
+            "arroz": {"name": "Arroz", "category": "Mercearia"},
+        }))
+
+    def _update(self, market, product, data):
+        pc.cmd_update(types.SimpleNamespace(market=market, product=product, data=json.dumps(data)))
+
+    def _cheapest(self, category, unit=None, limit=None, market=None):
+        return pc.cmd_cheapest(types.SimpleNamespace(category=category, unit=unit, limit=limit, market=market))
+
+    def test_ranks_by_normalized_unit_price(self):
+        self._update("continente", "Leite A", {"price": 1.5, "price_per_unit": 1.0, "unit": "L", "category": "lacticínios"})
+        self._update("pingodoce", "Leite B", {"price": 0.9, "price_per_unit": 900, "unit": "ml", "category": "lacticínios"})
+        self._update("pingodoce", "Iogurte", {"price": 2.0, "price_per_unit": 0.004, "unit": "g", "category": "lacticínios"})
+        result = self._cheapest("Lacticínios")
+        assert [r["product"] for r in result["results"]["€/L"]] == ["leite a", "leite b"]
+        assert result["results"]["€/kg"][0]["unit_price"] == 4.0
+
+    def test_promo_and_unit_items(self):
+        self._update("continente", "Ovos M", {"price": 2.4, "unit": "un", "promo_effective_price": 1.2, "category": "proteína"})
+        self._update("pingodoce", "Ovos L", {"price": 2.0, "price_per_unit": 0.2, "unit": "un", "category": "proteína"})
+        self._update("pingodoce", "Ovos XL", {"price": 1.0, "unit": "un", "available": False, "category": "proteína"})
+        rows = self._cheapest("proteína", unit="un")["results"]["€/un"]
+        assert [(r["product"], r["unit_price"]) for r in rows] == [("ovos l", 0.2), ("ovos m", 1.2)]
+
+    def test_category_from_consumption_model(self):
+        self._update("continente", "Arroz", {"price": 1.0, "price_per_unit": 1.0, "unit": "kg"})
+        assert pc.cmd_get(types.SimpleNamespace(market="continente", product="arroz"))["category"] == "Mercearia"
+        assert self._cheapest("mercearia")["results"]["€/kg"][0]["name"] == "Arroz"
+
+    def test_limit_market_and_update_replaces(self):
+        for i in range(5):
+            self._update("continente", f"Massa {i}", {"price": 1.0, "price_per_unit": 2.0 - i / 10, "unit": "kg", "category": "massas"})
+        self._update("pingodoce", "Massa P", {"price": 1.0, "price_per_unit": 0.5, "unit": "kg", "category": "massas"})
+        self._update("continente", "Massa 4", {"price": 1.0, "price_per_unit": 3.0, "unit": "kg", "category": "massas"})
+        rows = self._cheapest("massas", limit=2, market="continente")["results"]["€/kg"]
+        assert [r["product"] for r in rows] == ["massa 3", "massa 2"]
+
+    def test_survives_compaction(self):
+        self._update("continente", "Leite A", {"price": 1.0, "price_per_unit": 1.0, "unit": "L", "category": "lacticínios"})
+        pc.cmd_compact(types.SimpleNamespace())
+        self._update("pingodoce", "Leite B", {"price": 1.0, "price_per_unit": 0.8, "unit": "L", "category": "lacticínios"})
+        rows = self._cheapest("lacticínios", unit="L")["results"]["€/L"]
+        assert [r["market"] for r in rows] == ["pingodoce", "continente"]
+
+    def test_missing_category(self):
+        assert "error" in self._cheapest("  ")
+        assert self._cheapest("nada")["results"] == {}
+
+
+# ---------------------------------------------------------------------------
+# stats
+# ---------------------------------------------------------------------------
+
+class TestCmdStats:
+    @pytest.fixture(autouse=True, params=["json", "sqlite"])
+    def patch_paths(self, request, tmp_path, monkeypatch):
+        monkeypatch.setattr(pc, "CACHE_FILE", tmp_path / "price_cache.json")
+        monkeypatch.setattr(pc, "DATA_DIR", tmp_path)
+        monkeypatch.setenv("GROCERY_CACHE_BACKEND", request.param)
+        self.backend = request.param
+
+    def _put(self, market, key, hours_ago):
+        ts = datetime.now(timezone.utc) - timedelta(hours=hours_ago)
+        with pc.get_store() as store:
+            store.put(market, key, {"name": key, "price": 1.0, "cached_at": ts.isoformat()})
+
+    def _stats(self, recount=False):
+        return pc.cmd_stats(types.SimpleNamespace(recount=recount))
+
+    def test_counts_age_and_write_rate(self):
+        for key, hours in [("a", 0.1), ("b", 3), ("c", 30), ("d", 200)]:
+            self._put("continente", key, hours)
+        stats = self._stats()
+        market = stats["continente"]
+        assert (market["total"], market["valid"], market["expired"]) == (4, 2, 2)
+        assert sum(market["age"].values()) == 4
+        assert market["age"][">7d"] == 1 and market["age"]["1-7d"] == 1
+        assert market["write_rate_per_hour"] == round(2 / 24, 2)
+        assert stats["total"]["expired"] == 2
+        assert market["hit_rate"] is None
+
+    def test_hit_rate_from_lookups(self):
+        self._put("continente", "leite", 1)
+        pc.cmd_search(types.SimpleNamespace(product="leite", market=None))
+        pc.record_lookups({"continente": (3, 1)})
+        stats = self._stats()
+        assert (stats["continente"]["lookups"], stats["continente"]["hit_rate"]) == (4, 0.5)
+        assert stats["pingodoce"]["hit_rate"] == 0.0
+        assert stats["total"]["hit_rate"] == round(2 / 5, 3)
+
+    def test_gc_compacts_lookups(self):
+        now = datetime.now(timezone.utc).timestamp()
+        hour = now // 3600 * 3600
+        rows = [[hour + 1, "continente", 2, 1], [hour + 2, "continente", 3, 0], [hour + 2, "pingodoce", 1, 1],
+                [hour - 1, "continente", 1, 1], [now - (pc.STATS_WINDOW_DAYS + 1) * 86400, "continente", 9, 9]]
+        pc._append_lines(pc.lookups_file(), rows)
+        before = self._stats()["continente"]
+        pc.cmd_gc(types.SimpleNamespace(market=None, max_entries=None, max_stale_hours=None, dry_run=False))
+        lines = pc.lookups_file().read_text().splitlines()
+        assert len(lines) == 3
+        assert [json.loads(line)[1:] for line in lines] == [["continente", 1, 1], ["continente", 5, 1],
+                                                            ["pingodoce", 1, 1]]
+        after = self._stats()["continente"]
+        assert (after["lookups"], after["hit_rate"]) == (before["lookups"], before["hit_rate"]) == (6, 0.333)
+
+    def test_recount_detects_and_repairs_drift(self):
+        self._put("continente", "a", 1)
+        self._put("continente", "b", 30)
+        assert self._stats(recount=True)["recount"] == {"ok": True, "mismatched": []}
+        with pc.get_store() as store:
+            if self.backend == "sqlite":
+                store._conn.execute("UPDATE histogram SET n = n + 5")
+                store._conn.commit()
+            else:
+                store.compact()
+                cache = json.loads(store.path.read_text())
+                cache["continente"].pop("a")
+                store.path.write_text(json.dumps(cache))
+                store._write_expiry_index(json.loads(json.dumps({**cache, "continente": {}})))
+        stats = self._stats(recount=True)
+        assert stats["recount"] == {"ok": False, "mismatched": ["continente"]}
+        assert self._stats(recount=True)["recount"]["ok"] is True
+
+
+# ---------------------------------------------------------------------------
+# Backend SQLite + migrate / export
+# ---------------------------------------------------------------------------
+
+class TestSqliteBackend:
+    @pytest.fixture(autouse=True)
+    def patch_cache_file(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(pc, "CACHE_FILE", tmp_path / "price_cache.json")
+        monkeypatch.setattr(pc, "DATA_DIR", tmp_path)
+        monkeypatch.setenv("GROCERY_CACHE_BACKEND", "sqlite")
+        self.tmp = tmp_path
+
+    def _update(self, market, product, data):
+        return pc.cmd_update(types.SimpleNamespace(market=market, product=product, data=json.dumps(data)))
+
+    def test_update_get_stats_without_json_file(self):
+        self._update("continente", "Leite Mimosa", {"price": 1.29})
+        entry = pc.cmd_get(types.SimpleNamespace(market="continente", product="leite mimosa"))
+        assert entry["found"] is True
+        assert entry["price"] == 1.29
+        stats = pc.cmd_stats(types.SimpleNamespace())
+        assert (stats["continente"]["total"], stats["continente"]["valid"], stats["continente"]["expired"]) == (1, 1, 0)
+        assert not (self.tmp / "price_cache.json").exists()
+
+    def test_search_and_expired(self):
+        self._update("continente", "leite mimosa", {"price": 1.29})
+        results = pc.cmd_search(types.SimpleNamespace(product="leite", market=None))
+        assert [r["_key"] for r in results] == ["leite mimosa"]
+        expired = pc.cmd_expired(types.SimpleNamespace(market=None))
+        assert expired["expired_count"] == 0
+
+    def test_migrate_then_export_roundtrip(self):
+        old = (datetime.now(timezone.utc) - timedelta(hours=48)).isoformat()
+        cache = {
+            "continente": {"ovos": {"name": "Ovos", "price": 2.49, "cached_at": old}},
+            "pingodoce": {},
+            "last_updated": {},
+        }
+        (self.tmp / "price_cache.json").write_text(json.dumps(cache))
+
+        result = pc.cmd_migrate(types.SimpleNamespace(source=None))
+        assert result["migrated"] == 1
+        assert pc.cmd_expired(types.SimpleNamespace(market="continente"))["expired_count"] == 1
+
+        out = self.tmp / "export.json"
+        result = pc.cmd_export(types.SimpleNamespace(output=str(out)))
+        assert result["exported"] == 1
+        assert json.loads(out.read_text())["continente"]["ovos"]["price"] == 2.49
+
+    def test_export_without_db_errors(self):
+        result = pc.cmd_export(types.SimpleNamespace(output=None))
+        assert "error" in result
@@ -1,8 +1,87 @@
 """Testes para scripts/price_compare.py"""
+import itertools
+import random
+
 import pytest
 import price_compare as pc
 
 
+# ---------------------------------------------------------------------------
+# get_cached_price
+# ---------------------------------------------------------------------------
+
+class TestGetCachedPrice:
+    def _cache(self):
+        from datetime import datetime, timezone, timedelta
+        now = datetime.now(timezone.utc).isoformat()
+        old = (datetime.now(timezone.utc) - timedelta(hours=48)).isoformat()
+        return {
+            "continente": {
+                "leite uht velho": {"name": "velho", "cached_at": old},
+                "leite meio-gordo mimosa": {"name": "mimosa", "cached_at": now},
+                "leite uht": {"name": "uht", "cached_at": now},
+                "ovos": {"name": "ovos", "cached_at": now},
+                "pão": {"name": "pão", "cached_at": now},
+            },
+            "pingodoce": {},
+        }
+
+    def test_exact_match(self):
+        assert pc.get_cached_price(self._cache(), "continente", "Ovos")["name"] == "ovos"
+
+    def test_substring_fallback_skips_expired(self):
+        assert pc.get_cached_price(self._cache(), "continente", "leite")["name"] == "mimosa"
+
+    def test_key_contained_in_query(self):
+        assert pc.get_cached_price(self._cache(), "continente", "ovos m 12un")["name"] == "ovos"
+
+    def test_records_matched_key_in_hits(self):
+        hits = []
+        pc.get_cached_price(self._cache(), "continente", "leite", hits=hits)
+        pc.get_cached_price(self._cache(), "continente", "Ovos", hits=hits)
+        pc.get_cached_price(self._cache(), "continente", "café", hits=hits)
+        assert hits == [("continente", "leite meio-gordo mimosa"), ("continente", "ovos")]
+
+    def test_index_gives_same_results(self):
+        cache = self._cache()
+        indexes = pc.build_market_indexes(cache)
+        for name in ["leite", "Ovos", "ovos m 12un", "pão de forma", "leite uht", "café", "pã"]:
+            for market in pc.MARKETS:
+                assert pc.get_cached_price(cache, market, name, indexes[market]) == \
+                    pc.get_cached_price(cache, market, name), (name, market)
+
+
+class TestPriceIndex:
+    NAMES = ["leite", "Ovos", "ovos m 12un", "pão de forma", "leite uht", "leite uht velho",
+             "café", "pã", "", "  LEITE  ", "uht"]
+
+    def _cache(self):
+        cache = TestGetCachedPrice()._cache()
+        cache["continente"]["café expirado"] = {"name": "x", "expires_at": 1.0}
+        cache["pingodoce"] = {"leite": {"name": "pd", "cached_at": cache["continente"]["ovos"]["cached_at"]}}
+        return cache
+
+    @pytest.mark.parametrize("prefilter", [True, False])
+    def test_matches_get_cached_price(self, prefilter):
+        cache = self._cache()
+        index = pc.PriceIndex(cache, prefilter=prefilter)
+        for name in self.NAMES:
+            for market in pc.MARKETS:
+                found = index.lookup(market, name)
+                assert (found[1] if found else None) == pc.get_cached_price(cache, market, name), (name, market)
+
+    def test_resolve_collects_prices_and_hits(self):
+        index = pc.PriceIndex(self._cache())
+        result = index.resolve([{"name": "Leite"}, {"name": "café"}, {"name": "leite"}])
+        assert [sorted(r) for r in result] == [["continente", "pingodoce"], [], ["continente", "pingodoce"]]
+        assert result[0]["continente"]["name"] == "mimosa"
+        assert index.hits == [("continente", "leite meio-gordo mimosa"), ("pingodoce", "leite")] * 2
+
+    def test_empty_market(self):
+        index = pc.PriceIndex({"continente": {}}, markets=["continente"])
+        assert index.lookup("continente", "") is None
+
+
 # ---------------------------------------------------------------------------
 # calculate_delivery
 # ---------------------------------------------------------------------------
@@ -161,6 +240,43 @@ class TestOptimizeSplit:
         assert cont["coupon_discount"] == 3.0
         assert len(cont["coupons_applied"]) == 1
 
+    def test_moves_items_to_reach_coupon_min_spend(self, monkeypatch):
+        for market in pc.MARKETS:
+            monkeypatch.setitem(pc.DELIVERY_CONFIG[market], "cost", 0.0)
+        items = [
+            _make_item("azeite", "mercearia", continente_price=12.0, pingodoce_price=11.0),
+            _make_item("café", "mercearia", continente_price=9.0, pingodoce_price=8.5),
+        ]
+        coupons = [{"description": "5€ em >20€", "discount_eur": 5.0, "min_spend": 20.0, "categories": []}]
+        result = pc.optimize_split(items, _config(coupons))
+        # Tudo no Continente: 21€ − 5€ = 16€ < 19,50€ no Pingo Doce
+        assert list(result["markets"]) == ["continente"]
+        assert result["total"] == 16.0
+
+    def test_moves_item_to_unlock_category_coupon(self, monkeypatch):
+        for market in pc.MARKETS:
+            monkeypatch.setitem(pc.DELIVERY_CONFIG[market], "cost", 0.0)
+        items = [
+            _make_item("leite", "lacticínios", continente_price=1.0, pingodoce_price=1.2),
+            _make_item("detergente", "limpeza", continente_price=4.0, pingodoce_price=3.5),
+        ]
+        coupons = [{"description": "3€ em limpeza", "discount_eur": 3.0, "min_spend": 0.0, "categories": ["limpeza"]}]
+        result = pc.optimize_split(items, _config(coupons))
+        cont = result["markets"]["continente"]
+        assert {i["name"] for i in cont["items"]} == {"leite", "detergente"}
+        assert cont["coupon_discount"] == 3.0
+
+    def test_coupon_move_rejected_when_not_worth_it(self, monkeypatch):
+        for market in pc.MARKETS:
+            monkeypatch.setitem(pc.DELIVERY_CONFIG[market], "cost", 0.0)
+        items = [
+            _make_item("azeite", "mercearia", continente_price=15.0, pingodoce_price=11.0),
+            _make_item("café", "mercearia", continente_price=9.0, pingodoce_price=8.5),
+        ]
+        coupons = [{"description": "1€ em >20€", "discount_eur": 1.0, "min_spend": 20.0, "categories": []}]
+        result = pc.optimize_split(items, _config(coupons))
+        assert list(result["markets"]) == ["pingodoce"]
+
     def test_recommendation_note_when_savings_small(self):
         # Ambos os preços muito similares → deve sugerir single store
         items = [
@@ -213,6 +329,201 @@ class TestOptimizeSplit:
         pd_names = [i["name"] for i in result["markets"].get("pingodoce", {}).get("items", [])]
         assert "cafe" in pd_names
 
+    def test_rebalance_moves_items_at_target_price(self):
+        """Faltam €3 para a entrega grátis no Continente: o pão passa para lá ao preço do Continente."""
+        items = [
+            _make_item("cabaz", "outros", continente_price=47.0, pingodoce_price=None),
+            _make_item("pao", "padaria", continente_price=3.20, pingodoce_price=2.50),
+        ]
+        result = pc.optimize_split(items)
+        assert list(result["markets"]) == ["continente"]
+        cont = result["markets"]["continente"]
+        assert {i["name"]: i["price"] for i in cont["items"]}["pao"] == 3.20
+        assert cont["delivery"] == 0.0
+        assert result["total"] == 50.20
+
+    def test_rebalance_skips_items_unavailable_in_target(self):
+        items = [
+            _make_item("cabaz", "outros", continente_price=47.0, pingodoce_price=None),
+            _make_item("pao", "padaria", continente_price=None, pingodoce_price=2.50),
+        ]
+        result = pc.optimize_split(items)
+        assert [i["name"] for i in result["markets"]["pingodoce"]["items"]] == ["pao"]
+
+    def test_quantity_multiplies_line_price(self):
+        item = _make_item("leite", "lacticínios", continente_price=1.29, pingodoce_price=1.35)
+        item["item"]["quantity"] = {"value": 6, "unit": "L"}
+        for info in item["prices"].values():
+            info["name"] = "Leite Meio-Gordo 1.5L"
+        line = pc.optimize_split([item])["markets"]["continente"]["items"][0]
+        assert (line["units"], line["price"]) == (4, 5.16)
+
+    def test_multi_buy_promo_changes_market(self):
+        item = _make_item("sumo", "bebidas", continente_price=1.29, pingodoce_price=1.00)
+        item["item"]["quantity"] = {"value": 6, "unit": "un"}
+        item["prices"]["continente"]["promo"] = "Leve 3 pague 2"
+        result = pc.optimize_split([item])
+        line = result["markets"]["continente"]["items"][0]
+        assert (line["price"], line["promo_applied"]) == (5.16, "Leve 3 pague 2")
+        assert "pingodoce" not in result["markets"]
+
+    def test_shared_pricer_is_reused(self):
+        from promotions import LinePricer
+        item = _make_item("sumo", "bebidas", continente_price=1.29, pingodoce_price=1.00)
+        item["item"]["quantity"] = {"value": 2, "unit": "un"}
+        pricer = LinePricer()
+        pc.optimize_split([item], pricer=pricer)
+        misses = pricer.misses
+        pc.optimize_exact([item], pricer=pricer)
+        assert pricer.misses == misses and pricer.hits > 0
+
+
+# ---------------------------------------------------------------------------
+# optimize_exact
+# ---------------------------------------------------------------------------
+
+def _config(continente_coupons=(), balance=0.0):
+    return {
+        "continente": {"coupons": list(continente_coupons), "balance": balance},
+        "pingodoce": {"coupons": [], "balance": 0.0},
+    }
+
+
+def _brute_force(items, market_config):
+    """Custo mínimo por enumeração de todas as atribuições (referência para listas pequenas)."""
+    matrix = pc.PriceMatrix(items, pc.MARKETS)
+    options = [
+        [pc.MARKETS[matrix.preferred[i]]] if matrix.preferred[i] >= 0 else [pc.MARKETS[j] for _, j in matrix.options(i)]
+        for i in range(len(items))
+    ]
+    best = float("inf")
+    for choice in itertools.product(*options):
+        subs, cats = {}, {}
+        for i, (item_data, market) in enumerate(zip(items, choice)):
+            subs[market] = subs.get(market, 0.0) + matrix.price(i, pc.MARKETS.index(market))
+            cats.setdefault(market, set()).add(item_data["item"]["category"])
+        if any(subs[m] < (pc.DELIVERY_CONFIG[m].get("min_order") or 0.0) for m in subs):
+            continue
+        total = sum(pc.market_cost(m, subs[m], cats[m], market_config)["total"] for m in subs)
+        best = min(best, total)
+    return best
+
+
+class TestOptimizeExact:
+    def test_closes_delivery_gap_greedy_misses(self):
+        # Faltam €6 no Continente (acima do limiar de rebalanceamento de €5)
+        items = [
+            _make_item("cabaz", "outros", continente_price=44.0, pingodoce_price=None),
+            _make_item("arroz", "mercearia", continente_price=3.10, pingodoce_price=3.00),
+            _make_item("massa", "mercearia", continente_price=3.10, pingodoce_price=3.00),
+        ]
+        greedy = pc.optimize_split(items)
+        exact = pc.optimize_exact(items)
+        assert greedy["total"] == 56.98
+        assert exact["total"] == 50.20
+        assert list(exact["markets"]) == ["continente"]
+        assert exact["solver"]["optimal"] is True
+        assert exact["solver"]["gap_eur"] == 0.0
+        assert exact["solver"]["greedy_total"] == 56.98
+
+    def test_respects_min_order(self, monkeypatch):
+        items = [
+            _make_item("leite", "lacticínios", continente_price=1.29, pingodoce_price=None),
+            _make_item("arroz", "mercearia", continente_price=5.0, pingodoce_price=1.0),
+        ]
+        assert pc.optimize_exact(items)["total"] == 9.27
+        monkeypatch.setitem(pc.DELIVERY_CONFIG["pingodoce"], "min_order", 10.0)
+        result = pc.optimize_exact(items)
+        assert list(result["markets"]) == ["continente"]
+        assert result["total"] == 10.28
+
+    def test_coupon_min_spend_pulls_items_together(self):
+        items = [
+            _make_item("queijo", "lacticínios", continente_price=25.0, pingodoce_price=None),
+            _make_item("arroz", "mercearia", continente_price=9.0, pingodoce_price=5.0),
+        ]
+        coupon = {"description": "5€", "discount_eur": 5.0, "min_spend": 30.0, "categories": ["lacticínios"]}
+        result = pc.optimize_exact(items, _config([coupon]))
+        assert list(result["markets"]) == ["continente"]
+        assert result["markets"]["continente"]["coupon_discount"] == 5.0
+        assert result["total"] == 32.99
+
+    def test_coupon_category_not_in_cart(self):
+        items = [
+            _make_item("queijo", "lacticínios", continente_price=25.0, pingodoce_price=None),
+            _make_item("arroz", "mercearia", continente_price=9.0, pingodoce_price=5.0),
+        ]
+        coupon = {"description": "5€", "discount_eur": 5.0, "min_spend": 30.0, "categories": ["bebidas"]}
+        result = pc.optimize_exact(items, _config([coupon]))
+        assert set(result["markets"]) == {"continente", "pingodoce"}
+        assert result["total"] == 36.98
+
+    def test_preferred_store_is_fixed(self):
+        items = [
+            _make_item("cafe", "bebidas", continente_price=1.29, pingodoce_price=0.99,
+                       preferred_store="continente"),
+            _make_item("leite", "lacticínios", continente_price=1.50, pingodoce_price=1.00),
+        ]
+        result = pc.optimize_exact(items)
+        assert "cafe" in [i["name"] for i in result["markets"]["continente"]["items"]]
+
+    def test_unavailable_items_reported(self):
+        items = [
+            _make_item("leite", "lacticínios", continente_price=1.29, pingodoce_price=1.50),
+            _make_item("produto-raro", "outros", continente_price=None, pingodoce_price=None),
+        ]
+        result = pc.optimize_exact(items)
+        assert [u["name"] for u in result["unavailable"]] == ["produto-raro"]
+
+    def test_infeasible_min_order_falls_back_to_greedy(self, monkeypatch):
+        for market in pc.MARKETS:
+            monkeypatch.setitem(pc.DELIVERY_CONFIG[market], "min_order", 1000.0)
+        items = [_make_item("leite", "lacticínios", continente_price=1.29, pingodoce_price=1.50)]
+        result = pc.optimize_exact(items)
+        assert result["solver"]["feasible"] is False
+        assert result["total"] == pc.optimize_split(items)["total"]
+
+    def test_budget_exhausted_reports_gap(self):
+        rng = random.Random(3)
+        items = [
+            _make_item(f"item{i}", "outros", continente_price=round(rng.uniform(0.5, 6), 2),
+                       pingodoce_price=round(rng.uniform(0.5, 6), 2))
+            for i in range(40)
+        ]
+        result = pc.optimize_exact(items, time_budget=0)
+        solver = result["solver"]
+        assert solver["optimal"] is False
+        assert solver["lower_bound"] <= result["total"]
+        assert solver["gap_eur"] == round(result["total"] - solver["lower_bound"], 2)
+        assert result["total"] <= solver["greedy_total"]
+
+    @pytest.mark.parametrize("seed", range(12))
+    def test_matches_brute_force(self, seed, monkeypatch):
+        rng = random.Random(seed)
+        # limiares baixos para que a entrega grátis esteja em jogo
+        monkeypatch.setitem(pc.DELIVERY_CONFIG["continente"], "free_threshold", 20.0)
+        monkeypatch.setitem(pc.DELIVERY_CONFIG["pingodoce"], "free_threshold", 15.0)
+        min_order = rng.choice([0.0, 5.0])
+        monkeypatch.setitem(pc.DELIVERY_CONFIG["pingodoce"], "min_order", min_order)
+        categories = ["lacticínios", "mercearia", "bebidas"]
+        items = [
+            _make_item(f"item{i}", rng.choice(categories),
+                       continente_price=round(rng.uniform(0.5, 6), 2),
+                       pingodoce_price=round(rng.uniform(0.5, 6), 2) if rng.random() < 0.85 else None)
+            for i in range(9)
+        ]
+        coupons = [
+            {"description": "a", "discount_eur": 2.0, "min_spend": 10.0, "categories": [rng.choice(categories)]},
+            {"description": "b", "discount_eur": 1.5, "min_spend": 15.0, "categories": [], "exclusive_group": "x"},
+            {"description": "c", "discount_eur": 2.5, "min_spend": 18.0, "categories": [], "exclusive_group": "x"},
+        ]
+        config = _config(coupons, balance=rng.choice([0.0, 1.0]))
+        result = pc.optimize_exact(items, config, time_budget=None)
+        assert result["solver"]["optimal"] is True
+        assert result["total"] == pytest.approx(_brute_force(items, config), abs=0.011)
+        if not min_order:  # o greedy ignora min_order, pode ficar abaixo de uma solução viável
+            assert result["total"] <= pc.optimize_split(items, config)["total"] + 0.01
+
 
 # ---------------------------------------------------------------------------
 # check_budget
@@ -0,0 +1,294 @@
+"""Testes para scripts/price_fetcher.py
+
+O servidor de teste (http.server, em thread) imita as páginas de pesquisa do
+Continente e do Pingo Doce: nenhum teste acede à rede.
+"""
+import asyncio
+import json
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import price_cache as pc
+import price_fetcher as pf
+
+
+def _page(*products) -> str:
+    items = [{"@type": "ListItem", "position": i + 1, "item": p} for i, p in enumerate(products)]
+    doc = {"@context": "https://schema.org", "@type": "ItemList", "itemListElement": items}
+    return f'<html><head><script type="application/ld+json">{json.dumps(doc)}</script></head></html>'
+
+
+def _product(name, price, per_unit=None, unit_code=None, brand=None, stock="InStock"):
+    offer = {"@type": "Offer", "price": price, "priceCurrency": "EUR",
+             "availability": f"https://schema.org/{stock}", "url": f"https://example.pt/{name}"}
+    if per_unit is not None:
+        offer["priceSpecification"] = {"@type": "UnitPriceSpecification", "price": per_unit,
+                                       "referenceQuantity": {"unitCode": unit_code}}
+    product = {"@type": "Product", "name": name, "offers": offer}
+    if brand:
+        product["brand"] = {"@type": "Brand", "name": brand}
+    return product
+
+
+CATALOG = {
+    "continente": {"leite": [_product("Leite Mimosa 1L", "0,89 €", 0.89, "LTR", "Mimosa")]},
+    "pingodoce": {"leite": [_product("Leite Pingo Doce 1L", 0.79, 0.79, "LTR")],
+                  "arroz": [_product("Arroz Agulha 1kg", "1,09", 1.09, "KGM")]},
+}
+
+
+def _fake_get(responses, log=None):
+    """get(url) que devolve, por ordem, as respostas de `responses` (status ou exceção)."""
+    async def get(url):
+        if log is not None:
+            log.append(url)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        status, body = response
+        return status, {}, body
+    return get
+
+
+CONFIG = {
+    m: {"search_url": f"http://stub/{m}?q={{query}}", "concurrency": 2, "rate_per_second": 1000, "burst": 10}
+    for m in ("continente", "pingodoce")
+}
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(pf, "BACKOFF_BASE_SECONDS", 0.001)
+
+
+# ---------------------------------------------------------------------------
+# Parsers
+# ---------------------------------------------------------------------------
+
+class TestParseJsonLd:
+    def test_item_list_with_unit_price(self):
+        products = pf.parse_json_ld(_page(*CATALOG["pingodoce"]["arroz"], *CATALOG["continente"]["leite"]))
+        assert products[0]["price"] == 1.09
+        assert (products[0]["price_per_unit"], products[0]["unit"]) == (1.09, "kg")
+        assert products[1] == {
+            "price": 0.89, "unit": "L", "title": "Leite Mimosa 1L", "price_per_unit": 0.89,
+            "brand": "Mimosa", "available": True, "product_url": "https://example.pt/Leite Mimosa 1L",
+        }
+
+    def test_out_of_stock_and_no_unit_price(self):
+        [product] = pf.parse_json_ld(_page(_product("Ovos", "2,49 €", stock="OutOfStock")))
+        assert product["available"] is False
+        assert product["unit"] == "un" and "price_per_unit" not in product
+
+    @pytest.mark.parametrize("reference", ["KGM", ["KGM"], None, 1])
+    def test_malformed_reference_quantity(self, reference):
+        product = _product("Arroz", 1.09, 1.09)
+        product["offers"]["priceSpecification"]["referenceQuantity"] = reference
+        [data] = pf.parse_json_ld(_page(product))
+        assert data["price"] == 1.09 and data["unit"] == "un" and "price_per_unit" not in data
+
+    def test_ignores_invalid_blocks_and_products_without_price(self):
+        text = '<script type="application/ld+json">{nope</script>' + _page({"@type": "Product", "name": "x"})
+        assert pf.parse_json_ld(text) == []
+
+    def test_registered_for_all_configured_markets(self):
+        assert set(pc.MARKETS) <= set(pf.PARSERS)
+
+
+# ---------------------------------------------------------------------------
+# Rate limiting
+# ---------------------------------------------------------------------------
+
+class TestTokenBucket:
+    def test_burst_then_rate(self):
+        async def run():
+            bucket = pf.TokenBucket(rate=50, capacity=2)
+            t0 = time.monotonic()
+            for _ in range(7):
+                await bucket.acquire()
+            return time.monotonic() - t0
+        assert asyncio.run(run()) >= 5 / 50 * 0.9
+
+    def test_backoff_respects_retry_after_and_cap(self):
+        import random
+        rng = random.Random(1)
+        assert pf.backoff_delay(0, rng, retry_after=2.0) >= 2.0
+        assert all(0 <= pf.backoff_delay(20, rng) <= pf.BACKOFF_MAX_SECONDS for _ in range(50))
+
+
+# ---------------------------------------------------------------------------
+# fetch_all (get falso)
+# ---------------------------------------------------------------------------
+
+class TestFetchAll:
+    def test_retries_transient_errors(self):
+        page = _page(*CATALOG["continente"]["leite"])
+        get = _fake_get([(503, ""), ConnectionResetError("reset"), (200, page)])
+        [result] = asyncio.run(pf.fetch_all([("continente", "leite")], get, CONFIG, seed=1))
+        assert result["attempts"] == 3 and result["products"][0]["price"] == 0.89
+        assert result["status"] == 200 and "error" not in result
+
+    def test_client_error_is_not_retried(self):
+        [result] = asyncio.run(pf.fetch_all([("continente", "x")], _fake_get([(404, "")]), CONFIG))
+        assert result == {"market": "continente", "query": "x", "attempts": 1, "status": 404, "error": "HTTP 404"}
+
+    def test_gives_up_after_max_attempts(self):
+        get = _fake_get([(429, "")] * pf.MAX_ATTEMPTS)
+        [result] = asyncio.run(pf.fetch_all([("pingodoce", "x")], get, CONFIG))
+        assert result["attempts"] == pf.MAX_ATTEMPTS and "products" not in result
+
+    def test_dedupes_jobs_and_encodes_query(self):
+        log = []
+        get = _fake_get([(200, _page())], log)
+        results = asyncio.run(pf.fetch_all([("Continente", "pão de forma"), ("continente", "pão de forma ")], get, CONFIG))
+        assert len(results) == 1 and results[0]["error"] == "Sem resultados"
+        assert log == ["http://stub/continente?q=p%C3%A3o+de+forma"]
+
+    def test_semaphore_limits_concurrency(self):
+        in_flight, peak = 0, 0
+
+        async def get(url):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return 200, {}, _page()
+
+        asyncio.run(pf.fetch_all([("continente", f"q{i}") for i in range(8)], get, CONFIG))
+        assert peak == CONFIG["continente"]["concurrency"]
+
+    def test_failing_job_does_not_lose_the_others(self, monkeypatch):
+        page = _page(*CATALOG["continente"]["leite"])
+
+        async def get(url):
+            if "q=bad" in url:
+                raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+            return 200, {}, "<crash>" if "q=crash" in url else page
+
+        def parser(text):
+            if text == "<crash>":
+                raise KeyError("offers")
+            return pf.parse_json_ld(text)
+        monkeypatch.setitem(pf.PARSERS, "continente", parser)
+        results = asyncio.run(pf.fetch_all([("continente", "bad"), ("continente", "crash"), ("continente", "leite")],
+                                           get, CONFIG))
+        assert [r.get("error", "").split(":")[0] for r in results] == ["UnicodeDecodeError", "Parser", ""]
+        assert results[0]["attempts"] == 1 and results[1]["status"] == 200
+        assert results[2]["products"][0]["price"] == 0.89
+
+    def test_unknown_market(self):
+        with pytest.raises(ValueError):
+            asyncio.run(pf.fetch_all([("lidl", "leite")], _fake_get([]), CONFIG))
+
+
+# ---------------------------------------------------------------------------
+# Gravação na cache
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(pc, "CACHE_FILE", tmp_path / "price_cache.json")
+    monkeypatch.setattr(pc, "DATA_DIR", tmp_path)
+    monkeypatch.setenv("GROCERY_CACHE_BACKEND", "json")
+    return tmp_path
+
+
+class TestStoreResults:
+    def test_stores_first_match_under_its_name(self, cache_dir):
+        results = [
+            {"market": "continente", "query": "Leite", "attempts": 1, "status": 200,
+             "products": pf.parse_json_ld(_page(*CATALOG["continente"]["leite"]))},
+            {"market": "pingodoce", "query": "café", "attempts": 4, "status": 503, "error": "HTTP 503"},
+        ]
+        summary = pf.store_results(results)
+        assert summary["stored"] == 1
+        assert summary["failed"] == [{"market": "pingodoce", "query": "café", "status": 503, "error": "HTTP 503"}]
+        entry = pc.load_cache()["continente"]["leite mimosa 1l"]
+        assert (entry["name"], entry["price"], entry["price_per_unit"], entry["unit"], entry["brand"]) == (
+            "Leite Mimosa 1L", 0.89, 0.89, "L", "Mimosa")
+
+    def test_product_without_name_uses_query(self, cache_dir):
+        [product] = pf.parse_json_ld(_page({"@type": "Product", "offers": {"price": "1,09"}}))
+        pf.store_results([{"market": "pingodoce", "query": "Arroz", "attempts": 1, "products": [product]}])
+        assert pc.load_cache()["pingodoce"]["arroz"]["price"] == 1.09
+
+    def test_dry_run_does_not_write(self, cache_dir):
+        results = [{"market": "continente", "query": "leite", "attempts": 1,
+                    "products": pf.parse_json_ld(_page(*CATALOG["continente"]["leite"]))}]
+        assert pf.store_results(results, dry_run=True)["stored"] == 0
+        assert pc.load_cache()["continente"] == {}
+
+    def test_read_jobs(self):
+        jobs, errors = pf.read_jobs(['{"market": "continente", "query": "leite"}', "", "x", '{"product": "ovos"}',
+                                     '{"market": "pingodoce", "product": "ovos"}'])
+        assert jobs == [("continente", "leite"), ("pingodoce", "ovos")]
+        assert [e["line"] for e in errors] == [3, 4]
+
+
+# ---------------------------------------------------------------------------
+# Servidor HTTP local + aiohttp
+# ---------------------------------------------------------------------------
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """GET /<market>/pesquisa/?q=... → página com JSON-LD; a 1ª pesquisa de "arroz" dá 503."""
+
+    failed_once: set = set()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        market = url.path.strip("/").split("/")[0]
+        query = parse_qs(url.query).get("q", [""])[0]
+        if query == "arroz" and (market, query) not in self.failed_once:
+            self.failed_once.add((market, query))
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+        body = _page(*CATALOG.get(market, {}).get(query, [])).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    _StubHandler.failed_once = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    yield {
+        m: {"search_url": f"{base}/{m}/pesquisa/?q={{query}}", "concurrency": 2, "rate_per_second": 100, "burst": 4}
+        for m in ("continente", "pingodoce")
+    }
+    server.shutdown()
+    server.server_close()
+
+
+class TestAgainstStubServer:
+    def test_fetch_and_store(self, stub_server, cache_dir, monkeypatch):
+        pytest.importorskip("aiohttp")
+        jobs = [("continente", "leite"), ("pingodoce", "leite"), ("pingodoce", "arroz"), ("continente", "sal")]
+        monkeypatch.setattr(pf, "FETCH_CONFIG", stub_server)
+        results = asyncio.run(pf.fetch_all(jobs, seed=3))
+        assert [r["attempts"] for r in results] == [1, 1, 2, 1]
+        summary = pf.store_results(results)
+        assert summary["stored"] == 3
+        assert [f["query"] for f in summary["failed"]] == ["sal"]
+        assert pc.load_cache()["pingodoce"]["arroz agulha 1kg"]["price_per_unit"] == 1.09
+
+    def test_cli_without_aiohttp_reports_error(self, cache_dir, monkeypatch):
+        monkeypatch.setattr(pf, "aiohttp", None)
+        args = types.SimpleNamespace(plan=False, jobs=None, limit=None, dry_run=False)
+        monkeypatch.setattr("sys.stdin", __import__("io").StringIO('{"market": "continente", "query": "leite"}\n'))
+        assert "aiohttp" in pf.cmd_fetch(args)["error"]
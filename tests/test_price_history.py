@@ -0,0 +1,84 @@
+"""Testes para scripts/price_history.py"""
+import math
+
+import pytest
+import price_history as ph
+
+
+DAY = 86400.0
+
+
+def _entry(price, promo=None):
+    return {"price": price, "promo_effective_price": promo}
+
+
+class TestAppendPrice:
+    def test_appends_and_loads_typed_arrays(self, tmp_path):
+        assert ph.append_price(tmp_path, "continente", "leite", 1000.0, _entry(1.29)) is True
+        assert ph.append_price(tmp_path, "continente", "leite", 2000.0, _entry(1.29, 0.99)) is True
+        series = ph.load_series(tmp_path, "continente", "leite")
+        assert series.key == "leite"
+        assert list(series.timestamps) == [1000.0, 2000.0]
+        assert list(series.prices) == [1.29, 1.29]
+        assert list(series.effective) == [1.29, 0.99]
+        assert series.timestamps.typecode == "d"
+
+    def test_unchanged_price_is_deduplicated(self, tmp_path):
+        ph.append_price(tmp_path, "continente", "leite", 1000.0, _entry(1.29))
+        assert ph.append_price(tmp_path, "continente", "leite", 2000.0, _entry(1.29)) is False
+        assert len(ph.load_series(tmp_path, "continente", "leite")) == 1
+
+    def test_missing_price_is_ignored(self, tmp_path):
+        assert ph.append_price(tmp_path, "continente", "leite", 1000.0, {"price": None}) is False
+        assert ph.load_series(tmp_path, "continente", "leite") is None
+
+    def test_series_are_per_market(self, tmp_path):
+        ph.append_price(tmp_path, "continente", "leite", 1000.0, _entry(1.29))
+        assert ph.load_series(tmp_path, "pingodoce", "leite") is None
+
+    def test_torn_trailing_record_is_ignored(self, tmp_path):
+        ph.append_price(tmp_path, "continente", "leite", 1000.0, _entry(1.29))
+        with open(ph.series_path(tmp_path, "continente", "leite"), "ab") as f:
+            f.write(b"\x00" * 10)
+        assert len(ph.load_series(tmp_path, "continente", "leite")) == 1
+
+
+class TestSeriesStats:
+    def _series(self, tmp_path, points):
+        for ts, price, promo in points:
+            ph.append_price(tmp_path, "continente", "arroz", ts, _entry(price, promo))
+        return ph.load_series(tmp_path, "continente", "arroz")
+
+    def test_time_weighted_mean(self, tmp_path):
+        # 1.00 durante 3 dias, 2.00 durante 1 dia
+        series = self._series(tmp_path, [(0.0, 1.0, None), (3 * DAY, 2.0, None)])
+        stats = series.stats(now=4 * DAY)
+        assert stats["price"] == {"min": 1.0, "max": 2.0, "mean": 1.25, "current": 2.0}
+
+    def test_window_includes_price_in_force_at_start(self, tmp_path):
+        series = self._series(tmp_path, [(0.0, 1.0, None), (10 * DAY, 2.0, None)])
+        stats = series.stats(window_days=5, now=12 * DAY)
+        # janela [7d, 12d]: 1.00 durante 3 dias, 2.00 durante 2 dias
+        assert stats["price"]["min"] == 1.0
+        assert stats["price"]["mean"] == pytest.approx(1.4)
+
+    def test_window_excludes_older_prices(self, tmp_path):
+        series = self._series(tmp_path, [(0.0, 5.0, None), (DAY, 1.0, None), (10 * DAY, 2.0, None)])
+        assert series.stats(window_days=5, now=12 * DAY)["price"]["max"] == 2.0
+
+    def test_zero_window_is_price_in_force(self, tmp_path):
+        series = self._series(tmp_path, [(0.0, 5.0, None), (DAY, 1.0, None), (10 * DAY, 2.0, None)])
+        stats = series.stats(window_days=0, now=12 * DAY)
+        assert stats["price"] == {"min": 2.0, "max": 2.0, "mean": 2.0, "current": 2.0}
+
+    def test_negative_window_rejected(self, tmp_path):
+        series = self._series(tmp_path, [(0.0, 1.0, None)])
+        with pytest.raises(ValueError):
+            series.stats(window_days=-1, now=DAY)
+
+    def test_effective_tracks_promos(self, tmp_path):
+        series = self._series(tmp_path, [(0.0, 2.0, None), (DAY, 2.0, 1.5)])
+        stats = series.stats(now=2 * DAY)
+        assert stats["effective"]["current"] == 1.5
+        assert stats["price"]["current"] == 2.0
+        assert not math.isnan(stats["effective"]["mean"])
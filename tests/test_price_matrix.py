@@ -0,0 +1,94 @@
+"""Testes para scripts/price_matrix.py"""
+import math
+
+import pytest
+import price_matrix as pm
+
+MARKETS = ["continente", "pingodoce"]
+
+
+def _item(name, prices, preferred_store=None):
+    return {"item": {"name": name, "preferred_store": preferred_store}, "prices": prices}
+
+
+@pytest.fixture
+def items():
+    return [
+        _item("leite", {"continente": {"price": 1.29}, "pingodoce": {"price": 1.50}}),
+        _item("arroz", {"continente": {"price": 0.99}, "pingodoce": {"price": 1.20, "promo_effective_price": 0.79}}),
+        _item("ovos", {"continente": {"price": 2.10, "available": False}, "pingodoce": {"price": 2.30}}),
+        _item("sal", {"continente": {"price": 0.40}, "pingodoce": {"price": 0.40}}),
+        _item("raro", {}),
+    ]
+
+
+# ---------------------------------------------------------------------------
+# effective_price
+# ---------------------------------------------------------------------------
+
+class TestEffectivePrice:
+    def test_promo_wins(self):
+        assert pm.effective_price({"price": 1.2, "promo_effective_price": 0.8}) == 0.8
+
+    def test_unavailable_or_missing(self):
+        assert pm.effective_price(None) is None
+        assert pm.effective_price({"price": 1.0, "available": False}) is None
+        assert pm.effective_price({"price": None}) is None
+
+
+# ---------------------------------------------------------------------------
+# PriceMatrix
+# ---------------------------------------------------------------------------
+
+class TestPriceMatrix:
+    def test_columns_and_mask(self, items):
+        matrix = pm.PriceMatrix(items, MARKETS)
+        assert list(matrix.columns[1]) == [1.50, 0.79, 2.30, 0.40, math.inf]
+        assert list(matrix.available[0]) == [1, 1, 0, 1, 0]
+
+    def test_cheapest_ties_go_to_first_market(self, items):
+        choice, prices = pm.PriceMatrix(items, MARKETS).cheapest()
+        assert choice == [0, 1, 1, 0, -1]
+        assert prices[:4] == [1.29, 0.79, 2.30, 0.40]
+
+    def test_preferred_store_only_when_available_online(self):
+        items = [
+            _item("cafe", {"continente": {"price": 1.29}, "pingodoce": {"price": 0.99}}, "continente"),
+            _item("cha", {"continente": {"price": 1.0, "available": False}, "pingodoce": {"price": 2.0}}, "continente"),
+            _item("pao", {"continente": {"price": 1.0}, "pingodoce": {"price": 0.5}}, "lidl"),
+        ]
+        matrix = pm.PriceMatrix(items, MARKETS)
+        assert list(matrix.preferred) == [0, -1, -1]
+        assert matrix.cheapest()[0] == [0, 1, 1]
+        assert matrix.cheapest(honor_preferred=False)[0] == [1, 1, 1]
+
+    def test_column_total(self, items):
+        matrix = pm.PriceMatrix(items, MARKETS)
+        subtotal, all_available = matrix.column_total(1)
+        assert subtotal == pytest.approx(1.50 + 0.79 + 2.30 + 0.40)
+        assert all_available is False
+
+    def test_subtotals_and_options(self, items):
+        matrix = pm.PriceMatrix(items, MARKETS)
+        assert matrix.subtotals([0, 1, 1, 0, -1]) == pytest.approx([1.69, 3.09])
+        assert matrix.options(1) == [(0.79, 1), (0.99, 0)]
+        assert matrix.options(4) == []
+
+    def test_empty_list(self):
+        matrix = pm.PriceMatrix([], MARKETS)
+        assert matrix.cheapest() == ([], [])
+        assert matrix.column_total(0) == (0, True)
+
+    def test_row_edits_match_fresh_build(self, items):
+        matrix = pm.PriceMatrix([items[0], items[1], items[3]], MARKETS)
+        assert matrix.insert_row(2, items[2]) == 2
+        matrix.append_row(items[4])
+        matrix.set_row(0, _item("leite", {"pingodoce": {"price": 1.10}}, "continente"))
+        matrix.delete_row(1)
+        expected_items = [_item("leite", {"pingodoce": {"price": 1.10}}, "continente")] + items[2:]
+        fresh = pm.PriceMatrix(expected_items, MARKETS)
+        assert matrix.items == expected_items
+        assert [list(c) for c in matrix.columns] == [list(c) for c in fresh.columns]
+        assert matrix.available == fresh.available
+        assert list(matrix.preferred) == list(fresh.preferred)
+        assert [matrix.best(i) for i in range(matrix.n)] == fresh.cheapest()[0]
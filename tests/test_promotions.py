@@ -0,0 +1,148 @@
+"""Testes para scripts/promotions.py"""
+import pytest
+import promotions as pr
+
+
+# ---------------------------------------------------------------------------
+# parse_promo
+# ---------------------------------------------------------------------------
+
+class TestParsePromo:
+    @pytest.mark.parametrize("text,expected", [
+        ("Leve 3 pague 2", pr.MultiBuy(3, 2)),
+        ("Leve 2, Pague 1", pr.MultiBuy(2, 1)),
+        ("50% na 2ª unidade", pr.NthUnitDiscount(2, 50.0)),
+        ("25% de desconto na 3ª un", pr.NthUnitDiscount(3, 25.0)),
+        ("2 por 4,50€", pr.BundlePrice(2, 4.5)),
+        ("3 un por 5 €", pr.BundlePrice(3, 5.0)),
+        ("Poupa 20%", pr.PercentOff(20.0)),
+        ("-30% (máx. 4 un)", pr.PercentOff(30.0, max_units=4)),
+    ])
+    def test_text(self, text, expected):
+        assert pr.parse_promo(text) == expected
+
+    @pytest.mark.parametrize("text", [None, "", "Poupa 1,50€", "Novidade", "Leve 2 pague 3"])
+    def test_unrecognized_or_invalid(self, text):
+        assert pr.parse_promo(text) is None
+
+    def test_structured_descriptor(self):
+        assert pr.parse_promo({"type": "multi_buy", "buy": 3, "pay": 2, "max_units": 6}) == pr.MultiBuy(3, 2, 6)
+        assert pr.parse_promo({"type": "bundle", "units": 2, "price": 4.5}) == pr.BundlePrice(2, 4.5)
+        assert pr.parse_promo({"type": "nth_unit", "nth": 2, "percent": 50}) == pr.NthUnitDiscount(2, 50)
+
+    @pytest.mark.parametrize("descriptor", [
+        {"type": "multi_buy", "buy": 3},
+        {"type": "bundle", "units": 2.5, "price": 4.5},
+        {"type": "percent_off", "percent": "20"},
+        {"type": "desconhecido"},
+    ])
+    def test_bad_descriptor(self, descriptor):
+        assert pr.parse_promo(descriptor) is None
+
+
+# ---------------------------------------------------------------------------
+# Embalagens
+# ---------------------------------------------------------------------------
+
+class TestPackSize:
+    @pytest.mark.parametrize("entry,expected", [
+        ({"name": "Leite Meio-Gordo Mimosa 1.5L"}, (1.5, "L")),
+        ({"name": "Ovos M (12un)"}, (12.0, "un")),
+        ({"name": "Água 6x1,5L"}, (9.0, "L")),
+        ({"name": "Iogurte 4 x 125g"}, (0.5, "kg")),
+        ({"name": "Queijo", "pack_size": 250, "unit": "g"}, (0.25, "kg")),
+        ({"name": "Azeite", "price": 5.98, "price_per_unit": 7.97, "unit": "L"}, (5.98 / 7.97, "L")),
+        ({"name": "Pão"}, None),
+    ])
+    def test_pack_size(self, entry, expected):
+        size = pr.pack_size(entry)
+        if expected is None:
+            assert size is None
+        else:
+            assert size == (pytest.approx(expected[0]), expected[1])
+
+    def test_units_needed(self):
+        milk = {"name": "Leite 1.5L"}
+        assert pr.units_needed(milk, {"value": 6, "unit": "L"}) == 4
+        assert pr.units_needed(milk, {"value": 500, "unit": "ml"}) == 1
+        assert pr.units_needed(milk, None) == 1
+
+    def test_rounding_tolerance(self):
+        # 2.49 / 0.21 = 11,86 ovos por caixa; 24 ovos continuam a ser 2 caixas
+        eggs = {"name": "Ovos", "price": 2.49, "price_per_unit": 0.21, "unit": "un"}
+        assert pr.units_needed(eggs, {"value": 24, "unit": "un"}) == 2
+
+    def test_incomparable_unit_counts_packs(self):
+        assert pr.units_needed({"name": "Detergente 1L"}, {"value": 2, "unit": "pack"}) == 2
+        assert pr.units_needed({"name": "Pão"}, {"value": 0.3, "unit": "un"}) == 1
+
+    @pytest.mark.parametrize("entry, quantity", [
+        ({"name": "Queijo Flamengo", "price": 2.49, "unit": "kg"}, {"value": 300, "unit": "g"}),
+        ({"name": "Fiambre", "price": 1.99}, {"value": 200, "unit": "g"}),
+        ({"name": "Ovos", "price": 2.49, "price_per_unit": 0.21, "unit": "un"}, {"value": 0.5, "unit": "kg"}),
+    ])
+    def test_weight_without_comparable_pack_is_one_pack(self, entry, quantity):
+        assert pr.units_needed(entry, quantity) == 1
+        assert pr.line_total(entry, quantity)["total"] == pytest.approx(entry["price"])
+
+
+# ---------------------------------------------------------------------------
+# line_total
+# ---------------------------------------------------------------------------
+
+class TestLineTotal:
+    def test_no_promo_uses_effective_price(self):
+        line = pr.line_total({"name": "Arroz 1kg", "price": 1.0, "promo_effective_price": 0.8}, {"value": 3, "unit": "kg"})
+        assert line["units"] == 3
+        assert line["total"] == pytest.approx(2.4)
+        assert line["promo"] is None
+
+    def test_multi_buy(self):
+        line = pr.line_total({"name": "Leite 1L", "price": 1.0, "promo": "Leve 3 pague 2"}, {"value": 7, "unit": "L"})
+        assert line["total"] == pytest.approx(5.0)  # 2 grupos (4€) + 1
+        assert line["savings"] == pytest.approx(2.0)
+
+    def test_nth_unit_ignores_average_effective_price(self):
+        entry = {"name": "Café", "price": 4.0, "promo": "50% na 2ª unidade", "promo_effective_price": 3.0}
+        assert pr.line_total(entry, {"value": 1, "unit": "un"})["total"] == pytest.approx(4.0)
+        assert pr.line_total(entry, {"value": 3, "unit": "un"})["total"] == pytest.approx(10.0)
+
+    def test_bundle_rounds_up_when_cheaper(self):
+        entry = {"name": "Iogurte", "price": 2.0, "promo": "3 por 3,50€"}
+        line = pr.line_total(entry, {"value": 2, "unit": "un"})
+        assert (line["units"], line["total"]) == (3, pytest.approx(3.5))
+
+    def test_tie_keeps_fewer_units(self):
+        entry = {"name": "Sumo", "price": 1.0, "promo": "Leve 3 pague 2"}
+        assert pr.line_total(entry, {"value": 2, "unit": "un"})["units"] == 2
+
+    def test_max_units(self):
+        entry = {"name": "Atum", "price": 2.0, "promo": {"type": "percent_off", "percent": 50, "max_units": 2}}
+        assert pr.line_total(entry, {"value": 4, "unit": "un"})["total"] == pytest.approx(6.0)
+
+    def test_unavailable(self):
+        assert pr.line_total({"price": 1.0, "available": False}) is None
+        assert pr.line_total({"price": None}) is None
+
+    def test_rule_without_describe_cannot_be_created(self):
+        class HalfPrice(pr.PromoRule):
+            def _discounted(self, units, price):
+                return units * price / 2
+
+        with pytest.raises(TypeError):
+            HalfPrice()
+
+
+class TestLinePricer:
+    def test_memoized_per_entry_and_quantity(self):
+        pricer = pr.LinePricer()
+        entry = {"name": "Leite 1L", "price": 1.0, "promo": {"type": "multi_buy", "buy": 3, "pay": 2}}
+        assert pricer.total(entry, {"value": 3, "unit": "L"}) == pytest.approx(2.0)
+        assert pricer.total(dict(entry), {"value": 3, "unit": "L"}) == pytest.approx(2.0)
+        assert pricer.total(entry, {"value": 1, "unit": "L"}) == pytest.approx(1.0)
+        assert (pricer.hits, pricer.misses) == (1, 2)
+
+    def test_changed_entry_is_not_reused(self):
+        pricer = pr.LinePricer()
+        assert pricer.total({"name": "x", "price": 1.0}) == 1.0
+        assert pricer.total({"name": "x", "price": 2.0}) == 2.0
@@ -0,0 +1,237 @@
+"""Testes para scripts/result_cache.py (e o seu uso em price_compare.run_comparison)"""
+import json
+import os
+import time
+
+import pytest
+import price_cache as pcache
+import price_compare as pc
+import result_cache as rc
+
+
+def _items(price=1.29):
+    return [{"item": {"name": "Leite"}, "prices": {"continente": {"price": price, "cached_at": "2026-01-01T00:00:00"}}}]
+
+
+# ---------------------------------------------------------------------------
+# fingerprint / source_signature
+# ---------------------------------------------------------------------------
+
+def _settings(cost=3.99, coupons=(), exact=False):
+    return {"market_config": {"continente": {"coupons": list(coupons)}}, "delivery": {"continente": {"cost": cost}},
+            "mode": {"exact": exact}}
+
+
+class TestFingerprint:
+    def test_stable_for_equal_content(self):
+        assert rc.fingerprint(_items(), _settings()) == rc.fingerprint(_items(), _settings())
+
+    @pytest.mark.parametrize("change", ["price", "cached_at", "delivery", "coupons", "mode"])
+    def test_any_input_change_changes_key(self, change):
+        items, settings = _items(), _settings()
+        base = rc.fingerprint(items, settings)
+        if change == "price":
+            items = _items(1.30)
+        elif change == "cached_at":
+            items[0]["prices"]["continente"]["cached_at"] = "2026-01-02T00:00:00"
+        elif change == "delivery":
+            settings = _settings(cost=2.99)
+        elif change == "coupons":
+            settings = _settings(coupons=[{"discount_eur": 1.0}])
+        else:
+            settings = _settings(exact=True)
+        assert rc.fingerprint(items, settings) != base
+
+    def test_source_signature(self, tmp_path):
+        path = tmp_path / "inventory.json"
+        path.write_text("{}")
+        assert rc.source_signature([path], _settings()) is None  # acabado de escrever
+        os.utime(path, ns=(10**18, 10**18))
+        signature = rc.source_signature([path, tmp_path / "ausente.json"], _settings())
+        assert signature == rc.source_signature([path, tmp_path / "ausente.json"], _settings())
+        assert signature != rc.source_signature([path, tmp_path / "ausente.json"], _settings(cost=2.99))
+        path.write_text('{"a": 1}')
+        os.utime(path, ns=(10**18, 10**18))
+        assert rc.source_signature([path, tmp_path / "ausente.json"], _settings()) != signature
+
+
+# ---------------------------------------------------------------------------
+# ResultCache
+# ---------------------------------------------------------------------------
+
+class TestResultCache:
+    def test_miss_then_hit(self, tmp_path):
+        store = rc.ResultCache(tmp_path / "comparison_cache")
+        entry, status = store.get("k")
+        assert entry is None
+        assert status == {"status": "miss", "hits": 0, "misses": 1}
+        store.put("k", {"total": 10.0}, {"items_count": 1})
+        entry, status = store.get("k")
+        assert entry["result"] == {"total": 10.0}
+        assert entry["run"] == {"items_count": 1}
+        assert status["status"] == "hit"
+        assert (status["hits"], status["misses"]) == (1, 1)
+
+    def test_lru_eviction(self, tmp_path):
+        store = rc.ResultCache(tmp_path / "comparison_cache", max_entries=2)
+        store.put("a", {"total": 1})
+        store.put("b", {"total": 2})
+        os.utime(tmp_path / "comparison_cache" / "b.json", ns=(1, 1))
+        os.utime(tmp_path / "comparison_cache" / "a.json", ns=(2, 2))
+        store.put("c", {"total": 3})
+        assert store.get("b")[0] is None
+        assert store.get("a")[0]["result"] == {"total": 1}
+
+    def test_hit_renews_lru_position(self, tmp_path):
+        store = rc.ResultCache(tmp_path / "comparison_cache")
+        store.put("a", {"total": 1})
+        path = tmp_path / "comparison_cache" / "a.json"
+        os.utime(path, ns=(1, 1))
+        store.get("a")
+        assert path.stat().st_mtime_ns > 1
+
+    def test_corrupt_files_are_misses(self, tmp_path):
+        directory = tmp_path / "comparison_cache"
+        directory.mkdir()
+        (directory / "k.json").write_text("{not json")
+        (directory / "stats.json").write_text("[]")
+        assert rc.ResultCache(directory).get("k")[1] == {"status": "miss", "hits": 0, "misses": 1}
+
+    def test_uncounted_miss(self, tmp_path):
+        store = rc.ResultCache(tmp_path / "comparison_cache")
+        assert store.get("k", count_miss=False) == (None, {"status": "miss"})
+        assert not (tmp_path / "comparison_cache" / "stats.json").exists()
+
+    def test_concurrent_counts_and_links_are_not_lost(self, tmp_path):
+        from concurrent.futures import ThreadPoolExecutor
+        store = rc.ResultCache(tmp_path / "comparison_cache", max_entries=100)
+
+        def work(i):
+            rc.ResultCache(store.directory, max_entries=100).get(f"k{i}")
+            rc.ResultCache(store.directory, max_entries=100).link(f"sig{i}", f"k{i}", None)
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(work, range(40)))
+        assert store.get("k0")[1]["misses"] == 41
+        assert all(store.key_for_sources(f"sig{i}") == f"k{i}" for i in range(40))
+
+    def test_source_links_expire(self, tmp_path, monkeypatch):
+        store = rc.ResultCache(tmp_path / "comparison_cache")
+        store.link("sig", "k", valid_until=1000.0)
+        store.link("other", "k2", valid_until=None)
+        store.link(None, "k3", valid_until=None)  # ficheiros por assentar: não liga
+        monkeypatch.setattr(rc.time, "time", lambda: 999.0)
+        assert store.key_for_sources("sig") == "k"
+        assert store.key_for_sources(None) is None
+        monkeypatch.setattr(rc.time, "time", lambda: 1000.0)
+        assert store.key_for_sources("sig") is None
+        assert store.key_for_sources("other") == "k2"
+
+
+# ---------------------------------------------------------------------------
+# run_comparison
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def seed():
+    return {
+        "inventory.json": {"shopping_list": [{"name": "Leite"}, {"name": "Arroz"}]},
+        "price_cache": [("continente", "Leite", {"price": 1.29}), ("pingodoce", "Arroz", {"price": 0.79})],
+    }
+
+
+def _update(market, product, price):
+    pcache.write_entries([pcache.build_entry(market, product, {"price": price})])
+
+
+def _settle(directory):
+    """Recua o mtime dos ficheiros de entrada para fora da janela de escrita recente."""
+    t = time.time() - 10
+    for path in directory.iterdir():
+        if path.is_file():
+            os.utime(path, (t, t))
+
+
+class TestRunComparisonResultCache:
+    def test_second_run_is_a_hit_with_same_result(self, data_dir):
+        first = pc.run_comparison()
+        second = pc.run_comparison()
+        assert first["result_cache"]["status"] == "miss"
+        assert second["result_cache"]["status"] == "hit"
+        assert second["result_cache"]["key"] == first["result_cache"]["key"]
+        for key in ("markets", "total", "alternatives", "unavailable", "recommendation_note"):
+            assert second[key] == first[key]
+
+    def test_price_update_of_listed_item_forces_recompute(self, data_dir):
+        first = pc.run_comparison()
+        _update("continente", "Leite", 1.09)
+        second = pc.run_comparison()
+        assert second["result_cache"]["status"] == "miss"
+        assert second["total"] != first["total"]
+
+    def test_update_of_unlisted_item_still_hits(self, data_dir):
+        pc.run_comparison()
+        _update("continente", "Café", 3.49)
+        assert pc.run_comparison()["result_cache"]["status"] == "hit"
+
+    def test_delivery_config_change_forces_recompute(self, data_dir, monkeypatch):
+        pc.run_comparison()
+        monkeypatch.setitem(pc.DELIVERY_CONFIG["continente"], "cost", 1.99)
+        assert pc.run_comparison()["result_cache"]["status"] == "miss"
+
+    def test_disabled(self, data_dir):
+        pc.run_comparison()
+        result = pc.run_comparison(use_result_cache=False)
+        assert "result_cache" not in result
+        assert not pc.run_comparison(optimizer=pc.optimize_split).get("result_cache")
+
+    def test_exact_mode_has_its_own_key(self, data_dir):
+        pc.run_comparison()
+        exact = pc.run_comparison(exact=True)
+        assert exact["result_cache"]["status"] == "miss"
+        assert pc.run_comparison(exact=True)["result_cache"]["status"] == "hit"
+
+    def test_unchanged_files_skip_cache_resolution(self, data_dir, monkeypatch):
+        _settle(data_dir)
+        first = pc.run_comparison()
+        lookups = (data_dir / "price_cache.lookups").read_text()
+        monkeypatch.setattr(pc, "load_price_cache", lambda: pytest.fail("a cache não devia ser lida"))
+        second = pc.run_comparison()
+        assert second["result_cache"]["status"] == "hit"
+        assert second["total"] == first["total"]
+        assert second["items_count"] == 2
+        # a taxa de acerto do `stats` continua a contar as consultas
+        assert len((data_dir / "price_cache.lookups").read_text()) > len(lookups)
+
+    def test_evicted_linked_key_counts_one_miss(self, data_dir):
+        _settle(data_dir)
+        first = pc.run_comparison()
+        cache_dir = data_dir / "comparison_cache"
+        for path in cache_dir.glob("*.json"):
+            if path.name not in (rc.ResultCache.STATS, rc.ResultCache.SOURCES):
+                path.unlink()
+        result = pc.run_comparison()["result_cache"]
+        assert result["status"] == "miss"
+        assert (result["hits"], result["misses"]) == (first["result_cache"]["hits"], 2)
+
+    def test_file_change_goes_back_to_content_key(self, data_dir, monkeypatch):
+        _settle(data_dir)
+        pc.run_comparison()
+        _update("continente", "Café", 3.49)  # fora da lista: ficheiros mudam, chave não
+        _settle(data_dir)
+        calls = []
+        original = pc.load_price_cache
+        monkeypatch.setattr(pc, "load_price_cache", lambda: calls.append(1) or original())
+        assert pc.run_comparison()["result_cache"]["status"] == "hit"
+        assert calls == [1]
+        assert pc.run_comparison()["result_cache"]["status"] == "hit"
+        assert calls == [1]  # nova assinatura já ligada à chave
+
+    def test_shortcut_ends_when_a_used_entry_expires(self, data_dir, monkeypatch):
+        _settle(data_dir)
+        pc.run_comparison()
+        later = time.time() + 48 * 3600
+        monkeypatch.setattr(rc.time, "time", lambda: later)
+        monkeypatch.setattr(pcache.time, "time", lambda: later)
+        result = pc.run_comparison()
+        assert result["result_cache"]["status"] == "miss"
+        assert sorted(result["missing_from_cache"]) == ["Arroz", "Leite"]
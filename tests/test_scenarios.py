@@ -0,0 +1,132 @@
+"""Testes para scripts/scenarios.py (e price_compare.py --scenarios)"""
+import json
+import sys
+
+import pytest
+import price_compare as pc
+import scenarios as sc
+
+
+@pytest.fixture
+def seed():
+    return {
+        "inventory.json": {"shopping_list": [
+            {"name": "Leite", "category": "lacticínios"},
+            {"name": "Arroz", "category": "mercearia"},
+        ]},
+        "consumption_model.json": {
+            "azeite": {"name": "Azeite", "category": "mercearia", "confidence": 0.9, "bulk_eligible": True,
+                       "avg_weekly_consumption": {"value": 0.2, "unit": "L"}, "bulk_quantity": {"value": 1, "unit": "L"}},
+        },
+        "family_preferences.json": {"budget": {"weekly_limit_eur": 100.0, "bulk_monthly_budget_eur": 5.0}},
+        "price_cache": [
+            ("continente", "Leite", {"price": 1.29}),
+            ("pingodoce", "Leite", {"price": 0.99}),
+            ("continente", "Arroz", {"price": 0.79}),
+            ("continente", "Azeite", {"price": 7.49}),
+        ],
+    }
+
+
+
+def _run(lines, jobs=1):
+    out = []
+    summary = sc.run_scenarios([json.dumps(line) if not isinstance(line, str) else line for line in lines],
+                               out.append, jobs=jobs)
+    return {r["id"]: r for r in map(json.loads, out)}, summary
+
+
+# ---------------------------------------------------------------------------
+# parse_scenarios / build_items
+# ---------------------------------------------------------------------------
+
+class TestParseScenarios:
+    def test_defaults_and_errors(self):
+        scenarios = sc.parse_scenarios(['{"list": "weekly"}', "", "não é json", "[1]", '{"list": "mensal"}'])
+        assert scenarios[0]["id"] == "cenario-1"
+        assert [s["line"] for s in scenarios] == [1, 3, 4, 5]
+        assert scenarios[1]["error"].startswith("JSON inválido")
+        assert "objeto JSON" in scenarios[2]["error"]
+        assert "list desconhecida" in scenarios[3]["error"]
+
+    def test_brand_penalty_must_be_non_negative_number(self):
+        scenarios = sc.parse_scenarios(['{"brand_penalty_pct": null}', '{"brand_penalty_pct": 5}',
+                                        '{"brand_penalty_pct": -1}', '{"brand_penalty_pct": "10"}'])
+        assert ["error" in s for s in scenarios] == [False, False, True, True]
+
+
+class TestBuildItems:
+    def test_drop_set_add(self, data_dir):
+        sources = sc.ListSource({"budget": {"weekly_limit_eur": 100.0}})
+        scenario = {"drop": ["arroz"], "set": {"LEITE": {"preferred_brand": "Mimosa"}},
+                    "add": [{"name": "Ovos", "category": "frescos"}]}
+        items, limit = sc.build_items(scenario, sources)
+        assert [(i["name"], i.get("preferred_brand")) for i in items] == [("Leite", "Mimosa"), ("Ovos", None)]
+        assert limit == 100.0
+        # a lista base não é alterada pelo cenário
+        assert "preferred_brand" not in sources.get("shopping_list")[0][0]
+
+    def test_bulk_list_uses_bulk_budget(self, data_dir):
+        items, limit = sc.build_items({"list": "bulk", "budget": 50.0}, sc.ListSource({}))
+        assert [i["name"] for i in items] == ["Azeite"]
+        assert limit == 50.0
+        assert sc.build_items({"list": "bulk"}, sc.ListSource({}))[1] == 5.0
+
+
+# ---------------------------------------------------------------------------
+# run_scenarios
+# ---------------------------------------------------------------------------
+
+class TestRunScenarios:
+    def test_one_result_per_scenario(self, data_dir):
+        results, summary = _run([
+            {"id": "atual"},
+            {"id": "granel", "list": "bulk"},
+            {"id": "sem-leite", "drop": ["leite"], "exact": True, "pareto": False},
+            {"id": "vazio", "items": []},
+            "{",
+        ])
+        assert summary["scenarios"] == 5 and summary["errors"] == 2 and summary["workers"] == 1
+        assert results["atual"]["total"] == pc.run_comparison(use_result_cache=False)["total"]
+        assert results["atual"]["pareto"]["points"]
+        assert results["granel"]["budget_check"]["over_budget"] is True
+        assert results["sem-leite"]["solver"]["mode"] == "exact"
+        assert "pareto" not in results["sem-leite"]
+        assert results["vazio"]["error"] == "Lista de compras vazia"
+        assert results[None]["line"] == 5
+
+    def test_missing_prices_are_reported(self, data_dir):
+        results, _ = _run([{"id": "x", "add": [{"name": "Trufas"}]}])
+        assert results["x"]["missing_from_cache"] == ["Trufas"]
+
+    def test_cache_read_once(self, data_dir, monkeypatch):
+        calls = []
+        monkeypatch.setattr(sc, "load_price_cache", lambda: calls.append(1) or pc.load_price_cache())
+        _run([{"id": str(i)} for i in range(3)])
+        assert calls == [1]
+
+    def test_process_pool_matches_serial(self, data_dir):
+        lines = [{"id": f"c{i}", "drop": ["arroz"] if i % 2 else []} for i in range(sc.SCENARIO_POOL_MIN)]
+        serial, _ = _run(lines, jobs=1)
+        pooled, summary = _run(lines, jobs=2)
+        assert summary["workers"] == 2
+        for key in serial:
+            for field in ("total", "markets", "alternatives", "budget_check"):
+                assert pooled[key][field] == serial[key][field]
+
+
+class TestCli:
+    def test_scenarios_flag_streams_ndjson(self, data_dir, monkeypatch, capsys):
+        scenarios = data_dir / "scenarios.ndjson"
+        scenarios.write_text('{"id": "a"}\n{"id": "b", "drop": ["leite"]}\n')
+        monkeypatch.setattr(sys, "argv", ["price_compare.py", "--scenarios", str(scenarios), "--jobs", "1"])
+        pc.main()
+        out, err = capsys.readouterr()
+        assert [json.loads(line)["id"] for line in out.splitlines()] == ["a", "b"]
+        assert json.loads(err)["scenarios"] == 2
+
+    def test_missing_file(self, data_dir, monkeypatch, capsys):
+        monkeypatch.setattr(sys, "argv", ["price_compare.py", "--scenarios", str(data_dir / "nada.ndjson")])
+        with pytest.raises(SystemExit):
+            pc.main()
+        assert "não encontrado" in json.loads(capsys.readouterr().out)["error"]
@@ -0,0 +1,202 @@
+"""Testes para scripts/split_session.py"""
+import copy
+import random
+
+import pytest
+import price_compare as pc
+import split_session as ss
+
+
+def _item(name, category, continente=None, pingodoce=None, preferred_store=None, quantity=1):
+    prices = {}
+    if continente is not None:
+        prices["continente"] = {"price": continente}
+    if pingodoce is not None:
+        prices["pingodoce"] = {"price": pingodoce}
+    return {
+        "item": {"name": name, "category": category, "quantity": {"value": quantity, "unit": "un"},
+                 "preferred_store": preferred_store},
+        "prices": prices,
+    }
+
+
+def _assert_matches_full_solve(session):
+    expected = pc.optimize_split(copy.deepcopy(session.items), copy.deepcopy(session.market_config))
+    assert session.result() == expected
+
+
+@pytest.fixture
+def no_delivery_window(monkeypatch):
+    """Entregas caras mas limiares fora de alcance: rebalance_delivery nunca atua."""
+    monkeypatch.setitem(pc.DELIVERY_CONFIG["continente"], "free_threshold", 1000.0)
+    monkeypatch.setitem(pc.DELIVERY_CONFIG["pingodoce"], "free_threshold", 1000.0)
+
+
+# ---------------------------------------------------------------------------
+# Deltas locais
+# ---------------------------------------------------------------------------
+
+class TestLocalDeltas:
+    def test_initial_state_is_optimize_split(self):
+        items = [_item("leite", "lacticínios", 1.29, 1.50), _item("arroz", "mercearia", 0.99, 0.79)]
+        session = ss.SplitSession(items)
+        assert session.result() == pc.optimize_split(items)
+        assert session.stats == {"local": 0, "full": 1}
+
+    def test_add_remove_update_stay_local(self, no_delivery_window):
+        session = ss.SplitSession([_item("leite", "lacticínios", 1.29, 1.50), _item("arroz", "mercearia", 0.99, 0.79)])
+        session.add(_item("ovos", "frescos", 2.10, 2.30))
+        _assert_matches_full_solve(session)
+        session.remove("arroz")
+        _assert_matches_full_solve(session)
+        session.update(_item("leite", "lacticínios", 1.29, 1.10, quantity=2))
+        _assert_matches_full_solve(session)
+        session.set_price("ovos", "continente", None)
+        _assert_matches_full_solve(session)
+        assert session.stats == {"local": 4, "full": 1}
+        assert [i["name"] for i in session.result()["markets"]["pingodoce"]["items"]] == ["leite", "ovos"]
+
+    def test_unavailable_item(self, no_delivery_window):
+        session = ss.SplitSession([_item("leite", "lacticínios", 1.29, 1.50)])
+        session.add(_item("raro", "outros"))
+        assert session.result()["unavailable"] == [{"name": "raro", "reason": pc.UNAVAILABLE_REASON}]
+        session.set_price("raro", "pingodoce", {"price": 3.0})
+        assert session.result()["unavailable"] == []
+        _assert_matches_full_solve(session)
+
+    def test_preferred_store_honored(self, no_delivery_window):
+        session = ss.SplitSession([_item("leite", "lacticínios", 1.29, 1.50)])
+        session.add(_item("café", "bebidas", 1.29, 0.99, preferred_store="continente"))
+        names = [i["name"] for i in session.result()["markets"]["continente"]["items"]]
+        assert names == ["leite", "café"]
+        _assert_matches_full_solve(session)
+
+    def test_remove_unknown_item(self):
+        with pytest.raises(KeyError):
+            ss.SplitSession([]).remove("leite")
+
+    def test_sync_applies_difference_by_name(self, no_delivery_window):
+        session = ss.SplitSession([_item("leite", "lacticínios", 1.29, 1.50), _item("arroz", "mercearia", 0.99, 0.79)])
+        new_list = [_item("leite", "lacticínios", 1.60, 1.50), _item("ovos", "frescos", 2.10, 2.30)]
+        assert session.sync(new_list) == {"added": 1, "removed": 1, "changed": 1}
+        assert session.sync(new_list) == {"added": 0, "removed": 0, "changed": 0}
+        assert session.result() == pc.optimize_split(new_list)
+
+    def test_sync_inserts_added_items_in_list_order(self, no_delivery_window):
+        session = ss.SplitSession([_item("leite", "lacticínios", 1.29, 1.50), _item("arroz", "mercearia", 0.99, 0.79)])
+        new_list = [_item("ovos", "frescos", 2.10, 2.30), _item("leite", "lacticínios", 1.29, 1.50),
+                    _item("pão", "padaria", 0.30, 0.25), _item("arroz", "mercearia", 0.99, 0.79)]
+        assert session.sync(new_list) == {"added": 2, "removed": 0, "changed": 0}
+        assert [d["item"]["name"] for d in session.items] == ["ovos", "leite", "pão", "arroz"]
+        assert session.stats["full"] == 1
+        assert session.result() == pc.optimize_split(copy.deepcopy(new_list))
+
+    def test_sync_keeps_repeated_product_as_two_rows(self, no_delivery_window):
+        session = ss.SplitSession([_item("leite", "lacticínios", 1.29, 1.50)])
+        twice = [_item("leite", "lacticínios", 1.29, 1.50), _item("leite", "lacticínios", 4.70, 3.99, quantity=2)]
+        assert session.sync(twice) == {"added": 1, "removed": 0, "changed": 0}
+        assert len(session.items) == 2
+        _assert_matches_full_solve(session)
+        assert session.result() == pc.optimize_split(copy.deepcopy(twice))
+        assert session.sync(twice[1:]) == {"added": 0, "removed": 1, "changed": 1}
+        assert session.result() == pc.optimize_split(copy.deepcopy(twice[1:]))
+
+    def test_sync_reordered_list_is_solved_again(self, no_delivery_window):
+        items = [_item("leite", "lacticínios", 1.29, 1.50), _item("arroz", "mercearia", 0.99, 0.79)]
+        session = ss.SplitSession(items)
+        assert session.sync(items[::-1]) == {"added": 0, "removed": 0, "changed": 0}
+        assert [d["item"]["name"] for d in session.items] == ["arroz", "leite"]
+        assert session.result() == pc.optimize_split(copy.deepcopy(items[::-1]))
+
+
+# ---------------------------------------------------------------------------
+# Fallback para a solução completa
+# ---------------------------------------------------------------------------
+
+class TestFullSolveFallback:
+    def test_delivery_window_forces_full_solve(self, monkeypatch):
+        monkeypatch.setitem(pc.DELIVERY_CONFIG["continente"], "free_threshold", 10.0)
+        session = ss.SplitSession([_item("azeite", "mercearia", 4.0, 4.5)])
+        full = session.stats["full"]
+        session.add(_item("café", "mercearia", 3.0, 3.2))  # Continente a €3 da entrega grátis
+        assert session.stats["full"] == full + 1
+        _assert_matches_full_solve(session)
+
+    def test_reachable_coupon_forces_full_solve(self, no_delivery_window):
+        config = pc.default_market_config()
+        config["continente"]["coupons"] = [
+            {"description": "5€ em >20€", "discount_eur": 5.0, "min_spend": 20.0, "categories": []},
+        ]
+        session = ss.SplitSession([_item("azeite", "mercearia", 12.0, 11.0)], config)
+        assert not session.rebalanced
+        session.add(_item("café", "mercearia", 9.0, 8.5))  # com os dois, o cupão fica ao alcance
+        assert session.rebalanced
+        assert list(session.result()["markets"]) == ["continente"]
+        _assert_matches_full_solve(session)
+        session.remove("café")  # com movimentos do rebalanceamento, volta a resolver tudo
+        assert not session.rebalanced
+        _assert_matches_full_solve(session)
+
+
+# ---------------------------------------------------------------------------
+# Equivalência com optimize_split
+# ---------------------------------------------------------------------------
+
+class TestEquivalence:
+    @pytest.mark.parametrize("seed", range(20))
+    def test_random_deltas_match_full_solve(self, seed, monkeypatch):
+        rng = random.Random(seed)
+        monkeypatch.setitem(pc.DELIVERY_CONFIG["continente"], "free_threshold", rng.choice([15.0, 30.0, 1000.0]))
+        monkeypatch.setitem(pc.DELIVERY_CONFIG["pingodoce"], "free_threshold", rng.choice([15.0, 30.0, 1000.0]))
+        categories = ["lacticínios", "mercearia", "limpeza"]
+        config = pc.default_market_config()
+        if rng.random() < 0.7:
+            config["continente"]["coupons"] = [
+                {"description": "a", "discount_eur": 2.0, "min_spend": 12.0, "categories": [rng.choice(categories)]},
+                {"description": "b", "discount_eur": 3.0, "min_spend": 25.0, "categories": [], "exclusive_group": "x"},
+            ]
+            config["pingodoce"]["balance"] = rng.choice([0.0, 1.5])
+
+        def price():
+            return round(rng.uniform(0.5, 8), 2) if rng.random() < 0.85 else None
+
+        def new_item(name):
+            return _item(name, rng.choice(categories), price(), price(),
+                         preferred_store="continente" if rng.random() < 0.1 else None,
+                         quantity=rng.choice([1, 1, 2]))
+
+        session = ss.SplitSession([new_item(f"item{i}") for i in range(6)], config)
+        counter = 6
+        for _ in range(25):
+            names = [d["item"]["name"] for d in session.items]
+            op = rng.random()
+            if op < 0.4 or not names:
+                # às vezes o mesmo produto outra vez (a lista pode repeti-lo)
+                name = rng.choice(names) if names and rng.random() < 0.2 else f"item{counter}"
+                session.add(new_item(name), rng.randint(0, len(names)))
+                counter += 1
+            elif op < 0.65:
+                session.remove(rng.choice(names))
+            elif op < 0.85:
+                market = rng.choice(pc.MARKETS)
+                p = price()
+                session.set_price(rng.choice(names), market, {"price": p} if p else None)
+            else:
+                name = rng.choice(names)
+                session.update(dict(new_item(name), item=dict(new_item(name)["item"], name=name)))
+            _assert_matches_full_solve(session)
+
+    @pytest.mark.parametrize("seed", range(10))
+    def test_random_syncs_with_repeated_names_match_full_solve(self, seed, no_delivery_window):
+        rng = random.Random(seed)
+
+        def new_list():
+            names = rng.choices(["leite", "arroz", "ovos", "pão"], k=rng.randint(0, 6))
+            return [_item(name, "mercearia", round(rng.uniform(0.5, 5), 2), round(rng.uniform(0.5, 5), 2),
+                          quantity=rng.choice([1, 2])) for name in names]
+
+        session = ss.SplitSession(new_list())
+        for _ in range(10):
+            items = new_list()
+            session.sync(items)
+            assert session.result() == pc.optimize_split(copy.deepcopy(items))
@@ -0,0 +1,170 @@
+"""Testes para scripts/substitutions.py (e a etapa de substituição do price_compare)"""
+import time
+
+import pytest
+import cache_store as cs
+import pareto as pt
+import price_compare as pc
+import substitutions as sb
+
+MARKETS = ["continente", "pingodoce"]
+
+
+def _milk(name, per_l, brand, price=None):
+    return {"name": name, "price": price or per_l, "price_per_unit": per_l, "unit": "L", "brand": brand,
+            "category": "lacticínios", "cached_at": "2026-01-01T00:00:00+00:00", "expires_at": time.time() + 3600}
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = cs.open_store("json", tmp_path / "price_cache.json", MARKETS)
+    s.save_all({
+        "continente": {
+            "leite meio-gordo": _milk("Leite Meio-Gordo", 0.99, "Mimosa"),
+            "leite meio-gordo agros 1l": _milk("Leite Meio-Gordo Agros 1L", 0.92, "Agros"),
+            "leite meio-gordo continente 1l": _milk("Leite Meio-Gordo Continente 1L", 0.69, "Continente"),
+        },
+        "pingodoce": {
+            "leite meio-gordo agros 6x1l": _milk("Leite Meio-Gordo Agros 6x1L", 0.85, "Agros", price=5.10),
+        },
+    })
+    yield s
+    s.close()
+
+
+def _items(**item):
+    return [{"item": {"name": "Leite Meio-Gordo", "category": "lacticínios", **item}, "prices": {}}]
+
+
+def _resolve(store, items_with_prices, sources=None, penalty_pct=10.0):
+    cache = store.load_view()
+    for d in items_with_prices:
+        found = cache["continente"].get("leite meio-gordo")
+        if found:
+            d["prices"].setdefault("continente", found)
+    return sb.substitute_brands(items_with_prices, store, cache, sources or {}, penalty_pct)
+
+
+# ---------------------------------------------------------------------------
+# brand_sources / item_brands
+# ---------------------------------------------------------------------------
+
+class TestItemBrands:
+    def test_model_then_preferences(self):
+        sources = sb.brand_sources(
+            {"leite": {"name": "Leite", "preferred_brand": "Mimosa", "acceptable_brands": ["Agros"]}},
+            {"brand_preferences": {"Café": {"preferred": "Delta", "acceptable": ["Nicola"]},
+                                   "_example_leite": {"preferred": "X"}}},
+        )
+        assert sources == {"leite": ("Mimosa", ["Agros"]), "café": ("Delta", ["Nicola"])}
+        assert sb.item_brands({"name": "LEITE"}, sources) == ("Mimosa", ["Agros"])
+
+    def test_item_fields_win(self):
+        sources = {"leite": ("Mimosa", ["Agros"])}
+        assert sb.item_brands({"name": "Leite", "preferred_brand": "Mimosa"}, sources) == ("Mimosa", ["Agros"])
+        assert sb.item_brands({"name": "Leite", "preferred_brand": "Gresso"}, sources) == ("Gresso", [])
+        assert sb.item_brands({"name": "Leite", "acceptable_brands": []}, sources) == ("Mimosa", [])
+
+
+# ---------------------------------------------------------------------------
+# substitute_brands
+# ---------------------------------------------------------------------------
+
+class TestSubstituteBrands:
+    def test_cheaper_acceptable_brand_replaces_name_match(self, store):
+        items = _items(preferred_brand="Mimosa", acceptable_brands=["Agros"])
+        subs, hits = _resolve(store, items, penalty_pct=5.0)
+        assert items[0]["prices"]["continente"]["brand"] == "Agros"   # 0.92 × 1.05 < 0.99
+        assert items[0]["prices"]["pingodoce"]["name"] == "Leite Meio-Gordo Agros 6x1L"
+        assert subs[0] == {"item": "Leite Meio-Gordo", "market": "continente",
+                           "product": "Leite Meio-Gordo Agros 1L", "brand": "Agros", "unit_price": 0.92,
+                           "replaces": "Leite Meio-Gordo"}
+        assert subs[1]["replaces"] is None
+        assert hits == [("continente", "leite meio-gordo agros 1l"), ("pingodoce", "leite meio-gordo agros 6x1l")]
+
+    def test_penalty_keeps_preferred_brand(self, store):
+        items = _items(preferred_brand="Mimosa", acceptable_brands=["Agros"])
+        subs, _ = _resolve(store, items, penalty_pct=10.0)   # 0.92 × 1.10 > 0.99
+        assert items[0]["prices"]["continente"]["brand"] == "Mimosa"
+        assert [s["market"] for s in subs] == ["pingodoce"]   # sem entrada pelo nome, entra a aceitável
+
+    def test_brands_outside_acceptable_are_ignored(self, store):
+        items = _items(preferred_brand="Mimosa")
+        assert _resolve(store, items, penalty_pct=0.0) == ([], [])
+        assert items[0]["prices"]["continente"]["brand"] == "Mimosa"
+
+    def test_brands_from_model_are_copied_to_item(self, store):
+        items = _items()
+        sources = {"leite meio-gordo": ("Mimosa", ["Agros", "Continente"])}
+        subs, _ = _resolve(store, items, sources, penalty_pct=10.0)
+        item = items[0]["item"]
+        assert (item["preferred_brand"], item["acceptable_brands"]) == ("Mimosa", ["Agros", "Continente"])
+        assert items[0]["prices"]["continente"]["brand"] == "Continente"
+        # o pareto já não conta a marca aceitável como substituição
+        assert not pt.brand_substitution(item, items[0]["prices"]["continente"])
+
+    def test_cheaper_per_litre_multipack_does_not_replace_single_unit(self, tmp_path):
+        s = cs.open_store("json", tmp_path / "multipack.json", MARKETS)
+        s.save_all({"continente": {
+            "leite meio-gordo": _milk("Leite Meio-Gordo", 0.99, "Mimosa"),
+            "leite meio-gordo agros 6x1l": _milk("Leite Meio-Gordo Agros 6x1L", 0.85, "Agros", price=5.10),
+        }, "pingodoce": {}})
+        try:
+            for quantity in ({"value": 1, "unit": "L"}, {"value": 2, "unit": "un"}, None):
+                items = _items(preferred_brand="Mimosa", acceptable_brands=["Agros"], quantity=quantity)
+                assert _resolve(s, items, penalty_pct=0.0) == ([], [])
+                assert items[0]["prices"]["continente"]["brand"] == "Mimosa"
+            # 12 L: 2 packs (10,20 €) saem mais baratos do que 12 × 0,99 €
+            items = _items(preferred_brand="Mimosa", acceptable_brands=["Agros"], quantity={"value": 12, "unit": "L"})
+            subs, _ = _resolve(s, items, penalty_pct=10.0)
+            assert subs[0]["product"] == "Leite Meio-Gordo Agros 6x1L"
+        finally:
+            s.close()
+
+    def test_items_without_brands_or_category_are_skipped(self, store):
+        assert _resolve(store, _items(category=None, preferred_brand="Mimosa", acceptable_brands=["Agros"])) \
+            == ([], [])
+        assert _resolve(store, _items()) == ([], [])
+
+
+# ---------------------------------------------------------------------------
+# run_comparison
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def seed():
+    return {
+        "inventory.json": {"shopping_list": [
+            {"name": "Leite Meio-Gordo", "category": "lacticínios", "quantity": {"value": 6, "unit": "L"}},
+        ]},
+        "consumption_model.json": {
+            "leite_meio_gordo": {"name": "Leite Meio-Gordo", "category": "lacticínios",
+                                 "preferred_brand": "Mimosa", "acceptable_brands": ["Agros"]},
+        },
+        "price_cache": [
+            ("continente", "Leite Meio-Gordo", {"price": 0.99, "price_per_unit": 0.99, "unit": "L", "brand": "Mimosa",
+                                                "category": "lacticínios", "pack_size": "1L"}),
+            ("continente", "Leite Meio-Gordo Agros 1L", {"price": 0.79, "price_per_unit": 0.79, "unit": "L",
+                                                         "brand": "Agros", "category": "lacticínios",
+                                                         "pack_size": "1L"}),
+        ],
+    }
+
+
+class TestRunComparison:
+    def test_substitution_reaches_optimizer(self, data_dir):
+        result = pc.run_comparison(use_result_cache=False, pareto=False)
+        assert result["brand_substitutions"][0]["product"] == "Leite Meio-Gordo Agros 1L"
+        assert result["markets"]["continente"]["subtotal"] == pytest.approx(4.74)
+
+    def test_no_substitution(self, data_dir):
+        result = pc.run_comparison(use_result_cache=False, pareto=False, brand_penalty_pct=None)
+        assert "brand_substitutions" not in result
+        assert result["markets"]["continente"]["subtotal"] == pytest.approx(5.94)
+
+    def test_penalty_is_part_of_the_result_cache_key(self, data_dir):
+        assert "brand_substitutions" in pc.run_comparison(pareto=False)
+        assert "brand_substitutions" not in pc.run_comparison(pareto=False, brand_penalty_pct=50.0)
+        again = pc.run_comparison(pareto=False)
+        assert again["result_cache"]["status"] == "hit"
+        assert "brand_substitutions" in again
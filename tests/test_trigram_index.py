@@ -0,0 +1,85 @@
+"""Testes para scripts/trigram_index.py"""
+import random
+
+import pytest
+import trigram_index as ti
+
+
+WORDS = ["leite", "meio-gordo", "uht", "mimosa", "arroz", "agulha", "ovos", "m", "12un",
+         "pão", "de", "forma", "café", "delta", "lote", "1kg", "azeite", "gallo"]
+
+
+def _keys(n=300, seed=7):
+    rng = random.Random(seed)
+    return list(dict.fromkeys(" ".join(rng.sample(WORDS, rng.randint(1, 4))) for _ in range(n)))
+
+
+class TestTrigrams:
+    def test_trigrams(self):
+        assert ti.trigrams("leite") == {"lei", "eit", "ite"}
+
+    def test_short_text_has_no_trigrams(self):
+        assert ti.trigrams("ab") == set()
+
+
+class TestTrigramIndex:
+    def test_containing_matches_linear_scan(self):
+        keys = _keys()
+        index = ti.TrigramIndex(keys)
+        for query in ["leite", "ovos", "pão de", "a", "de", "zzz", "café delta", "ite m"]:
+            expected = [k for k in keys if query in k]
+            got = [k for k in index.containing(query) if query in k]
+            assert got == expected, query
+
+    def test_contained_in_matches_linear_scan(self):
+        keys = list(dict.fromkeys(_keys() + ["de", "m", ""]))
+        index = ti.TrigramIndex(keys)
+        for text in ["leite mimosa uht", "arroz agulha 1kg", "de", "ovos m 12un", "x"]:
+            expected = [k for k in keys if k in text]
+            got = [k for k in index.contained_in(text) if k in text]
+            assert got == expected, text
+
+    def test_preserves_insertion_order(self):
+        index = ti.TrigramIndex(["leite uht", "leite meio-gordo", "leite"])
+        assert index.containing("leite") == ["leite uht", "leite meio-gordo", "leite"]
+
+    def test_discard_and_readd_moves_to_end(self):
+        index = ti.TrigramIndex(["leite a", "leite b"])
+        index.discard("leite a")
+        assert "leite a" not in index
+        assert index.containing("leite") == ["leite b"]
+        index.add("leite a")
+        assert index.containing("leite") == ["leite b", "leite a"]
+        assert len(index) == 2
+
+    def test_no_candidates_for_unknown_gram(self):
+        assert ti.TrigramIndex(["leite"]).containing("xyz") == []
+
+
+class TestTrigramFile:
+    def _open(self, tmp_path, market_keys):
+        path = tmp_path / "price_cache.trigrams"
+        ti.write_trigram_file(path, market_keys, (1, 2))
+        return ti.TrigramFile.open(path, (1, 2))
+
+    def test_matches_memory_index(self, tmp_path):
+        keys = _keys()
+        stored = self._open(tmp_path, {"continente": keys, "pingodoce": keys[:10]}).market("continente")
+        index = ti.TrigramIndex(keys)
+        for query in ["leite", "ovos", "pão de", "a", "zzz", "café delta", "ite m"]:
+            assert stored.containing(query) == index.containing(query), query
+        for text in ["leite mimosa uht", "arroz agulha 1kg", "ovos m 12un"]:
+            assert stored.contained_in(text) == index.contained_in(text), text
+        ordered = sorted(keys[:50], key=stored.position)
+        assert ordered == sorted(keys[:50], key=index.position)
+
+    def test_unknown_market_and_gram(self, tmp_path):
+        trigram_file = self._open(tmp_path, {"continente": ["pão de forma"]})
+        assert trigram_file.market("continente").containing("pão") == ["pão de forma"]
+        assert trigram_file.market("continente").containing("xyz") == []
+        assert trigram_file.market("auchan").containing("pão") == []
+
+    def test_other_snapshot_is_rejected(self, tmp_path):
+        self._open(tmp_path, {"continente": ["leite"]})
+        assert ti.TrigramFile.open(tmp_path / "price_cache.trigrams", (1, 3)) is None
+        assert ti.TrigramFile.open(tmp_path / "nada.trigrams", (1, 2)) is None